@@ -245,12 +245,39 @@ if os.environ.get('AWS_STORAGE_BUCKET_NAME'):
 SUPABASE_URL = os.environ.get('SUPABASE_URL')
 SUPABASE_KEY = os.environ.get('SUPABASE_KEY')
 SUPABASE_SECRET = os.environ.get('SUPABASE_SERVICE_KEY')  # Using service key for admin operations
+SUPABASE_SCHEMA_TTL = int(os.environ.get('SUPABASE_SCHEMA_TTL', 3600))  # Seconds before cached table columns are reloaded
 
 # Plaid settings - Load from environment variables 
 PLAID_CLIENT_ID = os.environ.get('PLAID_CLIENT_ID')
 PLAID_SECRET = os.environ.get('PLAID_SECRET')
 PLAID_ENVIRONMENT = os.environ.get('PLAID_ENVIRONMENT', 'sandbox')
 PLAID_DEV_MODE = False  # Disabled - enforce refresh restrictions
+PLAID_SYNC_CONCURRENCY = int(os.environ.get('PLAID_SYNC_CONCURRENCY', 4))  # Plaid items fetched in parallel per sync (1 = sequential)
+PLAID_POOL_SIZE = int(os.environ.get('PLAID_POOL_SIZE', 10))  # Keep-alive connections kept open to Plaid per process
+PLAID_TIMEOUT = float(os.environ.get('PLAID_TIMEOUT', 30))  # Seconds before a Plaid API request times out
+PLAID_RATE_LIMIT = os.environ.get('PLAID_RATE_LIMIT', 'True').lower() == 'true'  # Pace Plaid calls to stay under Plaid's rate limits
+PLAID_RATE_LIMITS = os.environ.get('PLAID_RATE_LIMITS', '')  # Overrides of the per-minute limits, e.g. '/transactions/sync:1000:20'
+PLAID_RATE_LIMIT_DIR = os.environ.get('PLAID_RATE_LIMIT_DIR', '')  # Directory of the rate limit buckets shared by processes (defaults to the temp directory)
+PLAID_MAX_RETRIES = int(os.environ.get('PLAID_MAX_RETRIES', 3))  # Retries of Plaid calls that hit a rate limit or a server error
+PLAID_REFRESH_WORKERS = int(os.environ.get('PLAID_REFRESH_WORKERS', 4))  # Users refreshed at once by refresh_plaid_data
+PLAID_REFRESH_BUDGET = int(os.environ.get('PLAID_REFRESH_BUDGET', 0))  # Most items a scheduled soft refresh syncs per run (0 = no limit)
+PLAID_REFRESH_CADENCE_HOURS = float(os.environ.get('PLAID_REFRESH_CADENCE_HOURS', 24))  # Hours between new data at an institution; fresher items aren't refreshed
+PLAID_INSTITUTION_CADENCE_HOURS = {  # Per-institution overrides, e.g. 'ins_3:6,ins_4:12'
+    institution_id.strip(): float(hours)
+    for institution_id, hours in (entry.split(':') for entry in os.environ.get('PLAID_INSTITUTION_CADENCE_HOURS', '').split(',') if entry.strip())
+}
+PLAID_BACKGROUND_SYNC = os.environ.get('PLAID_BACKGROUND_SYNC', 'True').lower() == 'true'  # Sync newly linked items after the request returns
+PLAID_BACKGROUND_WORKERS = int(os.environ.get('PLAID_BACKGROUND_WORKERS', 2))  # Background syncs run at once per process
+PLAID_WEBHOOK_URL = os.environ.get('PLAID_WEBHOOK_URL', '')  # Public URL of /dashboard/api/plaid/webhook/, registered on new Link tokens
+PLAID_WEBHOOK_VERIFY = os.environ.get('PLAID_WEBHOOK_VERIFY', 'True').lower() == 'true'  # Only disable for local testing
+PLAID_RAW_JSON = os.environ.get('PLAID_RAW_JSON', 'False').lower() == 'true'  # Parse transaction/holdings responses as plain JSON, skipping SDK models
+PLAID_JOB_QUEUE = os.environ.get('PLAID_JOB_QUEUE', 'False').lower() == 'true'  # Hand syncs and refreshes to run_sync_workers instead of running them in the web process
+PLAID_JOB_WORKERS = int(os.environ.get('PLAID_JOB_WORKERS', 2))  # Jobs run at once by each run_sync_workers process
+
+# Monthly rollups of transactions (run supabase_integration/sql/monthly_rollups.sql, then backfill_monthly_rollups)
+MONTHLY_ROLLUPS = os.environ.get('MONTHLY_ROLLUPS', 'False').lower() == 'true'  # Keep monthly_rollups up to date on syncs and read monthly totals from it
+TRANSACTION_SUMMARY_RPC = os.environ.get('TRANSACTION_SUMMARY_RPC', 'False').lower() == 'true'  # Sum the transaction and budgeting pages' totals with the database functions
+DASHBOARD_SNAPSHOT_TTL = int(os.environ.get('DASHBOARD_SNAPSHOT_TTL', 3600))  # Most seconds a user's dashboard is served from its snapshot (0 = always recompute)
 
 # Stripe settings
 STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY')
@@ -0,0 +1,180 @@
+"""
+Columnar transaction data for the dashboard's analytics.
+
+The views fetch transactions as lists of dicts. TransactionFrame reads such a list
+once into typed NumPy columns (amount, date, category code, account code and a
+transfer flag), and the totals the pages show are then masks and grouped sums over
+those columns instead of Python loops that convert every field of every row again.
+
+Categories are cleaned and transfers flagged the same way as the monthly rollups and
+the database summary functions (supabase_integration.rollups), so every way of
+computing a page's totals agrees.
+"""
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+
+from supabase_integration.rollups import clean_category
+
+_TRANSFER_NAMES = ('venmo', 'zelle')
+
+
+class TransactionFrame:
+    """
+    A fetched set of transactions as NumPy columns.
+
+    Usage:
+        frame = TransactionFrame(transactions)
+        spending = frame.sum_by_category(frame.expense & ~frame.transfer)
+        income = frame.sum_by_month(frame.income, values=-frame.amount)
+
+    Attributes:
+        amount: float64 amounts in Plaid's sign convention (negative is money in)
+        date: datetime64[D] dates, NaT for transactions without one
+        category: Index of each transaction's cleaned category in `categories`
+        account: Index of each transaction's account ID in `accounts`
+        transfer: Whether each transaction moves money between own accounts or to friends
+    """
+
+    def __init__(self, transactions: Iterable[Dict[str, Any]]):
+        """
+        Args:
+            transactions: Transaction rows with at least amount, date, category,
+                          account_id, merchant_name and name
+        """
+        category_codes: Dict[str, int] = {}
+        account_codes: Dict[Any, int] = {}
+        transfer_categories: List[bool] = []
+        transfer_names: Dict[tuple, bool] = {}
+
+        amounts, dates, categories, accounts, transfers = [], [], [], [], []
+        for transaction in transactions:
+            amounts.append(float(transaction.get('amount') or 0))
+            dates.append((transaction.get('date') or 'NaT')[:10])
+
+            category = clean_category(transaction.get('category'))
+            code = category_codes.get(category)
+            if code is None:
+                code = category_codes[category] = len(category_codes)
+                transfer_categories.append('transfer' in category.lower())
+            categories.append(code)
+
+            account_id = transaction.get('account_id')
+            account_code = account_codes.get(account_id)
+            if account_code is None:
+                account_code = account_codes[account_id] = len(account_codes)
+            accounts.append(account_code)
+
+            # Names repeat a lot (same merchants every month), so each pair is only checked once
+            names = (transaction.get('merchant_name'), transaction.get('name'))
+            by_name = transfer_names.get(names)
+            if by_name is None:
+                joined = f"{names[0] or ''} {names[1] or ''}".lower()
+                by_name = transfer_names[names] = any(word in joined for word in _TRANSFER_NAMES)
+            transfers.append(by_name or transfer_categories[code])
+
+        self.amount = np.array(amounts, dtype=np.float64)
+        self.date = np.array(dates, dtype='datetime64[D]')
+        self.category = np.array(categories, dtype=np.int32)
+        self.account = np.array(accounts, dtype=np.int32)
+        self.transfer = np.array(transfers, dtype=bool)
+        self.categories: List[str] = list(category_codes)
+        self.accounts: List[Any] = list(account_codes)
+
+    def __len__(self) -> int:
+        return len(self.amount)
+
+    @property
+    def income(self) -> np.ndarray:
+        """Mask of the deposits (negative amounts)"""
+        return self.amount < 0
+
+    @property
+    def expense(self) -> np.ndarray:
+        """Mask of the expenses (positive amounts)"""
+        return self.amount > 0
+
+    @property
+    def dated(self) -> np.ndarray:
+        """Mask of the transactions that have a date"""
+        return ~np.isnat(self.date)
+
+    def between(self, start_date: date, end_date: date) -> np.ndarray:
+        """Mask of the transactions dated from start_date to end_date, inclusive"""
+        return (self.date >= np.datetime64(start_date, 'D')) & (self.date <= np.datetime64(end_date, 'D'))
+
+    def in_accounts(self, account_ids: Iterable[Any]) -> np.ndarray:
+        """Mask of the transactions from the given accounts"""
+        wanted = set(account_ids)
+        codes = [code for code, account_id in enumerate(self.accounts) if account_id in wanted]
+        return np.isin(self.account, codes)
+
+    def total(self, mask: np.ndarray, values: Optional[np.ndarray] = None) -> float:
+        """Sum of values (the amounts by default) over a mask"""
+        values = self.amount if values is None else values
+        return float(values[mask].sum())
+
+    def sum_by_category(self, mask: np.ndarray, values: Optional[np.ndarray] = None,
+                        transfer_label: Optional[str] = None) -> Dict[str, float]:
+        """
+        Sum values by category over a mask
+
+        Args:
+            mask: Transactions to include
+            values: Values to sum, the amounts by default
+            transfer_label: If given, transfers are summed under this label instead of their category
+
+        Returns:
+            dict: Category to sum, for the categories with transactions in the mask,
+                  in the order they first appear
+        """
+        codes, labels = self.category, self.categories
+        if transfer_label is not None:
+            codes = np.where(self.transfer, len(labels), codes)
+            labels = labels + [transfer_label]
+        return self._group_sum(codes, labels, mask, values)
+
+    def sum_by_account(self, mask: np.ndarray, values: Optional[np.ndarray] = None) -> Dict[Any, float]:
+        """Sum values by account ID over a mask, for the accounts with transactions in it"""
+        return self._group_sum(self.account, self.accounts, mask, values)
+
+    def sum_by_month(self, mask: np.ndarray, values: Optional[np.ndarray] = None) -> Dict[date, float]:
+        """Sum values by month over a mask (undated transactions are left out), keyed by the month's first day"""
+        mask = mask & self.dated
+        months, codes = np.unique(self.date[mask].astype('datetime64[M]'), return_inverse=True)
+        values = self.amount if values is None else values
+        sums = np.bincount(codes.ravel(), weights=values[mask], minlength=len(months))
+        return {month.astype('datetime64[D]').item(): float(total) for month, total in zip(months, sums)}
+
+    def sum_by_week(self, mask: np.ndarray, weeks: int, values: Optional[np.ndarray] = None) -> List[float]:
+        """
+        Sum values by week of the month over a mask
+
+        Weeks are 7-day buckets counted from the first of each month (the 1st-7th is
+        week 0), so masks usually cover a single month.
+
+        Args:
+            mask: Transactions to include
+            weeks: Number of weeks returned; later weeks are left out
+            values: Values to sum, the amounts by default
+
+        Returns:
+            list: The sum of each week
+        """
+        mask = mask & self.dated
+        dates = self.date[mask]
+        week = (dates - dates.astype('datetime64[M]')).astype(np.int64) // 7
+        values = (self.amount if values is None else values)[mask]
+        in_range = week < weeks
+        return np.bincount(week[in_range], weights=values[in_range], minlength=weeks)[:weeks].tolist()
+
+    def _group_sum(self, codes: np.ndarray, labels: Sequence[Any], mask: np.ndarray,
+                   values: Optional[np.ndarray]) -> Dict[Any, float]:
+        """Sum values by code over a mask, keyed by label in order of first appearance"""
+        values = self.amount if values is None else values
+        present, first = np.unique(codes[mask], return_index=True)
+        sums = np.bincount(codes[mask], weights=values[mask], minlength=len(labels))
+        totals: Dict[Any, float] = {}
+        for code in present[np.argsort(first)]:
+            totals[labels[code]] = totals.get(labels[code], 0.0) + float(sums[code])
+        return totals
@@ -0,0 +1,114 @@
+"""
+Management command to benchmark the dashboard's transaction analytics on NumPy columns against row loops.
+"""
+from django.core.management.base import BaseCommand
+from dashboard.frames import TransactionFrame
+from datetime import date, datetime, timedelta
+import random
+import time
+
+CATEGORIES = ['Food and Drink', 'Shops', 'Travel', 'Rent', 'Payroll', 'Transfer', 'Utilities', None]
+NAMES = ['Coffee Shop', 'Grocery Store', 'Venmo payment', 'Airline', 'Landlord', 'Zelle transfer', 'Power Co']
+
+
+def sample_transactions(count, account_ids):
+    """Build transactions as the views fetch them (TRANSACTION_SUMMARY_COLUMNS)"""
+    rng = random.Random(42)
+    start = date(2024, 1, 1)
+    return [{
+        'id': f"uuid-{i}",
+        'account_id': account_ids[i % len(account_ids)],
+        'amount': round(rng.uniform(-500, 500), 2),
+        'category': CATEGORIES[i % len(CATEGORIES)],
+        'date': (start + timedelta(days=i % 180)).isoformat(),
+        'merchant_name': None,
+        'name': f"{NAMES[i % len(NAMES)]} {i % 40}",
+    } for i in range(count)]
+
+
+def loop_summary(transactions):
+    """The page totals computed one row at a time, as the views did before TransactionFrame"""
+    summary = {'income': 0.0, 'spending': 0.0, 'by_category': {}, 'by_account': {}, 'by_month': {}, 'weekly': [0.0] * 5}
+    for transaction in transactions:
+        category = transaction.get('category') or 'Uncategorized'
+        amount = float(transaction.get('amount', 0))
+        transaction_date = datetime.strptime(transaction.get('date'), '%Y-%m-%d').date()
+        name = (transaction.get('merchant_name') or transaction.get('name') or '').lower()
+        is_transfer = 'transfer' in category.lower() or 'venmo' in name or 'zelle' in name
+
+        month = transaction_date.replace(day=1)
+        summary['by_month'][month] = summary['by_month'].get(month, 0.0) - amount
+        if amount < 0:
+            summary['income'] += abs(amount)
+        else:
+            summary['spending'] += amount
+            account_id = transaction.get('account_id')
+            summary['by_account'][account_id] = summary['by_account'].get(account_id, 0.0) + amount
+            summary['weekly'][(transaction_date.day - 1) // 7] += amount
+            if not is_transfer:
+                summary['by_category'][category] = summary['by_category'].get(category, 0.0) + amount
+    return summary
+
+
+def frame_summary(frame):
+    """The same totals as loop_summary from the frame's columns"""
+    spent = ~frame.income
+    return {
+        'income': frame.total(frame.income, values=-frame.amount),
+        'spending': frame.total(spent),
+        'by_category': frame.sum_by_category(spent & ~frame.transfer),
+        'by_account': frame.sum_by_account(spent),
+        'by_month': frame.sum_by_month(frame.dated, values=-frame.amount),
+        'weekly': frame.sum_by_week(spent, 5),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Measures the CPU time of the dashboard transaction totals with TransactionFrame and with row loops'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            action='append',
+            help='Number of synthetic transactions (can be given more than once, default 10000 and 100000)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Number of runs; the fastest is reported'
+        )
+
+    def handle(self, *args, **options):
+        repeat = max(1, options['repeat'])
+        account_ids = [f"account-{n}" for n in range(6)]
+
+        for rows in options['rows'] or [10000, 100000]:
+            transactions = sample_transactions(rows, account_ids)
+            self.stdout.write(f"{rows} transactions, best of {repeat} (CPU time)")
+
+            loop = self.time_best(repeat, lambda: loop_summary(transactions))
+            build = self.time_best(repeat, lambda: TransactionFrame(transactions))
+            frame = TransactionFrame(transactions)
+            aggregate = self.time_best(repeat, lambda: frame_summary(frame))
+            self.report('row loop', loop, rows)
+            self.report('frame: build columns', build, rows)
+            self.report('frame: totals', aggregate, rows)
+            self.report('frame: build + totals', build + aggregate, rows)
+            self.stdout.write(f"TransactionFrame is {loop / max(build + aggregate, 1e-9):.1f}x faster than the row loop")
+
+    def time_best(self, repeat, func):
+        """Run func repeat times and return the lowest CPU time in seconds"""
+        best = None
+        for _ in range(repeat):
+            started = time.process_time()
+            func()
+            elapsed = time.process_time() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def report(self, label, seconds, rows):
+        """Print the throughput of one stage"""
+        seconds = max(seconds, 1e-9)
+        self.stdout.write(self.style.SUCCESS(f"{label}: {seconds * 1000:.1f} ms, {rows / seconds:,.0f} rows/sec"))
@@ -0,0 +1,47 @@
+import unittest
+from datetime import date
+
+from .frames import TransactionFrame
+
+
+def transaction(amount, day, category='Food', account_id='acct-1', name='Shop', merchant_name=None):
+    """A fetched transaction row"""
+    return {'amount': amount, 'date': day, 'category': category, 'account_id': account_id,
+            'name': name, 'merchant_name': merchant_name}
+
+
+class TestTransactionFrame(unittest.TestCase):
+    """Test the columnar totals the dashboard views share."""
+
+    def setUp(self):
+        self.frame = TransactionFrame([
+            transaction(30, '2024-05-03'),
+            transaction(-1000, '2024-05-15', category='Payroll', account_id='acct-2'),
+            transaction(20, '2024-05-09', category=None),
+            transaction(45, '2024-05-29', name='Venmo payment'),
+            transaction(12.5, '2024-04-30', merchant_name='ZELLE'),
+            transaction(7, None),
+        ])
+
+    def test_masks_and_grouped_sums(self):
+        """Test income, expense and transfer masks and the sums by category and account."""
+        frame = self.frame
+        self.assertEqual(frame.total(frame.income, values=-frame.amount), 1000)
+        self.assertEqual(frame.total(frame.expense & ~frame.transfer), 57)
+        self.assertEqual(frame.sum_by_category(frame.expense & ~frame.transfer),
+                         {'Food': 37.0, 'Uncategorized': 20.0})
+        self.assertEqual(frame.sum_by_category(frame.expense, transfer_label='Transfer'),
+                         {'Food': 37.0, 'Uncategorized': 20.0, 'Transfer': 57.5})
+        self.assertEqual(frame.sum_by_account(frame.income), {'acct-2': -1000.0})
+
+    def test_weekly_and_monthly_buckets(self):
+        """Test that weeks count from the first of the month and undated transactions are left out."""
+        frame = self.frame
+        may = frame.between(date(2024, 5, 1), date(2024, 5, 31))
+        self.assertEqual(frame.sum_by_week(may & frame.expense, 5), [30.0, 20.0, 0.0, 0.0, 45.0])
+        self.assertEqual(frame.sum_by_month(frame.expense), {date(2024, 4, 1): 12.5, date(2024, 5, 1): 95.0})
+        self.assertEqual(int(frame.dated.sum()), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
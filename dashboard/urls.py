@@ -15,7 +15,9 @@ from .views.plaid_connection_view import (
     connect_bank_view, 
     create_link_token_view, 
     exchange_public_token_view,
-    manual_refresh_view
+    manual_refresh_view,
+    sync_status_view,
+    plaid_webhook_view
 )
 from dashboard.views import debug_view
 from .views.subscription_view import subscription_view
@@ -23,6 +25,7 @@ from .views.mobile_plaid_view import (
     create_link_token,
     exchange_public_token,
     get_plaid_items,
+    get_sync_status,
     get_accounts,
     get_transactions,
     manual_refresh,
@@ -51,11 +54,14 @@ urlpatterns = [
     path('api/plaid/create-link-token/', create_link_token_view, name='create_link_token'),
     path('api/plaid/exchange-public-token/', exchange_public_token_view, name='exchange_public_token'),
     path('api/plaid/refresh/', manual_refresh_view, name='manual_refresh'),
+    path('api/plaid/sync-status/', sync_status_view, name='plaid_sync_status'),
+    path('api/plaid/webhook/', plaid_webhook_view, name='plaid_webhook'),
     
     # Mobile API endpoints
     path('api/mobile/plaid/create-link-token/', create_link_token, name='mobile_create_link_token'),
     path('api/mobile/plaid/exchange-public-token/', exchange_public_token, name='mobile_exchange_public_token'),
     path('api/mobile/plaid/get-plaid-items/', get_plaid_items, name='mobile_get_plaid_items'),
+    path('api/mobile/plaid/sync-status/', get_sync_status, name='mobile_sync_status'),
     path('api/mobile/plaid/get-accounts/', get_accounts, name='mobile_get_accounts'),
     path('api/mobile/plaid/get-transactions/', get_transactions, name='mobile_get_transactions'),
     path('api/mobile/plaid/refresh/', manual_refresh, name='mobile_manual_refresh'),
@@ -5,13 +5,122 @@ from django.shortcuts import render
 import logging
 from supabase_integration.decorators import login_required
 from supabase_integration.adapter import SupabaseAdapter
-from datetime import datetime, timedelta
+from supabase_integration.queries import TransactionQuery, TRANSACTION_SUMMARY_COLUMNS
+from supabase_integration.rollups import monthly_rollups_enabled, summarize_rollups
+from dashboard.frames import TransactionFrame
+from datetime import datetime, date
 import json
 import calendar
 from dateutil.relativedelta import relativedelta
 
 logger = logging.getLogger(__name__)
 
+# Months shown in the trend chart, ending with the selected month
+TREND_MONTHS = 6
+
+
+def _fetch_transactions(adapter, supabase_id, start_date, end_date, exclude_account_ids):
+    """Every non-investment transaction between two dates, with only the columns the budget needs"""
+    query = TransactionQuery(
+        supabase_id,
+        start_date=start_date,
+        end_date=end_date,
+        exclude_account_ids=exclude_account_ids
+    )
+    return adapter.get_all_transactions(query, columns=TRANSACTION_SUMMARY_COLUMNS)
+
+
+def _bucket_transactions(transactions, start_date, end_date, trend_months):
+    """
+    Bucket transactions into the selected month, its weeks and categories, and the trend months
+
+    Args:
+        transactions: Transactions covering the trend months (any order)
+        start_date: First day of the selected month
+        end_date: Last day of the selected month counted in its totals
+        trend_months: First day of each trend month, oldest first
+
+    Returns:
+        dict: The selected month's 'count', 'income', 'spending' and 'spending_by_category'
+              (transfers under 'Transfer'), its 'weekly' spending by week of the month,
+              and the 'net' of each trend month by its first day
+    """
+    frame = TransactionFrame(transactions)
+    selected = frame.between(start_date, end_date)
+    spent = selected & frame.expense
+
+    # Negative amounts are deposits in Plaid format
+    months = frame.sum_by_month(frame.dated, values=-frame.amount)
+
+    return {
+        'count': int(selected.sum()),
+        'income': frame.total(selected & frame.income, values=-frame.amount),
+        'spending': frame.total(spent),
+        'spending_by_category': frame.sum_by_category(spent, transfer_label='Transfer'),
+        'weekly': frame.sum_by_week(spent, (end_date.day - 1) // 7 + 1),
+        'net': {month: months.get(month, 0.0) for month in trend_months},
+    }
+
+
+def _summarize_in_database(adapter, supabase_id, start_date, end_date, exclude_account_ids):
+    """
+    The same summary as _bucket_transactions, from transaction totals summed in the database
+
+    Args:
+        adapter: The SupabaseAdapter
+        supabase_id: The user's Supabase ID
+        start_date: First day of the selected month
+        end_date: Last day of the selected month counted in its totals
+        exclude_account_ids: Accounts left out of the totals (investment accounts)
+
+    Returns:
+        dict: The summary, or None if the database functions aren't available
+    """
+    month_query = TransactionQuery(supabase_id, start_date=start_date, end_date=end_date, exclude_account_ids=exclude_account_ids)
+    by_category = adapter.summarize_transactions(month_query, 'category')
+    if by_category is None:
+        return None
+    by_week = adapter.summarize_transactions(month_query, 'week')
+
+    # The trend counts the whole of the selected month
+    trend_start = start_date - relativedelta(months=TREND_MONTHS - 1)
+    trend_query = TransactionQuery(
+        supabase_id,
+        start_date=trend_start,
+        end_date=start_date + relativedelta(day=31),
+        exclude_account_ids=exclude_account_ids
+    )
+    by_month = adapter.summarize_transactions(trend_query, 'month')
+    if by_week is None or by_month is None:
+        return None
+
+    weekly = [0.0] * ((end_date.day - 1) // 7 + 1)
+    net = {trend_start + relativedelta(months=i): 0.0 for i in range(TREND_MONTHS)}
+    summary = {'count': 0, 'income': 0.0, 'spending': 0.0, 'spending_by_category': {}, 'weekly': weekly, 'net': net}
+
+    for row in by_category:
+        summary['count'] += row['transaction_count']
+        summary['income'] += float(row['income'])
+        spending = float(row['spending'])
+        if spending > 0:
+            summary['spending'] += spending
+            # Track transfers separately
+            category = 'Transfer' if row['is_transfer'] else row['key']
+            summary['spending_by_category'][category] = summary['spending_by_category'].get(category, 0) + spending
+
+    for row in by_week:
+        week_index = (date.fromisoformat(row['key']).day - 1) // 7
+        if week_index < len(weekly):
+            weekly[week_index] += float(row['spending'])
+
+    for row in by_month:
+        month = date.fromisoformat(row['key'])
+        if month in net:
+            net[month] += float(row['income']) - float(row['spending'])
+
+    return summary
+
+
 @login_required
 def budgeting_view(request):
     """Budgeting view with transaction data processing"""
@@ -61,17 +170,6 @@ def budgeting_view(request):
     # Calculate date for the monthly view
     current_month_name = datetime(start_date.year, start_date.month, 1).strftime('%B %Y')
     
-    # Get accounts to add account names to transactions
-    accounts = adapter.get_accounts(supabase_id)
-    account_map = {account['id']: account for account in accounts}
-    
-    # Identify investment accounts (for filtering)
-    investment_account_ids = []
-    for account in accounts:
-        if account.get('is_investment') or account.get('is_investment_account') or account.get('type') == 'investment':
-            if 'id' in account:
-                investment_account_ids.append(account['id'])
-    
     # Initialize context with default values
     context = {
         'page_title': 'Budgeting',
@@ -86,109 +184,87 @@ def budgeting_view(request):
     }
     
     try:
-        # Get transactions from Supabase for the selected month
         if supabase_id:
-            start_date_str = start_date.isoformat()
-            end_date_str = end_date.isoformat()
-            
-            transactions = adapter.get_transactions(
-                supabase_id, 
-                start_date=start_date_str, 
-                end_date=end_date_str
-            )
+            # Accounts are only needed to leave investment transactions out, which happens in the query
+            accounts = adapter.get_accounts(supabase_id)
+            investment_account_ids = [
+                account['id'] for account in accounts
+                if 'id' in account and (account.get('is_investment') or account.get('is_investment_account') or account.get('type') == 'investment')
+            ]
             
-            # If no transactions found for the selected month and it's the current month,
-            # try to find the most recent month with transactions
-            if not transactions and month_param == 'current':
-                logger.info("No transactions found for current month, fetching all available transactions")
-                transactions = adapter.get_transactions(supabase_id)
-                
-                # If we have transactions, find the most recent month with data
-                if transactions:
-                    # Sort transactions by date (newest first)
-                    transactions.sort(key=lambda x: x.get('date', ''), reverse=True)
-                    
-                    # Get the most recent transaction date
-                    most_recent_date = datetime.strptime(transactions[0]['date'], '%Y-%m-%d').date()
-                    
-                    # Update date range to that month
-                    end_date = most_recent_date
+            # With the summary functions the month's totals are summed in the database
+            summary = _summarize_in_database(adapter, supabase_id, start_date, end_date, investment_account_ids)
+            if summary is not None and month_param == 'current' and not summary['count']:
+                # If the current month has no transactions yet, show the most recent month that has some
+                latest = adapter.query_transactions(TransactionQuery(
+                    supabase_id, end_date=start_date - relativedelta(days=1), exclude_account_ids=investment_account_ids, page_size=1
+                ))
+                latest_dates = [t['date'] for t in latest['transactions'] if t.get('date')]
+                if latest_dates:
+                    end_date = date.fromisoformat(max(latest_dates))
                     start_date = end_date.replace(day=1)
-                    
-                    # Update month name
                     current_month_name = end_date.strftime('%B %Y')
                     context['current_month'] = current_month_name
-                    
-                    # Re-fetch transactions for that month only
-                    start_date_str = start_date.isoformat()
-                    end_date_str = end_date.isoformat()
-                    
-                    transactions = adapter.get_transactions(
-                        supabase_id, 
-                        start_date=start_date_str, 
-                        end_date=end_date_str
-                    )
-                    
+                    summary = _summarize_in_database(adapter, supabase_id, start_date, end_date, investment_account_ids)
                     logger.info(f"Found transactions for {current_month_name}")
             
-            # Filter out investment transactions
-            if investment_account_ids:
-                transactions = [t for t in transactions if t.get('account_id') not in investment_account_ids]
-            
-            # Add account names to transactions
-            for transaction in transactions:
-                account_id = transaction.get('account_id')
-                if account_id in account_map:
-                    transaction['account_name'] = account_map[account_id].get('name', 'Unknown Account')
-                else:
-                    transaction['account_name'] = 'Unknown Account'
-            
-            if transactions:
-                logger.info(f"Successfully retrieved {len(transactions)} transactions for {current_month_name} budgeting")
+            if summary is None:
+                # One query covers the selected month and the months of the trend before it;
+                # with the monthly rollups the trend is read from them and only the selected month is fetched
+                use_rollups = monthly_rollups_enabled()
+                trend_start = start_date - relativedelta(months=TREND_MONTHS - 1)
+                month_end = start_date + relativedelta(day=31)
+                transactions = _fetch_transactions(adapter, supabase_id, start_date if use_rollups else trend_start, month_end, investment_account_ids)
                 
-                # Calculate monthly income (negative amounts are deposits in Plaid format)
-                monthly_income = sum(abs(float(t.get('amount', 0))) for t in transactions if float(t.get('amount', 0)) < 0)
+                # If the current month has no transactions yet, show the most recent month that has some
+                in_selected_month = any(start_date.isoformat() <= (t.get('date') or '') <= end_date.isoformat() for t in transactions)
+                if month_param == 'current' and not in_selected_month:
+                    earlier = [t['date'] for t in transactions if t.get('date') and t['date'] < start_date.isoformat()]
+                    if not earlier:
+                        logger.info("No transactions found for the last months, looking up the most recent transaction")
+                        latest = adapter.query_transactions(TransactionQuery(supabase_id, exclude_account_ids=investment_account_ids, page_size=1))
+                        earlier = [t['date'] for t in latest['transactions'] if t.get('date')]
                 
-                # Calculate total spending (positive amounts are expenses)
-                monthly_spending = sum(float(t.get('amount', 0)) for t in transactions if float(t.get('amount', 0)) > 0)
+                    if earlier:
+                        most_recent_date = date.fromisoformat(max(earlier))
+                        end_date = most_recent_date
+                        start_date = end_date.replace(day=1)
+                        current_month_name = end_date.strftime('%B %Y')
+                        context['current_month'] = current_month_name
+                    
+                        # Fetch that month, or with the raw trend only the months the first query didn't cover
+                        new_trend_start = start_date - relativedelta(months=TREND_MONTHS - 1)
+                        if use_rollups:
+                            transactions = _fetch_transactions(adapter, supabase_id, start_date, end_date, investment_account_ids)
+                        elif new_trend_start < trend_start:
+                            missing_end = min(start_date + relativedelta(day=31), trend_start - relativedelta(days=1))
+                            transactions.extend(_fetch_transactions(adapter, supabase_id, new_trend_start, missing_end, investment_account_ids))
+                        trend_start = new_trend_start
+                        logger.info(f"Found transactions for {current_month_name}")
                 
-                # Calculate net savings
-                net_savings = monthly_income - monthly_spending
+                trend_months = [trend_start + relativedelta(months=i) for i in range(TREND_MONTHS)]
+                summary = _bucket_transactions(transactions, start_date, end_date, trend_months)
+                if use_rollups:
+                    months = summarize_rollups(adapter.get_monthly_rollups(supabase_id, trend_start, start_date))
+                    summary['net'] = {
+                        month: months[month]['income'] - months[month]['spending'] if month in months else 0.0
+                        for month in trend_months
+                    }
+            
+            if summary['count']:
+                logger.info(f"Successfully retrieved {summary['count']} transactions for {current_month_name} budgeting")
                 
-                # Compute spending by category
-                spending_by_category = {}
-                for transaction in transactions:
-                    category = transaction.get('category', 'Uncategorized')
-                    # Clean up category names
-                    if not category or category.lower() == 'null' or category.lower() == 'none':
-                        category = 'Uncategorized'
-                    
-                    amount = float(transaction.get('amount', 0))
-                    
-                    # Filter out transfers from regular expense calculations 
-                    is_transfer = (
-                        category.lower() == 'transfer' or 
-                        'transfer' in category.lower() or 
-                        'venmo' in transaction.get('name', '').lower() or
-                        'zelle' in transaction.get('name', '').lower()
-                    )
-                    
-                    # Only include expenses (positive amount in Plaid format)
-                    if amount > 0:
-                        # Track transfers separately
-                        if is_transfer:
-                            category = 'Transfer'
-                            
-                        if category in spending_by_category:
-                            spending_by_category[category] += amount
-                        else:
-                            spending_by_category[category] = amount
+                monthly_income = summary['income']
+                monthly_spending = summary['spending']
+                net_savings = monthly_income - monthly_spending
+                spending_by_category = summary['spending_by_category']
                 
                 # Re-calculate monthly spending WITHOUT transfer amounts for better financial insight
                 transfer_amount = spending_by_category.get('Transfer', 0)
                 actual_spending = monthly_spending - transfer_amount
                 
-                # Recalculate savings rate based on actual spending (excluding transfers)
+                # Savings rate is based on actual spending (excluding transfers)
+                savings_rate = 0
                 if monthly_income > 0:
                     savings_rate = int(((monthly_income - actual_spending) / monthly_income) * 100)
                 
@@ -200,60 +276,11 @@ def budgeting_view(request):
                     top_categories['Other'] = others_sum
                     spending_by_category = top_categories
                 
-                # Convert spending by category to chart format
-                category_labels = list(spending_by_category.keys())
-                category_data = list(spending_by_category.values())
-                
-                # Calculate weekly spending trends (improved algorithm)
-                weekly_spending = {}
-                
-                # Get weeks of the selected month
-                current_month_start = start_date
-                current_month_end = end_date
-                
-                # Create week buckets
-                week_number = 1
-                while True:
-                    week_start = current_month_start + timedelta(days=(week_number-1)*7)
-                    if week_start.month != current_month_start.month:
-                        break
-                    
-                    week_end = min(week_start + timedelta(days=6), current_month_end)
-                    if week_end.month != current_month_start.month:
-                        week_end = current_month_start.replace(day=calendar.monthrange(
-                            current_month_start.year, current_month_start.month)[1])
-                    
-                    week_label = f"Week {week_number}"
-                    weekly_spending[week_label] = 0
-                    week_number += 1
-                    
-                    if week_end >= current_month_end:
-                        break
-                
-                # If no weeks were created (rare edge case), create at least one
-                if not weekly_spending:
-                    weekly_spending["Week 1"] = 0
-                
-                # Assign transactions to weeks
-                for transaction in transactions:
-                    if 'date' not in transaction:
-                        continue
-                    
-                    tx_date = datetime.strptime(transaction['date'], '%Y-%m-%d').date()
-                    amount = float(transaction.get('amount', 0))
-                    
-                    # Only include expenses
-                    if amount <= 0:
-                        continue
-                    
-                    # Find which week this transaction belongs to
-                    days_from_start = (tx_date - current_month_start).days
-                    week_index = days_from_start // 7 + 1
-                    week_label = f"Week {week_index}"
-                    
-                    # Some weeks might not exist in our buckets if the month is incomplete
-                    if week_label in weekly_spending:
-                        weekly_spending[week_label] += amount
+                # Trend data for the months up to the selected one, in chronological order
+                past_months_data = [
+                    {'month': month.strftime('%b %Y'), 'net': month_net}
+                    for month, month_net in summary['net'].items()
+                ]
                 
                 # Update context with calculated values
                 context.update({
@@ -262,58 +289,15 @@ def budgeting_view(request):
                     'net_savings': net_savings,
                     'savings_rate': savings_rate,
                     'spending_by_category': spending_by_category,
-                    'category_labels': json.dumps(category_labels),
-                    'category_data': json.dumps(category_data),
-                    'weekly_labels': json.dumps(list(weekly_spending.keys())),
-                    'weekly_data': json.dumps(list(weekly_spending.values())),
+                    'category_labels': json.dumps(list(spending_by_category.keys())),
+                    'category_data': json.dumps(list(spending_by_category.values())),
+                    'weekly_labels': json.dumps([f"Week {i + 1}" for i in range(len(summary['weekly']))]),
+                    'weekly_data': json.dumps(summary['weekly']),
                     'has_transactions': True,
                     'transfer_amount': transfer_amount,
-                    'actual_spending': actual_spending
+                    'actual_spending': actual_spending,
+                    'past_months_data': json.dumps(past_months_data)
                 })
-                
-                # Calculate trend data for past 6 months to enhance projection chart
-                past_months_data = []
-                
-                # Use the selected month as the reference point
-                reference_date = datetime(end_date.year, end_date.month, 1)
-                
-                for i in range(6):
-                    # Calculate months relative to the selected month
-                    month_date = reference_date - relativedelta(months=i)
-                    month_end = month_date.replace(day=calendar.monthrange(month_date.year, month_date.month)[1])
-                    month_start = month_date.replace(day=1)
-                    
-                    # Format dates for Supabase
-                    month_start_str = month_start.isoformat()
-                    month_end_str = month_end.isoformat()
-                    
-                    # Get transactions for this month
-                    month_transactions = adapter.get_transactions(
-                        supabase_id, 
-                        start_date=month_start_str, 
-                        end_date=month_end_str
-                    )
-                    
-                    # Filter out investment transactions
-                    if investment_account_ids:
-                        month_transactions = [t for t in month_transactions if t.get('account_id') not in investment_account_ids]
-                    
-                    # Calculate net for this month
-                    month_income = sum(abs(float(t.get('amount', 0))) for t in month_transactions if float(t.get('amount', 0)) < 0)
-                    month_expenses = sum(float(t.get('amount', 0)) for t in month_transactions if float(t.get('amount', 0)) > 0)
-                    month_net = month_income - month_expenses
-                    
-                    month_name = month_end.strftime('%b %Y')
-                    past_months_data.append({
-                        'month': month_name,
-                        'net': month_net
-                    })
-                
-                # Reverse to get chronological order
-                past_months_data.reverse()
-                
-                # Add to context
-                context['past_months_data'] = json.dumps(past_months_data)
             else:
                 logger.warning("No transactions found for budgeting view")
         else:
@@ -322,4 +306,4 @@ def budgeting_view(request):
         logger.error(f"Error in budgeting view: {str(e)}")
         logger.exception("Full exception details:")
     
-    return render(request, 'dashboard/budgeting.html', context) 
\ No newline at end of file
+    return render(request, 'dashboard/budgeting.html', context)
@@ -10,6 +10,7 @@ import json
 from supabase_integration.decorators import login_required
 from supabase_integration.adapter import SupabaseAdapter
 from supabase_integration.services import SupabaseService
+from supabase_integration.snapshots import invalidate_dashboard
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
@@ -341,6 +342,7 @@ def create_goal(request):
         response = adapter.client.table('financial_goals').insert(goal_data).execute()
         
         if response.data:
+            invalidate_dashboard(supabase_id)
             # Add the frontend goal type to the response for UI consistency
             response.data[0]['frontend_goal_type'] = frontend_goal_type
             logger.info(f"[{request_id}] Goal created successfully with ID: {response.data[0].get('id')}")
@@ -400,6 +402,7 @@ def update_goal(request, goal_id):
         response = adapter.client.table('financial_goals').update(update_data).eq('id', goal_id).execute()
         
         if response.data:
+            invalidate_dashboard(supabase_id)
             # Add the frontend goal type to the response for UI consistency
             if 'goal_type' in data:
                 response.data[0]['frontend_goal_type'] = data.get('goal_type')
@@ -431,6 +434,7 @@ def delete_goal(request, goal_id):
         
         # Delete the goal
         response = adapter.client.table('financial_goals').delete().eq('id', goal_id).execute()
+        invalidate_dashboard(supabase_id)
         
         return JsonResponse({'success': True})
             
@@ -482,6 +486,7 @@ def add_funds(request, goal_id):
         
         if not transaction_response.data:
             return JsonResponse({'success': False, 'error': 'Failed to record transaction'}, status=500)
+        invalidate_dashboard(supabase_id)
         
         # Get updated goal data
         goal_response = adapter.client.table('financial_goals').select('*').eq('id', goal_id).execute()
@@ -7,7 +7,11 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from supabase_integration.services import PlaidService
+from supabase_integration.jobs import PRIORITY_INTERACTIVE, enqueue_job, job_queue_enabled
+from supabase_integration.leases import ItemSyncLease
+from supabase_integration.scheduler import record_dashboard_visit
 from supabase_integration.decorators import jwt_auth_required
+from supabase_integration.queries import TransactionQuery
 
 logger = logging.getLogger(__name__)
 
@@ -89,10 +93,13 @@ def exchange_public_token(request):
                 plaid_status = plaid_service.get_plaid_status(request.user)
                 
                 logger.info(f"Successfully exchanged public token for mobile user {request.user.id}")
+                # The accounts and transactions are still being synced in the background;
+                # the client follows the sync through the sync status endpoint
                 return JsonResponse({
                     'success': True,
                     'message': 'Successfully connected bank account',
-                    'plaid_status': plaid_status
+                    'plaid_status': plaid_status,
+                    'sync_status': plaid_service.get_sync_status(request.user)
                 })
             else:
                 logger.error(f"Failed to exchange token for mobile, PlaidService returned False")
@@ -139,6 +146,26 @@ def get_plaid_items(request):
             'error': str(e)
         }, status=500)
 
+@jwt_auth_required
+@require_http_methods(["GET"])
+def get_sync_status(request):
+    """
+    Mobile API endpoint to follow the background sync of newly linked Plaid items
+    """
+    try:
+        plaid_service = PlaidService()
+        sync_status = plaid_service.get_sync_status(request.user, item_id=request.GET.get('item_id'))
+        return JsonResponse({
+            'success': True,
+            **sync_status
+        })
+    except Exception as e:
+        logger.error(f"Error in mobile get_sync_status: {str(e)}", exc_info=True)
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
 @jwt_auth_required
 @require_http_methods(["GET"])
 def get_accounts(request):
@@ -146,6 +173,9 @@ def get_accounts(request):
     Mobile API endpoint to get user's financial accounts
     """
     try:
+        # Opening the app counts as a visit for the refresh scheduler
+        record_dashboard_visit(request.user.id)
+        
         # Initialize the PlaidService
         plaid_service = PlaidService()
         
@@ -176,21 +206,37 @@ def get_transactions(request):
         end_date = request.GET.get('end_date')      # Format: YYYY-MM-DD
         account_id = request.GET.get('account_id')  # Optional account ID for filtering
         
+        # Build a paginated query, all filtering happens in the database
+        try:
+            query = TransactionQuery(
+                request.user.id,
+                start_date=start_date,
+                end_date=end_date,
+                account_ids=[account_id] if account_id else None,
+                category=request.GET.get('category'),
+                search=request.GET.get('search'),
+                sign=request.GET.get('sign'),  # Optional 'income' or 'expense'
+                page_size=int(request.GET.get('limit', 100)),
+                cursor=request.GET.get('cursor')  # next_cursor from the previous page
+            )
+        except ValueError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            }, status=400)
+        
         # Initialize the PlaidService
         plaid_service = PlaidService()
         
-        # Get the user's transactions
+        # Get one page of the user's transactions
         adapter = plaid_service.adapter
-        transactions = adapter.get_transactions(
-            request.user.id,
-            start_date=start_date,
-            end_date=end_date,
-            account_id=account_id
-        )
+        page = adapter.query_transactions(query)
         
         return JsonResponse({
             'success': True,
-            'transactions': transactions
+            'transactions': page['transactions'],
+            'next_cursor': page['next_cursor'],
+            'has_more': page['has_more']
         })
     except Exception as e:
         logger.error(f"Error in mobile get_transactions: {str(e)}", exc_info=True)
@@ -233,6 +279,15 @@ def manual_refresh(request):
                 'error': 'Item not found or unauthorized'
             }, status=403)
         
+        # Join a sync of this item that is already running instead of starting another
+        if refresh_type.lower() != 'hard' and ItemSyncLease.holder(item.get('item_id')):
+            logger.info(f"Item {item_id} is already syncing, not starting another refresh")
+            return JsonResponse({
+                'success': True,
+                'already_syncing': True,
+                'message': 'This account is already being refreshed'
+            })
+        
         # Perform the refresh
         success = False
         if refresh_type.lower() == 'hard':
@@ -240,6 +295,15 @@ def manual_refresh(request):
         else:
             success = adapter.record_soft_refresh(item_id)
         
+        if success and refresh_type.lower() != 'hard' and job_queue_enabled():
+            # Fetch the new data in the background
+            enqueue_job(
+                'manual_refresh',
+                {'user_id': str(request.user.id), 'item_id': item_id},
+                priority=PRIORITY_INTERACTIVE,
+                dedup_key=f"manual_refresh:{request.user.id}"
+            )
+        
         if success:
             logger.info(f"Successfully initiated {refresh_type} refresh for item {item_id}")
             return JsonResponse({
@@ -11,6 +11,9 @@ import json
 from django.conf import settings
 from supabase_integration.decorators import login_required
 from supabase_integration.services import PlaidService
+from supabase_integration.webhooks import handle_plaid_webhook
+from supabase_integration.jobs import PRIORITY_INTERACTIVE, enqueue_job, job_queue_enabled
+from supabase_integration.leases import ItemSyncLease
 from datetime import datetime, timedelta, timezone as dt_timezone
 
 logger = logging.getLogger(__name__)
@@ -148,10 +151,13 @@ def exchange_public_token_view(request):
                 plaid_status = plaid_service.get_plaid_status(request.user)
                 
                 logger.info(f"Successfully exchanged public token for user {request.user.id}")
+                # The accounts and transactions are still being synced in the background;
+                # the client follows the sync through the sync status endpoint
                 return JsonResponse({
                     'success': True,
                     'message': 'Successfully connected bank account',
-                    'plaid_status': plaid_status
+                    'plaid_status': plaid_status,
+                    'sync_status': plaid_service.get_sync_status(request.user)
                 })
             else:
                 logger.error(f"Failed to exchange token, PlaidService returned False")
@@ -266,7 +272,33 @@ def manual_refresh_view(request):
                         'hours_until_next_refresh': hours_until
                     })
             
-            # Soft refresh is allowed - perform it
+            # Join a sync of this item that is already running instead of starting another
+            if ItemSyncLease.holder(item.get('item_id')):
+                logger.info(f"Item {item_id} is already syncing, not starting another refresh")
+                return JsonResponse({
+                    'success': True,
+                    'already_syncing': True,
+                    'message': 'This account is already being refreshed, your data will update shortly'
+                })
+            
+            # Soft refresh is allowed - hand it to the sync workers if there are any
+            if job_queue_enabled():
+                job = enqueue_job(
+                    'manual_refresh',
+                    {'user_id': str(request.user.id), 'item_id': item_id},
+                    priority=PRIORITY_INTERACTIVE,
+                    dedup_key=f"manual_refresh:{request.user.id}"
+                )
+                if job:
+                    adapter.record_soft_refresh(item_id)
+                    return JsonResponse({
+                        'success': True,
+                        'queued': True,
+                        'message': 'Refresh started, your accounts will update in a few minutes',
+                        'job_id': job.id
+                    })
+            
+            # Otherwise perform it now
             logger.info(f"Refreshing accounts for user {request.user.id}, item {item_id}")
             plaid_service.refresh_accounts(request.user)
             
@@ -282,16 +314,16 @@ def manual_refresh_view(request):
             end_date_str = end_date.isoformat()
             
             logger.info(f"Syncing transactions from {start_date_str} to {end_date_str}")
-            transactions = plaid_service.sync_transactions(request.user, start_date_str, end_date_str)
-            logger.info(f"Synced {len(transactions)} transactions")
+            transaction_count = plaid_service.sync_transactions(request.user, start_date_str, end_date_str)
+            logger.info(f"Synced {transaction_count} transactions")
             
             # Get updated status
             plaid_status = plaid_service.get_plaid_status(request.user)
             
             return JsonResponse({
                 'success': True,
-                'message': f'Successfully refreshed accounts and synced {len(transactions)} transactions',
-                'transaction_count': len(transactions),
+                'message': f'Successfully refreshed accounts and synced {transaction_count} transactions',
+                'transaction_count': transaction_count,
                 'plaid_status': plaid_status
             })
             
@@ -301,4 +333,39 @@ def manual_refresh_view(request):
         return JsonResponse({
             'success': False,
             'error': str(e)
-        }, status=500) 
\ No newline at end of file
+        }, status=500)
+
+
+@login_required
+@require_http_methods(["GET"])
+def sync_status_view(request):
+    """API view to follow the background sync of newly linked Plaid items"""
+    try:
+        plaid_service = PlaidService()
+        sync_status = plaid_service.get_sync_status(request.user, item_id=request.GET.get('item_id'))
+        return JsonResponse({
+            'success': True,
+            **sync_status
+        })
+    except Exception as e:
+        logger.error(f"Error getting Plaid sync status: {str(e)}", exc_info=True)
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def plaid_webhook_view(request):
+    """
+    Endpoint Plaid calls when an item's data or status changes
+    
+    The webhook is verified and the matching per-item sync is queued to run in
+    the background, so Plaid gets its response immediately.
+    """
+    try:
+        status, body = handle_plaid_webhook(request.body, request.headers.get('Plaid-Verification'))
+        return JsonResponse(body, status=status)
+    except Exception as e:
+        logger.error(f"Error handling Plaid webhook: {str(e)}")
+        return JsonResponse({'error': 'Webhook processing failed'}, status=500)
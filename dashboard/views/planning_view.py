@@ -8,6 +8,7 @@ import logging
 from supabase_integration.decorators import login_required
 from supabase_integration.services import SupabaseService
 from supabase_integration.adapter import SupabaseAdapter
+from supabase_integration.snapshots import invalidate_dashboard
 
 logger = logging.getLogger(__name__)
 
@@ -180,6 +181,7 @@ def save_retirement_profile(request):
             result = adapter.client.table('profiles').update(profile_data).eq('id', supabase_id).execute()
             if result.data:
                 logger.info(f"Profile updated successfully: {result.data}")
+                invalidate_dashboard(supabase_id)
                 return JsonResponse({
                     'success': True,
                     'message': 'Profile updated successfully!'
@@ -2,16 +2,47 @@
 Views for transaction display with different filtering options.
 """
 from django.shortcuts import render
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from supabase_integration.adapter import SupabaseAdapter
 from supabase_integration.decorators import login_required
+from supabase_integration.queries import TransactionQuery, TRANSACTION_SUMMARY_COLUMNS
+from dashboard.frames import TransactionFrame
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 import calendar
 import json
 
 logger = logging.getLogger(__name__)
 
+TRANSACTIONS_PER_PAGE = 10
+
+def _pagination_query(request):
+    """URL query string with the current filters, for building page links"""
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    params.pop('page', None)
+    return params.urlencode()
+
+def _database_totals(adapter, query, *group_bys):
+    """
+    Transaction totals summed in the database for each grouping
+    
+    Args:
+        adapter: The SupabaseAdapter
+        query: TransactionQuery with the filters to sum
+        group_bys: Groupings to sum by ('category', 'account', 'week' or 'month')
+        
+    Returns:
+        dict: The summary rows of each grouping, or None if the database functions
+              aren't available and the transactions have to be summed here
+    """
+    totals = {}
+    for group_by in group_bys:
+        rows = adapter.summarize_transactions(query, group_by)
+        if rows is None:
+            return None
+        totals[group_by] = rows
+    return totals
+
 @login_required
 def regular_transactions_view(request):
     """Display only regular transactions, excluding investment transactions"""
@@ -49,14 +80,6 @@ def regular_transactions_view(request):
     start_date_str = start_date.isoformat()
     end_date_str = end_date.isoformat()
     
-    # Get all transactions from Supabase
-    transactions = adapter.get_transactions(
-        supabase_id, 
-        start_date=start_date_str, 
-        end_date=end_date_str,
-        account_id=account_id if account_id else None
-    )
-    
     # Get accounts to add account names to transactions
     accounts = adapter.get_accounts(supabase_id)
     account_map = {account['id']: account for account in accounts}
@@ -72,30 +95,27 @@ def regular_transactions_view(request):
         else:
             regular_accounts.append(account)
     
-    # Add account names to transactions and filter out investment transactions
-    regular_transactions = []
-    for transaction in transactions:
-        account_id = transaction.get('account_id')
-        is_investment_transaction = account_id in investment_account_ids
-        
-        # Add account name
-        if account_id in account_map:
-            transaction['account_name'] = account_map[account_id].get('name', 'Unknown Account')
-        else:
-            transaction['account_name'] = 'Unknown Account'
-            
-        # Only include non-investment transactions
-        if not is_investment_transaction:
-            # Apply additional filtering (category and search)
-            if category and category.lower() not in (transaction.get('category') or '').lower():
-                continue
-                
-            if search and not (search.lower() in (transaction.get('merchant_name') or '').lower() or 
-                              search.lower() in (transaction.get('name') or '').lower() or
-                              search.lower() in (transaction.get('category') or '').lower()):
-                continue
-                
-            regular_transactions.append(transaction)
+    # All filtering happens in the database, investment transactions are excluded there too
+    transaction_query = TransactionQuery(
+        supabase_id,
+        start_date=start_date_str,
+        end_date=end_date_str,
+        account_ids=[account_id] if account_id else None,
+        exclude_account_ids=investment_account_ids,
+        category=category,
+        search=search,
+        page_size=TRANSACTIONS_PER_PAGE,
+        cursor=request.GET.get('cursor')
+    )
+    
+    # Only the current page is loaded in full
+    page = adapter.query_transactions(transaction_query)
+    page_transactions = page['transactions']
+    
+    # Add account names to the transactions on this page
+    for transaction in page_transactions:
+        account = account_map.get(transaction.get('account_id'))
+        transaction['account_name'] = account.get('name', 'Unknown Account') if account else 'Unknown Account'
     
     # Calculate account cash flow
     account_cash_flow = {}
@@ -127,45 +147,70 @@ def regular_transactions_view(request):
         monthly_income[month_name] = 0.0
         monthly_expenses[month_name] = 0.0
     
-    # Process transactions
-    for transaction in regular_transactions:
-        category = transaction.get('category', 'Uncategorized')
-        amount = float(transaction.get('amount', 0))
-        account_id = transaction.get('account_id')
-        transaction_date = datetime.strptime(transaction.get('date', end_date.isoformat()), '%Y-%m-%d').date()
-        transaction_month = transaction_date.strftime('%B')
+    # Totals only count the regular accounts, so categories and months are summed over those
+    summary_account_ids = [
+        regular_id for regular_id in account_cash_flow
+        if not transaction_query.account_ids or str(regular_id) in transaction_query.account_ids
+    ]
+    summary_query = TransactionQuery(
+        supabase_id,
+        start_date=start_date_str,
+        end_date=end_date_str,
+        account_ids=summary_account_ids,
+        category=transaction_query.category,
+        search=transaction_query.search
+    )
+    totals = _database_totals(adapter, transaction_query, 'account')
+    if totals is not None and summary_account_ids:
+        by_category_and_month = _database_totals(adapter, summary_query, 'category', 'month')
+        totals = {**totals, **by_category_and_month} if by_category_and_month is not None else None
+    
+    if totals is not None:
+        # Summed in the database, a few rows per account, category and month
+        total_transactions = 0
+        for row in totals['account']:
+            total_transactions += row['transaction_count']
+            if row['key'] in account_cash_flow:
+                account_cash_flow[row['key']]['inflows'] += float(row['income'])
+                account_cash_flow[row['key']]['outflows'] += float(row['spending'])
+                total_inflows += float(row['income'])
+                total_outflows += float(row['spending'])
+        
+        for row in totals.get('category', []):
+            if not row['is_transfer'] and float(row['spending']) > 0:
+                spending_by_category[row['key']] = spending_by_category.get(row['key'], 0.0) + float(row['spending'])
         
-        # Check if this is a transfer transaction
-        is_transfer = (
-            category.lower() == 'transfer' or 
-            'transfer' in category.lower() or 
-            'venmo' in (transaction.get('merchant_name', '') or transaction.get('name', '')).lower() or
-            'zelle' in (transaction.get('merchant_name', '') or transaction.get('name', '')).lower()
-        )
+        for row in totals.get('month', []):
+            month_name = date.fromisoformat(row['key']).strftime('%B')
+            if month_name in monthly_income:
+                monthly_income[month_name] += float(row['income'])
+                monthly_expenses[month_name] += float(row['spending'])
+    else:
+        # Totals only need a few columns of each matching transaction, read once into columns
+        frame = TransactionFrame(adapter.get_all_transactions(transaction_query, columns=TRANSACTION_SUMMARY_COLUMNS))
+        total_transactions = len(frame)
         
-        # Update account cash flow
-        if account_id in account_cash_flow:
-            if amount < 0:  # Income (negative in Plaid format)
-                account_cash_flow[account_id]['inflows'] += abs(amount)
-                total_inflows += abs(amount)
-                
-                # Update monthly income if in the last 5 months
-                if transaction_month in monthly_income:
-                    monthly_income[transaction_month] += abs(amount)
-            else:  # Expense
-                account_cash_flow[account_id]['outflows'] += amount
-                total_outflows += amount
-                
-                # Update monthly expenses if in the last 5 months
-                if transaction_month in monthly_expenses:
-                    monthly_expenses[transaction_month] += amount
-                
-                # Track spending by category (exclude transfers)
-                if not is_transfer:
-                    if category in spending_by_category:
-                        spending_by_category[category] += amount
-                    else:
-                        spending_by_category[category] = amount
+        # Only the regular accounts count; negative amounts are income in Plaid format
+        known = frame.in_accounts(account_cash_flow)
+        received = known & frame.income
+        paid = known & ~frame.income
+        for account_id, inflow in frame.sum_by_account(received, values=-frame.amount).items():
+            account_cash_flow[account_id]['inflows'] += inflow
+        for account_id, outflow in frame.sum_by_account(paid).items():
+            account_cash_flow[account_id]['outflows'] += outflow
+        total_inflows += frame.total(received, values=-frame.amount)
+        total_outflows += frame.total(paid)
+        
+        # Track spending by category (exclude transfers)
+        spending_by_category = frame.sum_by_category(paid & ~frame.transfer)
+        
+        # Update monthly income and expenses for the months in the last 5
+        for month, inflow in frame.sum_by_month(received, values=-frame.amount).items():
+            if month.strftime('%B') in monthly_income:
+                monthly_income[month.strftime('%B')] += inflow
+        for month, outflow in frame.sum_by_month(paid).items():
+            if month.strftime('%B') in monthly_expenses:
+                monthly_expenses[month.strftime('%B')] += outflow
     
     # Calculate net cash flow for each account
     for account_id, data in account_cash_flow.items():
@@ -185,18 +230,6 @@ def regular_transactions_view(request):
     # Calculate total net
     total_net = total_inflows - total_outflows
     
-    # Sort by most recent first
-    regular_transactions.sort(key=lambda x: x.get('date', ''), reverse=True)
-    
-    # Paginate results
-    page_number = request.GET.get('page', 1)
-    paginator = Paginator(regular_transactions, 10)  # Show 10 transactions per page
-    
-    try:
-        page_obj = paginator.page(page_number)
-    except (EmptyPage, PageNotAnInteger):
-        page_obj = paginator.page(1)
-    
     # Generate dummy upcoming payments (for demonstration)
     upcoming_payments = [
         {'type': 'Bill', 'name': 'Internet Service', 'amount': 79.99, 'date': 'May 15'},
@@ -212,7 +245,10 @@ def regular_transactions_view(request):
     
     context = {
         'page_title': 'Transactions',
-        'transactions': page_obj,
+        'transactions': page_transactions,
+        'next_cursor': page['next_cursor'],
+        'is_first_page': not transaction_query.cursor,
+        'pagination_query': _pagination_query(request),
         'accounts': regular_accounts,
         'total_inflows': round(total_inflows, 2),
         'total_outflows': round(total_outflows, 2),
@@ -224,7 +260,7 @@ def regular_transactions_view(request):
         'last_5_months_json': last_5_months_json,
         'investment_account_ids': investment_account_ids,
         'has_plaid_data': bool(accounts),
-        'total_transactions': len(regular_transactions),
+        'total_transactions': total_transactions,
         'account_cash_flow': accounts_with_cash_flow,
         'upcoming_payments': upcoming_payments
     }
@@ -268,24 +304,6 @@ def all_transactions_view(request):
     start_date_str = start_date.isoformat()
     end_date_str = end_date.isoformat()
     
-    # Get transactions from Supabase without filtering out investment transactions
-    transactions = adapter.get_transactions(
-        supabase_id, 
-        start_date=start_date_str, 
-        end_date=end_date_str,
-        account_id=account_id if account_id else None
-    )
-    
-    # Apply additional filtering in Python (category and search)
-    if category:
-        transactions = [t for t in transactions if category.lower() in (t.get('category') or '').lower()]
-    
-    if search:
-        transactions = [t for t in transactions if 
-            search.lower() in (t.get('merchant_name') or '').lower() or 
-            search.lower() in (t.get('name') or '').lower() or
-            search.lower() in (t.get('category') or '').lower()]
-    
     # Get accounts to add account names to transactions
     accounts = adapter.get_accounts(supabase_id)
     account_map = {account['id']: account for account in accounts}
@@ -297,13 +315,29 @@ def all_transactions_view(request):
             if 'id' in account:
                 investment_account_ids.append(account['id'])
     
-    # Add account names to transactions
-    for transaction in transactions:
-        account_id = transaction.get('account_id')
-        if account_id in account_map:
-            transaction['account_name'] = account_map[account_id].get('name', 'Unknown Account')
-            transaction['account_type'] = account_map[account_id].get('type', 'unknown')
-            transaction['is_investment'] = account_id in investment_account_ids
+    # All filtering happens in the database, without filtering out investment transactions
+    transaction_query = TransactionQuery(
+        supabase_id,
+        start_date=start_date_str,
+        end_date=end_date_str,
+        account_ids=[account_id] if account_id else None,
+        category=category,
+        search=search,
+        page_size=TRANSACTIONS_PER_PAGE,
+        cursor=request.GET.get('cursor')
+    )
+    
+    # Only the current page is loaded in full
+    page = adapter.query_transactions(transaction_query)
+    page_transactions = page['transactions']
+    
+    # Add account names to the transactions on this page
+    for transaction in page_transactions:
+        transaction_account_id = transaction.get('account_id')
+        if transaction_account_id in account_map:
+            transaction['account_name'] = account_map[transaction_account_id].get('name', 'Unknown Account')
+            transaction['account_type'] = account_map[transaction_account_id].get('type', 'unknown')
+            transaction['is_investment'] = transaction_account_id in investment_account_ids
         else:
             transaction['account_name'] = 'Unknown Account'
             transaction['account_type'] = 'unknown'
@@ -313,32 +347,25 @@ def all_transactions_view(request):
     spending_by_category = {}
     income_by_category = {}
     
-    for transaction in transactions:
-        category = transaction.get('category', 'Uncategorized')
-        amount = float(transaction.get('amount', 0))
-        
-        # Check if this is a transfer transaction
-        is_transfer = (
-            category.lower() == 'transfer' or 
-            'transfer' in category.lower() or 
-            'venmo' in (transaction.get('merchant_name', '') or transaction.get('name', '')).lower() or
-            'zelle' in (transaction.get('merchant_name', '') or transaction.get('name', '')).lower()
-        )
+    totals = _database_totals(adapter, transaction_query, 'category')
+    if totals is not None:
+        # Summed in the database, a few rows per category
+        total_transactions_count = 0
+        for row in totals['category']:
+            total_transactions_count += row['transaction_count']
+            if float(row['income']) > 0:
+                income_by_category[row['key']] = income_by_category.get(row['key'], 0.0) + float(row['income'])
+            if not row['is_transfer'] and float(row['spending']) > 0:
+                spending_by_category[row['key']] = spending_by_category.get(row['key'], 0.0) + float(row['spending'])
+    else:
+        # Totals only need a few columns of each matching transaction, read once into columns
+        frame = TransactionFrame(adapter.get_all_transactions(transaction_query, columns=TRANSACTION_SUMMARY_COLUMNS))
+        total_transactions_count = len(frame)
         
-        # Negative amounts are income in Plaid format
-        if amount < 0:
-            # Store as positive for display
-            if category in income_by_category:
-                income_by_category[category] += abs(amount)
-            else:
-                income_by_category[category] = abs(amount)
-        else:
-            # Positive amounts are expenses (exclude transfers)
-            if not is_transfer:
-                if category in spending_by_category:
-                    spending_by_category[category] += amount
-                else:
-                    spending_by_category[category] = amount
+        # Negative amounts are income in Plaid format, stored as positive for display
+        income_by_category = frame.sum_by_category(frame.income, values=-frame.amount)
+        # Positive amounts are expenses (exclude transfers)
+        spending_by_category = frame.sum_by_category(~frame.income & ~frame.transfer)
     
     # Prepare data for charts
     spending_categories = list(spending_by_category.keys())
@@ -352,21 +379,12 @@ def all_transactions_view(request):
     total_income = sum(income_by_category.values())
     net_cashflow = total_income - total_spending
     
-    # Save the total count before filtering
-    total_transactions_count = len(transactions)
-    
-    # Paginate results
-    page_number = request.GET.get('page', 1)
-    paginator = Paginator(transactions, 10)  # Show 10 transactions per page (reduced from 25)
-    
-    try:
-        page_obj = paginator.page(page_number)
-    except (EmptyPage, PageNotAnInteger):
-        page_obj = paginator.page(1)
-    
     context = {
         'page_title': 'All Transactions',
-        'transactions': page_obj,
+        'transactions': page_transactions,
+        'next_cursor': page['next_cursor'],
+        'is_first_page': not transaction_query.cursor,
+        'pagination_query': _pagination_query(request),
         'accounts': accounts,
         'investment_account_ids': investment_account_ids,
         'date_filter': date_filter,
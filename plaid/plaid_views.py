@@ -8,9 +8,10 @@ from django.shortcuts import render, redirect
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
 from datetime import datetime, timedelta
-import requests
 import os
 
+from supabase_integration.plaid_client import get_plaid_session, plaid_timeout
+
 logger = logging.getLogger(__name__)
 
 # ----- PLAID CONFIGURATION -----
@@ -61,10 +62,11 @@ def create_link_token(request):
             payload['redirect_uri'] = PLAID_REDIRECT_URI
             
         # Make the API request
-        response = requests.post(
+        response = get_plaid_session().post(
             f'{plaid_api_host}/link/token/create',
             json=payload,
-            headers={'Content-Type': 'application/json'}
+            headers={'Content-Type': 'application/json'},
+            timeout=plaid_timeout()
         )
         
         # Handle the response
@@ -118,14 +120,15 @@ def exchange_public_token(request):
             return JsonResponse({'error': 'Invalid Plaid environment'}, status=400)
             
         # Make the API request to exchange the token
-        response = requests.post(
+        response = get_plaid_session().post(
             f'{plaid_api_host}/item/public_token/exchange',
             json={
                 'client_id': PLAID_CLIENT_ID,
                 'secret': PLAID_SECRET,
                 'public_token': public_token
             },
-            headers={'Content-Type': 'application/json'}
+            headers={'Content-Type': 'application/json'},
+            timeout=plaid_timeout()
         )
         
         # Handle the response
@@ -243,14 +246,15 @@ def fetch_accounts(access_token, supabase_id):
         raise ValueError(f"Invalid Plaid environment: {PLAID_ENV}")
     
     # Make API request to get accounts
-    response = requests.post(
+    response = get_plaid_session().post(
         f'{plaid_api_host}/accounts/get',
         json={
             'client_id': PLAID_CLIENT_ID,
             'secret': PLAID_SECRET,
             'access_token': access_token
         },
-        headers={'Content-Type': 'application/json'}
+        headers={'Content-Type': 'application/json'},
+        timeout=plaid_timeout()
     )
     
     if response.status_code != 200:
@@ -267,7 +271,7 @@ def fetch_accounts(access_token, supabase_id):
     institution_db_id = None
     if institution_id:
         # Fetch institution data from Plaid
-        inst_response = requests.post(
+        inst_response = get_plaid_session().post(
             f'{plaid_api_host}/institutions/get_by_id',
             json={
                 'client_id': PLAID_CLIENT_ID,
@@ -275,7 +279,8 @@ def fetch_accounts(access_token, supabase_id):
                 'institution_id': institution_id,
                 'country_codes': PLAID_COUNTRY_CODES
             },
-            headers={'Content-Type': 'application/json'}
+            headers={'Content-Type': 'application/json'},
+            timeout=plaid_timeout()
         )
         
         if inst_response.status_code == 200:
@@ -353,7 +358,7 @@ def fetch_transactions(access_token, start_date, end_date, accounts):
     end_date_str = end_date.strftime('%Y-%m-%d')
     
     # Make API request to get transactions
-    response = requests.post(
+    response = get_plaid_session().post(
         f'{plaid_api_host}/transactions/get',
         json={
             'client_id': PLAID_CLIENT_ID,
@@ -362,7 +367,8 @@ def fetch_transactions(access_token, start_date, end_date, accounts):
             'start_date': start_date_str,
             'end_date': end_date_str
         },
-        headers={'Content-Type': 'application/json'}
+        headers={'Content-Type': 'application/json'},
+        timeout=plaid_timeout()
     )
     
     if response.status_code != 200:
@@ -389,52 +395,19 @@ def fetch_transactions(access_token, start_date, end_date, accounts):
                 for acc in account_response.data:
                     account_map[acc['account_id']] = acc['id']
     
-    # Prepare transactions for storage
-    transaction_data_list = []
-    stored_transactions = []
+    # Prepare transactions for storage, the user_id is added from each account when storing
+    from supabase_integration.normalize import TransactionNormalizer
+    transaction_data_list = TransactionNormalizer(account_map).normalize_page(transactions)
     
-    for transaction in transactions:
-        plaid_account_id = transaction.get('account_id')
-        account_id = account_map.get(plaid_account_id)
-        
-        if account_id:
-            transaction_data = {
-                'account_id': account_id,
-                'transaction_id': transaction.get('transaction_id'),
-                'amount': transaction.get('amount'),
-                'date': transaction.get('date'),
-                'merchant_name': transaction.get('merchant_name', ''),
-                'description': transaction.get('name', ''),  # Use transaction name as description
-                'category': transaction.get('category', [''])[0] if transaction.get('category') else '',
-                'pending': transaction.get('pending', False)
-            }
-            transaction_data_list.append(transaction_data)
+    # Store all transactions with one bulk upsert keyed on transaction_id
+    from supabase_integration.adapter import PlaidAdapter
+    counts = PlaidAdapter(supabase).upsert_transactions(transaction_data_list)
     
-    # Store transactions in batches to avoid large payloads
-    batch_size = 50
-    for i in range(0, len(transaction_data_list), batch_size):
-        batch = transaction_data_list[i:i+batch_size]
-        
-        if batch:
-            # For each transaction, check if it exists and update it, or insert it
-            for txn_data in batch:
-                # Check if transaction exists
-                txn_id = txn_data['transaction_id']
-                existing_txn = supabase.table('transactions').select('id').eq('transaction_id', txn_id).execute()
-                
-                if existing_txn.data and len(existing_txn.data) > 0:
-                    # Update existing transaction
-                    txn_db_id = existing_txn.data[0]['id']
-                    txn_response = supabase.table('transactions').update(txn_data).eq('id', txn_db_id).execute()
-                    if txn_response.data:
-                        stored_transactions.extend(txn_response.data)
-                else:
-                    # Insert new transaction
-                    txn_response = supabase.table('transactions').insert(txn_data).execute()
-                    if txn_response.data:
-                        stored_transactions.extend(txn_response.data)
+    if counts is None:
+        raise Exception("Failed to store transactions in Supabase")
     
-    return stored_transactions
+    logger.info(f"Stored transactions: {counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged")
+    return transaction_data_list
 
 @login_required
 def simple_plaid_link(request):
@@ -21,6 +21,7 @@ from plaid.configuration import Configuration
 from plaid.api_client import ApiClient
 from datetime import datetime, timedelta
 from .utils import classify_account, enhanced_account_data, is_investment_account, is_retirement_account, is_credit_account, is_loan_account
+from supabase_integration.normalize import TransactionNormalizer
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -114,6 +115,13 @@ class SupabaseStorage(StorageInterface):
             # Delete Plaid items
             client.table('plaid_items').delete().eq('user_id', user_id).execute()
             
+            # The transactions are gone, so are their monthly totals
+            if getattr(settings, 'MONTHLY_ROLLUPS', False):
+                client.table('monthly_rollups').delete().eq('user_id', user_id).execute()
+            
+            from supabase_integration.snapshots import invalidate_dashboard
+            invalidate_dashboard(user_id)
+            
             logger.info(f"Cleared all Plaid data for user {user_id}")
             return True
         except Exception as e:
@@ -261,9 +269,9 @@ class PlaidService:
             if not accounts:
                 return []
             
-            all_transactions = []
+            plaid_transactions = []
             
-            # Generate random transactions for each account
+            # Generate random transactions for each account, shaped like Plaid's
             for account in accounts:
                 # Create 5-10 transactions per account
                 num_transactions = random.randint(5, 10)
@@ -274,17 +282,20 @@ class PlaidService:
                     tx_date = start_date + timedelta(days=random_days)
                     
                     # Generate transaction data
-                    tx_data = {
+                    plaid_transactions.append({
                         'account_id': account['id'],
                         'transaction_id': f"tx_{uuid.uuid4()}",
                         'amount': round(random.uniform(5, 500), 2),
                         'date': tx_date,
+                        'name': f"Merchant {i+1}",
                         'merchant_name': f"Merchant {i+1}",
-                        'category': random.choice(['Food', 'Shopping', 'Transportation', 'Entertainment']),
+                        'category': [random.choice(['Food', 'Shopping', 'Transportation', 'Entertainment'])],
                         'pending': random.choice([True, False, False, False])  # 25% chance of pending
-                    }
-                    
-                    all_transactions.append(tx_data)
+                    })
+            
+            # Map them to rows the same way real Plaid transactions are
+            account_map = {account['id']: account['id'] for account in accounts}
+            all_transactions = TransactionNormalizer(account_map, str(user.id)).normalize_page(plaid_transactions)
             
             # Store all transactions
             if all_transactions:
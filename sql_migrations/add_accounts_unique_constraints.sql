@@ -0,0 +1,75 @@
+-- SQL script to make accounts unique per user and Plaid account_id
+-- Required for the bulk upserts in PlaidAdapter.store_accounts (on_conflict=user_id,account_id)
+-- and PlaidAdapter.store_account_details (on_conflict=account_id)
+-- Run this in the Supabase SQL Editor
+
+-- First, point transactions of duplicate accounts at the oldest row for each (user_id, account_id)
+WITH ranked AS (
+    SELECT id, first_value(id) OVER (PARTITION BY user_id, account_id ORDER BY created_at, id) AS keep_id
+    FROM public.accounts
+)
+UPDATE public.transactions t
+SET account_id = ranked.keep_id
+FROM ranked
+WHERE t.account_id = ranked.id
+AND ranked.id <> ranked.keep_id;
+
+-- Holdings and detail rows of the duplicates are rebuilt on the next sync, so drop them
+-- together with the duplicate accounts
+DO $$
+DECLARE
+    detail_table text;
+BEGIN
+    CREATE TEMP TABLE duplicate_accounts ON COMMIT DROP AS
+    SELECT id FROM (
+        SELECT id, first_value(id) OVER (PARTITION BY user_id, account_id ORDER BY created_at, id) AS keep_id
+        FROM public.accounts
+    ) ranked
+    WHERE id <> keep_id;
+    
+    FOREACH detail_table IN ARRAY ARRAY['account_holdings', 'account_investments', 'account_credit_details', 'account_loan_details']
+    LOOP
+        IF to_regclass('public.' || detail_table) IS NOT NULL THEN
+            EXECUTE format('DELETE FROM public.%I WHERE account_id IN (SELECT id FROM duplicate_accounts)', detail_table);
+        END IF;
+    END LOOP;
+    
+    DELETE FROM public.accounts WHERE id IN (SELECT id FROM duplicate_accounts);
+    RAISE NOTICE 'Removed duplicate accounts';
+END $$;
+
+-- Now add the unique constraints if they don't exist
+DO $$
+DECLARE
+    detail_table text;
+BEGIN
+    IF NOT EXISTS (
+        SELECT FROM pg_constraint
+        WHERE conrelid = 'public.accounts'::regclass
+        AND conname = 'accounts_user_account_key'
+    ) THEN
+        ALTER TABLE public.accounts
+        ADD CONSTRAINT accounts_user_account_key UNIQUE (user_id, account_id);
+        RAISE NOTICE 'Added unique constraint on accounts (user_id, account_id)';
+    END IF;
+    
+    -- Each account has at most one row in its detail table
+    FOREACH detail_table IN ARRAY ARRAY['account_investments', 'account_credit_details', 'account_loan_details']
+    LOOP
+        IF to_regclass('public.' || detail_table) IS NOT NULL AND NOT EXISTS (
+            SELECT FROM pg_constraint
+            WHERE conrelid = to_regclass('public.' || detail_table)
+            AND conname = detail_table || '_account_id_key'
+        ) THEN
+            EXECUTE format(
+                'DELETE FROM public.%I t USING public.%I d WHERE t.account_id = d.account_id AND t.ctid > d.ctid',
+                detail_table, detail_table
+            );
+            EXECUTE format(
+                'ALTER TABLE public.%I ADD CONSTRAINT %I UNIQUE (account_id)',
+                detail_table, detail_table || '_account_id_key'
+            );
+            RAISE NOTICE 'Added unique constraint on %.account_id', detail_table;
+        END IF;
+    END LOOP;
+END $$;
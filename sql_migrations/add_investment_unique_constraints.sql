@@ -0,0 +1,56 @@
+-- SQL script to make securities and holdings unique on their natural keys
+-- Required for the bulk upserts in PlaidAdapter.store_securities (on_conflict=security_id)
+-- and PlaidAdapter.store_holdings (on_conflict=account_id,security_id)
+-- Run this in the Supabase SQL Editor
+
+-- First, point holdings of duplicate securities at the oldest row for each security_id
+WITH ranked AS (
+    SELECT id, first_value(id) OVER (PARTITION BY security_id ORDER BY created_at, id) AS keep_id
+    FROM public.securities
+)
+UPDATE public.account_holdings h
+SET security_id = ranked.keep_id
+FROM ranked
+WHERE h.security_id = ranked.id
+AND ranked.id <> ranked.keep_id;
+
+-- Then remove the duplicate securities, which no longer have holdings
+WITH ranked AS (
+    SELECT id, first_value(id) OVER (PARTITION BY security_id ORDER BY created_at, id) AS keep_id
+    FROM public.securities
+)
+DELETE FROM public.securities s
+USING ranked
+WHERE s.id = ranked.id
+AND ranked.id <> ranked.keep_id;
+
+-- Remove duplicate holdings, keeping one row per account and security
+DELETE FROM public.account_holdings h
+USING public.account_holdings d
+WHERE h.account_id = d.account_id
+AND h.security_id = d.security_id
+AND h.ctid > d.ctid;
+
+-- Now add the unique constraints if they don't exist
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT FROM pg_constraint
+        WHERE conrelid = 'public.securities'::regclass
+        AND conname = 'securities_security_id_key'
+    ) THEN
+        ALTER TABLE public.securities
+        ADD CONSTRAINT securities_security_id_key UNIQUE (security_id);
+        RAISE NOTICE 'Added unique constraint on securities.security_id';
+    END IF;
+    
+    IF NOT EXISTS (
+        SELECT FROM pg_constraint
+        WHERE conrelid = 'public.account_holdings'::regclass
+        AND conname = 'account_holdings_account_security_key'
+    ) THEN
+        ALTER TABLE public.account_holdings
+        ADD CONSTRAINT account_holdings_account_security_key UNIQUE (account_id, security_id);
+        RAISE NOTICE 'Added unique constraint on account_holdings (account_id, security_id)';
+    END IF;
+END $$;
@@ -0,0 +1,9 @@
+-- SQL script to add the indexes used by the paginated transaction queries
+-- Transactions are always filtered by user_id and read newest first, ordered by (date, id)
+-- Run this in the Supabase SQL Editor
+
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date_id
+ON public.transactions (user_id, date DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_transactions_account_date
+ON public.transactions (account_id, date DESC);
@@ -0,0 +1,27 @@
+-- SQL script to make Plaid's transaction_id unique in the transactions table
+-- Required for the bulk upsert in PlaidAdapter.upsert_transactions (on_conflict=transaction_id)
+-- Run this in the Supabase SQL Editor
+
+-- First, remove duplicate transactions created by earlier re-syncs, keeping one row per transaction_id
+DELETE FROM public.transactions t
+USING public.transactions d
+WHERE t.transaction_id = d.transaction_id
+AND t.transaction_id IS NOT NULL
+AND t.ctid > d.ctid;
+
+-- The plain index from transactions_sync_cursor.sql is replaced by the unique constraint below
+DROP INDEX IF EXISTS public.idx_transactions_transaction_id;
+
+-- Now add the unique constraint if it doesn't exist
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT FROM pg_constraint
+        WHERE conrelid = 'public.transactions'::regclass
+        AND conname = 'transactions_transaction_id_key'
+    ) THEN
+        ALTER TABLE public.transactions
+        ADD CONSTRAINT transactions_transaction_id_key UNIQUE (transaction_id);
+        RAISE NOTICE 'Added unique constraint on transactions.transaction_id';
+    END IF;
+END $$;
@@ -3,15 +3,23 @@ Adapters for interacting with Supabase database.
 These provide domain-specific interfaces for different database needs.
 """
 import logging
+import threading
 import uuid
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, Iterable, List, Optional, Union
 from datetime import datetime, timezone, timedelta
 
 from django.conf import settings
 from .client import get_supabase_client
+from .queries import TransactionQuery
+from .rollups import RollupDelta, account_class, month_start, monthly_rollups_enabled
+from .schema import schema_registry
+from .utils import clean_for_schema, is_credit_account, is_investment_account, is_loan_account
 
 logger = logging.getLogger(__name__)
 
+# While status updates are buffered, they are written once this many items are waiting
+STATUS_FLUSH_BATCH = 50
+
 class BaseSupabaseAdapter:
     """
     Base adapter class for Supabase operations.
@@ -21,6 +29,55 @@ class BaseSupabaseAdapter:
     def __init__(self, client=None):
         """Initialize with an optional client for dependency injection"""
         self.client = client or get_supabase_client()
+    
+    def _clean_for_table(self, table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Serialize a row and drop any fields that aren't columns of the table"""
+        return clean_for_schema(data, schema_registry.get_columns(table, self.client))
+    
+    def _bulk_upsert(self, table: str, rows: List[Dict[str, Any]], on_conflict: str,
+                     returning: str = 'representation', batch_size: int = 500) -> List[Dict[str, Any]]:
+        """
+        Upsert rows in as few requests as possible
+        
+        A bulk upsert sets every column present in the request, so rows are grouped
+        by their columns first; otherwise a row missing a column would overwrite it
+        with the column default. Each group is sent in batches of batch_size.
+        
+        Args:
+            table: The table name
+            rows: Cleaned rows to write
+            on_conflict: Comma-separated columns of the unique constraint to upsert on
+            returning: 'representation' to get the stored rows back, or 'minimal'
+            batch_size: Maximum number of rows per request
+            
+        Returns:
+            The stored rows, or the rows sent when returning='minimal'. Rows from
+            batches that failed are left out.
+        """
+        stored = []
+        for group in self._column_groups(rows):
+            for i in range(0, len(group), batch_size):
+                batch = group[i:i+batch_size]
+                try:
+                    response = self.client.table(table).upsert(
+                        batch,
+                        on_conflict=on_conflict,
+                        returning=returning
+                    ).execute()
+                    stored.extend(batch if returning == 'minimal' else (response.data or []))
+                except Exception as batch_error:
+                    logger.error(f"Error upserting {len(batch)} rows into {table}: {str(batch_error)}")
+                    schema_registry.report_error(table, batch_error)
+        
+        return stored
+    
+    @staticmethod
+    def _column_groups(rows: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Group rows by their set of columns, so each group can be upserted with one request"""
+        groups = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row.keys())), []).append(row)
+        return list(groups.values())
         
 
 class UserAdapter(BaseSupabaseAdapter):
@@ -123,6 +180,15 @@ class UserAdapter(BaseSupabaseAdapter):
     
     def update_profile(self, user_id: str, profile_data: Dict[str, Any]) -> bool:
         """Update a user's profile in Supabase"""
+        updated = self._write_profile(user_id, profile_data)
+        if updated:
+            # The dashboard's retirement figures come from the profile
+            from .snapshots import invalidate_dashboard
+            invalidate_dashboard(str(user_id))
+        return updated
+    
+    def _write_profile(self, user_id: str, profile_data: Dict[str, Any]) -> bool:
+        """Write a user's profile to Supabase, trying an update and an insert if the upsert returns nothing"""
         try:
             # Debugging
             print(f"SupabaseAdapter.update_profile called with user_id: {user_id} (type: {type(user_id)})")
@@ -190,6 +256,9 @@ class UserAdapter(BaseSupabaseAdapter):
                     clean_data['email'] = existing_profile['email']
                     print(f"Added email from existing profile: {clean_data['email']}")
             
+            # Drop anything the profiles table doesn't have
+            clean_data = self._clean_for_table('profiles', clean_data)
+            
             # Debug the cleaned data
             print(f"Cleaned profile data: {clean_data}")
             
@@ -288,6 +357,7 @@ class FinancialAdapter(BaseSupabaseAdapter):
                 
             response = self.client.table('financial_goals').insert(goal_data).execute()
             if response.data and len(response.data) > 0:
+                self._goals_changed(response.data)
                 return response.data[0]['id']
             return None
         except Exception as e:
@@ -301,6 +371,7 @@ class FinancialAdapter(BaseSupabaseAdapter):
             goal_data['id'] = goal_id
             
             response = self.client.table('financial_goals').update(goal_data).eq('id', goal_id).execute()
+            self._goals_changed(response.data)
             return bool(response.data)
         except Exception as e:
             logger.error(f"Error updating financial goal: {str(e)}")
@@ -310,11 +381,18 @@ class FinancialAdapter(BaseSupabaseAdapter):
         """Delete a financial goal from Supabase"""
         try:
             response = self.client.table('financial_goals').delete().eq('id', goal_id).execute()
+            self._goals_changed(response.data)
             return bool(response.data)
         except Exception as e:
             logger.error(f"Error deleting financial goal: {str(e)}")
             return False
     
+    def _goals_changed(self, goals: Optional[List[Dict[str, Any]]]) -> None:
+        """Invalidate the dashboards of the owners of written goal rows"""
+        from .snapshots import invalidate_dashboard
+        for user_id in {goal.get('user_id') for goal in goals or [] if goal.get('user_id')}:
+            invalidate_dashboard(str(user_id))
+    
     def get_accounts(self, user_id: str) -> List[Dict[str, Any]]:
         """Get a user's accounts from Supabase"""
         try:
@@ -346,92 +424,132 @@ class FinancialAdapter(BaseSupabaseAdapter):
             account_id: Optional account ID filter
             
         Returns:
-            List of transaction dictionaries
+            List of transaction dictionaries, newest first
         """
         try:
-            # First, get all accounts for this user to know which accounts we need to search for
-            accounts_response = self.client.table('accounts').select('id, account_id').eq('user_id', user_id).execute()
+            query = TransactionQuery(
+                user_id,
+                start_date=start_date,
+                end_date=end_date,
+                account_ids=[account_id] if account_id else None
+            )
+            transactions = self.get_all_transactions(query)
+            logger.info(f"Found {len(transactions)} transactions for user {user_id}")
+            return transactions
+        except Exception as e:
+            logger.error(f"Error getting transactions: {str(e)}")
+            logger.exception("Full traceback:")
+            return []
+    
+    def get_monthly_rollups(self, user_id: str, start_month=None, end_month=None) -> List[Dict[str, Any]]:
+        """
+        Get a user's monthly rollups from Supabase.
+        
+        Args:
+            user_id: The user's ID in Supabase
+            start_month: Optional first month (date or YYYY-MM-DD string, any day of the month)
+            end_month: Optional last month (date or YYYY-MM-DD string, any day of the month)
             
-            if not accounts_response.data:
-                logger.info(f"No accounts found for user {user_id}")
-                return []
-                
-            # Extract all account identifiers - both primary key IDs and Plaid account_ids
-            account_ids = set()
-            for account in accounts_response.data:
-                if 'id' in account and account['id']:
-                    account_ids.add(account['id'])
-                if 'account_id' in account and account['account_id']:
-                    account_ids.add(account['account_id'])
+        Returns:
+            List of monthly_rollups rows, oldest month first
+        """
+        try:
+            query = self.client.table('monthly_rollups').select('*').eq('user_id', user_id)
+            if start_month:
+                query = query.gte('month', month_start(start_month).isoformat())
+            if end_month:
+                query = query.lte('month', month_start(end_month).isoformat())
+            response = query.order('month').execute()
+            return response.data or []
+        except Exception as e:
+            logger.error(f"Error getting monthly rollups: {str(e)}")
+            return []
+    
+    def summarize_transactions(self, query: TransactionQuery, group_by: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Sum the transactions matching a query in the database, with one of the
+        transaction_totals_by_* functions from sql/transaction_summary_functions.sql.
+        
+        Args:
+            query: The TransactionQuery describing the filters (its cursor is ignored)
+            group_by: 'category', 'account', 'week' or 'month'
             
-            logger.info(f"Found {len(account_ids)} account identifiers for user {user_id}")
+        Returns:
+            List of rows with the group's 'key', 'is_transfer', 'income', 'spending' and
+            'transaction_count', or None if TRANSACTION_SUMMARY_RPC is off or the call
+            failed, in which case callers sum the rows themselves
+        """
+        if group_by not in ('category', 'account', 'week', 'month'):
+            raise ValueError(f"Invalid transaction summary grouping: {group_by}")
+        if not getattr(settings, 'TRANSACTION_SUMMARY_RPC', False):
+            return None
+        
+        try:
+            response = self.client.rpc(f'transaction_totals_by_{group_by}', query.rpc_params()).execute()
+            return response.data or []
+        except Exception as e:
+            logger.error(f"Error summarizing transactions by {group_by}: {str(e)}")
+            return None
+    
+    def query_transactions(self, query: TransactionQuery) -> Dict[str, Any]:
+        """
+        Get one page of a user's transactions, filtered and ordered in the database.
+        
+        Args:
+            query: The TransactionQuery describing the filters and page
             
-            # Strategy 1: Try to get transactions directly by user_id field
-            logger.info(f"Fetching all transactions for user {user_id}...")
-            query = self.client.table('transactions').select('*')
+        Returns:
+            Dictionary with the page of 'transactions', the 'next_cursor' to pass
+            back for the following page (None on the last page) and 'has_more'
+        """
+        try:
+            response = query.apply(self.client.table('transactions').select('*')).execute()
+            rows = response.data or []
             
-            # Try different approaches to find transactions
-            all_transactions = []
+            has_more = len(rows) > query.page_size
+            rows = rows[:query.page_size]
             
-            # Approach 1: Use user_id filter to get all user's transactions
-            try:
-                user_query = self.client.table('transactions').select('*').eq('user_id', user_id)
-                
-                # Apply date filters if specified
-                if start_date and isinstance(start_date, str):
-                    user_query = user_query.gte('date', start_date)
-                if end_date and isinstance(end_date, str):
-                    user_query = user_query.lte('date', end_date)
-                
-                user_response = user_query.execute()
-                if user_response.data:
-                    logger.info(f"Found {len(user_response.data)} transactions using user_id filter")
-                    all_transactions.extend(user_response.data)
-            except Exception as user_error:
-                logger.warning(f"Error getting transactions by user_id: {str(user_error)}")
-            
-            # Approach 2: Get all transactions and filter by account_id
-            if not all_transactions:
-                try:
-                    # Build a query to get all transactions from the database
-                    query = self.client.table('transactions').select('*')
-                    
-                    # Apply date filters if specified
-                    if start_date and isinstance(start_date, str):
-                        query = query.gte('date', start_date)
-                    if end_date and isinstance(end_date, str):
-                        query = query.lte('date', end_date)
-                    
-                    # Execute the query
-                    txn_response = query.execute()
-                    
-                    if txn_response.data:
-                        logger.info(f"Found {len(txn_response.data)} transactions in the database")
-                        # Filter to only include transactions for this user's accounts
-                        for tx in txn_response.data:
-                            # Check if this transaction belongs to one of the user's accounts
-                            if ('account_id' in tx and tx['account_id'] in account_ids) or \
-                               ('user_id' in tx and tx['user_id'] == user_id):
-                                all_transactions.append(tx)
-                        
-                        logger.info(f"After filtering, found {len(all_transactions)} transactions for user {user_id}")
-                except Exception as e:
-                    logger.warning(f"Error getting all transactions: {str(e)}")
-            
-            # Apply account_id filter if specified
-            if account_id and all_transactions:
-                all_transactions = [t for t in all_transactions if 
-                                   t.get('account_id') == account_id or 
-                                   t.get('account') == account_id]
-            
-            # Sort by date (newest first)
-            all_transactions.sort(key=lambda x: x.get('date', ''), reverse=True)
-            logger.info(f"Final count: {len(all_transactions)} transactions for user {user_id}")
-            return all_transactions
+            return {
+                'transactions': rows,
+                'next_cursor': TransactionQuery.encode_cursor(rows[-1]) if has_more and rows else None,
+                'has_more': has_more
+            }
+        except Exception as e:
+            logger.error(f"Error querying transactions: {str(e)}")
+            return {'transactions': [], 'next_cursor': None, 'has_more': False}
+    
+    def get_all_transactions(self, query: TransactionQuery, columns: str = '*') -> List[Dict[str, Any]]:
+        """
+        Get every transaction matching a query's filters, newest first.
+        
+        Use a narrow column list (e.g. TRANSACTION_SUMMARY_COLUMNS) when the rows
+        are only needed to compute totals.
+        
+        Args:
+            query: The TransactionQuery describing the filters (its cursor is ignored)
+            columns: Columns to select
+            
+        Returns:
+            List of transaction dictionaries
+        """
+        try:
+            transactions = []
+            batch_size = 1000  # PostgREST's default max rows per request
+            offset = 0
+            
+            while True:
+                builder = query.apply(self.client.table('transactions').select(columns), paginate=False)
+                response = builder.order('date', desc=True).order('id', desc=True).range(offset, offset + batch_size - 1).execute()
+                rows = response.data or []
+                transactions.extend(rows)
                 
+                if len(rows) < batch_size:
+                    break
+                offset += batch_size
+            
+            return transactions
         except Exception as e:
             logger.error(f"Error getting transactions: {str(e)}")
-            logger.exception("Full traceback:")
             return []
 
 
@@ -441,6 +559,15 @@ class PlaidAdapter(BaseSupabaseAdapter):
     Handles Plaid items, accounts, and transactions.
     """
     
+    def __init__(self, client=None):
+        super().__init__(client)
+        # Pending status changes by item_id while status updates are buffered
+        self._status_buffer = None
+        self._status_written = 0
+        # The refresh engine's worker threads share the buffer; flushes are written one at a time
+        self._status_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+    
     def store_plaid_item(self, user_id: str, item_id: str, access_token: str, institution_id: str = None, 
                         institution_name: str = None, institution_logo: str = None) -> Optional[str]:
         """Store a Plaid item in Supabase"""
@@ -553,6 +680,24 @@ class PlaidAdapter(BaseSupabaseAdapter):
             logger.error(f"Error getting Plaid item by ID: {str(e)}")
             return None
     
+    def get_plaid_item_by_plaid_id(self, item_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a Plaid item by Plaid's item_id only
+        
+        get_plaid_item_by_id tries the UUID primary key first, which Postgres rejects
+        for Plaid's item IDs, so callers holding a Plaid item_id (webhooks, syncs)
+        use this instead.
+        """
+        try:
+            response = self.client.table('plaid_items').select('*').eq('item_id', item_id).execute()
+            if response.data:
+                return response.data[0]
+            logger.warning(f"Plaid item not found with item_id = {item_id}")
+            return None
+        except Exception as e:
+            logger.error(f"Error getting Plaid item by item_id: {str(e)}")
+            return None
+    
     def store_account(self, user_id=None, account_data=None):
         """Store account data in the database
         
@@ -629,6 +774,7 @@ class PlaidAdapter(BaseSupabaseAdapter):
                 
                 # Include a last_updated timestamp
                 update_data['last_updated'] = datetime.now(timezone.utc).isoformat()
+                update_data = self._clean_for_table('accounts', update_data)
                 
                 try:
                     self.client.table('accounts').update(update_data).eq('id', account_id).execute()
@@ -648,7 +794,7 @@ class PlaidAdapter(BaseSupabaseAdapter):
                 account_data['last_updated'] = account_data['created_at']
                 
                 try:
-                    response = self.client.table('accounts').insert(account_data).execute()
+                    response = self.client.table('accounts').insert(self._clean_for_table('accounts', account_data)).execute()
                     
                     if response.data and len(response.data) > 0:
                         logger.info(f"Created new account: {response.data[0]['id']} - {account_data.get('name')}")
@@ -662,6 +808,132 @@ class PlaidAdapter(BaseSupabaseAdapter):
             logger.error(f"Error storing account data: {str(e)}")
             return None
     
+    def store_accounts(self, user_id: str, accounts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Store many accounts for a user with bulk upserts
+        
+        Accounts are upserted on (user_id, account_id), so one request stores every
+        account of a Plaid item whether or not it exists yet. Accounts that carry an
+        'id' (existing rows matched during a reconnection, whose Plaid account_id
+        changed) are upserted on id instead. The credit, loan and investment detail
+        rows are then written with one upsert per detail table.
+        
+        Args:
+            user_id (str): The user ID to associate the accounts with
+            accounts (list): Account data, in the same form as for store_account
+            
+        Returns:
+            list: The stored account rows
+        """
+        try:
+            now = datetime.now(timezone.utc).isoformat()
+            by_account_id = {}
+            by_id = []
+            
+            for account_data in accounts:
+                if not account_data.get('account_id'):
+                    logger.error("Missing account_id in account data")
+                    continue
+                
+                record = self._clean_account_data({**account_data, 'user_id': user_id})
+                record['last_updated'] = now
+                record = self._clean_for_table('accounts', record)
+                
+                if record.get('id'):
+                    by_id.append(record)
+                else:
+                    # New rows get their id and created_at from the column defaults
+                    record.pop('id', None)
+                    by_account_id[record['account_id']] = record
+            
+            stored = self._bulk_upsert('accounts', list(by_account_id.values()), on_conflict='user_id,account_id')
+            if by_id:
+                stored.extend(self._bulk_upsert('accounts', by_id, on_conflict='id'))
+            
+            logger.info(f"Stored {len(stored)} of {len(by_account_id) + len(by_id)} accounts for user {user_id}")
+            
+            self.store_account_details(stored)
+            return stored
+        except Exception as e:
+            logger.error(f"Error storing accounts: {str(e)}")
+            return []
+    
+    def _build_account_details(self, account: Dict[str, Any]) -> Optional[tuple]:
+        """
+        Map a stored account to its row in the matching detail table
+        
+        Returns:
+            A (table, row) pair, or None if the account has no detail table
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        
+        if is_investment_account(account):
+            return 'account_investments', {
+                'account_id': account['id'],
+                'total_investment_value': account.get('total_investment_value', 0),
+                'total_cash_value': account.get('total_cash_value', 0),
+                'total_investment_holdings': account.get('total_investment_holdings', 0),
+                'cash_interest_rate': account.get('cash_interest_rate', 0),
+                'updated_at': now
+            }
+        
+        if is_credit_account(account):
+            return 'account_credit_details', {
+                'account_id': account['id'],
+                'credit_limit': account.get('limit') or 0,
+                'current_balance': account.get('current_balance') or 0,
+                'available_credit': account.get('available_balance') or 0,
+                'interest_rate': account.get('interest_rate') or 0,
+                'minimum_payment': account.get('minimum_payment') or 0,
+                'payment_due_date': account.get('payment_due_date'),
+                'updated_at': now
+            }
+        
+        if is_loan_account(account):
+            return 'account_loan_details', {
+                'account_id': account['id'],
+                'original_loan_amount': account.get('original_loan_amount') or 0,
+                'current_balance': account.get('current_balance') or 0,
+                'interest_rate': account.get('interest_rate') or 0,
+                'minimum_payment': account.get('minimum_payment') or 0,
+                'payment_due_date': account.get('payment_due_date'),
+                'loan_term_months': account.get('loan_term_months') or 0,
+                'loan_start_date': account.get('loan_start_date'),
+                'loan_end_date': account.get('loan_end_date'),
+                'updated_at': now
+            }
+        
+        return None
+    
+    def store_account_details(self, accounts: List[Dict[str, Any]]) -> int:
+        """
+        Write the credit, loan and investment detail rows for stored accounts,
+        with one upsert per detail table keyed on account_id
+        
+        Args:
+            accounts: Stored account rows (with their database 'id')
+            
+        Returns:
+            Number of detail rows written
+        """
+        try:
+            rows_by_table = {}
+            for account in accounts:
+                if not account.get('id'):
+                    continue
+                details = self._build_account_details(account)
+                if details:
+                    table, row = details
+                    rows_by_table.setdefault(table, []).append(self._clean_for_table(table, row))
+            
+            written = 0
+            for table, rows in rows_by_table.items():
+                written += len(self._bulk_upsert(table, rows, on_conflict='account_id', returning='minimal'))
+            return written
+        except Exception as e:
+            logger.error(f"Error storing account details: {str(e)}")
+            return 0
+    
     def _clean_account_data(self, account_data: Dict[str, Any]) -> Dict[str, Any]:
         """Clean account data to prevent schema issues"""
         try:
@@ -698,15 +970,8 @@ class PlaidAdapter(BaseSupabaseAdapter):
             
             # Try to check the actual table schema to see what columns exist
             try:
-                schema_columns = []
-                try:
-                    # Get columns from the schema cache (only works with newer Supabase)
-                    response = self.client.table('accounts').select('*').limit(1).execute()
-                    if response and hasattr(response, 'data') and response.data:
-                        schema_columns = list(response.data[0].keys())
-                    logger.debug(f"Retrieved schema columns from Supabase: {schema_columns}")
-                except Exception as schema_error:
-                    logger.warning(f"Could not get schema columns: {str(schema_error)}")
+                # Columns come from the process-wide schema registry, no query per account
+                schema_columns = schema_registry.get_columns('accounts', self.client) or []
                 
                 # Now check if mapped fields exist in the schema
                 for old_field, new_field in field_mapping.items():
@@ -778,6 +1043,159 @@ class PlaidAdapter(BaseSupabaseAdapter):
             # Return the original data as a fallback
             return account_data
     
+    def _build_security_record(self, security_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Map Plaid security data to a securities row"""
+        security_id = security_data.get('security_id')
+        security_record = {
+            'security_id': security_id,
+            # Ensure name is never null - default to security_id or "Unknown Security"
+            'name': security_data.get('name') or f"Unknown Security ({security_data.get('ticker_symbol') or security_id})",
+            'ticker_symbol': security_data.get('ticker_symbol'),
+            'isin': security_data.get('isin'),
+            'cusip': security_data.get('cusip'),
+            'type': security_data.get('type'),
+            'close_price': security_data.get('close_price'),
+            'currency_code': security_data.get('iso_currency_code', 'USD')
+        }
+        
+        # Handle close_price_as_of date
+        close_price_as_of = security_data.get('close_price_as_of')
+        if close_price_as_of:
+            if isinstance(close_price_as_of, datetime):
+                security_record['close_price_as_of'] = close_price_as_of.isoformat()
+            elif hasattr(close_price_as_of, 'isoformat'):
+                security_record['close_price_as_of'] = close_price_as_of.isoformat()
+            else:
+                security_record['close_price_as_of'] = str(close_price_as_of)
+        
+        return security_record
+    
+    def _build_holding_record(self, account_id: str, security_id: str, holding_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Map Plaid holding data to an account_holdings row"""
+        holding_record = {
+            'account_id': account_id,
+            'security_id': security_id,
+            'cost_basis': holding_data.get('cost_basis'),
+            'quantity': holding_data.get('quantity', 0),
+            'institution_value': holding_data.get('institution_value'),
+            'institution_price': holding_data.get('institution_price')
+        }
+        
+        # Handle date objects by converting to ISO format strings
+        price_as_of = holding_data.get('institution_price_as_of')
+        if price_as_of:
+            if isinstance(price_as_of, datetime):
+                holding_record['institution_price_as_of'] = price_as_of.isoformat()
+            elif hasattr(price_as_of, 'isoformat'):
+                holding_record['institution_price_as_of'] = price_as_of.isoformat()
+            else:
+                holding_record['institution_price_as_of'] = str(price_as_of)
+        
+        # Similarly handle any other potential date fields
+        for date_field in ['purchase_date', 'updated_at']:
+            if date_field in holding_data:
+                date_value = holding_data.get(date_field)
+                if date_value:
+                    if isinstance(date_value, datetime):
+                        holding_record[date_field] = date_value.isoformat()
+                    elif hasattr(date_value, 'isoformat'):
+                        holding_record[date_field] = date_value.isoformat()
+                    else:
+                        holding_record[date_field] = str(date_value)
+        
+        # Add current timestamp for updated_at if not provided
+        if 'updated_at' not in holding_record:
+            holding_record['updated_at'] = datetime.now(timezone.utc).isoformat()
+        
+        return self._clean_for_table('account_holdings', holding_record)
+    
+    def store_securities(self, securities: List[Dict[str, Any]]) -> Dict[str, str]:
+        """
+        Upsert many securities at once, keyed on Plaid's security_id.
+        
+        Args:
+            securities: Security data from Plaid
+            
+        Returns:
+            Dictionary mapping Plaid security_id to the Supabase security ID
+        """
+        security_id_map = {}
+        try:
+            # De-duplicate by security_id; new rows get their id from the column default
+            records = {}
+            for security in securities:
+                if not security.get('security_id'):
+                    logger.warning(f"Security missing security_id: {security}")
+                    continue
+                records[security['security_id']] = self._clean_for_table('securities', self._build_security_record(security))
+            
+            rows = list(records.values())
+            batch_size = 500
+            for i in range(0, len(rows), batch_size):
+                batch = rows[i:i+batch_size]
+                try:
+                    response = self.client.table('securities').upsert(
+                        batch,
+                        on_conflict='security_id',
+                        default_to_null=False
+                    ).execute()
+                    for row in response.data or []:
+                        security_id_map[row['security_id']] = row['id']
+                except Exception as batch_error:
+                    logger.error(f"Error upserting securities batch {i//batch_size + 1}: {str(batch_error)}")
+                    schema_registry.report_error('securities', batch_error)
+            
+            logger.info(f"Stored {len(security_id_map)} of {len(rows)} securities")
+            return security_id_map
+        except Exception as e:
+            logger.error(f"Error storing securities: {str(e)}")
+            return security_id_map
+    
+    def store_holdings(self, holdings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Upsert many holdings at once, keyed on (account_id, security_id).
+        
+        Args:
+            holdings: Holding data from Plaid with 'account_id' and 'security_id'
+                      already set to the Supabase account and security IDs
+            
+        Returns:
+            The holdings that were stored successfully
+        """
+        stored = []
+        try:
+            # De-duplicate by account and security
+            records = {}
+            for holding in holdings:
+                key = (holding.get('account_id'), holding.get('security_id'))
+                if not all(key):
+                    logger.warning(f"Holding missing account_id or security_id: {holding}")
+                    continue
+                records[key] = holding
+            
+            items = list(records.values())
+            batch_size = 500
+            for i in range(0, len(items), batch_size):
+                batch = items[i:i+batch_size]
+                rows = [self._build_holding_record(h['account_id'], h['security_id'], h) for h in batch]
+                try:
+                    self.client.table('account_holdings').upsert(
+                        rows,
+                        on_conflict='account_id,security_id',
+                        returning='minimal',
+                        default_to_null=False
+                    ).execute()
+                    stored.extend(batch)
+                except Exception as batch_error:
+                    logger.error(f"Error upserting holdings batch {i//batch_size + 1}: {str(batch_error)}")
+                    schema_registry.report_error('account_holdings', batch_error)
+            
+            logger.info(f"Stored {len(stored)} of {len(items)} holdings")
+            return stored
+        except Exception as e:
+            logger.error(f"Error storing holdings: {str(e)}")
+            return stored
+    
     def store_security(self, security_data: Dict[str, Any]) -> Optional[str]:
         """
         Store a security record in Supabase.
@@ -802,27 +1220,7 @@ class PlaidAdapter(BaseSupabaseAdapter):
             existing = self.client.table('securities').select('id').eq('security_id', security_id).execute()
                 
             # Prepare data for storage
-            security_record = {
-                'security_id': security_id,
-                # Ensure name is never null - default to security_id or "Unknown Security"
-                'name': security_data.get('name') or f"Unknown Security ({security_data.get('ticker_symbol') or security_id})",
-                'ticker_symbol': security_data.get('ticker_symbol'),
-                'isin': security_data.get('isin'),
-                'cusip': security_data.get('cusip'),
-                'type': security_data.get('type'),
-                'close_price': security_data.get('close_price'),
-                'currency_code': security_data.get('iso_currency_code', 'USD')
-            }
-            
-            # Handle close_price_as_of date
-            close_price_as_of = security_data.get('close_price_as_of')
-            if close_price_as_of:
-                if isinstance(close_price_as_of, datetime):
-                    security_record['close_price_as_of'] = close_price_as_of.isoformat()
-                elif hasattr(close_price_as_of, 'isoformat'):
-                    security_record['close_price_as_of'] = close_price_as_of.isoformat()
-                else:
-                    security_record['close_price_as_of'] = str(close_price_as_of)
+            security_record = self._build_security_record(security_data)
             
             # Add current timestamp for created_at and updated_at if not already set
             if 'created_at' not in security_record:
@@ -835,6 +1233,8 @@ class PlaidAdapter(BaseSupabaseAdapter):
             if 'id' in security_data:
                 security_record['id'] = security_data['id']
             
+            security_record = self._clean_for_table('securities', security_record)
+            
             # Create or update security
             if existing.data and len(existing.data) > 0:
                 # Update existing security
@@ -878,40 +1278,7 @@ class PlaidAdapter(BaseSupabaseAdapter):
                 .execute()
                 
             # Prepare data for storage
-            holding_record = {
-                'account_id': account_id,
-                'security_id': security_id,
-                'cost_basis': holding_data.get('cost_basis'),
-                'quantity': holding_data.get('quantity', 0),
-                'institution_value': holding_data.get('institution_value'),
-                'institution_price': holding_data.get('institution_price')
-            }
-            
-            # Handle date objects by converting to ISO format strings
-            price_as_of = holding_data.get('institution_price_as_of')
-            if price_as_of:
-                if isinstance(price_as_of, datetime):
-                    holding_record['institution_price_as_of'] = price_as_of.isoformat()
-                elif hasattr(price_as_of, 'isoformat'):
-                    holding_record['institution_price_as_of'] = price_as_of.isoformat()
-                else:
-                    holding_record['institution_price_as_of'] = str(price_as_of)
-            
-            # Similarly handle any other potential date fields
-            for date_field in ['purchase_date', 'updated_at']:
-                if date_field in holding_data:
-                    date_value = holding_data.get(date_field)
-                    if date_value:
-                        if isinstance(date_value, datetime):
-                            holding_record[date_field] = date_value.isoformat()
-                        elif hasattr(date_value, 'isoformat'):
-                            holding_record[date_field] = date_value.isoformat()
-                        else:
-                            holding_record[date_field] = str(date_value)
-            
-            # Add current timestamp for updated_at if not provided
-            if 'updated_at' not in holding_record:
-                holding_record['updated_at'] = datetime.now(timezone.utc).isoformat()
+            holding_record = self._build_holding_record(account_id, security_id, holding_data)
             
             # Create or update holding
             if existing.data and len(existing.data) > 0:
@@ -939,42 +1306,74 @@ class PlaidAdapter(BaseSupabaseAdapter):
             logger.error(f"Error storing holding: {str(e)}")
             return None
     
-    def get_holdings(self, user_id: str) -> List[Dict[str, Any]]:
+    def get_investment_positions(self, user_id: str, account_ids: List[str] = None) -> Dict[str, List[Dict[str, Any]]]:
         """
-        Get all holdings for a user from Supabase.
+        Get a user's holdings together with their securities in a single request.
+        
+        Holdings are read with their security embedded (PostgREST resource embedding
+        over the account_holdings foreign keys) and filtered to the user's accounts
+        in the database. If embedding isn't available, falls back to one holdings
+        query and one securities query using in_ filters.
         
         Args:
             user_id: The user ID
+            account_ids: Optional list of the user's account IDs, saves a lookup in the fallback
             
         Returns:
-            A list of holdings
+            Dictionary with 'holdings' and the distinct 'securities' they reference
         """
         try:
-            # First get all accounts for the user directly from the database
-            # Instead of calling get_accounts which doesn't exist in this class
-            accounts_response = self.client.table('accounts').select('id').eq('user_id', user_id).execute()
-            if not accounts_response.data:
-                return []
+            try:
+                response = self.client.table('account_holdings') \
+                    .select('*, securities(*), accounts!inner(user_id)') \
+                    .eq('accounts.user_id', user_id) \
+                    .execute()
+                
+                holdings = []
+                securities = {}
+                for row in response.data or []:
+                    security = row.pop('securities', None)
+                    row.pop('accounts', None)
+                    if security and security.get('id'):
+                        securities[security['id']] = security
+                    holdings.append(row)
+                
+                return {'holdings': holdings, 'securities': list(securities.values())}
+            except Exception as embed_error:
+                logger.warning(f"Could not fetch holdings with embedded securities, using separate queries: {str(embed_error)}")
             
-            # Get account IDs
-            account_ids = [account['id'] for account in accounts_response.data]
+            if account_ids is None:
+                accounts_response = self.client.table('accounts').select('id').eq('user_id', user_id).execute()
+                account_ids = [account['id'] for account in accounts_response.data or []]
             
-            # Get holdings for these accounts
-            all_holdings = []
+            if not account_ids:
+                return {'holdings': [], 'securities': []}
             
-            # Query each account separately and combine results
-            for account_id in account_ids:
-                try:
-                    response = self.client.table('account_holdings').select('*').eq('account_id', account_id).execute()
-                    if response.data:
-                        all_holdings.extend(response.data)
-                except Exception as e:
-                    logger.warning(f"Error fetching holdings for account {account_id}: {str(e)}")
+            holdings_response = self.client.table('account_holdings').select('*').in_('account_id', account_ids).execute()
+            holdings = holdings_response.data or []
             
-            return all_holdings
+            security_ids = list({holding['security_id'] for holding in holdings if holding.get('security_id')})
+            securities = []
+            if security_ids:
+                securities_response = self.client.table('securities').select('*').in_('id', security_ids).execute()
+                securities = securities_response.data or []
+            
+            return {'holdings': holdings, 'securities': securities}
         except Exception as e:
-            logger.error(f"Error getting holdings: {str(e)}")
-            return []
+            logger.error(f"Error getting investment positions: {str(e)}")
+            return {'holdings': [], 'securities': []}
+    
+    def get_holdings(self, user_id: str) -> List[Dict[str, Any]]:
+        """
+        Get all holdings for a user from Supabase.
+        
+        Args:
+            user_id: The user ID
+            
+        Returns:
+            A list of holdings
+        """
+        return self.get_investment_positions(user_id)['holdings']
     
     def get_securities(self, user_id: str) -> List[Dict[str, Any]]:
         """
@@ -986,216 +1385,392 @@ class PlaidAdapter(BaseSupabaseAdapter):
         Returns:
             A list of securities
         """
-        try:
-            # First get all accounts for the user directly from the database
-            accounts_response = self.client.table('accounts').select('id').eq('user_id', user_id).execute()
-            if not accounts_response.data:
-                return []
+        return self.get_investment_positions(user_id)['securities']
+    
+    def _add_transaction_user_ids(self, transactions: List[Dict[str, Any]]) -> None:
+        """
+        Fill in user_id for transactions that don't have one, based on their account.
+        
+        All the accounts are looked up in one query per key type instead of per transaction.
+        """
+        missing = {tx['account_id'] for tx in transactions if not tx.get('user_id') and tx.get('account_id')}
+        if not missing:
+            return
+        
+        user_id_map = {}
+        # Transactions may reference either the Plaid account_id or our account UUID
+        for column in ('account_id', 'id'):
+            lookup_ids = [account_id for account_id in missing if account_id not in user_id_map]
+            if not lookup_ids:
+                break
+            try:
+                response = self.client.table('accounts').select(f'{column}, user_id').in_(column, lookup_ids).execute()
+                for account in response.data or []:
+                    if account.get('user_id'):
+                        user_id_map[account[column]] = account['user_id']
+            except Exception as account_error:
+                logger.warning(f"Could not look up user_id for accounts by {column}: {str(account_error)}")
+        
+        for tx in transactions:
+            if not tx.get('user_id') and tx.get('account_id') in user_id_map:
+                tx['user_id'] = user_id_map[tx['account_id']]
+    
+    def upsert_transactions(self, transactions: List[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+        """
+        Idempotently store transactions, keyed on Plaid's transaction_id.
+        
+        Existing rows are read back in bulk and compared with the incoming data, so
+        unchanged transactions are skipped and only new or changed rows are written.
+        New rows carry only the normalized columns and changed rows the full stored row,
+        so each batch is written with one upsert per set of columns. Re-syncing an
+        overlapping window never creates duplicates.
+        
+        Args:
+            transactions: Transactions to store; each must have a transaction_id
             
-            account_ids = [account['id'] for account in accounts_response.data]
+        Returns:
+            A dictionary with 'inserted', 'updated' and 'unchanged' counts, or None on error
+        """
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+        try:
+            from .utils import row_has_changes
             
-            # Get all holdings for these accounts
-            all_holdings = []
-            for account_id in account_ids:
-                try:
-                    holdings_response = self.client.table('account_holdings').select('security_id').eq('account_id', account_id).execute()
-                    if holdings_response.data:
-                        all_holdings.extend(holdings_response.data)
-                except Exception as e:
-                    logger.warning(f"Error fetching holdings for account {account_id}: {str(e)}")
+            logger.info(f"Preparing {len(transactions)} transactions for storage")
             
-            if not all_holdings:
-                return []
+            schema_columns = schema_registry.get_columns('transactions', self.client)
+            self._add_transaction_user_ids(transactions)
             
-            # Extract unique security IDs
-            security_ids = list(set(holding.get('security_id') for holding in all_holdings 
-                                  if holding.get('security_id')))
+            # De-duplicate by transaction_id, keeping the latest version of each transaction
+            incoming = {}
+            for tx in transactions:
+                if not tx.get('transaction_id'):
+                    logger.warning("Skipping transaction without a transaction_id")
+                    continue
+                incoming[tx['transaction_id']] = clean_for_schema(tx, schema_columns)
             
-            if not security_ids:
-                return []
+            # A sync writes one user's transactions, so only that user's rows are read back
+            owners = {tx.get('user_id') for tx in incoming.values()}
+            owner = owners.pop() if len(owners) == 1 else None
             
-            # Get securities for these security IDs
-            all_securities = []
+            # The rows being replaced are read anyway, so the rollup deltas come for free
+            account_classes = self._rollup_account_classes(incoming.values()) if monthly_rollups_enabled() else None
             
-            # Query each security separately to avoid issues with .in_() operation
-            for security_id in security_ids:
+            batch_size = 200
+            transaction_ids = list(incoming.keys())
+            for i in range(0, len(transaction_ids), batch_size):
+                batch_ids = transaction_ids[i:i+batch_size]
+                
                 try:
-                    response = self.client.table('securities').select('*').eq('id', security_id).execute()
-                    if response.data and len(response.data) > 0:
-                        all_securities.append(response.data[0])
-                except Exception as e:
-                    logger.warning(f"Error fetching security {security_id}: {str(e)}")
+                    query = self.client.table('transactions').select('*').in_('transaction_id', batch_ids)
+                    if owner:
+                        query = query.eq('user_id', owner)
+                    response = query.execute()
+                    existing = {row['transaction_id']: row for row in response.data or []}
+                    
+                    rows = []
+                    for transaction_id in batch_ids:
+                        tx = incoming[transaction_id]
+                        current = existing.get(transaction_id)
+                        
+                        if current is None:
+                            if (schema_columns is None or 'id' in schema_columns) and not tx.get('id'):
+                                tx['id'] = str(uuid.uuid4())
+                            rows.append(tx)
+                            counts['inserted'] += 1
+                        elif row_has_changes(tx, current):
+                            # Keep the existing primary key and any columns we aren't updating
+                            rows.append({**current, **{k: v for k, v in tx.items() if k != 'id'}})
+                            counts['updated'] += 1
+                        else:
+                            counts['unchanged'] += 1
+                    
+                    # A missing column in a request would be written as its default, so inserts
+                    # and updates with different columns go out separately. Each request's rollup
+                    # changes are applied once it succeeded, since a retry finds its rows unchanged.
+                    for group in self._column_groups(rows):
+                        self.client.table('transactions').upsert(
+                            group,
+                            on_conflict='transaction_id',
+                            returning='minimal',
+                            default_to_null=False
+                        ).execute()
+                        if account_classes is not None:
+                            delta = RollupDelta(account_classes)
+                            for row in group:
+                                if row['transaction_id'] in existing:
+                                    delta.remove(existing[row['transaction_id']])
+                                delta.add(row)
+                            self.apply_rollup_deltas(delta.rows())
+                except Exception as batch_error:
+                    logger.error(f"Error upserting transaction batch {i//batch_size + 1}: {str(batch_error)}")
+                    schema_registry.report_error('transactions', batch_error)
+                    return None
             
-            return all_securities
+            logger.info(
+                f"Stored transactions: {counts['inserted']} inserted, {counts['updated']} updated, "
+                f"{counts['unchanged']} unchanged"
+            )
+            return counts
         except Exception as e:
-            logger.error(f"Error getting securities: {str(e)}")
-            return []
+            logger.error(f"Error upserting transactions: {str(e)}")
+            return None
     
     def store_transactions(self, transactions: List[Dict[str, Any]]) -> bool:
         """Store multiple transactions in Supabase"""
-        try:
-            # Prepare transactions for insertion, filtering out fields that might not exist in schema
-            logger.info(f"Preparing {len(transactions)} transactions for storage")
-            
-            from .utils import serialize_for_supabase, clean_for_schema, extract_schema_columns
+        return self.upsert_transactions(transactions) is not None
+    
+    def apply_transaction_changes(self, user_id: str, added: List[Dict[str, Any]], modified: List[Dict[str, Any]],
+                                  removed_ids: List[str]) -> bool:
+        """
+        Apply a set of /transactions/sync updates to the transactions table
+        
+        Args:
+            user_id: The Supabase user ID that owns the synced item
+            added: Formatted transactions that are new since the last cursor
+            modified: Formatted transactions that changed since the last cursor
+            removed_ids: Plaid transaction IDs that no longer exist
             
-            # Get the known schema columns for transactions table
-            try:
-                # Try to query with limit 0 to get column info without fetching data
-                response = self.client.table('transactions').select('*').limit(0).execute()
-                # Extract schema columns using our utility
-                schema_columns = extract_schema_columns(response)
-                
-                if not schema_columns:
-                    # Fallback to a list of known safe columns
-                    schema_columns = [
-                        'id', 'account_id', 'transaction_id', 'amount', 'date', 'name',
-                        'merchant_name', 'category', 'pending', 'reference_number', 'payee',
-                        'user_id', 'location', 'payment_channel', 'payment_method', 'payer',
-                        'category_id', 'subcategory', 'authorized_date', 'iso_currency_code',
-                        'unofficial_currency_code', 'website', 'account_name', 'account_owner',
-                        'description'
-                    ]
-                    logger.warning(f"Could not determine schema columns, using safe defaults: {schema_columns}")
-            except Exception as schema_error:
-                # If we can't get schema, use safe defaults
-                schema_columns = [
-                    'id', 'account_id', 'transaction_id', 'amount', 'date', 'name',
-                    'merchant_name', 'category', 'pending', 'reference_number', 'payee',
-                    'user_id', 'location', 'payment_channel', 'payment_method', 'payer',
-                    'category_id', 'subcategory', 'authorized_date', 'iso_currency_code',
-                    'unofficial_currency_code', 'website', 'account_name', 'account_owner',
-                    'description'
-                ]
-                logger.warning(f"Error getting schema: {str(schema_error)}. Using safe defaults: {schema_columns}")
-            
-            # For each transaction, fetch the related account and add the user_id to the transaction
-            # This ensures transactions can be properly filtered by user later
-            user_id_map = {}  # Cache for account_id to user_id mapping
-            
-            # Filter transactions to only include fields in the schema and ensure all values are serialized
-            filtered_transactions = []
-            for tx in transactions:
-                # Ensure required fields are present
-                if 'id' not in tx:
-                    tx['id'] = str(uuid.uuid4())
-                
-                # Try to add user_id to transaction if missing
-                if 'user_id' not in tx and 'account_id' in tx:
-                    account_id = tx['account_id']
-                    
-                    # Check the cache first
-                    if account_id in user_id_map:
-                        tx['user_id'] = user_id_map[account_id]
-                    else:
-                        # Look up the account to get its user_id
-                        try:
-                            account_response = self.client.table('accounts').select('user_id').eq('account_id', account_id).execute()
-                            if account_response.data and len(account_response.data) > 0 and 'user_id' in account_response.data[0]:
-                                user_id = account_response.data[0]['user_id']
-                                user_id_map[account_id] = user_id  # Cache for future use
-                                tx['user_id'] = user_id
-                            else:
-                                # Try looking up by other methods if initial lookup fails
-                                # 1. Try using UUID format of account_id
-                                try:
-                                    account_response = self.client.table('accounts').select('user_id').eq('id', account_id).execute()
-                                    if account_response.data and len(account_response.data) > 0 and 'user_id' in account_response.data[0]:
-                                        user_id = account_response.data[0]['user_id']
-                                        user_id_map[account_id] = user_id  # Cache for future use
-                                        tx['user_id'] = user_id
-                                except Exception as uuid_error:
-                                    # Handle silently, this is just an alternative approach
-                                    pass
-                        except Exception as account_error:
-                            logger.warning(f"Could not get user_id for account {account_id}: {str(account_error)}")
-                
-                # Clean and serialize transaction data
-                filtered_tx = clean_for_schema(tx, schema_columns)
-                filtered_transactions.append(filtered_tx)
+        Returns:
+            True if every change was applied, False otherwise
+        """
+        try:
+            # Added and modified transactions both go through the upsert on transaction_id
+            if (added or modified) and self.upsert_transactions(added + modified) is None:
+                return False
             
-            logger.info(f"Filtered transactions to match schema, prepared {len(filtered_transactions)} for insertion")
+            if removed_ids:
+                self.delete_transactions(user_id, removed_ids)
             
-            # Insert in batches of 100 to avoid payload size limits
+            return True
+        except Exception as e:
+            logger.error(f"Error applying transaction changes: {str(e)}")
+            return False
+    
+    def delete_transactions(self, user_id: str, transaction_ids: List[str]) -> int:
+        """Delete a user's transactions by their Plaid transaction IDs, returning the number deleted"""
+        try:
+            deleted = 0
             batch_size = 100
-            successful_batches = 0
-            for i in range(0, len(filtered_transactions), batch_size):
-                batch = filtered_transactions[i:i+batch_size]
+            for i in range(0, len(transaction_ids), batch_size):
+                batch = transaction_ids[i:i+batch_size]
+                response = self.client.table('transactions').delete().eq('user_id', user_id).in_('transaction_id', batch).execute()
+                deleted += len(response.data or [])
                 
-                try:
-                    response = self.client.table('transactions').insert(batch).execute()
-                    if response.data:
-                        successful_batches += 1
-                        logger.info(f"Successfully inserted batch {successful_batches} ({len(batch)} transactions)")
-                    else:
-                        logger.error(f"Error inserting batch {i//batch_size + 1}: No data returned")
-                        return False
-                except Exception as batch_error:
-                    logger.error(f"Error inserting batch {i//batch_size + 1}: {str(batch_error)}")
-                    return False
+                # The deleted rows come back, so they can be counted out of the rollups
+                if response.data and monthly_rollups_enabled():
+                    delta = RollupDelta(self._rollup_account_classes(response.data))
+                    for row in response.data:
+                        delta.remove(row)
+                    self.apply_rollup_deltas(delta.rows())
+            
+            logger.info(f"Deleted {deleted} removed transactions")
+            return deleted
+        except Exception as e:
+            logger.error(f"Error deleting transactions: {str(e)}")
+            return 0
+    
+    def _rollup_account_classes(self, transactions: Iterable[Dict[str, Any]]) -> Dict[str, str]:
+        """Look up the rollup account class of every account the transactions belong to, in one query"""
+        account_ids = list({tx['account_id'] for tx in transactions if tx.get('account_id')})
+        if not account_ids:
+            return {}
+        try:
+            response = self.client.table('accounts').select('*').in_('id', account_ids).execute()
+            return {account['id']: account_class(account) for account in response.data or []}
+        except Exception as e:
+            logger.error(f"Error looking up account classes for rollups: {str(e)}")
+            return {}
+    
+    def apply_rollup_deltas(self, deltas: List[Dict[str, Any]]) -> bool:
+        """
+        Add changes to the monthly_rollups table atomically
+        
+        Args:
+            deltas: Rows from RollupDelta.rows()
             
+        Returns:
+            True if the changes were applied (or there were none), False otherwise
+        """
+        if not deltas:
+            return True
+        try:
+            self.client.rpc('apply_monthly_rollup_deltas', {'deltas': deltas}).execute()
             return True
         except Exception as e:
-            logger.error(f"Error storing transactions: {str(e)}")
+            # The transactions are stored, only the rollups are behind; a backfill fixes them
+            logger.error(f"Error applying {len(deltas)} monthly rollup changes, run backfill_monthly_rollups: {str(e)}")
+            return False
+    
+    def replace_monthly_rollups(self, user_id: str, rollups: List[Dict[str, Any]]) -> bool:
+        """
+        Replace all of a user's monthly rollups in one transaction
+        
+        Args:
+            user_id: The user's ID in Supabase
+            rollups: Every rollup row of the user, from RollupDelta.rows()
+            
+        Returns:
+            True if the rollups were replaced, False otherwise
+        """
+        try:
+            self.client.rpc('replace_monthly_rollups', {'p_user_id': user_id, 'p_rows': rollups}).execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error replacing monthly rollups of user {user_id}: {str(e)}")
+            return False
+    
+    def update_transactions_cursor(self, item_id: str, cursor: str) -> bool:
+        """Save the /transactions/sync cursor for a Plaid item"""
+        try:
+            response = self.client.table('plaid_items').update({'transactions_cursor': cursor}).eq('item_id', item_id).execute()
+            return bool(response.data)
+        except Exception as e:
+            logger.error(f"Error updating transactions cursor for item {item_id}: {str(e)}")
             return False
     
     def update_plaid_item_status(self, item_id: str, status: str = None, 
                            update_type: str = None, last_update: str = None, 
-                           next_hard_refresh: str = None) -> bool:
-        """Update the status of a Plaid item in the database"""
+                           next_hard_refresh: str = None) -> Optional[bool]:
+        """
+        Update the status of a Plaid item in the database
+        
+        All provided fields are written with a single UPDATE. While status updates
+        are buffered (see buffer_status_updates), the change is held in memory and
+        written with the next batch instead, and None is returned since nothing was
+        written yet. A connection_status other than 'active' is an error transition
+        and is always written at once, so a batch can't delay it or overwrite it later.
+        
+        Returns:
+            True if the status was written, False if not, None if it was buffered
+        """
         try:
-            # Start with the basic update data
-            update_data = {}
-            
-            # Only add fields if they are provided and try to update incrementally
+            changes = {}
             if status:
-                try:
-                    # Try to update just the status
-                    status_data = {'connection_status': status}
-                    status_response = self.client.table('plaid_items').update(status_data).eq('item_id', item_id).execute()
-                    if status_response.data:
-                        update_data.update(status_data)  # Track that we successfully updated
-                except Exception as status_error:
-                    logger.warning(f"Failed to update connection_status: {str(status_error)}")
-            
+                changes['connection_status'] = status
             if update_type:
-                try:
-                    # Try to update just the update_type
-                    update_type_data = {'update_type': update_type}
-                    type_response = self.client.table('plaid_items').update(update_type_data).eq('item_id', item_id).execute()
-                    if type_response.data:
-                        update_data.update(update_type_data)  # Track that we successfully updated
-                except Exception as type_error:
-                    logger.warning(f"Failed to update update_type: {str(type_error)}")
-            
+                changes['update_type'] = update_type
             if last_update:
-                try:
-                    # Try to update just the last_successful_update
-                    last_update_data = {'last_successful_update': last_update}
-                    last_update_response = self.client.table('plaid_items').update(last_update_data).eq('item_id', item_id).execute()
-                    if last_update_response.data:
-                        update_data.update(last_update_data)  # Track that we successfully updated
-                except Exception as last_update_error:
-                    logger.warning(f"Failed to update last_successful_update: {str(last_update_error)}")
-            
+                changes['last_successful_update'] = last_update
             if next_hard_refresh:
-                try:
-                    # Try to update just the next_hard_refresh
-                    next_refresh_data = {'next_hard_refresh': next_hard_refresh}
-                    refresh_response = self.client.table('plaid_items').update(next_refresh_data).eq('item_id', item_id).execute()
-                    if refresh_response.data:
-                        update_data.update(next_refresh_data)  # Track that we successfully updated
-                except Exception as refresh_error:
-                    logger.warning(f"Failed to update next_hard_refresh: {str(refresh_error)}")
+                changes['next_hard_refresh'] = next_hard_refresh
+            
+            if not changes:
+                return False
+            
+            buffered = False
+            batch_full = False
+            with self._status_lock:
+                if self._status_buffer is not None:
+                    if status and status != 'active':
+                        # This status is newer than the buffered one, which must not be written after it
+                        self._status_buffer.pop(item_id, None)
+                    else:
+                        # Later changes to the same item replace earlier ones field by field
+                        self._status_buffer.setdefault(item_id, {}).update(changes)
+                        buffered = True
+                        batch_full = len(self._status_buffer) >= STATUS_FLUSH_BATCH
+            if buffered:
+                if batch_full:
+                    self.write_buffered_status_updates()
+                return None
+            
+            # Drop any status columns this database doesn't have
+            update_data = self._clean_for_table('plaid_items', changes)
+            if not update_data:
+                logger.warning(f"No status columns to update for Plaid item {item_id}")
+                return False
             
-            # Return success if we updated at least one field
-            return len(update_data) > 0
+            response = self.client.table('plaid_items').update(update_data).eq('item_id', item_id).execute()
+            return bool(response.data)
         
         except Exception as e:
             logger.error(f"Error updating Plaid item status: {str(e)}")
+            schema_registry.report_error('plaid_items', e)
             return False
+    
+    def buffer_status_updates(self) -> None:
+        """
+        Start holding Plaid item status updates in memory.
+        
+        Until flush_status_updates is called, update_plaid_item_status and the
+        record_*_refresh methods only record the change, and the statuses of every
+        STATUS_FLUSH_BATCH items are written together in one upsert. Error
+        transitions are not buffered.
+        """
+        with self._status_lock:
+            if self._status_buffer is None:
+                self._status_buffer = {}
+                self._status_written = 0
+    
+    def write_buffered_status_updates(self) -> int:
+        """
+        Write the status updates buffered so far and keep buffering
+        
+        Returns:
+            Number of items whose status was written
+        """
+        with self._flush_lock:
+            with self._status_lock:
+                pending = self._status_buffer or {}
+                if self._status_buffer is not None:
+                    self._status_buffer = {}
+            written = self._write_status_updates(pending)
+            with self._status_lock:
+                self._status_written += written
+            return written
+    
+    def flush_status_updates(self) -> int:
+        """
+        Write the buffered Plaid item status updates and stop buffering
+        
+        Returns:
+            Number of items whose status was written since buffering started
+        """
+        with self._flush_lock:
+            with self._status_lock:
+                pending = self._status_buffer or {}
+                self._status_buffer = None
+            written = self._write_status_updates(pending)
+            with self._status_lock:
+                total, self._status_written = self._status_written + written, 0
+            return total
+    
+    def _write_status_updates(self, pending: Dict[str, Dict[str, Any]]) -> int:
+        """Write buffered status changes by item_id with one upsert, returning the number written"""
+        if not pending:
+            return 0
+        
+        written = 0
+        try:
+            # The upsert has to carry the NOT NULL columns in case it inserts, so
+            # read them first. Only these and the changed fields are sent.
+            item_ids = list(pending.keys())
+            existing = {}
+            batch_size = 100
+            for i in range(0, len(item_ids), batch_size):
+                response = self.client.table('plaid_items').select(
+                    'id, user_id, item_id, access_token'
+                ).in_('item_id', item_ids[i:i+batch_size]).execute()
+                for row in response.data or []:
+                    existing[row['item_id']] = row
+            
+            rows = []
+            for item_id, changes in pending.items():
+                row = existing.get(item_id)
+                if not row:
+                    logger.warning(f"Plaid item {item_id} not found, skipping status update")
+                    continue
+                rows.append(self._clean_for_table('plaid_items', {**row, **changes}))
             
-    def record_soft_refresh(self, item_id: str) -> bool:
+            written = len(self._bulk_upsert('plaid_items', rows, on_conflict='id', returning='minimal'))
+            
+            logger.info(f"Wrote buffered status updates for {written} of {len(pending)} Plaid items")
+            return written
+        except Exception as e:
+            logger.error(f"Error flushing Plaid item status updates: {str(e)}")
+            return written
+            
+    def record_soft_refresh(self, item_id: str) -> Optional[bool]:
         """Record a soft refresh of a Plaid item"""
         try:
             now = datetime.now(timezone.utc).isoformat()
@@ -1209,7 +1784,7 @@ class PlaidAdapter(BaseSupabaseAdapter):
             logger.error(f"Error recording soft refresh: {str(e)}")
             return False
             
-    def record_hard_refresh(self, item_id: str) -> bool:
+    def record_hard_refresh(self, item_id: str) -> Optional[bool]:
         """Record a hard refresh of a Plaid item"""
         try:
             now = datetime.now(timezone.utc).isoformat()
@@ -1225,6 +1800,35 @@ class PlaidAdapter(BaseSupabaseAdapter):
             logger.error(f"Error recording hard refresh: {str(e)}")
             return False
             
+    def update_sync_status(self, item_id: str, status: str, error: str = None) -> bool:
+        """
+        Record the progress of a Plaid item's background sync
+        
+        Args:
+            item_id: Plaid's item_id
+            status: queued, accounts, holdings, transactions, complete or failed
+            error: Why the sync failed, cleared for every other status
+            
+        Returns:
+            bool: True if the status was written, False otherwise
+        """
+        try:
+            update_data = self._clean_for_table('plaid_items', {
+                'sync_status': status,
+                'sync_error': error,
+                'sync_status_updated_at': datetime.now(timezone.utc).isoformat()
+            })
+            if not update_data:
+                logger.warning("plaid_items has no sync status columns, run supabase_integration/sql/plaid_item_sync_status.sql")
+                return False
+            
+            response = self.client.table('plaid_items').update(update_data).eq('item_id', item_id).execute()
+            return bool(response.data)
+        except Exception as e:
+            logger.error(f"Error updating sync status of Plaid item {item_id}: {str(e)}")
+            schema_registry.report_error('plaid_items', e)
+            return False
+    
     def get_items_needing_refresh(self, user_id: str = None, refresh_type: str = 'soft') -> List[Dict[str, Any]]:
         """Get Plaid items that need refresh based on type and schedule"""
         try:
@@ -1264,6 +1868,37 @@ class PlaidAdapter(BaseSupabaseAdapter):
             logger.error(f"Error getting items needing refresh: {str(e)}")
             return []
             
+    def get_refresh_candidates(self) -> List[Dict[str, Any]]:
+        """
+        Get every Plaid item with the columns the refresh scheduler scores it on
+        
+        Unlike get_items_needing_refresh there is no staleness cutoff, and items
+        that have never synced are included.
+        
+        Returns:
+            List of plaid_items rows, or an empty list on error
+        """
+        try:
+            items = []
+            batch_size = 1000  # PostgREST's default max rows per request
+            offset = 0
+            
+            while True:
+                response = self.client.table('plaid_items').select(
+                    'id,item_id,user_id,institution_id,connection_status,update_type,last_successful_update'
+                ).order('id').range(offset, offset + batch_size - 1).execute()
+                rows = response.data or []
+                items.extend(rows)
+                
+                if len(rows) < batch_size:
+                    break
+                offset += batch_size
+            
+            return items
+        except Exception as e:
+            logger.error(f"Error getting Plaid items to schedule refreshes for: {str(e)}")
+            return []
+    
     def get_connected_institutions(self, user_id: str) -> List[str]:
         """Get list of institution IDs connected by the user"""
         try:
@@ -1384,7 +2019,7 @@ class PlaidAdapter(BaseSupabaseAdapter):
         """Update a Plaid item with additional data"""
         try:
             # Filter out None values
-            item_update = {k: v for k, v in item_data.items() if v is not None}
+            item_update = self._clean_for_table('plaid_items', {k: v for k, v in item_data.items() if v is not None})
             
             response = self.client.table('plaid_items').update(item_update).eq('id', plaid_item_id).execute()
             return True
@@ -1449,6 +2084,18 @@ class SupabaseAdapter:
     def get_transactions(self, user_id: str, start_date=None, end_date=None, account_id=None):
         return self.financial_adapter.get_transactions(user_id, start_date, end_date, account_id)
     
+    def get_monthly_rollups(self, user_id: str, start_month=None, end_month=None):
+        return self.financial_adapter.get_monthly_rollups(user_id, start_month, end_month)
+    
+    def summarize_transactions(self, query, group_by):
+        return self.financial_adapter.summarize_transactions(query, group_by)
+    
+    def query_transactions(self, query):
+        return self.financial_adapter.query_transactions(query)
+        
+    def get_all_transactions(self, query, columns='*'):
+        return self.financial_adapter.get_all_transactions(query, columns)
+    
     # Delegate plaid methods
     def store_plaid_item(self, user_id: str, item_id: str, access_token: str, institution_id: str = None, 
                         institution_name: str = None, institution_logo: str = None):
@@ -1459,18 +2106,51 @@ class SupabaseAdapter:
         
     def get_plaid_item_by_id(self, item_id: str):
         return self.plaid_adapter.get_plaid_item_by_id(item_id)
+    
+    def get_plaid_item_by_plaid_id(self, item_id: str):
+        return self.plaid_adapter.get_plaid_item_by_plaid_id(item_id)
         
     def store_account(self, user_id=None, account_data=None):
         return self.plaid_adapter.store_account(user_id, account_data)
+    
+    def store_accounts(self, user_id, accounts):
+        return self.plaid_adapter.store_accounts(user_id, accounts)
         
     def store_transactions(self, transactions):
         return self.plaid_adapter.store_transactions(transactions)
+    
+    def upsert_transactions(self, transactions):
+        return self.plaid_adapter.upsert_transactions(transactions)
+    
+    def apply_transaction_changes(self, user_id, added, modified, removed_ids):
+        return self.plaid_adapter.apply_transaction_changes(user_id, added, modified, removed_ids)
+        
+    def delete_transactions(self, user_id, transaction_ids):
+        return self.plaid_adapter.delete_transactions(user_id, transaction_ids)
+        
+    def apply_rollup_deltas(self, deltas):
+        return self.plaid_adapter.apply_rollup_deltas(deltas)
+    
+    def replace_monthly_rollups(self, user_id: str, rollups):
+        return self.plaid_adapter.replace_monthly_rollups(user_id, rollups)
+        
+    def update_transactions_cursor(self, item_id: str, cursor: str):
+        return self.plaid_adapter.update_transactions_cursor(item_id, cursor)
         
     def update_plaid_item_status(self, item_id: str, status: str = None, 
                            update_type: str = None, last_update: str = None, 
                            next_hard_refresh: str = None):
         return self.plaid_adapter.update_plaid_item_status(item_id, status, update_type, last_update, next_hard_refresh)
         
+    def buffer_status_updates(self):
+        return self.plaid_adapter.buffer_status_updates()
+        
+    def write_buffered_status_updates(self):
+        return self.plaid_adapter.write_buffered_status_updates()
+        
+    def flush_status_updates(self):
+        return self.plaid_adapter.flush_status_updates()
+        
     def record_soft_refresh(self, item_id: str):
         return self.plaid_adapter.record_soft_refresh(item_id)
         
@@ -1479,6 +2159,12 @@ class SupabaseAdapter:
         
     def get_items_needing_refresh(self, user_id: str = None, refresh_type: str = 'soft'):
         return self.plaid_adapter.get_items_needing_refresh(user_id, refresh_type)
+    
+    def update_sync_status(self, item_id: str, status: str, error: str = None):
+        return self.plaid_adapter.update_sync_status(item_id, status, error)
+    
+    def get_refresh_candidates(self):
+        return self.plaid_adapter.get_refresh_candidates()
         
     def get_connected_institutions(self, user_id: str):
         return self.plaid_adapter.get_connected_institutions(user_id)
@@ -1489,6 +2175,9 @@ class SupabaseAdapter:
         
     def get_holdings(self, user_id: str):
         return self.plaid_adapter.get_holdings(user_id)
+    
+    def get_investment_positions(self, user_id: str, account_ids=None):
+        return self.plaid_adapter.get_investment_positions(user_id, account_ids)
         
     def store_security(self, security_data):
         return self.plaid_adapter.store_security(security_data)
@@ -1496,6 +2185,12 @@ class SupabaseAdapter:
     def store_holding(self, account_id, security_id, holding_data):
         return self.plaid_adapter.store_holding(account_id, security_id, holding_data)
     
+    def store_securities(self, securities):
+        return self.plaid_adapter.store_securities(securities)
+        
+    def store_holdings(self, holdings):
+        return self.plaid_adapter.store_holdings(holdings)
+    
     def get_account_by_plaid_id(self, plaid_account_id):
         """Get an account by its Plaid ID"""
         return self.plaid_adapter.get_account_by_plaid_id(plaid_account_id)
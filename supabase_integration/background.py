@@ -0,0 +1,53 @@
+"""
+Running long Plaid syncs outside the request that triggered them.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_background_executor() -> ThreadPoolExecutor:
+    """
+    Get the process-wide executor for background syncs
+
+    It has PLAID_BACKGROUND_WORKERS threads, so only that many syncs run at once
+    in each process and the rest wait their turn.
+    """
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, getattr(settings, 'PLAID_BACKGROUND_WORKERS', 2)),
+                    thread_name_prefix='plaid-background'
+                )
+    return _executor
+
+
+def run_in_background(func, *args, **kwargs) -> Future:
+    """
+    Run func(*args, **kwargs) on the background executor
+
+    Exceptions are logged, since nobody waits on the returned future. The executor's
+    threads outlive requests, so their database connections are checked around each
+    task the way Django does around a request.
+    """
+    def run():
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Error in background task {getattr(func, '__name__', func)}: {str(e)}", exc_info=True)
+            return None
+        finally:
+            close_old_connections()
+
+    return get_background_executor().submit(run)
@@ -0,0 +1,96 @@
+"""
+Streaming writes of synced Plaid data to Supabase.
+"""
+from typing import Dict, Any, List
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the stream for the writer thread
+_DONE = object()
+
+
+class TransactionWriteQueue:
+    """
+    Bounded queue that writes pages of formatted transactions in a background thread.
+
+    Producers put each page as soon as it has been fetched and formatted, and the
+    writer thread upserts it while the next pages are still downloading. The queue
+    holds at most max_pages pages, so a producer that gets ahead of the database
+    blocks instead of buffering the whole sync in memory.
+
+    Usage:
+        writer = TransactionWriteQueue(adapter)
+        writer.start()
+        try:
+            writer.put(rows)
+        finally:
+            stats = writer.close()
+    """
+
+    def __init__(self, adapter, max_pages: int = 4):
+        """
+        Args:
+            adapter: Adapter with an upsert_transactions method
+            max_pages: Maximum number of pages waiting to be written
+        """
+        self.adapter = adapter
+        self._queue = queue.Queue(maxsize=max(1, max_pages))
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {'pages': 0, 'written': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+
+    def start(self) -> None:
+        """Start the writer thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='transaction-writer', daemon=True)
+            self._thread.start()
+
+    def put(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Hand a page of formatted transactions to the writer
+
+        Blocks while the queue is full. Safe to call from several threads.
+        """
+        if rows:
+            self._queue.put(rows)
+
+    def close(self) -> Dict[str, int]:
+        """
+        Wait for every queued page to be written and stop the writer thread
+
+        Returns:
+            Counts of pages and rows written, and of rows whose page failed
+        """
+        if self._thread is not None:
+            self._queue.put(_DONE)
+            self._thread.join()
+            self._thread = None
+        return dict(self.stats)
+
+    def _run(self) -> None:
+        """Write pages until the end of the stream"""
+        while True:
+            rows = self._queue.get()
+            if rows is _DONE:
+                break
+            self._write(rows)
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        """Upsert one page, recording the outcome"""
+        try:
+            counts = self.adapter.upsert_transactions(rows)
+        except Exception as e:
+            logger.error(f"Error writing a page of {len(rows)} transactions: {str(e)}")
+            counts = None
+
+        with self._lock:
+            self.stats['pages'] += 1
+            if counts is None:
+                self.stats['failed'] += len(rows)
+                return
+            for key in ('inserted', 'updated', 'unchanged'):
+                self.stats[key] += counts.get(key, 0)
+            self.stats['written'] += sum(counts.get(key, 0) for key in ('inserted', 'updated', 'unchanged'))
@@ -0,0 +1,373 @@
+"""
+Database-backed queue of background Plaid jobs.
+
+Web requests, webhooks and the scheduler enqueue SyncJob rows; the run_sync_workers
+command claims and runs them. Workers claim a job with a conditional UPDATE, so
+any number of them (in any number of processes) can share the queue on both
+SQLite and Postgres, and hold it with a lease they keep extending while the job
+runs. A job whose worker died is picked up again once its lease expires. Failed
+jobs are retried with exponential backoff until they run out of attempts.
+"""
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterable, Optional
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import SyncJob
+
+logger = logging.getLogger(__name__)
+
+# Priorities: someone is waiting on interactive jobs, webhooks should be prompt, scheduled refreshes can wait
+PRIORITY_INTERACTIVE = 100
+PRIORITY_WEBHOOK = 50
+PRIORITY_SCHEDULED = 0
+
+# A worker holds a job for LEASE_SECONDS and extends the lease every HEARTBEAT_SECONDS
+LEASE_SECONDS = 5 * 60
+HEARTBEAT_SECONDS = 60
+
+# Retry delays double from RETRY_BASE_DELAY up to RETRY_MAX_DELAY
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = 60 * 60
+
+# Number of candidate jobs looked at per claim, so workers racing for the first one fall through to the next
+CLAIM_BATCH = 10
+
+JOB_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {}
+
+
+class JobError(Exception):
+    """Raised by a job handler when its work didn't succeed and should be retried"""
+
+
+def job_handler(kind: str):
+    """Register the function that runs jobs of a kind; it is called with the job's payload"""
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+def job_queue_enabled() -> bool:
+    """Whether background work goes through the job queue (PLAID_JOB_QUEUE)"""
+    return getattr(settings, 'PLAID_JOB_QUEUE', False)
+
+
+def enqueue_job(kind: str, payload: Optional[Dict[str, Any]] = None, priority: int = PRIORITY_SCHEDULED,
+                dedup_key: Optional[str] = None, run_at=None, max_attempts: int = 5) -> Optional[SyncJob]:
+    """
+    Add a job to the queue
+
+    If a job with the same dedup_key is still queued, no new job is added; the
+    queued one is moved up to the higher priority and earlier run time instead.
+
+    Args:
+        kind: Job kind, one of JOB_HANDLERS
+        payload: JSON-serialisable arguments for the handler
+        priority: Higher priorities run first
+        dedup_key: Key identifying jobs that do the same work
+        run_at: Earliest time to run the job (defaults to now)
+        max_attempts: Attempts before the job is given up on
+
+    Returns:
+        The queued SyncJob, or None if it couldn't be queued
+    """
+    try:
+        run_at = run_at or timezone.now()
+        if dedup_key:
+            existing = SyncJob.objects.filter(dedup_key=dedup_key, status='queued').order_by('id').first()
+            if existing:
+                SyncJob.objects.filter(id=existing.id, status='queued').update(
+                    priority=max(existing.priority, priority),
+                    run_at=min(existing.run_at, run_at),
+                    updated_at=timezone.now()
+                )
+                logger.info(f"Job {dedup_key} is already queued as #{existing.id}")
+                return existing
+
+        job = SyncJob.objects.create(
+            kind=kind,
+            payload=payload or {},
+            priority=priority,
+            dedup_key=dedup_key,
+            run_at=run_at,
+            max_attempts=max_attempts
+        )
+        logger.info(f"Queued {kind} job #{job.id} with priority {priority}")
+        return job
+    except Exception as e:
+        logger.error(f"Error queueing {kind} job: {str(e)}")
+        return None
+
+
+def claim_job(worker_id: str, kinds: Optional[Iterable[str]] = None) -> Optional[SyncJob]:
+    """
+    Take the next job that is due, highest priority first
+
+    Jobs left running by a worker whose lease expired are taken over.
+
+    Args:
+        worker_id: Identifies the worker holding the lease
+        kinds: Only take jobs of these kinds
+
+    Returns:
+        The claimed SyncJob, or None if no job is due
+    """
+    now = timezone.now()
+    due = Q(status='queued', run_at__lte=now) | Q(status='running', locked_until__lt=now)
+    candidates = SyncJob.objects.filter(due)
+    if kinds:
+        candidates = candidates.filter(kind__in=list(kinds))
+
+    for job_id, status in candidates.order_by('-priority', 'run_at', 'id').values_list('id', 'status')[:CLAIM_BATCH]:
+        # Only succeeds if no other worker claimed the job since we looked
+        still_due = Q(status='queued') if status == 'queued' else Q(status='running', locked_until__lt=now)
+        claimed = SyncJob.objects.filter(still_due, id=job_id).update(
+            status='running',
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=LEASE_SECONDS),
+            attempts=F('attempts') + 1,
+            updated_at=now
+        )
+        if claimed:
+            if status == 'running':
+                logger.warning(f"Worker {worker_id} took over job #{job_id} after its lease expired")
+            return SyncJob.objects.get(id=job_id)
+    return None
+
+
+def extend_lease(job: SyncJob, worker_id: str) -> bool:
+    """
+    Heartbeat: extend a worker's lease on a running job
+
+    Returns:
+        bool: False if the worker has lost the job to another worker
+    """
+    now = timezone.now()
+    return SyncJob.objects.filter(id=job.id, status='running', locked_by=worker_id).update(
+        locked_until=now + timedelta(seconds=LEASE_SECONDS),
+        updated_at=now
+    ) == 1
+
+
+def retry_delay(attempts: int) -> float:
+    """Seconds to wait before the next attempt: exponential backoff with jitter"""
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def complete_job(job: SyncJob, worker_id: str) -> bool:
+    """Mark a job done, if the worker still holds it"""
+    now = timezone.now()
+    return SyncJob.objects.filter(id=job.id, status='running', locked_by=worker_id).update(
+        status='done',
+        locked_by=None,
+        locked_until=None,
+        last_error=None,
+        finished_at=now,
+        updated_at=now
+    ) == 1
+
+
+def fail_job(job: SyncJob, worker_id: str, error: str) -> bool:
+    """
+    Record a failed attempt, and queue a retry unless the job is out of attempts
+
+    Returns:
+        bool: True if the job will be retried
+    """
+    now = timezone.now()
+    retry = job.attempts < job.max_attempts
+    if retry:
+        changes = {'status': 'queued', 'run_at': now + timedelta(seconds=retry_delay(job.attempts))}
+    else:
+        changes = {'status': 'failed', 'finished_at': now}
+    SyncJob.objects.filter(id=job.id, status='running', locked_by=worker_id).update(
+        locked_by=None,
+        locked_until=None,
+        last_error=error[:2000],
+        updated_at=now,
+        **changes
+    )
+    return retry
+
+
+def purge_finished_jobs(older_than: timedelta = timedelta(days=7)) -> int:
+    """Delete done and failed jobs that finished more than older_than ago"""
+    try:
+        deleted, _ = SyncJob.objects.filter(
+            status__in=('done', 'failed'),
+            finished_at__lt=timezone.now() - older_than
+        ).delete()
+        return deleted
+    except Exception as e:
+        logger.error(f"Error purging finished jobs: {str(e)}")
+        return 0
+
+
+class SyncWorker:
+    """
+    Claims and runs jobs from the queue.
+
+    Usage:
+        worker = SyncWorker()
+        worker.run(stop_event)  # until stop_event is set
+        worker.run_pending()    # or just until the queue is empty
+    """
+
+    def __init__(self, worker_id: Optional[str] = None, poll_interval: float = 5.0,
+                 kinds: Optional[Iterable[str]] = None):
+        """
+        Args:
+            worker_id: Identifies the worker in locked_by (defaults to host, process and a random suffix)
+            poll_interval: Seconds to wait before looking again when the queue is empty
+            kinds: Only run jobs of these kinds
+        """
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.poll_interval = poll_interval
+        self.kinds = list(kinds) if kinds else None
+
+    def run(self, stop_event: threading.Event) -> None:
+        """Run jobs until stop_event is set"""
+        while not stop_event.is_set():
+            if not self.run_one():
+                stop_event.wait(self.poll_interval)
+
+    def run_pending(self) -> int:
+        """
+        Run jobs until none are due
+
+        Returns:
+            Number of jobs run
+        """
+        count = 0
+        while self.run_one():
+            count += 1
+        return count
+
+    def run_one(self) -> bool:
+        """
+        Claim and run a single job
+
+        Returns:
+            bool: True if a job was run, False if none was due
+        """
+        close_old_connections()
+        try:
+            job = claim_job(self.worker_id, self.kinds)
+        except Exception as e:
+            logger.error(f"Worker {self.worker_id} could not claim a job: {str(e)}")
+            return False
+        if job is None:
+            return False
+
+        handler = JOB_HANDLERS.get(job.kind)
+        if handler is None or job.attempts > job.max_attempts:
+            # Out of attempts because its workers kept dying, or nothing can run it
+            error = f"Unknown job kind {job.kind}" if handler is None else "Lease expired on the last attempt"
+            logger.error(f"Giving up on {job.kind} job #{job.id}: {error}")
+            job.attempts = job.max_attempts
+            fail_job(job, self.worker_id, error)
+            return True
+
+        logger.info(f"Worker {self.worker_id} running {job.kind} job #{job.id} (attempt {job.attempts}/{job.max_attempts})")
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, stop_heartbeat), daemon=True)
+        heartbeat.start()
+        try:
+            handler(job.payload)
+        except Exception as e:
+            retry = fail_job(job, self.worker_id, str(e))
+            logger.error(f"{job.kind} job #{job.id} failed{', will retry' if retry else ''}: {str(e)}")
+        else:
+            complete_job(job, self.worker_id)
+            logger.info(f"{job.kind} job #{job.id} done")
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+        return True
+
+    def _heartbeat(self, job: SyncJob, stop_event: threading.Event) -> None:
+        """Keep extending the lease on a job until it finishes"""
+        try:
+            while not stop_event.wait(HEARTBEAT_SECONDS):
+                if not extend_lease(job, self.worker_id):
+                    logger.warning(f"Worker {self.worker_id} lost the lease on job #{job.id}")
+                    return
+        except Exception as e:
+            logger.error(f"Error extending the lease on job #{job.id}: {str(e)}")
+        finally:
+            close_old_connections()
+
+
+def _user(user_id: str):
+    """The user object PlaidService expects for a Supabase user ID"""
+    from .middleware import SupabaseUser
+    return SupabaseUser({'id': user_id})
+
+
+@job_handler('initial_sync')
+def run_initial_sync_job(payload: Dict[str, Any]) -> None:
+    """Sync a newly linked item (queued by exchange_public_token)"""
+    from .services import PlaidService
+
+    result = PlaidService().run_initial_sync(
+        _user(payload['user_id']),
+        payload.get('plaid_item_id'),
+        payload['item_id'],
+        payload.get('is_reconnect', False)
+    )
+    if result is None:
+        raise JobError(f"Initial sync of item {payload['item_id']} failed")
+
+
+@job_handler('webhook')
+def run_webhook_job_handler(payload: Dict[str, Any]) -> None:
+    """Run the targeted sync a Plaid webhook asked for"""
+    from .webhooks import ItemSyncBusy, run_webhook_job
+
+    try:
+        succeeded = run_webhook_job(payload['job'], payload['item_id'], payload.get('webhook', {}))
+    except ItemSyncBusy as e:
+        # Retried with the usual backoff, by when the other sync has released the item
+        raise JobError(str(e))
+    if not succeeded:
+        raise JobError(f"Webhook {payload['job']} job for item {payload['item_id']} failed")
+
+
+@job_handler('manual_refresh')
+def run_manual_refresh_job(payload: Dict[str, Any]) -> None:
+    """Refresh a user's accounts and their last 90 days of transactions (queued by the refresh buttons)"""
+    from .services import PlaidService
+
+    service = PlaidService()
+    user = _user(payload['user_id'])
+    if not service.refresh_accounts(user):
+        raise JobError(f"Could not refresh the accounts of user {payload['user_id']}")
+
+    end_date = timezone.now().date()
+    start_date = end_date - timedelta(days=payload.get('days', 90))
+    transaction_count = service.sync_transactions(user, start_date.isoformat(), end_date.isoformat())
+    logger.info(f"Manual refresh synced {transaction_count} transactions for user {payload['user_id']}")
+
+
+@job_handler('refresh_user')
+def run_refresh_user_job(payload: Dict[str, Any]) -> None:
+    """Scheduled soft refresh of a user (queued by refresh_plaid_data --enqueue)"""
+    from .refresh import PlaidRefreshEngine
+    from .services import PlaidService
+
+    result = PlaidRefreshEngine(PlaidService(), full=payload.get('full', False)).refresh_user(
+        payload['user_id'], payload.get('item_count', 1)
+    )
+    if not result['ok']:
+        raise JobError(result['error'] or f"Not every item of user {payload['user_id']} could be synced")
@@ -0,0 +1,139 @@
+"""
+Per-item leases that stop the same Plaid item from being synced twice at once.
+
+The refresh buttons, the mobile app, the debug views, webhooks, the job workers and
+the cron command can all ask for the same item to be synced. Before syncing an item
+a sync takes its lease (a SyncLease row in the Django database, so it is shared by
+every process); an item whose lease is held by another sync is left to that sync
+instead of being fetched from Plaid and written to Supabase a second time.
+
+A lease has an owner and an expiry. The holder renews it while the sync runs, so
+a lease left behind by a process that died frees itself within LEASE_SECONDS.
+"""
+from datetime import timedelta
+from typing import Iterable, List, Optional
+import logging
+import os
+import socket
+import threading
+import uuid
+
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from .models import SyncLease
+
+logger = logging.getLogger(__name__)
+
+# A lease lasts LEASE_SECONDS and is renewed every RENEW_SECONDS while the sync runs
+LEASE_SECONDS = 10 * 60
+RENEW_SECONDS = 2 * 60
+
+
+class ItemSyncLease:
+    """
+    Leases on a group of Plaid items, held for the length of one sync.
+
+    Usage:
+        lease = ItemSyncLease()
+        mine = lease.acquire(item_ids)  # the items no other sync holds
+        try:
+            ...  # sync the items in mine
+        finally:
+            lease.release()
+    """
+
+    def __init__(self, owner: Optional[str] = None, ttl: int = LEASE_SECONDS):
+        """
+        Args:
+            owner: Identifies the holder (defaults to host, process and a random suffix)
+            ttl: Seconds a lease lasts without being renewed
+        """
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.ttl = ttl
+        self.item_ids = []
+        self._stop = threading.Event()
+        self._renewer = None
+
+    def acquire(self, item_ids: Iterable[str]) -> List[str]:
+        """
+        Take the leases of items that no other sync holds
+
+        If the lease table can't be used, every item is returned, so syncs carry on
+        as they did before leases.
+
+        Returns:
+            The item IDs now held, in the order given
+        """
+        held = []
+        for item_id in item_ids:
+            if not item_id:
+                continue
+            item_id = str(item_id)
+            try:
+                if self._take(item_id):
+                    held.append(item_id)
+                else:
+                    logger.info(f"Plaid item {item_id} is already being synced by {self.holder(item_id) or 'another sync'}")
+            except Exception as e:
+                logger.error(f"Error taking the sync lease of Plaid item {item_id}: {str(e)}")
+                held.append(item_id)
+
+        self.item_ids.extend(held)
+        if self.item_ids and self._renewer is None:
+            self._stop = threading.Event()
+            self._renewer = threading.Thread(target=self._renew, name='plaid-sync-lease', daemon=True)
+            self._renewer.start()
+        return held
+
+    def release(self) -> None:
+        """Give up every lease this holder took"""
+        self._stop.set()
+        if self._renewer is not None:
+            self._renewer.join()
+            self._renewer = None
+        if not self.item_ids:
+            return
+        try:
+            SyncLease.objects.filter(item_id__in=self.item_ids, owner=self.owner).delete()
+        except Exception as e:
+            logger.error(f"Error releasing the sync leases of {len(self.item_ids)} Plaid items: {str(e)}")
+        self.item_ids = []
+
+    @staticmethod
+    def holder(item_id: str) -> Optional[str]:
+        """The owner of an item's unexpired lease, or None if nothing is syncing it"""
+        try:
+            lease = SyncLease.objects.filter(item_id=str(item_id), expires_at__gte=timezone.now()).first()
+            return lease.owner if lease else None
+        except Exception as e:
+            logger.error(f"Error checking the sync lease of Plaid item {item_id}: {str(e)}")
+            return None
+
+    def _take(self, item_id: str) -> bool:
+        """Take one lease if it is free or expired"""
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=self.ttl)
+        # Take over a lease whose holder stopped renewing it
+        if SyncLease.objects.filter(item_id=item_id, expires_at__lt=now).update(
+            owner=self.owner, acquired_at=now, expires_at=expires_at
+        ):
+            return True
+        try:
+            with transaction.atomic():
+                SyncLease.objects.create(item_id=item_id, owner=self.owner, acquired_at=now, expires_at=expires_at)
+            return True
+        except IntegrityError:
+            return False
+
+    def _renew(self) -> None:
+        """Keep the leases from expiring until they are released"""
+        try:
+            while not self._stop.wait(RENEW_SECONDS):
+                SyncLease.objects.filter(item_id__in=list(self.item_ids), owner=self.owner).update(
+                    expires_at=timezone.now() + timedelta(seconds=self.ttl)
+                )
+        except Exception as e:
+            logger.error(f"Error renewing Plaid sync leases: {str(e)}")
+        finally:
+            close_old_connections()
@@ -0,0 +1,94 @@
+"""
+Management command to rebuild the monthly_rollups table from the stored transactions.
+"""
+from django.core.management.base import BaseCommand
+from supabase_integration.adapter import SupabaseAdapter
+from supabase_integration.leases import ItemSyncLease
+from supabase_integration.queries import TransactionQuery, TRANSACTION_SUMMARY_COLUMNS
+from supabase_integration.rollups import RollupDelta, account_class, monthly_rollups_enabled
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Rebuilds the monthly rollups of every user (or the given users) from their transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            help='Only rebuild this user\'s rollups (Supabase user ID, can be given more than once)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compute the rollups and report them without writing anything'
+        )
+
+    def handle(self, *args, **options):
+        if not monthly_rollups_enabled():
+            self.stdout.write(self.style.WARNING(
+                "MONTHLY_ROLLUPS is off: transaction syncs won't keep the rebuilt rollups up to date"
+            ))
+
+        adapter = SupabaseAdapter()
+        accounts = self._get_accounts(adapter, options.get('user'))
+        account_classes = {account['id']: account_class(account) for account in accounts if account.get('id')}
+        user_ids = options.get('user') or sorted({str(account['user_id']) for account in accounts if account.get('user_id')})
+
+        self.stdout.write(f"Rebuilding the monthly rollups of {len(user_ids)} users")
+        rebuilt, busy, failed = 0, [], []
+        for user_id in user_ids:
+            # Hold the user's items so no sync changes their transactions between reading them and replacing the rollups
+            item_ids = [item['item_id'] for item in adapter.get_plaid_items(user_id) if item.get('item_id')]
+            lease = ItemSyncLease(owner=f"rollup-backfill:{user_id}")
+            held = lease.acquire(item_ids)
+            try:
+                if len(held) < len(item_ids):
+                    busy.append(user_id)
+                    continue
+
+                transactions = adapter.get_all_transactions(TransactionQuery(user_id), columns=TRANSACTION_SUMMARY_COLUMNS)
+                delta = RollupDelta(account_classes, user_id=user_id)
+                for transaction in transactions:
+                    delta.add(transaction)
+                rollups = delta.rows()
+
+                if options['dry_run']:
+                    self.stdout.write(f"User {user_id}: {len(transactions)} transactions in {len(rollups)} rollups")
+                elif adapter.replace_monthly_rollups(user_id, rollups):
+                    rebuilt += 1
+                else:
+                    failed.append(user_id)
+            except Exception as e:
+                logger.error(f"Error rebuilding monthly rollups of user {user_id}: {str(e)}")
+                failed.append(user_id)
+            finally:
+                lease.release()
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS("Dry run, nothing was written"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt the monthly rollups of {rebuilt} users"))
+        if busy:
+            self.stdout.write(self.style.WARNING(
+                f"Skipped {len(busy)} users whose items were syncing, run again with: "
+                + ' '.join(f"--user {user_id}" for user_id in busy)
+            ))
+        if failed:
+            self.stdout.write(self.style.ERROR(f"Failed for {len(failed)} users: {', '.join(failed)}"))
+
+    def _get_accounts(self, adapter, user_ids=None):
+        """Every account (or the given users' accounts), a page at a time"""
+        accounts = []
+        batch_size = 1000
+        offset = 0
+        while True:
+            query = adapter.client.table('accounts').select('*')
+            if user_ids:
+                query = query.in_('user_id', user_ids)
+            rows = query.order('id').range(offset, offset + batch_size - 1).execute().data or []
+            accounts.extend(rows)
+            if len(rows) < batch_size:
+                return accounts
+            offset += batch_size
@@ -0,0 +1,174 @@
+"""
+Management command to benchmark the CPU cost of the transaction sync pipeline.
+"""
+from django.core.management.base import BaseCommand
+from supabase_integration.normalize import TransactionNormalizer
+from supabase_integration.plaid_client import parse_plaid_json
+from plaid.api_client import ApiClient
+from plaid.configuration import Configuration
+from plaid.model.transactions_get_response import TransactionsGetResponse
+from datetime import date, timedelta
+import json
+import random
+import time
+
+PAGE_SIZE = 500
+
+
+def sample_transactions(count, account_ids):
+    """Build transactions as Plaid's /transactions/get returns them on the wire"""
+    rng = random.Random(42)
+    start = date(2023, 1, 1)
+    transactions = []
+    for i in range(count):
+        day = (start + timedelta(days=i % 730)).isoformat()
+        transactions.append({
+            'transaction_id': f"tx_{i:08d}",
+            'account_id': account_ids[i % len(account_ids)],
+            'account_owner': None,
+            'amount': round(rng.uniform(-500, 500), 2),
+            'iso_currency_code': 'USD',
+            'unofficial_currency_code': None,
+            'date': day,
+            'datetime': None,
+            'authorized_date': day,
+            'authorized_datetime': None,
+            'name': f"Merchant {i % 250}",
+            'merchant_name': f"Merchant {i % 250}",
+            'merchant_entity_id': None,
+            'logo_url': None,
+            'website': None,
+            'check_number': None,
+            'pending': i % 20 == 0,
+            'pending_transaction_id': None,
+            'category': ['Food and Drink', 'Restaurants'],
+            'category_id': '13005000',
+            'payment_meta': {
+                'by_order_of': None, 'payee': None, 'payer': None, 'payment_method': None,
+                'payment_processor': None, 'ppd_id': None, 'reason': None, 'reference_number': None,
+            },
+            'location': {
+                'address': None, 'city': 'Seattle', 'region': 'WA', 'postal_code': None,
+                'country': 'US', 'lat': None, 'lon': None, 'store_number': None,
+            },
+            'payment_channel': 'in store',
+            'transaction_code': None,
+            'transaction_type': 'place',
+            'personal_finance_category': {
+                'primary': 'FOOD_AND_DRINK', 'detailed': 'FOOD_AND_DRINK_RESTAURANT', 'confidence_level': 'HIGH',
+            },
+            'personal_finance_category_icon_url': 'https://plaid-category-icons.plaid.com/PFC_FOOD_AND_DRINK.png',
+            'counterparties': [],
+        })
+    return transactions
+
+
+def sample_response_body(transactions, account_ids, total):
+    """Encode a page of transactions as a /transactions/get response body"""
+    return json.dumps({
+        'accounts': [{
+            'account_id': account_id,
+            'balances': {
+                'available': 100.0, 'current': 100.0, 'limit': None,
+                'iso_currency_code': 'USD', 'unofficial_currency_code': None,
+            },
+            'mask': '0000',
+            'name': 'Checking',
+            'official_name': None,
+            'type': 'depository',
+            'subtype': 'checking',
+        } for account_id in account_ids],
+        'transactions': transactions,
+        'total_transactions': total,
+        'item': {
+            'item_id': 'benchmark-item', 'institution_id': 'ins_1', 'webhook': None, 'error': None,
+            'available_products': [], 'billed_products': ['transactions'],
+            'consent_expiration_time': None, 'update_type': 'background',
+        },
+        'request_id': 'benchmark',
+    }).encode('utf-8')
+
+
+class _Response:
+    """The parts of a urllib3 response the SDK deserializer reads"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def getheader(self, name, default=None):
+        return 'application/json; charset=utf-8'
+
+
+class Command(BaseCommand):
+    help = 'Measures the CPU time the transaction sync pipeline spends per page of Plaid transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=20000,
+            help='Number of synthetic transactions to process'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Number of runs; the fastest is reported'
+        )
+        parser.add_argument(
+            '--sdk-pages',
+            type=int,
+            default=4,
+            help='Number of pages to run through the (slow) SDK path'
+        )
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = max(1, options['repeat'])
+
+        account_ids = [f"plaid-account-{n}" for n in range(5)]
+        normalizer = TransactionNormalizer({a: f"uuid-{a}" for a in account_ids}, 'benchmark-user')
+        transactions = sample_transactions(rows, account_ids)
+        pages = [transactions[i:i + PAGE_SIZE] for i in range(0, rows, PAGE_SIZE)]
+        bodies = [sample_response_body(page, account_ids, rows) for page in pages]
+        sdk_bodies = bodies[:max(1, options['sdk_pages'])]
+        sdk_rows = sum(len(page) for page in pages[:len(sdk_bodies)])
+        api_client = ApiClient(Configuration())
+
+        def sdk_path():
+            # What the SDK does for transactions_get, then _plaid_object_to_dict
+            for body in sdk_bodies:
+                response = api_client.deserialize(_Response(body.decode('utf-8')), (TransactionsGetResponse,), True)
+                normalizer.normalize_page(response.to_dict()['transactions'])
+
+        def raw_path():
+            # PLAID_RAW_JSON: call_plaid_json
+            for body in bodies:
+                normalizer.normalize_page(parse_plaid_json(body)['transactions'])
+
+        self.stdout.write(f"{rows} transactions in {len(pages)} pages of {PAGE_SIZE}, best of {repeat} (CPU time)")
+        self.report('normalize only', self.time_best(repeat, lambda: [normalizer.normalize_page(page) for page in pages]), rows, len(pages))
+        sdk = self.time_best(repeat, sdk_path)
+        self.report('SDK models + normalize', sdk, sdk_rows, len(sdk_bodies))
+        raw = self.time_best(repeat, raw_path)
+        self.report('raw JSON + normalize', raw, rows, len(pages))
+        sdk_per_page = sdk / len(sdk_bodies)
+        raw_per_page = max(raw, 1e-9) / len(pages)
+        self.stdout.write(f"Raw JSON path is {sdk_per_page / raw_per_page:.1f}x faster per page than the SDK path")
+
+    def time_best(self, repeat, func):
+        """Run func repeat times and return the lowest CPU time in seconds"""
+        best = None
+        for _ in range(repeat):
+            started = time.process_time()
+            func()
+            elapsed = time.process_time() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def report(self, label, seconds, rows, pages):
+        """Print the throughput of one stage"""
+        seconds = max(seconds, 1e-9)
+        self.stdout.write(self.style.SUCCESS(
+            f"{label}: {seconds:.3f}s, {rows / seconds:,.0f} rows/sec, {seconds / max(1, pages) * 1000:.2f} ms/page"
+        ))
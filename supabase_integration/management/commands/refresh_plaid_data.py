@@ -1,11 +1,15 @@
 """
 Management command to refresh Plaid data periodically.
 """
-from django.core.management.base import BaseCommand
-from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
 from supabase_integration.services import PlaidService
-from datetime import datetime, timedelta
+from supabase_integration.refresh import PlaidRefreshEngine, RefreshCheckpoint, parse_shard, shard_of
+from supabase_integration.scheduler import RefreshScheduler, get_last_dashboard_visits
+from supabase_integration.jobs import PRIORITY_SCHEDULED, enqueue_job, job_queue_enabled
 import logging
+import os
+import tempfile
 
 logger = logging.getLogger(__name__)
 
@@ -22,57 +26,104 @@ class Command(BaseCommand):
         parser.add_argument(
             '--user_id',
             type=str,
-            help='Specific user ID to refresh (optional)'
+            help='Supabase ID of a specific user to refresh (optional)'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Re-download the last 30 days of transactions instead of using the incremental sync'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'PLAID_REFRESH_WORKERS', 4),
+            help='Number of users refreshed at the same time'
+        )
+        parser.add_argument(
+            '--shard',
+            type=str,
+            help='Only refresh this host\'s share of the users, given as i/n (e.g. 0/4 on the first of four hosts)'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            help='Checkpoint file used to resume an interrupted run (defaults to one in the temp directory)'
+        )
+        parser.add_argument(
+            '--budget',
+            type=int,
+            default=getattr(settings, 'PLAID_REFRESH_BUDGET', 0),
+            help='Most items to sync in this run, chosen by priority (0 for no limit)'
+        )
+        parser.add_argument(
+            '--enqueue',
+            action='store_true',
+            help='Queue a job per user for the sync workers instead of refreshing in this process'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore the checkpoint of an interrupted run and refresh every user again'
         )
     
     def handle(self, *args, **options):
         refresh_type = options.get('type')
         user_id = options.get('user_id')
+        self.full_refresh = options.get('full', False)
+        self.workers = options.get('workers')
+        self.budget = options.get('budget')
+        
+        try:
+            self.shard = parse_shard(options.get('shard'))
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.checkpoint_path = options.get('checkpoint')
+        self.restart = options.get('restart', False)
+        self.enqueue = options.get('enqueue', False) or job_queue_enabled()
         
         plaid_service = PlaidService()
         
+        # Write item statuses in batches instead of one request per item (errors are still written at once)
+        plaid_service.adapter.buffer_status_updates()
+        
         try:
             if user_id:
                 # Refresh a specific user
-                User = get_user_model()
-                try:
-                    user = User.objects.get(id=user_id)
-                    self.refresh_user_data(plaid_service, user, refresh_type)
-                except User.DoesNotExist:
-                    self.stdout.write(self.style.ERROR(f"User with ID {user_id} not found"))
+                self.refresh_user_data(plaid_service, user_id, refresh_type)
             else:
                 # Refresh all users based on schedule
                 self.refresh_scheduled_items(plaid_service, refresh_type)
         except Exception as e:
             logger.error(f"Error refreshing Plaid data: {str(e)}")
             self.stdout.write(self.style.ERROR(f"Error refreshing Plaid data: {str(e)}"))
+        finally:
+            written = plaid_service.adapter.flush_status_updates()
+            self.stdout.write(f"Updated refresh status for {written} items")
     
-    def refresh_user_data(self, plaid_service, user, refresh_type):
+    def refresh_user_data(self, plaid_service, user_id, refresh_type):
         """Refresh data for a specific user"""
         if refresh_type == 'soft':
             # For soft refresh, update accounts and transactions
-            self.stdout.write(f"Performing soft refresh for user {user.id}")
+            self.stdout.write(f"Performing soft refresh for user {user_id}")
+            
+            engine = PlaidRefreshEngine(plaid_service, full=self.full_refresh)
+            result = engine.refresh_user(user_id)
+            if result['error']:
+                self.stdout.write(self.style.ERROR(f"Error performing soft refresh for user {user_id}: {result['error']}"))
+                return
             
-            try:
-                # Update accounts
-                accounts = plaid_service.refresh_accounts(user)
-                self.stdout.write(f"Updated {len(accounts)} accounts for user {user.id}")
-                
-                # Update transactions for the last 30 days
-                end_date = datetime.now().date()
-                start_date = end_date - timedelta(days=30)
-                transactions = plaid_service.refresh_transactions(user, start_date, end_date)
-                self.stdout.write(f"Updated {len(transactions)} transactions for user {user.id}")
-                
-                # Get the user's Plaid items and record the refresh
-                plaid_items = plaid_service.adapter.get_plaid_items(str(user.id))
-                for item in plaid_items:
-                    plaid_service.adapter.record_soft_refresh(item['id'])
-                
-                self.stdout.write(self.style.SUCCESS(f"Successfully refreshed data for user {user.id}"))
-            except Exception as e:
-                logger.error(f"Error performing soft refresh for user {user.id}: {str(e)}")
-                self.stdout.write(self.style.ERROR(f"Error performing soft refresh for user {user.id}: {str(e)}"))
+            self.stdout.write(f"Updated {result['accounts']} accounts for user {user_id}")
+            if self.full_refresh:
+                self.stdout.write(f"Updated {result['transactions']} transactions for user {user_id}")
+            else:
+                self.stdout.write(
+                    f"Synced transactions for user {user_id}: {result['added']} added, "
+                    f"{result['modified']} modified, {result['removed']} removed"
+                )
+            
+            # Each item that synced successfully has recorded its own soft refresh
+            
+            self.stdout.write(self.style.SUCCESS(f"Successfully refreshed data for user {user_id}"))
         else:
             # For hard refresh, we can't do this automatically
             # as it requires user interaction with Plaid Link
@@ -82,67 +133,130 @@ class Command(BaseCommand):
     
     def refresh_scheduled_items(self, plaid_service, refresh_type):
         """Refresh items based on schedule"""
-        User = get_user_model()
+        if refresh_type == 'soft':
+            items_to_refresh = self.schedule_soft_refresh(plaid_service)
+            if self.enqueue:
+                self.enqueue_soft_refresh(plaid_service, items_to_refresh)
+            else:
+                self.run_soft_refresh(plaid_service, items_to_refresh)
+            return
         
         # Get items needing refresh
         try:
             items_to_refresh = plaid_service.adapter.get_items_needing_refresh(
                 refresh_type=refresh_type
             )
-            
-            self.stdout.write(f"Found {len(items_to_refresh)} items needing {refresh_type} refresh")
-            
-            if refresh_type == 'soft':
-                # Process soft refreshes
-                for item in items_to_refresh:
-                    try:
-                        # Get the user for this item
-                        user_id = item.get('user_id')
-                        try:
-                            user = User.objects.get(supabase_id=user_id)
-                            
-                            # Refresh accounts and transactions
-                            plaid_service.refresh_accounts(user)
-                            
-                            # Update transactions for the last 30 days
-                            end_date = datetime.now().date()
-                            start_date = end_date - timedelta(days=30)
-                            plaid_service.refresh_transactions(user, start_date, end_date)
-                            
-                            # Record the refresh
-                            plaid_service.adapter.record_soft_refresh(item['id'])
-                            
-                            self.stdout.write(self.style.SUCCESS(
-                                f"Successfully refreshed item {item['id']} for user {user_id}"
-                            ))
-                        except User.DoesNotExist:
-                            logger.warning(f"User with Supabase ID {user_id} not found")
-                            self.stdout.write(self.style.WARNING(
-                                f"User with Supabase ID {user_id} not found"
-                            ))
-                    except Exception as e:
-                        logger.error(f"Error refreshing item {item['id']}: {str(e)}")
-                        self.stdout.write(self.style.ERROR(
-                            f"Error refreshing item {item['id']}: {str(e)}"
-                        ))
-            else:
-                # For hard refreshes, we can't do this automatically
-                # We'll log which items need a hard refresh so a notification system
-                # could be used to prompt users to reconnect
-                for item in items_to_refresh:
-                    user_id = item.get('user_id')
-                    self.stdout.write(self.style.WARNING(
-                        f"Item {item['id']} for user {user_id} needs a hard refresh "
-                        f"(last connected: {item.get('last_connection_time', 'unknown')})"
-                    ))
-                
-                self.stdout.write(self.style.WARNING(
-                    f"Hard refreshes require user interaction and will need to be "
-                    f"prompted through the UI or notification system."
-                ))
-                
         except Exception as e:
             logger.error(f"Error getting items needing refresh: {str(e)}")
             self.stdout.write(self.style.ERROR(
                 f"Error getting items needing refresh: {str(e)}"
-            )) 
\ No newline at end of file
+            ))
+            return
+        
+        self.stdout.write(f"Found {len(items_to_refresh)} items needing {refresh_type} refresh")
+        
+        # For hard refreshes, we can't do this automatically
+        # We'll log which items need a hard refresh so a notification system
+        # could be used to prompt users to reconnect
+        for item in items_to_refresh:
+            user_id = item.get('user_id')
+            self.stdout.write(self.style.WARNING(
+                f"Item {item['id']} for user {user_id} needs a hard refresh "
+                f"(last connected: {item.get('last_connection_time', 'unknown')})"
+            ))
+        
+        self.stdout.write(self.style.WARNING(
+            f"Hard refreshes require user interaction and will need to be "
+            f"prompted through the UI or notification system."
+        ))
+    
+    def schedule_soft_refresh(self, plaid_service):
+        """Pick this run's items: the most valuable due items that fit the budget"""
+        candidates = plaid_service.adapter.get_refresh_candidates()
+        if self.shard:
+            # Only this host's users count against its budget
+            candidates = [item for item in candidates
+                          if item.get('user_id') and shard_of(item['user_id'], self.shard[1]) == self.shard[0]]
+        
+        scheduler = RefreshScheduler(budget=self.budget)
+        last_visits = get_last_dashboard_visits(item.get('user_id') for item in candidates if item.get('user_id'))
+        batch = scheduler.select(candidates, last_visits)
+        
+        self.stdout.write(
+            f"Scheduled {len(batch['items'])} of {len(candidates)} items ({batch['users']} users)"
+            + (f" within a budget of {scheduler.budget} items" if scheduler.budget else '')
+            + f": {batch['deferred']} due items deferred to a later run, {batch['not_due']} not due yet, "
+            f"{batch['need_relink']} need relinking"
+        )
+        return batch['items']
+    
+    def enqueue_soft_refresh(self, plaid_service, items_to_refresh):
+        """Queue a refresh job per user with stale items, to be run by run_sync_workers"""
+        plan = PlaidRefreshEngine(plaid_service, full=self.full_refresh).plan(items_to_refresh, shard=self.shard)
+        queued = 0
+        for user_id, item_count in plan['users'].items():
+            job = enqueue_job(
+                'refresh_user',
+                {'user_id': user_id, 'item_count': item_count, 'full': self.full_refresh},
+                priority=PRIORITY_SCHEDULED,
+                dedup_key=f"refresh_user:{user_id}"
+            )
+            if job:
+                queued += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Queued refreshes of {queued} users ({plan['items']} items) for the sync workers"
+        ))
+    
+    def run_soft_refresh(self, plaid_service, items_to_refresh):
+        """Refresh each user with stale items once, using a pool of workers"""
+        shard_label = f"{self.shard[0]}of{self.shard[1]}" if self.shard else 'all'
+        mode = 'full' if self.full_refresh else 'incremental'
+        checkpoint = RefreshCheckpoint(
+            self.checkpoint_path or os.path.join(tempfile.gettempdir(), f"refresh_plaid_data-soft-{mode}-{shard_label}.json"),
+            key=f"soft:{mode}:{shard_label}"
+        )
+        if self.restart:
+            checkpoint.clear()
+        elif checkpoint.load():
+            self.stdout.write(f"Resuming the run started at {checkpoint.started_at.isoformat()}: "
+                              f"{len(checkpoint.done)} users already refreshed")
+        
+        def report(user_id, result):
+            if result['ok']:
+                self.stdout.write(self.style.SUCCESS(f"Successfully refreshed user {user_id}"))
+            else:
+                self.stdout.write(self.style.ERROR(
+                    f"Error refreshing user {user_id}: {result['error'] or 'not every item could be synced'}"
+                ))
+        
+        engine = PlaidRefreshEngine(
+            plaid_service,
+            workers=self.workers,
+            full=self.full_refresh,
+            checkpoint=checkpoint,
+            on_result=report
+        )
+        plan = engine.plan(items_to_refresh, shard=self.shard)
+        self.stdout.write(
+            f"Refreshing {len(plan['users'])} users ({plan['items']} items) with {engine.workers} workers"
+            + (f", shard {self.shard[0]}/{self.shard[1]}" if self.shard else '')
+            + (f", skipping {plan['skipped']} users already done" if plan['skipped'] else '')
+        )
+        
+        stats = engine.run(plan)
+        
+        # A run that got through every user doesn't need to be resumed
+        if not stats['failed_users']:
+            checkpoint.clear()
+        
+        elapsed = max(stats['elapsed'], 0.001)
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {stats['users']} users ({stats['items']} items) in {elapsed:.1f}s: "
+            f"{stats['users'] / elapsed * 60:.1f} users/min, {stats['items'] / elapsed * 60:.1f} items/min"
+        ))
+        self.stdout.write(
+            f"Synced {stats['accounts']} accounts and "
+            + (f"{stats['transactions']} transactions" if self.full_refresh else
+               f"{stats['added']} added, {stats['modified']} modified, {stats['removed']} removed transactions")
+            + f"; {stats['failed_users']} users failed, {stats['skipped_users']} skipped from the checkpoint"
+        )
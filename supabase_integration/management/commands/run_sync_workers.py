@@ -0,0 +1,86 @@
+"""
+Management command to run the workers of the background job queue.
+"""
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.db import connection
+from supabase_integration.jobs import SyncWorker, purge_finished_jobs
+from datetime import timedelta
+import logging
+import signal
+import threading
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Runs queued Plaid sync jobs (link syncs, webhooks, manual and scheduled refreshes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'PLAID_JOB_WORKERS', 2),
+            help='Number of jobs run at the same time'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Seconds to wait before checking an empty queue again'
+        )
+        parser.add_argument(
+            '--kind',
+            action='append',
+            help='Only run jobs of this kind (can be given more than once)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the jobs that are due and exit, instead of waiting for more'
+        )
+        parser.add_argument(
+            '--keep-days',
+            type=int,
+            default=7,
+            help='Delete finished jobs older than this many days on startup'
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+
+        purged = purge_finished_jobs(timedelta(days=options['keep_days']))
+        if purged:
+            self.stdout.write(f"Deleted {purged} finished jobs")
+
+        stop_event = threading.Event()
+        if not options['once']:
+            def stop(signum, frame):
+                self.stdout.write("Stopping after the running jobs finish")
+                stop_event.set()
+            signal.signal(signal.SIGTERM, stop)
+            signal.signal(signal.SIGINT, stop)
+
+        counts = []
+
+        def run_worker():
+            worker = SyncWorker(poll_interval=options['poll_interval'], kinds=options.get('kind'))
+            try:
+                if options['once']:
+                    counts.append(worker.run_pending())
+                else:
+                    worker.run(stop_event)
+            finally:
+                connection.close()
+
+        self.stdout.write(f"Starting {workers} sync workers" + (" (until the queue is empty)" if options['once'] else ''))
+        threads = [threading.Thread(target=run_worker, name=f"sync-worker-{i}") for i in range(workers)]
+        for thread in threads:
+            thread.start()
+
+        # Wait with a timeout so signals are still handled by this thread
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=1)
+
+        if options['once']:
+            self.stdout.write(self.style.SUCCESS(f"Ran {sum(counts)} jobs"))
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-16 23:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("supabase_integration", "0002_synclease"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserActivity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("user_id", models.CharField(max_length=100, unique=True)),
+                ("last_dashboard_visit", models.DateTimeField()),
+            ],
+        ),
+    ]
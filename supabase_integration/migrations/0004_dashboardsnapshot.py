@@ -0,0 +1,40 @@
+# Generated by Django 5.1.6 on 2026-10-16 23:50
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("supabase_integration", "0003_useractivity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DashboardSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("user_id", models.CharField(max_length=100, unique=True)),
+                ("version", models.PositiveIntegerField(default=0)),
+                ("built_version", models.PositiveIntegerField(blank=True, null=True)),
+                ("built_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "context",
+                    models.JSONField(
+                        blank=True,
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                        null=True,
+                    ),
+                ),
+            ],
+        ),
+    ]
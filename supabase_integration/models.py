@@ -1,4 +1,80 @@
 """
 Models for the supabase_integration app.
+
+Financial data lives in Supabase; the models here are the bookkeeping shared by the
+web and worker processes (background sync jobs, sync leases, user activity and
+dashboard snapshots), kept in the Django database so workers need no other broker.
 """
-# No models needed - using Supabase for data storage 
\ No newline at end of file
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class SyncJob(models.Model):
+    """A unit of background Plaid work, run by the run_sync_workers command"""
+
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    priority = models.IntegerField(default=0)  # Higher runs first
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    dedup_key = models.CharField(max_length=200, blank=True, null=True)  # Queued jobs with the same key are merged
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)  # Not run before this, used to back off retries
+    locked_by = models.CharField(max_length=100, blank=True, null=True)
+    locked_until = models.DateTimeField(blank=True, null=True)  # Lease; another worker may take the job after it
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='syncjob_status_run_at'),
+            models.Index(fields=['dedup_key', 'status'], name='syncjob_dedup_key_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class SyncLease(models.Model):
+    """Held by whatever is syncing a Plaid item, so only one sync of the item runs at a time"""
+
+    item_id = models.CharField(max_length=100, unique=True)  # Plaid's item_id
+    owner = models.CharField(max_length=150)
+    acquired_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)  # Free for another sync after this, if the owner stopped renewing
+
+    def __str__(self):
+        return f"{self.item_id} held by {self.owner} until {self.expires_at}"
+
+
+class UserActivity(models.Model):
+    """When a user last looked at their data, so scheduled refreshes favour active users"""
+
+    user_id = models.CharField(max_length=100, unique=True)  # Supabase user ID
+    last_dashboard_visit = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.user_id} last visited {self.last_dashboard_visit}"
+
+
+class DashboardSnapshot(models.Model):
+    """A user's last computed dashboard, served again until their data changes"""
+
+    user_id = models.CharField(max_length=100, unique=True)  # Supabase user ID
+    version = models.PositiveIntegerField(default=0)  # Bumped by every sync, profile or goal change of the user
+    built_version = models.PositiveIntegerField(blank=True, null=True)  # Version the context was computed at
+    built_at = models.DateTimeField(blank=True, null=True)
+    context = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+
+    def __str__(self):
+        return f"Dashboard of {self.user_id} at version {self.version}"
@@ -0,0 +1,138 @@
+"""
+Mapping of Plaid transactions to rows for the Supabase transactions table.
+"""
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _first(value):
+    """Plaid's legacy category is a hierarchy list; we store its top level"""
+    return value[0] if isinstance(value, list) else value
+
+
+def _iso(value):
+    """Dates may arrive as date objects (SDK models) or ISO strings (raw JSON)"""
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _json(value):
+    """Nested objects are stored as JSON text"""
+    return value if isinstance(value, str) else json.dumps(value, default=str)
+
+
+# Columns written for every transaction: (column, Plaid field, default, converter)
+TRANSACTION_REQUIRED_FIELDS = (
+    ('transaction_id', 'transaction_id', None, None),
+    ('amount', 'amount', 0.0, None),  # Plaid uses positive for debit, negative for credit
+    ('date', 'date', None, _iso),
+    ('name', 'name', None, None),
+    ('pending', 'pending', False, None),
+)
+
+# Columns written only when Plaid has a value: (column, path to the Plaid field, converter)
+TRANSACTION_OPTIONAL_FIELDS = (
+    ('merchant_name', ('merchant_name',), None),
+    ('category', ('category',), _first),
+    ('reference_number', ('payment_meta', 'reference_number'), None),
+    ('payee', ('payment_meta', 'payee'), None),
+    ('payer', ('payment_meta', 'payer'), None),
+    ('payment_method', ('payment_meta', 'payment_method'), None),
+    ('location', ('location',), _json),
+    ('payment_channel', ('payment_channel',), None),
+    ('category_id', ('personal_finance_category', 'primary'), None),
+    ('subcategory', ('personal_finance_category', 'detailed'), None),
+    ('iso_currency_code', ('iso_currency_code',), None),
+    ('unofficial_currency_code', ('unofficial_currency_code',), None),
+    ('website', ('website',), None),
+    ('authorized_date', ('authorized_date',), _iso),
+)
+
+
+def _compile_optional_fields(fields) -> Tuple[Tuple[str, Tuple[Tuple[str, Optional[str], Any], ...]], ...]:
+    """
+    Group the optional fields by their top-level Plaid field, so each transaction
+    looks up payment_meta or personal_finance_category once for all its columns
+    """
+    plan = {}
+    for column, path, converter in fields:
+        top, sub = path[0], (path[1] if len(path) > 1 else None)
+        plan.setdefault(top, []).append((column, sub, converter))
+    return tuple((top, tuple(columns)) for top, columns in plan.items())
+
+
+_OPTIONAL_PLAN = _compile_optional_fields(TRANSACTION_OPTIONAL_FIELDS)
+
+
+class TransactionNormalizer:
+    """
+    Turns pages of Plaid transactions into rows for the transactions table.
+
+    The mapping is described by TRANSACTION_REQUIRED_FIELDS and
+    TRANSACTION_OPTIONAL_FIELDS and compiled once at import, so normalizing a page is
+    a single pass with no per-row branching on the field list. Every sync path uses
+    this class, so a transaction is stored with the same columns however it was fetched.
+    """
+
+    def __init__(self, account_id_to_uuid: Dict[str, str], user_id: Optional[str] = None):
+        """
+        Args:
+            account_id_to_uuid: Mapping of Plaid account IDs to Supabase account UUIDs
+            user_id: The Supabase user ID that owns the transactions, if known
+        """
+        self.account_id_to_uuid = account_id_to_uuid
+        self.user_id = user_id
+
+    def normalize_page(self, transactions: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Normalize a page of Plaid transactions
+
+        Args:
+            transactions: Plaid transactions as dictionaries
+
+        Returns:
+            The rows to store. Transactions whose account isn't known are left out.
+        """
+        account_id_to_uuid = self.account_id_to_uuid
+        user_id = self.user_id
+        required = TRANSACTION_REQUIRED_FIELDS
+        optional = _OPTIONAL_PLAN
+
+        rows = []
+        skipped = set()
+        for tx in transactions:
+            account_uuid = account_id_to_uuid.get(tx.get('account_id'))
+            if account_uuid is None:
+                skipped.add(tx.get('account_id'))
+                continue
+
+            row = {'account_id': account_uuid}
+            if user_id is not None:
+                row['user_id'] = user_id
+
+            for column, field, default, converter in required:
+                value = tx.get(field, default)
+                row[column] = converter(value) if converter and value is not None else value
+
+            for top, columns in optional:
+                value = tx.get(top)
+                if not value:
+                    continue
+                for column, sub, converter in columns:
+                    field_value = value.get(sub) if sub else value
+                    if field_value:
+                        row[column] = converter(field_value) if converter else field_value
+
+            rows.append(row)
+
+        if skipped:
+            logger.warning(f"No UUID mapping found for Plaid account IDs {sorted(map(str, skipped))}, skipping their transactions")
+
+        return rows
+
+    def normalize(self, tx: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Normalize a single Plaid transaction, or return None if its account isn't known"""
+        rows = self.normalize_page([tx])
+        return rows[0] if rows else None
@@ -0,0 +1,239 @@
+"""
+Process-wide, pooled clients for the Plaid API.
+"""
+from typing import Any, Dict, Optional, Tuple
+import json
+import logging
+import socket
+import threading
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+from django.conf import settings
+from plaid.api import plaid_api
+from plaid.api_client import ApiClient
+from plaid.configuration import Configuration
+
+from .ratelimit import create_plaid_rate_limiter
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+logger = logging.getLogger(__name__)
+
+# Valid values of PLAID_ENVIRONMENT
+PLAID_ENVIRONMENTS = ['sandbox', 'development', 'production']
+
+# Keep idle pooled connections open at the TCP level between requests
+KEEPALIVE_SOCKET_OPTIONS = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+
+
+def plaid_host(environment: Optional[str] = None) -> str:
+    """
+    Get the API host for a Plaid environment
+
+    Args:
+        environment: 'sandbox', 'development' or 'production' (defaults to PLAID_ENVIRONMENT)
+
+    Returns:
+        The base URL of the Plaid API, e.g. https://sandbox.plaid.com
+    """
+    environment = environment or settings.PLAID_ENVIRONMENT
+    if environment not in PLAID_ENVIRONMENTS:
+        raise ValueError(f"Invalid Plaid environment: {environment}")
+    return f"https://{environment}.plaid.com"
+
+
+class TimeoutApiClient(ApiClient):
+    """
+    ApiClient that applies a default timeout to requests made without one, and
+    paces and retries every call with a PlaidRateLimiter when it has one
+    """
+
+    def __init__(self, configuration, timeout=None, rate_limiter=None, **kwargs):
+        super().__init__(configuration, **kwargs)
+        self.default_timeout = timeout
+        self.rate_limiter = rate_limiter
+
+    def call_api(self, resource_path, method, *args, **kwargs):
+        if self.rate_limiter is None:
+            return super().call_api(resource_path, method, *args, **kwargs)
+
+        # Per-item limits are keyed on the access token of the request, if it has one
+        body = kwargs.get('body')
+        access_token = body.get('access_token') if hasattr(body, 'get') else None
+        return self.rate_limiter.call(
+            resource_path, access_token,
+            lambda: super(TimeoutApiClient, self).call_api(resource_path, method, *args, **kwargs)
+        )
+
+    def request(self, method, url, query_params=None, headers=None,
+                post_params=None, body=None, _preload_content=True,
+                _request_timeout=None):
+        return super().request(
+            method, url, query_params=query_params, headers=headers,
+            post_params=post_params, body=body, _preload_content=_preload_content,
+            _request_timeout=_request_timeout or self.default_timeout
+        )
+
+
+class PlaidClientRegistry:
+    """
+    Keeps one Plaid API client per environment and credentials for the whole process.
+
+    Building a PlaidApi creates a new urllib3 pool, so every call site that built its
+    own client paid for a fresh TCP connection and TLS handshake. Clients from the
+    registry share a connection pool of PLAID_POOL_SIZE keep-alive connections, retry
+    failed connection attempts and time out after PLAID_TIMEOUT seconds, and each is
+    rate limited and retries transient errors (see ratelimit). The registry also
+    holds a requests Session for code that calls the Plaid REST API directly.
+    """
+
+    def __init__(self):
+        self._clients: Dict[Tuple[str, str, str], plaid_api.PlaidApi] = {}
+        self._session: Optional[requests.Session] = None
+        self._lock = threading.Lock()
+
+    def get_client(self, environment: Optional[str] = None, client_id: Optional[str] = None,
+                   secret: Optional[str] = None) -> plaid_api.PlaidApi:
+        """
+        Get the shared Plaid API client
+
+        Args:
+            environment: Plaid environment (defaults to PLAID_ENVIRONMENT)
+            client_id: Plaid client ID (defaults to PLAID_CLIENT_ID)
+            secret: Plaid secret (defaults to PLAID_SECRET)
+
+        Returns:
+            A PlaidApi that is safe to share between threads
+        """
+        key = (
+            environment or settings.PLAID_ENVIRONMENT,
+            client_id or settings.PLAID_CLIENT_ID,
+            secret or settings.PLAID_SECRET
+        )
+
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._create_client(*key)
+                self._clients[key] = client
+            return client
+
+    def _create_client(self, environment: str, client_id: str, secret: str) -> plaid_api.PlaidApi:
+        """Build a Plaid API client with a tuned connection pool"""
+        configuration = Configuration(
+            host=plaid_host(environment),
+            api_key={
+                'clientId': client_id,
+                'secret': secret,
+            }
+        )
+        configuration.connection_pool_maxsize = getattr(settings, 'PLAID_POOL_SIZE', 10)
+        configuration.socket_options = KEEPALIVE_SOCKET_OPTIONS
+        # Retry connection failures only; a request that reached Plaid is never resent
+        configuration.retries = urllib3.Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2)
+
+        logger.info(f"Creating pooled Plaid client for the {environment} environment")
+        api_client = TimeoutApiClient(
+            configuration,
+            timeout=getattr(settings, 'PLAID_TIMEOUT', 30),
+            rate_limiter=create_plaid_rate_limiter(namespace=f"{environment}:{client_id}")
+        )
+        return plaid_api.PlaidApi(api_client)
+
+    def get_session(self) -> requests.Session:
+        """Get the shared requests Session for direct calls to the Plaid REST API"""
+        if self._session is not None:
+            return self._session
+
+        with self._lock:
+            if self._session is None:
+                pool_size = getattr(settings, 'PLAID_POOL_SIZE', 10)
+                adapter = HTTPAdapter(
+                    pool_connections=len(PLAID_ENVIRONMENTS),
+                    pool_maxsize=pool_size,
+                    max_retries=urllib3.Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2)
+                )
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.headers.update({'Content-Type': 'application/json'})
+                self._session = session
+            return self._session
+
+    def clear(self) -> None:
+        """Close and forget every pooled client and the session"""
+        with self._lock:
+            for client in self._clients.values():
+                client.api_client.rest_client.pool_manager.clear()
+            self._clients.clear()
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+# Shared by every Plaid call site in the process
+plaid_client_registry = PlaidClientRegistry()
+
+
+def get_plaid_client(environment: Optional[str] = None, client_id: Optional[str] = None,
+                     secret: Optional[str] = None) -> plaid_api.PlaidApi:
+    """Get the process-wide Plaid API client (see PlaidClientRegistry.get_client)"""
+    return plaid_client_registry.get_client(environment, client_id, secret)
+
+
+def get_plaid_session() -> requests.Session:
+    """Get the process-wide requests Session for the Plaid REST API"""
+    return plaid_client_registry.get_session()
+
+
+def plaid_timeout() -> float:
+    """Timeout in seconds for a request to the Plaid API"""
+    return getattr(settings, 'PLAID_TIMEOUT', 30)
+
+
+def raw_json_enabled() -> bool:
+    """Whether large Plaid responses should be parsed without the SDK models (PLAID_RAW_JSON)"""
+    return getattr(settings, 'PLAID_RAW_JSON', False)
+
+
+def parse_plaid_json(body) -> Any:
+    """Parse a Plaid response body (bytes or str), with orjson when it is installed"""
+    return _json_loads(body)
+
+
+def call_plaid_json(client: plaid_api.PlaidApi, operation: str, request) -> Dict[str, Any]:
+    """
+    Call a Plaid endpoint and parse its response body straight into dictionaries
+
+    The SDK normally builds a model object for every transaction, security and
+    holding, which is then converted back to a dict. Asking for the undecoded body
+    skips both steps. Dates stay ISO strings and every field Plaid returns is kept,
+    including ones this SDK version doesn't know about.
+
+    Args:
+        client: A Plaid API client
+        operation: Name of the PlaidApi method, e.g. 'transactions_get'
+        request: The request model for that method
+
+    Returns:
+        The response as plain dictionaries and lists
+
+    Raises:
+        plaid.ApiException: If Plaid returns an error, as with the SDK path
+    """
+    response = getattr(client, operation)(request, _preload_content=False)
+    try:
+        return parse_plaid_json(response.data)
+    finally:
+        response.release_conn()
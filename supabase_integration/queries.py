@@ -0,0 +1,161 @@
+"""
+Query objects for reading data from Supabase with server-side filtering and pagination.
+"""
+from typing import Dict, Any, List, Optional
+import base64
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Columns needed to compute transaction totals, much smaller than select('*')
+TRANSACTION_SUMMARY_COLUMNS = 'id, account_id, amount, category, date, merchant_name, name'
+
+
+class TransactionQuery:
+    """
+    Describes a filtered, keyset-paginated query on a user's transactions.
+
+    Every filter is pushed down into PostgREST, and the results are always
+    restricted to the given user. Pages are ordered by (date, id) descending, and
+    the cursor for the next page encodes the (date, id) of the last row returned,
+    so fetching page N never requires reading the N-1 pages before it.
+    """
+
+    MAX_PAGE_SIZE = 500
+
+    def __init__(self, user_id: str, start_date=None, end_date=None,
+                 account_ids: List[str] = None, exclude_account_ids: List[str] = None,
+                 category: str = None, search: str = None, sign: str = None,
+                 page_size: int = 50, cursor: str = None):
+        """
+        Args:
+            user_id: The user's ID in Supabase (required, every query is scoped to it)
+            start_date: Optional start date filter (YYYY-MM-DD string or date object)
+            end_date: Optional end date filter (YYYY-MM-DD string or date object)
+            account_ids: Only include transactions from these accounts
+            exclude_account_ids: Leave out transactions from these accounts
+            category: Case-insensitive substring match on the category
+            search: Case-insensitive substring match on merchant name, name or category
+            sign: 'income' for money in (negative amounts), 'expense' for money out
+            page_size: Number of transactions per page
+            cursor: Cursor returned with the previous page, or None for the first page
+        """
+        if not user_id:
+            raise ValueError("A user_id is required to query transactions")
+        if sign not in (None, '', 'income', 'expense'):
+            raise ValueError(f"Invalid sign filter: {sign}")
+
+        self.user_id = str(user_id)
+        self.start_date = start_date.isoformat() if hasattr(start_date, 'isoformat') else start_date
+        self.end_date = end_date.isoformat() if hasattr(end_date, 'isoformat') else end_date
+        self.account_ids = [str(a) for a in account_ids] if account_ids else []
+        self.exclude_account_ids = [str(a) for a in exclude_account_ids] if exclude_account_ids else []
+        self.category = category or None
+        self.search = search or None
+        self.sign = sign or None
+        self.page_size = max(1, min(int(page_size), self.MAX_PAGE_SIZE))
+        self.cursor = cursor or None
+
+    @staticmethod
+    def encode_cursor(row: Dict[str, Any]) -> str:
+        """Build the cursor pointing just after the given transaction row"""
+        raw = json.dumps([row.get('date'), row.get('id')])
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> Optional[List[str]]:
+        """Decode a cursor into its [date, id] pair, or None if it is invalid"""
+        try:
+            date, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+            if date and row_id:
+                return [str(date), str(row_id)]
+        except Exception:
+            logger.warning(f"Ignoring invalid transaction cursor: {cursor}")
+        return None
+
+    @staticmethod
+    def _quote(value: str) -> str:
+        """Quote a value for use inside a PostgREST logical filter"""
+        cleaned = str(value).replace('\\', '').replace('"', '')
+        return f'"{cleaned}"'
+
+    def _search_filters(self) -> List[str]:
+        """PostgREST conditions for the text search, any of which may match"""
+        pattern = self._quote(f"*{self.search}*")
+        return [f"{column}.ilike.{pattern}" for column in ('merchant_name', 'name', 'category')]
+
+    def _keyset_filters(self) -> List[str]:
+        """PostgREST conditions selecting rows after the cursor, any of which may match"""
+        position = self.decode_cursor(self.cursor) if self.cursor else None
+        if not position:
+            return []
+
+        date, row_id = position
+        return [
+            f"date.lt.{self._quote(date)}",
+            f"and(date.eq.{self._quote(date)},id.lt.{self._quote(row_id)})"
+        ]
+
+    def apply(self, query, paginate: bool = True):
+        """
+        Apply the filters, ordering and pagination to a PostgREST query builder
+
+        Args:
+            query: A query builder from client.table('transactions').select(...)
+            paginate: If False, only the filters are applied
+
+        Returns:
+            The query builder with everything applied
+        """
+        query = query.eq('user_id', self.user_id)
+
+        if self.start_date:
+            query = query.gte('date', self.start_date)
+        if self.end_date:
+            query = query.lte('date', self.end_date)
+
+        if self.account_ids:
+            query = query.in_('account_id', self.account_ids)
+        if self.exclude_account_ids:
+            query = query.not_.in_('account_id', self.exclude_account_ids)
+
+        if self.category:
+            query = query.ilike('category', f"%{self.category}%")
+
+        if self.sign == 'income':
+            query = query.lt('amount', 0)
+        elif self.sign == 'expense':
+            query = query.gt('amount', 0)
+
+        # Search and keyset conditions are both ORs, so they are combined into a
+        # single OR filter: (search) AND (keyset) == OR of (search AND keyset_i)
+        search_filters = self._search_filters() if self.search else []
+        keyset_filters = self._keyset_filters() if paginate else []
+
+        if search_filters and keyset_filters:
+            search_clause = f"or({','.join(search_filters)})"
+            query = query.or_(','.join(f"and({search_clause},{keyset})" for keyset in keyset_filters))
+        elif search_filters:
+            query = query.or_(','.join(search_filters))
+        elif keyset_filters:
+            query = query.or_(','.join(keyset_filters))
+
+        if paginate:
+            # Fetch one extra row to know whether there is another page
+            query = query.order('date', desc=True).order('id', desc=True).limit(self.page_size + 1)
+
+        return query
+
+    def rpc_params(self) -> Dict[str, Any]:
+        """The filters as parameters of the transaction summary functions (sql/transaction_summary_functions.sql)"""
+        return {
+            'p_user_id': self.user_id,
+            'p_start_date': self.start_date,
+            'p_end_date': self.end_date,
+            'p_account_ids': self.account_ids or None,
+            'p_exclude_account_ids': self.exclude_account_ids or None,
+            'p_category': self.category,
+            'p_search': self.search,
+            'p_sign': self.sign,
+        }
@@ -0,0 +1,347 @@
+"""
+Client-side rate limiting and retries for Plaid API calls.
+
+Plaid limits requests per endpoint for the whole client and per item, and answers
+RATE_LIMIT_EXCEEDED (HTTP 429) once a limit is hit. Every call made through the
+pooled client takes a token from two token buckets first, one for the endpoint and
+one for the endpoint and item, waiting for a token if the bucket is empty. Buckets
+live in small files locked with fcntl, so every process on the host (web workers,
+sync workers, the cron command) shares them; where fcntl isn't available they fall
+back to memory and only limit the current process.
+
+Calls that still fail with a rate limit or a server error are retried with
+jittered exponential backoff. A rate limit error also empties the buckets, so
+every process backs off instead of only the one that got the error.
+"""
+from typing import Any, Callable, Dict, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from django.conf import settings
+from plaid.exceptions import ApiException
+
+logger = logging.getLogger(__name__)
+
+# Requests per minute by endpoint: (whole client, per item). Based on Plaid's
+# production limits; PLAID_RATE_LIMITS overrides them.
+DEFAULT_RATE_LIMITS = {
+    '/accounts/get': (15000, 15),
+    '/transactions/get': (20000, 30),
+    '/transactions/sync': (2500, 50),
+    '/investments/holdings/get': (15000, 15),
+    '/item/get': (5000, 15),
+    '/item/public_token/exchange': (2500, None),
+    '/institutions/get_by_id': (400, None),
+    '/link/token/create': (5000, None),
+    '/webhook_verification_key/get': (5000, None),
+}
+
+# A bucket holds this fraction of a minute's requests, so a full bucket can't be spent in one burst
+BURST_FRACTION = 0.1
+
+# Resending these after a server error could repeat work Plaid already did
+NOT_RETRIED_ON_SERVER_ERROR = ('/item/public_token/exchange',)
+
+# Backoff between attempts: a random delay up to BASE_DELAY * 2**attempt, capped at MAX_DELAY
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+
+# Bucket files untouched for this long are full again and can be deleted
+STALE_BUCKET_SECONDS = 60 * 60
+
+
+class MemoryBucketStore:
+    """Token buckets kept in memory, limiting only this process"""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        """
+        Args:
+            clock: Function returning the current time in seconds
+        """
+        self.clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, capacity: float) -> float:
+        """
+        Take a token from a bucket
+
+        Args:
+            key: Identifies the bucket
+            rate: Tokens added per second
+            capacity: Most tokens the bucket holds
+
+        Returns:
+            0 if a token was taken, otherwise the seconds until one is available
+        """
+        with self._lock:
+            bucket, wait = _take(self._buckets.get(key), rate, capacity, self.clock())
+            self._buckets[key] = bucket
+            return wait
+
+    def drain(self, key: str) -> None:
+        """Empty a bucket, e.g. after Plaid reported a rate limit"""
+        with self._lock:
+            self._buckets[key] = (0.0, self.clock())
+
+
+class FileBucketStore:
+    """Token buckets kept in files under a directory, shared by every process on the host"""
+
+    def __init__(self, directory: str, clock: Callable[[], float] = time.time):
+        """
+        Args:
+            directory: Where the bucket files are kept
+            clock: Function returning the current time in seconds; every process sharing
+                   the directory must use the same clock
+        """
+        self.directory = directory
+        self.clock = clock
+        os.makedirs(directory, exist_ok=True)
+        self._takes = 0
+
+    def take(self, key: str, rate: float, capacity: float) -> float:
+        """Take a token from a bucket (see MemoryBucketStore.take)"""
+        with open(self._path(key), 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                bucket, wait = _take(_parse_bucket(f.read()), rate, capacity, self.clock())
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(bucket))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+        self._takes += 1
+        if self._takes % 1000 == 0:
+            self.prune()
+        return wait
+
+    def drain(self, key: str) -> None:
+        """Empty a bucket (see MemoryBucketStore.drain)"""
+        with open(self._path(key), 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps((0.0, self.clock())))
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def prune(self) -> None:
+        """Delete the files of buckets nobody has used for a while, e.g. of deleted items"""
+        cutoff = time.time() - STALE_BUCKET_SECONDS
+        try:
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+        except OSError as e:
+            logger.warning(f"Error pruning Plaid rate limit buckets: {str(e)}")
+
+    def _path(self, key: str) -> str:
+        """Bucket file for a key; keys are hashed so access tokens never reach the disk"""
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest()[:32])
+
+
+def _parse_bucket(data: str) -> Optional[Tuple[float, float]]:
+    """Read a bucket written by FileBucketStore, or None for a new or unreadable one"""
+    try:
+        tokens, updated_at = json.loads(data)
+        return float(tokens), float(updated_at)
+    except (ValueError, TypeError):
+        return None
+
+
+def _take(bucket: Optional[Tuple[float, float]], rate: float, capacity: float,
+          now: float) -> Tuple[Tuple[float, float], float]:
+    """
+    Refill a bucket for the time since it was last used and take a token
+
+    Args:
+        bucket: The stored (tokens, updated_at), or None for a new bucket
+        rate: Tokens added per second
+        capacity: Most tokens the bucket holds
+        now: The current time of the store's clock
+
+    Returns:
+        ((tokens, updated_at) to store, seconds to wait or 0 if a token was taken)
+    """
+    tokens, updated_at = bucket if bucket else (capacity, now)
+    tokens = min(capacity, tokens + max(0.0, now - updated_at) * rate)
+    if tokens >= 1:
+        return (tokens - 1, now), 0.0
+    return (tokens, now), (1 - tokens) / rate
+
+
+def parse_rate_limits(value: str) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+    """
+    Parse PLAID_RATE_LIMITS overrides given as 'endpoint:client:item' entries separated by commas
+
+    Either limit may be left empty for none, e.g. '/transactions/sync:1000:20,/item/get:100:'
+    """
+    limits = {}
+    for entry in (value or '').split(','):
+        if not entry.strip():
+            continue
+        endpoint, client_limit, item_limit = entry.strip().split(':')
+        limits[endpoint] = (int(client_limit) if client_limit else None, int(item_limit) if item_limit else None)
+    return limits
+
+
+def _error_type(error: ApiException) -> Optional[str]:
+    """The Plaid error_type of an ApiException, if its body has one"""
+    try:
+        return json.loads(error.body).get('error_type')
+    except Exception:
+        return None
+
+
+class PlaidRateLimiter:
+    """
+    Paces Plaid API calls and retries the ones that fail transiently.
+
+    Usage:
+        limiter = PlaidRateLimiter(store=FileBucketStore('/tmp/plaid-rate-limits'))
+        response = limiter.call('/transactions/sync', access_token, lambda: client.transactions_sync(request))
+    """
+
+    def __init__(self, store=None, limits: Optional[Dict[str, Tuple[Optional[int], Optional[int]]]] = None,
+                 max_retries: int = 3, namespace: str = '', sleep: Callable[[float], None] = time.sleep,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            store: Where the buckets are kept (defaults to memory)
+            limits: Requests per minute by endpoint, (client, item) (defaults to DEFAULT_RATE_LIMITS)
+            max_retries: Retries of a failed call before its error is raised
+            namespace: Prefix of every bucket key, e.g. the Plaid environment
+            sleep: Function used to wait
+            clock: Function returning the current time, for the default store; sleep
+                   must advance it
+        """
+        self.store = store or MemoryBucketStore(clock=clock)
+        self.limits = limits if limits is not None else DEFAULT_RATE_LIMITS
+        self.max_retries = max_retries
+        self.namespace = namespace
+        self.sleep = sleep
+
+    def acquire(self, endpoint: str, item_key: Optional[str] = None) -> float:
+        """
+        Wait until a call to an endpoint for an item is allowed
+
+        Args:
+            endpoint: Plaid endpoint path, e.g. '/transactions/sync'
+            item_key: Identifies the item, e.g. its access token
+
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        for key, per_minute in self._buckets(endpoint, item_key):
+            rate = per_minute / 60.0
+            capacity = max(1.0, per_minute * BURST_FRACTION)
+            while True:
+                try:
+                    wait = self.store.take(key, rate, capacity)
+                except Exception as e:
+                    # Never let the limiter's own storage stop a Plaid call
+                    logger.error(f"Error taking a Plaid rate limit token: {str(e)}")
+                    wait = 0.0
+                if not wait:
+                    break
+                self.sleep(wait)
+                waited += wait
+
+        if waited >= 5:
+            logger.info(f"Waited {waited:.1f}s for the rate limit of {endpoint}")
+        return waited
+
+    def call(self, endpoint: str, item_key: Optional[str], func: Callable[[], Any]) -> Any:
+        """
+        Make a Plaid call within the rate limits, retrying transient failures
+
+        Raises:
+            plaid.ApiException: The error of the last attempt, or at once for errors that aren't transient
+        """
+        attempt = 0
+        while True:
+            self.acquire(endpoint, item_key)
+            try:
+                return func()
+            except ApiException as e:
+                rate_limited = e.status == 429 or _error_type(e) == 'RATE_LIMIT_EXCEEDED'
+                server_error = (e.status or 0) >= 500 and endpoint not in NOT_RETRIED_ON_SERVER_ERROR
+                if attempt >= self.max_retries or not (rate_limited or server_error):
+                    raise
+
+                if rate_limited:
+                    # Make every process sharing the buckets back off, not just this one
+                    for key, _ in self._buckets(endpoint, item_key):
+                        try:
+                            self.store.drain(key)
+                        except Exception as drain_error:
+                            logger.error(f"Error draining a Plaid rate limit bucket: {str(drain_error)}")
+
+                delay = random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+                attempt += 1
+                logger.warning(
+                    f"Plaid {endpoint} failed with {'a rate limit' if rate_limited else f'HTTP {e.status}'}, "
+                    f"retry {attempt}/{self.max_retries} in {delay:.1f}s"
+                )
+                self.sleep(delay)
+
+    def _buckets(self, endpoint: str, item_key: Optional[str]):
+        """The (key, requests per minute) of the buckets a call takes tokens from, item first"""
+        client_limit, item_limit = self.limits.get(endpoint, (None, None))
+        buckets = []
+        if item_limit and item_key:
+            item_hash = hashlib.sha256(item_key.encode('utf-8')).hexdigest()[:16]
+            buckets.append((f"{self.namespace}{endpoint}:item:{item_hash}", item_limit))
+        if client_limit:
+            buckets.append((f"{self.namespace}{endpoint}:client", client_limit))
+        return buckets
+
+
+def create_plaid_rate_limiter(namespace: str = '') -> Optional[PlaidRateLimiter]:
+    """
+    Build the rate limiter for a Plaid client from the settings
+
+    Returns:
+        The limiter, or None if PLAID_RATE_LIMIT is off
+    """
+    if not getattr(settings, 'PLAID_RATE_LIMIT', True):
+        return None
+
+    limits = dict(DEFAULT_RATE_LIMITS)
+    try:
+        limits.update(parse_rate_limits(getattr(settings, 'PLAID_RATE_LIMITS', '')))
+    except ValueError as e:
+        logger.error(f"Ignoring invalid PLAID_RATE_LIMITS: {str(e)}")
+
+    store = None
+    if fcntl is not None:
+        directory = getattr(settings, 'PLAID_RATE_LIMIT_DIR', '') or os.path.join(tempfile.gettempdir(), 'plaid-rate-limits')
+        try:
+            store = FileBucketStore(directory)
+        except OSError as e:
+            logger.warning(f"Can't share Plaid rate limits through {directory}, limiting each process on its own: {str(e)}")
+    return PlaidRateLimiter(
+        store=store,
+        limits=limits,
+        max_retries=getattr(settings, 'PLAID_MAX_RETRIES', 3),
+        namespace=namespace
+    )
@@ -0,0 +1,274 @@
+"""
+Execution engine for scheduled refreshes of Plaid data.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# A checkpoint older than this belongs to an earlier run and is ignored
+CHECKPOINT_MAX_AGE = timedelta(hours=24)
+
+
+def shard_of(user_id: str, shard_count: int) -> int:
+    """Stable shard of a user, the same on every host"""
+    return int(hashlib.md5(str(user_id).encode('utf-8')).hexdigest(), 16) % shard_count
+
+
+def parse_shard(value: Optional[str]) -> Optional[Tuple[int, int]]:
+    """
+    Parse a shard given as 'i/n'
+
+    Returns:
+        (index, count) with 0 <= index < count, or None for no sharding
+
+    Raises:
+        ValueError: If the value isn't a valid shard
+    """
+    if not value:
+        return None
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{value}', expected i/n such as 0/4")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{value}', the index must be between 0 and {count - 1}")
+    return index, count
+
+
+class RefreshCheckpoint:
+    """
+    File recording which users a refresh run has already finished.
+
+    It is rewritten (atomically) after every user, so a run that is interrupted
+    resumes with the users it hadn't finished. A checkpoint is only reused by a run
+    with the same key (refresh type, shard and mode) within CHECKPOINT_MAX_AGE, and
+    is deleted when a run completes.
+    """
+
+    def __init__(self, path: str, key: str):
+        """
+        Args:
+            path: File to keep the checkpoint in
+            key: Identifies the kind of run the checkpoint belongs to
+        """
+        self.path = path
+        self.key = key
+        self.started_at = datetime.now(timezone.utc)
+        self.done = set()
+        self._lock = threading.Lock()
+
+    def load(self) -> int:
+        """
+        Pick up the progress of an interrupted run
+
+        Returns:
+            Number of users that run had finished
+        """
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable refresh checkpoint {self.path}: {str(e)}")
+            return 0
+
+        try:
+            started_at = datetime.fromisoformat(data['started_at'])
+            if data.get('key') != self.key or datetime.now(timezone.utc) - started_at > CHECKPOINT_MAX_AGE:
+                logger.info(f"Ignoring refresh checkpoint {self.path} from another run")
+                return 0
+            self.started_at = started_at
+            self.done = set(data.get('done', []))
+            return len(self.done)
+        except Exception as e:
+            logger.warning(f"Ignoring invalid refresh checkpoint {self.path}: {str(e)}")
+            return 0
+
+    def mark_done(self, user_id: str) -> None:
+        """Record that a user has been refreshed"""
+        with self._lock:
+            self.done.add(user_id)
+            self._write()
+
+    def clear(self) -> None:
+        """Delete the checkpoint once the run has finished"""
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def _write(self) -> None:
+        """Replace the checkpoint file, so it is never left half written"""
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({
+                    'key': self.key,
+                    'started_at': self.started_at.isoformat(),
+                    'done': sorted(self.done)
+                }, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error writing refresh checkpoint {self.path}: {str(e)}")
+
+
+class PlaidRefreshEngine:
+    """
+    Refreshes the Plaid data of many users with a pool of workers.
+
+    Items needing a refresh are grouped by user, since accounts and transactions are
+    synced for all of a user's items at once; a user with several stale items is
+    refreshed once. Users can be split over several hosts with a shard, and an
+    optional checkpoint lets an interrupted run skip the users it already finished.
+
+    Usage:
+        engine = PlaidRefreshEngine(plaid_service, workers=8, checkpoint=checkpoint)
+        plan = engine.plan(items, shard=(0, 2))
+        stats = engine.run(plan)
+    """
+
+    def __init__(self, plaid_service, workers: int = 4, full: bool = False,
+                 checkpoint: Optional[RefreshCheckpoint] = None,
+                 on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None):
+        """
+        Args:
+            plaid_service: The PlaidService to refresh with
+            workers: Number of users refreshed at the same time
+            full: Re-download the last 30 days of transactions instead of syncing incrementally
+            checkpoint: Where to record finished users, if the run should be resumable
+            on_result: Called with (user_id, result) as each user finishes
+        """
+        self.plaid_service = plaid_service
+        self.workers = max(1, workers)
+        self.full = full
+        self.checkpoint = checkpoint
+        self.on_result = on_result
+
+    def plan(self, items: Iterable[Dict[str, Any]], shard: Optional[Tuple[int, int]] = None) -> Dict[str, Any]:
+        """
+        Work out which users to refresh
+
+        Args:
+            items: plaid_items rows needing a refresh
+            shard: (index, count) to only take this host's share of the users
+
+        Returns:
+            dict: 'users' mapping each user ID to refresh to its item count, the
+                  number of 'items' they cover, and the users 'skipped' because the
+                  checkpoint has them as done
+        """
+        items_by_user = {}
+        for item in items:
+            user_id = item.get('user_id')
+            if not user_id:
+                continue
+            if shard and shard_of(user_id, shard[1]) != shard[0]:
+                continue
+            items_by_user[str(user_id)] = items_by_user.get(str(user_id), 0) + 1
+
+        done = self.checkpoint.done if self.checkpoint else set()
+        users = {user_id: count for user_id, count in items_by_user.items() if user_id not in done}
+        return {
+            'users': users,
+            'items': sum(users.values()),
+            'skipped': len(items_by_user) - len(users)
+        }
+
+    def run(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Refresh every user in a plan
+
+        Returns:
+            dict: Counts of users, items and synced rows, and the elapsed seconds
+        """
+        stats = {
+            'users': 0, 'items': 0, 'failed_users': 0, 'skipped_users': plan.get('skipped', 0),
+            'accounts': 0, 'added': 0, 'modified': 0, 'removed': 0, 'transactions': 0,
+            'elapsed': 0.0
+        }
+        started = time.perf_counter()
+
+        users = plan['users']
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='plaid-refresh') as executor:
+            futures = {
+                executor.submit(self._refresh_user_in_worker, user_id, item_count): (user_id, item_count)
+                for user_id, item_count in users.items()
+            }
+            for future in as_completed(futures):
+                user_id, item_count = futures[future]
+                result = future.result()
+
+                if result['ok']:
+                    stats['users'] += 1
+                    stats['items'] += item_count
+                    if self.checkpoint:
+                        self.checkpoint.mark_done(user_id)
+                else:
+                    stats['failed_users'] += 1
+                for key in ('accounts', 'added', 'modified', 'removed', 'transactions'):
+                    stats[key] += result.get(key, 0)
+
+                if self.on_result:
+                    self.on_result(user_id, result)
+
+        stats['elapsed'] = time.perf_counter() - started
+        return stats
+
+    def _refresh_user_in_worker(self, user_id: str, item_count: int) -> Dict[str, Any]:
+        """refresh_user on a pool thread, which reuses its database connection (leases, snapshots) across users"""
+        from django.db import close_old_connections
+
+        close_old_connections()
+        try:
+            return self.refresh_user(user_id, item_count)
+        finally:
+            close_old_connections()
+
+    def refresh_user(self, user_id: str, item_count: int = 1) -> Dict[str, Any]:
+        """
+        Soft refresh the accounts and transactions of one user
+
+        Args:
+            user_id: The Supabase user ID
+            item_count: Number of the user's items that needed a refresh
+
+        Returns:
+            dict: 'ok' if every item synced, the counts of synced rows, and the 'error' if one was raised
+        """
+        from .middleware import SupabaseUser
+        
+        result = {'ok': False, 'accounts': 0, 'added': 0, 'modified': 0, 'removed': 0, 'transactions': 0, 'error': None}
+        user = SupabaseUser({'id': user_id})
+        try:
+            accounts = self.plaid_service.refresh_accounts(user)
+            result['accounts'] = len(accounts)
+
+            if self.full:
+                # Update transactions for the last 30 days
+                end_date = datetime.now().date()
+                start_date = end_date - timedelta(days=30)
+                result['transactions'] = self.plaid_service.refresh_transactions(user, start_date, end_date)
+                result['ok'] = bool(accounts)
+            else:
+                # Only fetch what changed since the last sync
+                changes = self.plaid_service.sync_transactions_incremental(user)
+                for key in ('added', 'modified', 'removed'):
+                    result[key] = changes.get(key, 0)
+                # Items another sync held aren't done yet, so the user is retried
+                result['ok'] = changes.get('items_synced', 0) >= item_count and not changes.get('items_busy')
+                if changes.get('items_busy'):
+                    result['error'] = f"{changes['items_busy']} item(s) were being synced by another process"
+        except Exception as e:
+            logger.error(f"Error refreshing Plaid data for user {user_id}: {str(e)}")
+            result['error'] = str(e)
+        return result
@@ -0,0 +1,171 @@
+"""
+Monthly rollups of transactions, kept up to date as transactions are written.
+
+The monthly_rollups table holds one row per user, month, category, transfer flag and
+account class with the income, spending and number of transactions in it. The
+transaction writes in PlaidAdapter turn every insert, update and delete into deltas
+(the new row counted in, the old row counted out) and apply them with the
+apply_monthly_rollup_deltas database function, which adds them atomically. Pages
+that only need monthly totals read a few dozen rollup rows instead of every
+transaction. The backfill_monthly_rollups command rebuilds the table from the
+transactions.
+
+Run sql/monthly_rollups.sql and set MONTHLY_ROLLUPS before relying on them.
+"""
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from django.conf import settings
+
+from .utils import classify_account
+
+logger = logging.getLogger(__name__)
+
+# Rollups of these accounts are left out of the budgeting figures
+INVESTMENT_CLASS = 'investment'
+
+# Category used for transactions without one
+UNCATEGORIZED = 'Uncategorized'
+
+
+def monthly_rollups_enabled() -> bool:
+    """Whether transaction writes maintain monthly_rollups and pages read from it (MONTHLY_ROLLUPS)"""
+    return getattr(settings, 'MONTHLY_ROLLUPS', False)
+
+
+def clean_category(category: Optional[str]) -> str:
+    """The category a transaction is rolled up under"""
+    if not category or str(category).lower() in ('null', 'none'):
+        return UNCATEGORIZED
+    return str(category)
+
+
+def is_transfer(transaction: Dict[str, Any]) -> bool:
+    """Whether a transaction moves money between the user's own accounts or to friends"""
+    names = f"{transaction.get('merchant_name') or ''} {transaction.get('name') or ''}".lower()
+    return 'transfer' in clean_category(transaction.get('category')).lower() or 'venmo' in names or 'zelle' in names
+
+
+def account_class(account: Dict[str, Any]) -> str:
+    """
+    Class of an account for the rollups
+
+    Returns:
+        'investment' for the accounts the budgeting pages leave out, otherwise
+        'depository', 'credit', 'loan' or 'other'
+    """
+    if account.get('is_investment') or account.get('is_investment_account') or account.get('type') == 'investment':
+        return INVESTMENT_CLASS
+    category = account.get('account_category') or classify_account(account)
+    return category if category in ('depository', 'credit', 'loan') else 'other'
+
+
+def month_start(value) -> date:
+    """First day of the month of a date or YYYY-MM-DD string"""
+    if isinstance(value, date):
+        return value.replace(day=1)
+    return date(int(str(value)[:4]), int(str(value)[5:7]), 1)
+
+
+class RollupDelta:
+    """
+    Changes to the monthly rollups from a batch of transaction writes.
+
+    Usage:
+        delta = RollupDelta(account_classes)
+        delta.add(new_row)
+        delta.remove(old_row)
+        adapter.apply_rollup_deltas(delta.rows())
+    """
+
+    def __init__(self, account_classes: Dict[str, str], user_id: Optional[str] = None):
+        """
+        Args:
+            account_classes: account_class() by account ID
+            user_id: User of every transaction, for rows without a user_id
+        """
+        self.account_classes = account_classes
+        self.user_id = user_id
+        self._totals = {}
+
+    def add(self, transaction: Dict[str, Any], sign: int = 1) -> None:
+        """Count a stored transaction in"""
+        key = self._key(transaction)
+        if key is None:
+            return
+        amount = float(transaction.get('amount') or 0)
+        income, spending, count = self._totals.get(key, (0.0, 0.0, 0))
+        # Negative amounts are deposits in Plaid format
+        self._totals[key] = (
+            income + sign * (-amount if amount < 0 else 0.0),
+            spending + sign * (amount if amount > 0 else 0.0),
+            count + sign
+        )
+
+    def remove(self, transaction: Dict[str, Any]) -> None:
+        """Count a transaction that was changed or deleted out"""
+        self.add(transaction, sign=-1)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Rows for apply_monthly_rollup_deltas, without the keys that didn't change"""
+        rows = []
+        for (user_id, month, category, transfer, cls), (income, spending, count) in self._totals.items():
+            income, spending = round(income, 2), round(spending, 2)
+            if not (income or spending or count):
+                continue
+            rows.append({
+                'user_id': user_id,
+                'month': month,
+                'category': category,
+                'is_transfer': transfer,
+                'account_class': cls,
+                'income': income,
+                'spending': spending,
+                'transaction_count': count,
+            })
+        return rows
+
+    def _key(self, transaction: Dict[str, Any]) -> Optional[Tuple]:
+        """Rollup key of a transaction, or None if it can't be rolled up"""
+        user_id = transaction.get('user_id') or self.user_id
+        if not user_id or not transaction.get('date'):
+            return None
+        return (
+            str(user_id),
+            month_start(transaction['date']).isoformat(),
+            clean_category(transaction.get('category')),
+            is_transfer(transaction),
+            self.account_classes.get(transaction.get('account_id'), 'other'),
+        )
+
+
+def summarize_rollups(rollups: Iterable[Dict[str, Any]], exclude_classes: Iterable[str] = (INVESTMENT_CLASS,)) -> Dict[date, Dict[str, Any]]:
+    """
+    Monthly totals from rollup rows
+
+    Args:
+        rollups: Rows of monthly_rollups
+        exclude_classes: Account classes to leave out
+
+    Returns:
+        dict: By first day of the month, the 'income', 'spending' (transfers included),
+              'transfers', 'count' and 'spending_by_category' (transfers under 'Transfer')
+    """
+    months = {}
+    for row in rollups:
+        if row.get('account_class') in exclude_classes:
+            continue
+        month = months.setdefault(month_start(row['month']), {
+            'income': 0.0, 'spending': 0.0, 'transfers': 0.0, 'count': 0, 'spending_by_category': {}
+        })
+        spending = float(row.get('spending') or 0)
+        month['income'] += float(row.get('income') or 0)
+        month['spending'] += spending
+        month['count'] += int(row.get('transaction_count') or 0)
+        if spending:
+            category = 'Transfer' if row.get('is_transfer') else row.get('category') or UNCATEGORIZED
+            month['spending_by_category'][category] = month['spending_by_category'].get(category, 0) + spending
+            if row.get('is_transfer'):
+                month['transfers'] += spending
+    return months
@@ -0,0 +1,203 @@
+"""
+Choosing which Plaid items each scheduled refresh spends its Plaid quota on.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional
+import logging
+import threading
+
+from django.conf import settings
+
+from .models import UserActivity
+
+logger = logging.getLogger(__name__)
+
+# Items whose connection needs the user to relink in Plaid Link; syncing them only wastes quota
+NEEDS_USER_STATUSES = ('login_required', 'revoked')
+
+# Items in a (possibly transient) error state are tried, but after healthy items
+ERROR_PENALTY = 0.5
+
+# An item that has never synced counts as this stale
+NEVER_SYNCED_AGE = timedelta(days=30)
+
+# The weight of a user's items halves for every ACTIVITY_HALF_LIFE since their last
+# dashboard visit, down to MIN_ACTIVITY_WEIGHT, so inactive users still get refreshed
+# once their data is stale enough
+ACTIVITY_HALF_LIFE = timedelta(days=7)
+MIN_ACTIVITY_WEIGHT = 0.05
+
+# A user's visits are recorded at most this often per process
+VISIT_RESOLUTION = timedelta(minutes=15)
+
+_recent_visits = {}
+_visits_lock = threading.Lock()
+
+
+def record_dashboard_visit(user_id: str) -> None:
+    """Note that a user opened their dashboard (called by the dashboard views)"""
+    if not user_id:
+        return
+    now = datetime.now(timezone.utc)
+    with _visits_lock:
+        last = _recent_visits.get(str(user_id))
+        if last and now - last < VISIT_RESOLUTION:
+            return
+        _recent_visits[str(user_id)] = now
+    try:
+        UserActivity.objects.update_or_create(user_id=str(user_id), defaults={'last_dashboard_visit': now})
+    except Exception as e:
+        logger.error(f"Error recording dashboard visit of user {user_id}: {str(e)}")
+
+
+def get_last_dashboard_visits(user_ids: Iterable[str]) -> Dict[str, datetime]:
+    """
+    Get when each user last opened their dashboard
+
+    Returns:
+        dict: Last visit by user ID, without the users never seen
+    """
+    try:
+        user_ids = list({str(user_id) for user_id in user_ids})
+        visits = {}
+        for start in range(0, len(user_ids), 500):
+            rows = UserActivity.objects.filter(user_id__in=user_ids[start:start + 500]).values_list('user_id', 'last_dashboard_visit')
+            visits.update(rows)
+        return visits
+    except Exception as e:
+        logger.error(f"Error getting dashboard visits: {str(e)}")
+        return {}
+
+
+def _parse_time(value) -> Optional[datetime]:
+    """Parse a Supabase timestamp, returning None if it is missing or invalid"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class RefreshScheduler:
+    """
+    Ranks Plaid items for the scheduled soft refresh and picks a batch that fits a budget.
+
+    Each item is scored on:
+        - staleness: time since its last successful update, relative to how often
+          its institution publishes new data; items refreshed more recently than
+          that aren't due yet
+        - activity: how recently its user opened the dashboard
+        - errors: items needing the user to relink are left out, and items in an
+          error state rank lower
+
+    A refresh syncs all of a user's items at once, so users are taken in order of
+    their best-scoring item, and each costs the budget their number of items.
+
+    Usage:
+        scheduler = RefreshScheduler(budget=500)
+        batch = scheduler.select(items, get_last_dashboard_visits(user_ids))
+        engine.plan(batch['items'])
+    """
+
+    def __init__(self, budget: Optional[int] = None, default_cadence_hours: Optional[float] = None,
+                 cadence_hours: Optional[Dict[str, float]] = None, now: Optional[datetime] = None):
+        """
+        Args:
+            budget: Most items synced per run (0 or None for no limit)
+            default_cadence_hours: Hours between updates of institutions not in cadence_hours
+            cadence_hours: Hours between updates by institution ID
+            now: Time to score against (defaults to the current time)
+        """
+        self.budget = budget if budget is not None else getattr(settings, 'PLAID_REFRESH_BUDGET', 0)
+        self.default_cadence = timedelta(hours=default_cadence_hours if default_cadence_hours is not None
+                                         else getattr(settings, 'PLAID_REFRESH_CADENCE_HOURS', 24))
+        cadence_hours = cadence_hours if cadence_hours is not None else getattr(settings, 'PLAID_INSTITUTION_CADENCE_HOURS', {})
+        self.cadence = {institution_id: timedelta(hours=hours) for institution_id, hours in cadence_hours.items()}
+        self.now = now or datetime.now(timezone.utc)
+
+    def score(self, item: Dict[str, Any], last_visit: Optional[datetime] = None) -> Optional[float]:
+        """
+        Score an item; higher scores are refreshed first
+
+        Returns:
+            The score, or None if the item shouldn't be refreshed this run
+        """
+        if item.get('connection_status') in NEEDS_USER_STATUSES:
+            return None
+
+        cadence = self.cadence.get(item.get('institution_id'), self.default_cadence)
+        last_update = _parse_time(item.get('last_successful_update'))
+        age = self.now - last_update if last_update else max(NEVER_SYNCED_AGE, cadence)
+        if age < cadence:
+            # The institution is unlikely to have anything new yet
+            return None
+        staleness = age / cadence
+
+        last_visit = _parse_time(last_visit)
+        if last_visit:
+            weight = max(MIN_ACTIVITY_WEIGHT, 0.5 ** ((self.now - last_visit) / ACTIVITY_HALF_LIFE))
+        else:
+            weight = MIN_ACTIVITY_WEIGHT
+
+        if item.get('connection_status') == 'error' or item.get('update_type') == 'error':
+            weight *= ERROR_PENALTY
+
+        return staleness * weight
+
+    def select(self, items: Iterable[Dict[str, Any]], last_visits: Dict[str, datetime]) -> Dict[str, Any]:
+        """
+        Pick this run's batch
+
+        Args:
+            items: Every Plaid item that could be refreshed
+            last_visits: Last dashboard visit by user ID
+
+        Returns:
+            dict: The due 'items' of the chosen users, best first, with counts of the
+                  'users' chosen, the items 'due', the items 'deferred' to a later
+                  run by the budget, those that 'need_relink', and those 'not_due'
+        """
+        items_by_user = {}
+        for item in items:
+            if item.get('user_id'):
+                items_by_user.setdefault(str(item['user_id']), []).append(item)
+
+        ranked = []
+        need_relink = not_due = 0
+        for user_id, user_items in items_by_user.items():
+            scored = []
+            for item in user_items:
+                score = self.score(item, last_visits.get(user_id))
+                if score is not None:
+                    scored.append((score, item))
+                elif item.get('connection_status') in NEEDS_USER_STATUSES:
+                    need_relink += 1
+                else:
+                    not_due += 1
+            if scored:
+                scored.sort(key=lambda pair: pair[0], reverse=True)
+                ranked.append((scored[0][0], user_id, len(user_items), [item for _, item in scored]))
+        ranked.sort(key=lambda user: user[0], reverse=True)
+
+        batch, users, spent, deferred = [], 0, 0, 0
+        for _, user_id, cost, due_items in ranked:
+            if self.budget and spent + cost > self.budget:
+                deferred += len(due_items)
+                continue
+            batch.extend(due_items)
+            users += 1
+            spent += cost
+
+        return {
+            'items': batch,
+            'users': users,
+            'due': sum(len(user[3]) for user in ranked),
+            'deferred': deferred,
+            'need_relink': need_relink,
+            'not_due': not_due,
+        }
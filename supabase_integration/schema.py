@@ -0,0 +1,160 @@
+"""
+Process-wide registry of the Supabase table columns we write to.
+"""
+from typing import Dict, Any, List, Optional, FrozenSet
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Tables whose columns are tracked by the registry
+REGISTERED_TABLES = ['transactions', 'accounts', 'securities', 'account_holdings', 'plaid_items', 'profiles']
+
+# Columns we know exist, used when the schema can't be read from Supabase.
+# Tables without an entry are written without filtering in that case.
+FALLBACK_COLUMNS = {
+    'transactions': [
+        'id', 'account_id', 'transaction_id', 'amount', 'date', 'name',
+        'merchant_name', 'category', 'pending', 'reference_number', 'payee',
+        'user_id', 'location', 'payment_channel', 'payment_method', 'payer',
+        'category_id', 'subcategory', 'authorized_date', 'iso_currency_code',
+        'unofficial_currency_code', 'website', 'account_name', 'account_owner',
+        'description'
+    ],
+}
+
+# Error fragments PostgREST/Postgres return when a column we sent doesn't exist
+SCHEMA_ERROR_MARKERS = ['PGRST204', '42703', 'schema cache']
+
+
+class SchemaRegistry:
+    """
+    Caches the column set of each registered table for the whole process.
+
+    The columns for every table are loaded with a single request to PostgREST's
+    OpenAPI description the first time they are needed, and reloaded when the TTL
+    expires or when a write fails with a schema error. Each table's columns are kept
+    as a frozenset, so cleaning a row is a set lookup per field with no round trip.
+    """
+
+    def __init__(self, ttl: Optional[int] = None):
+        """
+        Args:
+            ttl: Seconds before the cached columns are reloaded (defaults to SUPABASE_SCHEMA_TTL)
+        """
+        self.ttl = ttl if ttl is not None else getattr(settings, 'SUPABASE_SCHEMA_TTL', 3600)
+        self._columns: Dict[str, Optional[FrozenSet[str]]] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get_columns(self, table: str, client=None) -> Optional[FrozenSet[str]]:
+        """
+        Get the columns of a table
+
+        Args:
+            table: The table name
+            client: Supabase client to load the schema with if it isn't cached
+
+        Returns:
+            A frozenset of column names, or None if they are unknown
+        """
+        loaded_at = self._loaded_at.get(table)
+        if loaded_at is not None and time.monotonic() - loaded_at < self.ttl:
+            return self._columns.get(table)
+
+        with self._lock:
+            # Another thread may have loaded it while we waited
+            loaded_at = self._loaded_at.get(table)
+            if loaded_at is not None and time.monotonic() - loaded_at < self.ttl:
+                return self._columns.get(table)
+
+            if client is None:
+                from .client import get_supabase_client
+                client = get_supabase_client()
+
+            self._load(client, table)
+            return self._columns.get(table)
+
+    def _load(self, client, table: str) -> None:
+        """Load the columns of every registered table, falling back per table"""
+        definitions = self._load_openapi_definitions(client)
+        now = time.monotonic()
+
+        for name in set(REGISTERED_TABLES) | {table}:
+            columns = None
+
+            if definitions:
+                columns = list((definitions.get(name, {}).get('properties') or {}).keys())
+            elif name == table:
+                columns = self._load_from_sample_row(client, name)
+            else:
+                # Leave other tables to be loaded when they are first needed
+                continue
+
+            if not columns and name in FALLBACK_COLUMNS:
+                logger.warning(f"Could not determine columns for {name}, using safe defaults")
+                columns = FALLBACK_COLUMNS[name]
+
+            self._columns[name] = frozenset(columns) if columns else None
+            self._loaded_at[name] = now
+
+        logger.info(f"Loaded schema columns for {len(self._columns)} tables")
+
+    def _load_openapi_definitions(self, client) -> Optional[Dict[str, Any]]:
+        """Read the table definitions from PostgREST's OpenAPI description"""
+        try:
+            postgrest = client.postgrest
+            response = postgrest.session.get(
+                str(postgrest.base_url),
+                headers={'Accept': 'application/openapi+json'}
+            )
+            response.raise_for_status()
+            return response.json().get('definitions') or None
+        except Exception as e:
+            logger.warning(f"Could not load schema from PostgREST: {str(e)}")
+            return None
+
+    def _load_from_sample_row(self, client, table: str) -> Optional[List[str]]:
+        """Read the columns of a table from one of its rows"""
+        try:
+            response = client.table(table).select('*').limit(1).execute()
+            if response.data:
+                return list(response.data[0].keys())
+        except Exception as e:
+            logger.warning(f"Could not get schema columns for {table}: {str(e)}")
+        return None
+
+    def invalidate(self, table: Optional[str] = None) -> None:
+        """Forget the cached columns of a table, or of every table"""
+        with self._lock:
+            if table is None:
+                self._columns.clear()
+                self._loaded_at.clear()
+            else:
+                self._columns.pop(table, None)
+                self._loaded_at.pop(table, None)
+
+    def report_error(self, table: str, error: Exception) -> bool:
+        """
+        Reload a table's columns on the next use if a write failed with a schema error
+
+        Args:
+            table: The table the write failed on
+            error: The exception raised by the write
+
+        Returns:
+            True if the error looked like a schema error and the cache was invalidated
+        """
+        message = str(error)
+        if any(marker in message for marker in SCHEMA_ERROR_MARKERS):
+            logger.warning(f"Schema error writing to {table}, reloading its columns: {message}")
+            self.invalidate(table)
+            return True
+        return False
+
+
+# Shared by every adapter in the process
+schema_registry = SchemaRegistry()
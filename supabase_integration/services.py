@@ -2,12 +2,14 @@ from django.conf import settings
 from .client import SupabaseClient, get_supabase_client
 from typing import Dict, Any, Optional, List
 import logging
-import uuid
 import random
 import string
 from .adapter import SupabaseAdapter, UserAdapter, FinancialAdapter
+from .background import run_in_background
+from .ingest import TransactionWriteQueue
+from .normalize import TransactionNormalizer
+from .plaid_client import get_plaid_client, call_plaid_json, raw_json_enabled
 import plaid
-from plaid.api import plaid_api
 from plaid.model.link_token_create_request import LinkTokenCreateRequest
 from plaid.model.link_token_create_request_user import LinkTokenCreateRequestUser
 from plaid.model.country_code import CountryCode
@@ -16,8 +18,7 @@ from plaid.model.item_public_token_exchange_request import ItemPublicTokenExchan
 from plaid.model.accounts_get_request import AccountsGetRequest
 from plaid.model.transactions_get_request import TransactionsGetRequest
 from plaid.model.transactions_get_request_options import TransactionsGetRequestOptions
-from plaid.configuration import Configuration
-from plaid.api_client import ApiClient
+from plaid.model.transactions_sync_request import TransactionsSyncRequest
 from datetime import datetime, timedelta, timezone
 from .utils import classify_account, enhanced_account_data, is_investment_account, is_retirement_account, is_credit_account, is_loan_account
 import json
@@ -25,6 +26,7 @@ import os
 from django.contrib.auth import get_user_model
 from supabase import create_client, Client
 import time
+from concurrent.futures import ThreadPoolExecutor
 from plaid.model.investments_holdings_get_request import InvestmentsHoldingsGetRequest
 from plaid.exceptions import ApiException as PlaidError
 from plaid.model.item_get_request import ItemGetRequest
@@ -32,6 +34,19 @@ from plaid.model.institutions_get_by_id_request import InstitutionsGetByIdReques
 
 logger = logging.getLogger(__name__)
 
+# connection_status recorded for ITEM webhooks other than ERROR
+ITEM_WEBHOOK_STATUSES = {
+    'PENDING_EXPIRATION': 'pending_expiration',
+    'USER_PERMISSION_REVOKED': 'revoked',
+    'LOGIN_REPAIRED': 'active',
+}
+
+# sync_status values of a background sync that hasn't finished yet
+SYNC_IN_PROGRESS_STATUSES = ('queued', 'accounts', 'holdings', 'transactions')
+
+# A sync whose status hasn't changed for this long is no longer running
+SYNC_STALE_AFTER = timedelta(minutes=30)
+
 class PlaidService:
     """
     Service class to handle Plaid API interactions, using Supabase as the data store.
@@ -72,15 +87,8 @@ class PlaidService:
             plaid_secret = settings.PLAID_SECRET
             plaid_env = settings.PLAID_ENVIRONMENT
             
-            configuration = plaid.Configuration(
-                host=plaid.Environment.Sandbox,  # Using sandbox for development
-                api_key={
-                    'clientId': plaid_client_id,
-                    'secret': plaid_secret,
-                }
-            )
-            api_client = plaid.ApiClient(configuration)
-            client = plaid_api.PlaidApi(api_client)
+            # Using sandbox for development
+            client = get_plaid_client('sandbox', plaid_client_id, plaid_secret)
             
             # Create a Link token request
             request_args = {
@@ -100,6 +108,10 @@ class PlaidService:
             # Add redirect URI if defined
             if hasattr(settings, 'PLAID_REDIRECT_URI') and settings.PLAID_REDIRECT_URI:
                 request_args['redirect_uri'] = settings.PLAID_REDIRECT_URI
+            
+            # Have Plaid notify our webhook endpoint when the item's data changes
+            if getattr(settings, 'PLAID_WEBHOOK_URL', None):
+                request_args['webhook'] = settings.PLAID_WEBHOOK_URL
                 
             # Handle reconnection flow
             if update_mode == 'reconnect' and item_id:
@@ -150,17 +162,8 @@ class PlaidService:
         try:
             logger.info(f"Exchanging public token for user {user.id}, is_reconnect={is_reconnect}")
             
-            # Create a real Plaid configuration
-            configuration = Configuration(
-                host=f"https://{self.plaid_environment}.plaid.com",
-                api_key={
-                    'clientId': self.client_id,
-                    'secret': self.secret,
-                }
-            )
-            
-            api_client = ApiClient(configuration)
-            client = plaid_api.PlaidApi(api_client)
+            # Get the shared Plaid API client
+            client = get_plaid_client(self.plaid_environment, self.client_id, self.secret)
             
             # Exchange the public token
             exchange_request = ItemPublicTokenExchangeRequest(
@@ -244,27 +247,8 @@ class PlaidService:
                         
                         logger.info(f"Updated existing Plaid item during hard refresh: {existing_item_id}")
                         
-                        # After storing the item, sync accounts
-                        accounts, investment_accounts = self.sync_accounts(user, is_reconnect=True, existing_item_id=existing_item_id)
-                        
-                        # Now sync investment holdings if there are investment accounts
-                        if investment_accounts:
-                            logger.info(f"Found {len(investment_accounts)} investment accounts to sync after reconnect")
-                            self.sync_all_investment_holdings(
-                                user_id=str(user.id),
-                                plaid_item_id=existing_item_id,
-                                investment_accounts=investment_accounts
-                            )
-                        
-                        # Sync transactions for the last 90 days
-                        end_date = datetime.now().date()
-                        start_date = end_date - timedelta(days=90)
-                        start_date_str = start_date.isoformat()
-                        end_date_str = end_date.isoformat()
-
-                        logger.info(f"Syncing initial transactions from {start_date_str} to {end_date_str}")
-                        transactions = self.sync_transactions(user, start_date_str, end_date_str)
-                        logger.info(f"Synced {len(transactions)} initial transactions after reconnect")
+                        # Sync the item's data in the background so the request returns immediately
+                        self.start_initial_sync(user, existing_item_id, item_id, is_reconnect=True)
                         
                         return True
                     else:
@@ -330,27 +314,8 @@ class PlaidService:
                     
                     if plaid_item_id:
                         logger.info(f"Successfully stored new Plaid item: {plaid_item_id}")
-                        # After storing the item, sync accounts
-                        accounts, investment_accounts = self.sync_accounts(user)
-                        
-                        # Now sync investment holdings if there are investment accounts
-                        if investment_accounts:
-                            logger.info(f"Found {len(investment_accounts)} investment accounts to sync for new connection")
-                            self.sync_all_investment_holdings(
-                                user_id=str(user.id),
-                                plaid_item_id=plaid_item_id,
-                                investment_accounts=investment_accounts
-                            )
-
-                        # Sync transactions for the last 90 days
-                        end_date = datetime.now().date()
-                        start_date = end_date - timedelta(days=90)
-                        start_date_str = start_date.isoformat()
-                        end_date_str = end_date.isoformat()
-
-                        logger.info(f"Syncing initial transactions from {start_date_str} to {end_date_str} for new connection")
-                        transactions = self.sync_transactions(user, start_date_str, end_date_str)
-                        logger.info(f"Synced {len(transactions)} initial transactions for new connection")
+                        # Sync the item's data in the background so the request returns immediately
+                        self.start_initial_sync(user, plaid_item_id, item_id)
                         
                         return True
                     else:
@@ -367,6 +332,142 @@ class PlaidService:
             logger.error(f"Error exchanging public token: {str(e)}", exc_info=True)
             raise
     
+    def start_initial_sync(self, user, plaid_item_id, item_id, is_reconnect=False):
+        """
+        Queue the initial sync of a newly linked (or relinked) Plaid item
+        
+        The sync is handed to the job queue when PLAID_JOB_QUEUE is on, and otherwise
+        runs on the background executor unless PLAID_BACKGROUND_SYNC is off, in which
+        case it runs before this method returns. Its progress can be followed with
+        get_sync_status.
+        
+        Args:
+            user: The user object
+            plaid_item_id: Our ID of the Plaid item
+            item_id: Plaid's item_id
+            is_reconnect: Whether the item was relinked during a hard refresh
+        """
+        from .jobs import PRIORITY_INTERACTIVE, enqueue_job, job_queue_enabled
+        
+        self.adapter.update_sync_status(item_id, 'queued')
+        
+        if job_queue_enabled():
+            job = enqueue_job(
+                'initial_sync',
+                {'user_id': str(user.id), 'plaid_item_id': plaid_item_id, 'item_id': item_id, 'is_reconnect': is_reconnect},
+                priority=PRIORITY_INTERACTIVE,
+                dedup_key=f"initial_sync:{item_id}"
+            )
+            if job:
+                return
+            logger.warning(f"Could not queue the initial sync of Plaid item {item_id}, running it in this process")
+        
+        if not getattr(settings, 'PLAID_BACKGROUND_SYNC', True):
+            self.run_initial_sync(user, plaid_item_id, item_id, is_reconnect)
+            return
+        
+        logger.info(f"Queued initial sync of Plaid item {item_id} for user {user.id}")
+        run_in_background(self.run_initial_sync, user, plaid_item_id, item_id, is_reconnect)
+    
+    def run_initial_sync(self, user, plaid_item_id, item_id, is_reconnect=False):
+        """
+        Sync the accounts, investment holdings and last 90 days of transactions of a linked item
+        
+        plaid_items.sync_status is updated as each stage starts, and is 'complete' or
+        'failed' (with sync_error) at the end.
+        
+        Args:
+            user: The user object
+            plaid_item_id: Our ID of the Plaid item
+            item_id: Plaid's item_id
+            is_reconnect: Whether the item was relinked during a hard refresh
+            
+        Returns:
+            dict: The number of 'accounts' and 'transactions' synced, or None if the sync failed
+        """
+        try:
+            self.adapter.update_sync_status(item_id, 'accounts')
+            if is_reconnect:
+                accounts, investment_accounts = self.sync_accounts(user, is_reconnect=True, existing_item_id=plaid_item_id)
+            else:
+                accounts, investment_accounts = self.sync_accounts(user)
+            
+            if not accounts:
+                raise Exception("No accounts could be synced from Plaid")
+            
+            # Now sync investment holdings if there are investment accounts
+            if investment_accounts:
+                self.adapter.update_sync_status(item_id, 'holdings')
+                logger.info(f"Found {len(investment_accounts)} investment accounts to sync for item {item_id}")
+                self.sync_all_investment_holdings(
+                    user_id=str(user.id),
+                    plaid_item_id=plaid_item_id,
+                    investment_accounts=investment_accounts
+                )
+            
+            # Sync transactions for the last 90 days
+            self.adapter.update_sync_status(item_id, 'transactions')
+            end_date = datetime.now().date()
+            start_date = end_date - timedelta(days=90)
+            start_date_str = start_date.isoformat()
+            end_date_str = end_date.isoformat()
+            
+            logger.info(f"Syncing initial transactions from {start_date_str} to {end_date_str} for item {item_id}")
+            transaction_count = self.sync_transactions(user, start_date_str, end_date_str)
+            logger.info(f"Synced {transaction_count} initial transactions for item {item_id}")
+            
+            self.adapter.update_sync_status(item_id, 'complete')
+            return {'accounts': len(accounts), 'transactions': transaction_count}
+        except Exception as e:
+            logger.error(f"Initial sync of Plaid item {item_id} failed: {str(e)}", exc_info=True)
+            self.adapter.update_sync_status(item_id, 'failed', error=str(e))
+            return None
+    
+    def get_sync_status(self, user, item_id=None):
+        """
+        Get the progress of the background syncs of a user's Plaid items
+        
+        A sync whose status hasn't changed for SYNC_STALE_AFTER is reported as failed,
+        since the process running it must have stopped.
+        
+        Args:
+            user: The user object
+            item_id: Only report this item (our ID or Plaid's item_id)
+            
+        Returns:
+            dict: 'syncing' (True while any item is still syncing) and the 'items'
+                  with their sync_status, sync_error and sync_status_updated_at
+        """
+        items = []
+        now = datetime.now(timezone.utc)
+        for item in self.adapter.get_plaid_items(str(user.id)):
+            if item_id and item_id not in (item.get('id'), item.get('item_id')):
+                continue
+            
+            status = item.get('sync_status')
+            error = item.get('sync_error')
+            updated_at = item.get('sync_status_updated_at')
+            if status in SYNC_IN_PROGRESS_STATUSES and updated_at:
+                try:
+                    if now - datetime.fromisoformat(updated_at) > SYNC_STALE_AFTER:
+                        status, error = 'failed', 'The sync was interrupted'
+                except (TypeError, ValueError):
+                    pass
+            
+            items.append({
+                'id': item.get('id'),
+                'item_id': item.get('item_id'),
+                'institution_name': item.get('institution_name'),
+                'sync_status': status,
+                'sync_error': error,
+                'sync_status_updated_at': updated_at
+            })
+        
+        return {
+            'syncing': any(item['sync_status'] in SYNC_IN_PROGRESS_STATUSES for item in items),
+            'items': items
+        }
+    
     def _plaid_object_to_dict(self, plaid_object):
         """
         Convert a Plaid API response object to a dictionary
@@ -402,6 +503,90 @@ class PlaidService:
             # If conversion fails, return an empty dict to avoid breaking processing
             return {}
 
+    def _call_plaid(self, client, operation, request):
+        """
+        Call a Plaid endpoint that returns large pages and get the response as a dict
+        
+        With PLAID_RAW_JSON enabled the response body is parsed directly, skipping
+        the SDK model objects and their conversion back to dicts.
+        
+        Args:
+            client: A configured PlaidApi client
+            operation: Name of the PlaidApi method, e.g. 'transactions_get'
+            request: The request model for that method
+            
+        Returns:
+            A dictionary representation of the response
+        """
+        if raw_json_enabled():
+            return call_plaid_json(client, operation, request)
+        return self._plaid_object_to_dict(getattr(client, operation)(request))
+
+    def _get_account_id_map(self, user_id):
+        """
+        Map a user's Plaid account IDs to their Supabase account UUIDs
+        
+        Args:
+            user_id: The Supabase user ID
+            
+        Returns:
+            dict: Plaid account ID -> Supabase account UUID (empty on error)
+        """
+        try:
+            account_id_to_uuid = {}
+            for acct in self.adapter.get_accounts(user_id):
+                if 'account_id' in acct and 'id' in acct:
+                    account_id_to_uuid[acct['account_id']] = acct['id']
+                elif 'plaid_account_id' in acct and 'id' in acct:
+                    account_id_to_uuid[acct['plaid_account_id']] = acct['id']
+            
+            logger.info(f"Found {len(account_id_to_uuid)} account ID to UUID mappings")
+            return account_id_to_uuid
+        except Exception as account_error:
+            logger.error(f"Error fetching account mappings: {str(account_error)}")
+            return {}
+
+    def _run_for_items(self, items, func):
+        """
+        Run func(item) for each Plaid item, several items at a time
+        
+        Items are processed by a bounded thread pool of PLAID_SYNC_CONCURRENCY
+        workers, so a user with several institutions waits on Plaid's latency
+        about once instead of once per item. An exception raised for one item is
+        logged and doesn't affect the others.
+        
+        Args:
+            items: The Plaid items to process
+            func: Function called with each item
+            
+        Returns:
+            list: (item, result) pairs in the order of items, with result None
+                  for the items that raised
+        """
+        def run(item):
+            try:
+                return func(item)
+            except Exception as item_error:
+                logger.error(f"Error processing Plaid item {item.get('id')}: {str(item_error)}")
+                return None
+        
+        workers = min(getattr(settings, 'PLAID_SYNC_CONCURRENCY', 4), len(items))
+        if workers <= 1:
+            return [(item, run(item)) for item in items]
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='plaid-sync') as executor:
+            return list(zip(items, executor.map(run, items)))
+    
+    def _handle_item_error(self, item, error_code):
+        """Update a Plaid item's status after an API error, if the error calls for it"""
+        if error_code == 'ITEM_LOGIN_REQUIRED':
+            # Update item status to indicate reconnection needed
+            self.adapter.update_plaid_item_status(
+                item.get('item_id'),
+                status='login_required',
+                update_type='error'
+            )
+    
     def sync_accounts(self, user, is_reconnect=False, existing_item_id=None):
         """Sync accounts for a user from Plaid to our database"""
         try:
@@ -440,190 +625,205 @@ class PlaidService:
                 except Exception as account_error:
                     logger.error(f"Error getting existing accounts for reconnection: {str(account_error)}")
             
-            # For each Plaid item, get and store accounts
-            for item in plaid_items:
-                logger.info(f"Processing Plaid item {item.get('id')}")
-                
-                # Get access token
-                access_token = item.get('access_token')
-                if not access_token:
-                    logger.error(f"No access token found for item {item.get('id')}")
+            # Always get real accounts from Plaid API
+            # Get the shared Plaid API client
+            client = get_plaid_client(self.plaid_environment, self.client_id, self.secret)
+            
+            # Fetch and build the accounts of every Plaid item in parallel
+            results = self._run_for_items(
+                plaid_items,
+                lambda item: self._fetch_item_accounts(
+                    client, item, str(user.id), is_reconnect, existing_item_id, existing_account_ids
+                )
+            )
+            
+            # Gather the accounts of all items so they are stored together
+            merged_accounts = []
+            investment_account_ids = set()
+            for item, result in results:
+                if not result:
+                    continue
+                if result.get('error_code'):
+                    self._handle_item_error(item, result['error_code'])
                     continue
+                merged_accounts.extend(result['accounts'])
+                investment_account_ids.update(result['investment_account_ids'])
+            
+            # Store all accounts using the adapter
+            # The adapter will clean the data and handle schema differences
+            stored_accounts = self.adapter.store_accounts(str(user.id), merged_accounts)
+            if len(stored_accounts) < len(merged_accounts):
+                logger.warning(f"Stored {len(stored_accounts)} of {len(merged_accounts)} accounts for user {user.id}")
+            
+            for stored_account in stored_accounts:
+                all_accounts.append(stored_account)
                 
-                # Always get real accounts from Plaid API
-                # Create a Plaid API client
-                configuration = Configuration(
-                    host=f"https://{self.plaid_environment}.plaid.com",
-                    api_key={
-                        'clientId': self.client_id,
-                        'secret': self.secret,
-                    }
-                )
+                # Add to investment accounts list if applicable
+                if stored_account.get('account_id') in investment_account_ids:
+                    logger.info(f"Added investment account {stored_account.get('name')} for sync")
+                    investment_accounts.append({
+                        'account_id': stored_account.get('id'),
+                        'plaid_account_id': stored_account.get('account_id')
+                    })
+            
+            # Balances changed, so the cached dashboard is out of date
+            from .snapshots import invalidate_dashboard
+            invalidate_dashboard(str(user.id))
+            
+            return all_accounts, investment_accounts
+        except Exception as e:
+            logger.error(f"Error syncing accounts: {str(e)}")
+            return [], []
+    
+    def _fetch_item_accounts(self, client, item, user_id, is_reconnect, existing_item_id, existing_account_ids):
+        """
+        Fetch one Plaid item's accounts and build the rows to store for them
+        
+        Only reads from Plaid, so it is safe to run for several items at once.
+        
+        Returns:
+            dict: 'accounts' to store, the Plaid 'investment_account_ids' among them,
+                  and the Plaid 'error_code' if the request failed
+        """
+        logger.info(f"Processing Plaid item {item.get('id')}")
+        result = {'accounts': [], 'investment_account_ids': set(), 'error_code': None}
+        
+        # Get access token
+        access_token = item.get('access_token')
+        if not access_token:
+            logger.error(f"No access token found for item {item.get('id')}")
+            return result
+        
+        try:
+            # Get accounts from Plaid
+            logger.info(f"Fetching real accounts from Plaid with access token {access_token[:5]}...")
+            accounts_request = AccountsGetRequest(access_token=access_token)
+            accounts_response = client.accounts_get(accounts_request)
+            
+            # Convert the API response to a dictionary
+            accounts_data = self._plaid_object_to_dict(accounts_response)
+            accounts = accounts_data.get('accounts', [])
+            
+            logger.info(f"Found {len(accounts)} real accounts")
+        except plaid.ApiException as e:
+            response_body = json.loads(e.body)
+            logger.error(f"Plaid API error: {response_body.get('error_code')} - {response_body.get('error_message')}")
+            result['error_code'] = response_body.get('error_code') or 'UNKNOWN'
+            return result
+        
+        for account in accounts:
+            try:
+                # Get enhanced data
+                enhanced_data = enhanced_account_data(account)
                 
-                api_client = ApiClient(configuration)
-                client = plaid_api.PlaidApi(api_client)
+                # Check if this is an investment account
+                account_is_investment = is_investment_account(account)
                 
-                try:
-                    # Get accounts from Plaid
-                    logger.info(f"Fetching real accounts from Plaid with access token {access_token[:5]}...")
-                    accounts_request = AccountsGetRequest(access_token=access_token)
-                    accounts_response = client.accounts_get(accounts_request)
+                # Basic account data that should always exist in schema
+                account_data = {
+                    # Required fields for all accounts
+                    'user_id': user_id,
+                    'account_id': account.get('account_id'),
+                    'name': account.get('name', 'Unnamed Account'),
+                    'type': account.get('type', 'other'),
+                    'subtype': account.get('subtype', '')
+                }
+                
+                # Always include balances since these are essential
+                if account.get('balances', {}).get('current') is not None:
+                    account_data['current_balance'] = account.get('balances', {}).get('current', 0)
+                else:
+                    account_data['current_balance'] = 0
                     
-                    # Convert the API response to a dictionary
-                    accounts_data = self._plaid_object_to_dict(accounts_response)
-                    accounts = accounts_data.get('accounts', [])
+                if account.get('balances', {}).get('available') is not None:
+                    account_data['available_balance'] = account.get('balances', {}).get('available', 0)
+                else:
+                    account_data['available_balance'] = 0
+                
+                # Credit limit, used for the credit card details
+                if account.get('balances', {}).get('limit') is not None:
+                    account_data['limit'] = account.get('balances', {}).get('limit')
+                
+                # Include institution data
+                if item.get('institution_id'):
+                    account_data['institution_id'] = item.get('institution_id')
+                
+                if item.get('institution_name'):
+                    account_data['institution_name'] = item.get('institution_name')
+                
+                # Optional fields - only add if the column is known to exist
+                # Use a safe dictionary approach to avoid KeyErrors
+                
+                # Set account type flags safely using a dictionary instead of trying to directly set fields
+                # This ensures we only include fields that exist in the schema
+                account_flags = {
+                    'is_investment': account_is_investment,
+                    'is_investment_account': account_is_investment,
+                    'is_plaid_synced': True,
+                    'status': 'active'
+                }
+                
+                # Optional UI fields from enhanced data 
+                ui_fields = {}
+                if enhanced_data.get('color'):
+                    ui_fields['color'] = enhanced_data.get('color')
+                if enhanced_data.get('icon_url'):
+                    ui_fields['icon_url'] = enhanced_data.get('icon_url')
                     
-                    logger.info(f"Found {len(accounts)} real accounts")
-                except plaid.ApiException as e:
-                    response_body = json.loads(e.body)
-                    logger.error(f"Plaid API error: {response_body.get('error_code')} - {response_body.get('error_message')}")
+                # Plaid item ID - store as string to avoid UUID issues
+                if item.get('id'):
+                    account_data['plaid_item_id'] = str(item.get('id'))
+                
+                # If we're reconnecting, try to find and update an existing account
+                if is_reconnect and existing_item_id and existing_account_ids:
+                    # Try to find a match by name (case-insensitive) or account ID
+                    account_name = account_data.get('name', '').lower()
+                    account_id = account_data.get('account_id')
                     
-                    if response_body.get('error_code') == 'ITEM_LOGIN_REQUIRED':
-                        # Update item status to indicate reconnection needed
-                        self.adapter.update_plaid_item_status(
-                            item.get('item_id'), 
-                            status='login_required',
-                            update_type='error'
-                        )
-                        
-                    continue
+                    # Look for matches
+                    found_match = False
+                    
+                    # Try exact match by Plaid account_id first
+                    for existing_key, existing_account in existing_account_ids.items():
+                        if existing_account.get('account_id') == account_id:
+                            # Found an exact match - use this account's ID
+                            account_data['id'] = existing_account['id']
+                            logger.info(f"Found exact account_id match for reconnected account: {account_name}")
+                            found_match = True
+                            break
+                    
+                    # If no exact match found, try matching by name
+                    if not found_match and account_name in existing_account_ids:
+                        account_data['id'] = existing_account_ids[account_name]['id']
+                        logger.info(f"Found name match for reconnected account: {account_name}")
+                        found_match = True
+                    
+                    # For reconnected accounts with a match, we must force an update
+                    if found_match:
+                        logger.info(f"Updating existing account during reconnection: {account_data['name']}")
                 
-                # Import utility functions
-                from .utils import is_investment_account, enhanced_account_data
+                # Merge all data dictionaries
+                # The adapter's _clean_account_data method will handle
+                # filtering out fields that don't exist in the database
+                account_data.update(account_flags)
+                account_data.update(ui_fields)
                 
-                # Process each account
-                for account in accounts:
-                    try:
-                        # Get enhanced data
-                        enhanced_data = enhanced_account_data(account)
-                        
-                        # Check if this is an investment account
-                        account_is_investment = is_investment_account(account)
-                        
-                        # Basic account data that should always exist in schema
-                        account_data = {
-                            # Required fields for all accounts
-                            'user_id': str(user.id),
-                            'account_id': account.get('account_id'),
-                            'name': account.get('name', 'Unnamed Account'),
-                            'type': account.get('type', 'other'),
-                            'subtype': account.get('subtype', '')
-                        }
-                        
-                        # Always include balances since these are essential
-                        if account.get('balances', {}).get('current') is not None:
-                            account_data['current_balance'] = account.get('balances', {}).get('current', 0)
-                        else:
-                            account_data['current_balance'] = 0
-                            
-                        if account.get('balances', {}).get('available') is not None:
-                            account_data['available_balance'] = account.get('balances', {}).get('available', 0)
-                        else:
-                            account_data['available_balance'] = 0
-                        
-                        # Include institution data
-                        if item.get('institution_id'):
-                            account_data['institution_id'] = item.get('institution_id')
-                        
-                        if item.get('institution_name'):
-                            account_data['institution_name'] = item.get('institution_name')
-                        
-                        # Optional fields - only add if the column is known to exist
-                        # Use a safe dictionary approach to avoid KeyErrors
-                        
-                        # Set account type flags safely using a dictionary instead of trying to directly set fields
-                        # This ensures we only include fields that exist in the schema
-                        account_flags = {
-                            'is_investment': account_is_investment,
-                            'is_investment_account': account_is_investment,
-                            'is_plaid_synced': True,
-                            'status': 'active'
-                        }
-                        
-                        # Optional UI fields from enhanced data 
-                        ui_fields = {}
-                        if enhanced_data.get('color'):
-                            ui_fields['color'] = enhanced_data.get('color')
-                        if enhanced_data.get('icon_url'):
-                            ui_fields['icon_url'] = enhanced_data.get('icon_url')
-                            
-                        # Plaid item ID - store as string to avoid UUID issues
-                        if item.get('id'):
-                            account_data['plaid_item_id'] = str(item.get('id'))
-                        
-                        # If we're reconnecting, try to find and update an existing account
-                        if is_reconnect and existing_item_id and existing_account_ids:
-                            # Try to find a match by name (case-insensitive) or account ID
-                            account_name = account_data.get('name', '').lower()
-                            account_id = account_data.get('account_id')
-                            
-                            # Look for matches
-                            found_match = False
-                            
-                            # Try exact match by Plaid account_id first
-                            for existing_key, existing_account in existing_account_ids.items():
-                                if existing_account.get('account_id') == account_id:
-                                    # Found an exact match - use this account's ID
-                                    account_data['id'] = existing_account['id']
-                                    logger.info(f"Found exact account_id match for reconnected account: {account_name}")
-                                    found_match = True
-                                    break
-                            
-                            # If no exact match found, try matching by name
-                            if not found_match and account_name in existing_account_ids:
-                                account_data['id'] = existing_account_ids[account_name]['id']
-                                logger.info(f"Found name match for reconnected account: {account_name}")
-                                found_match = True
-                            
-                            # For reconnected accounts with a match, we must force an update
-                            if found_match:
-                                logger.info(f"Updating existing account during reconnection: {account_data['name']}")
-                        
-                        # Merge all data dictionaries
-                        # The adapter's _clean_account_data method will handle
-                        # filtering out fields that don't exist in the database
-                        account_data.update(account_flags)
-                        account_data.update(ui_fields)
-                        
-                        # Store the account using the adapter
-                        # The adapter will clean the data and handle schema differences
-                        stored_account = self.adapter.store_account(str(user.id), account_data)
-                        
-                        if stored_account:
-                            all_accounts.append(stored_account)
-                            
-                            # Add to investment accounts list if applicable
-                            if account_is_investment:
-                                logger.info(f"Added investment account {account.get('name')} for sync")
-                                investment_accounts.append({
-                                    'account_id': stored_account.get('id'),
-                                    'plaid_account_id': account.get('account_id')
-                                })
-                    except Exception as account_error:
-                        logger.error(f"Error processing account {account.get('account_id')}: {str(account_error)}")
-                        continue
-            
-            return all_accounts, investment_accounts
-        except Exception as e:
-            logger.error(f"Error syncing accounts: {str(e)}")
-            return [], []
+                result['accounts'].append(account_data)
+                if account_is_investment:
+                    result['investment_account_ids'].add(account_data['account_id'])
+            except Exception as account_error:
+                logger.error(f"Error processing account {account.get('account_id')}: {str(account_error)}")
+                continue
+        
+        return result
     
     def sync_investment_holdings(self, user_id, plaid_item_id, account_id=None, plaid_account_id=None, demo_mode=None):
         """Sync investment holdings for a specific account or all investment accounts for a user"""
         try:
             logger.info(f"Syncing investment holdings for user {user_id}, plaid_item {plaid_item_id}")
             
-            # Create a Plaid API client
-            configuration = Configuration(
-                host=f"https://{self.plaid_environment}.plaid.com",
-                api_key={
-                    'clientId': self.client_id,
-                    'secret': self.secret,
-                }
-            )
-            
-            api_client = ApiClient(configuration)
-            client = plaid_api.PlaidApi(api_client)
+            # Get the shared Plaid API client
+            client = get_plaid_client(self.plaid_environment, self.client_id, self.secret)
             
             # Get the Plaid item for the access token
             item = self.adapter.get_plaid_item_by_id(plaid_item_id)
@@ -639,10 +839,7 @@ class PlaidService:
             # Get investment holdings from Plaid
             try:
                 holdings_request = InvestmentsHoldingsGetRequest(access_token=access_token)
-                holdings_response = client.investments_holdings_get(holdings_request)
-                
-                # Convert to Python dict for easier access
-                holdings_data = self._plaid_object_to_dict(holdings_response)
+                holdings_data = self._call_plaid(client, 'investments_holdings_get', holdings_request)
                 
                 holdings = holdings_data.get('holdings', [])
                 securities = holdings_data.get('securities', [])
@@ -810,13 +1007,28 @@ class PlaidService:
                     logger.error(f"Error updating portfolio value: {str(portfolio_error)}")
             
             logger.info(f"Processed {total_processed} holdings with total value ${total_portfolio_value:.2f}")
+            
+            from .snapshots import invalidate_dashboard
+            invalidate_dashboard(user_id)
             return True
         except Exception as e:
             logger.error(f"Error in sync_investment_holdings: {str(e)}")
             return False
     
     def sync_transactions(self, user, start_date, end_date):
-        """Sync transactions for a user from Plaid to Supabase"""
+        """
+        Sync transactions for a user from Plaid to Supabase
+        
+        Each page from Plaid is formatted and handed to a bounded write queue as soon
+        as it arrives, so pages are stored while later ones are still downloading and
+        memory use doesn't grow with the size of the date range. Items that another
+        sync holds the lease of are skipped.
+        
+        Returns:
+            int: The number of transactions written
+        """
+        from .leases import ItemSyncLease
+        
         try:
             logger.info(f"Syncing transactions for user {user.id} from {start_date} to {end_date}")
             
@@ -825,22 +1037,10 @@ class PlaidService:
             
             if not plaid_items:
                 logger.warning(f"No Plaid items found for user {user.id}, cannot sync transactions")
-                return []
-            
-            # Create Plaid API client configuration
-            configuration = Configuration(
-                host=f"https://{self.plaid_environment}.plaid.com",
-                api_key={
-                    'clientId': self.client_id,
-                    'secret': self.secret,
-                }
-            )
+                return 0
             
-            api_client = ApiClient(configuration)
-            client = plaid_api.PlaidApi(api_client)
-            
-            # Track all transactions synced
-            all_transactions = []
+            # Get the shared Plaid API client
+            client = get_plaid_client(self.plaid_environment, self.client_id, self.secret)
             
             # Format dates properly if they're strings
             if isinstance(start_date, str):
@@ -853,271 +1053,408 @@ class PlaidService:
             else:
                 end_date_obj = end_date
             
-            # For each Plaid item, get transactions
-            for item in plaid_items:
-                try:
-                    access_token = item.get('access_token')
-                    if not access_token:
-                        logger.error(f"No access token found for item {item.get('id')}")
-                        continue
-                    
-                    logger.info(f"Fetching transactions for Plaid item {item.get('id')}")
-                    
-                    # Build the transactions get request
-                    options = TransactionsGetRequestOptions(
-                        count=500  # Max number of transactions per request
-                    )
-                    
-                    request = TransactionsGetRequest(
-                        access_token=access_token,
-                        start_date=start_date_obj,
-                        end_date=end_date_obj,
-                        options=options
+            # Skip the items another sync is already fetching
+            lease = ItemSyncLease()
+            leased = set(lease.acquire(item.get('item_id') for item in plaid_items))
+            plaid_items = [item for item in plaid_items if str(item.get('item_id')) in leased]
+            if not plaid_items:
+                logger.info(f"Every Plaid item of user {user.id} is already being synced")
+                return 0
+            
+            # Get a mapping of Plaid account IDs to Supabase account UUIDs, shared by all items
+            account_id_to_uuid = self._get_account_id_map(str(user.id))
+            
+            # Fetch and format the transactions of every Plaid item in parallel,
+            # writing each page as soon as it is ready
+            writer = TransactionWriteQueue(self.adapter)
+            writer.start()
+            try:
+                results = self._run_for_items(
+                    plaid_items,
+                    lambda item: self._fetch_item_transactions(
+                        client, item, str(user.id), start_date_obj, end_date_obj, account_id_to_uuid, writer.put
                     )
-                    
-                    try:
-                        # Get initial response
-                        response = client.transactions_get(request)
-                        transactions_data = self._plaid_object_to_dict(response)
-                        
-                        # Get total transactions and process what we received
-                        total_transactions = transactions_data.get('total_transactions', 0)
-                        transactions = transactions_data.get('transactions', [])
-                        
-                        logger.info(f"Retrieved {len(transactions)} of {total_transactions} transactions from Plaid")
-                        
-                        # Add account info to each transaction
-                        accounts_map = {}
-                        for account in transactions_data.get('accounts', []):
-                            accounts_map[account.get('account_id')] = account
-                        
-                        # Get a mapping of Plaid account IDs to Supabase account UUIDs
-                        try:
-                            # Fetch all accounts for this user
-                            supabase_accounts = self.adapter.get_accounts(str(user.id))
-                            account_id_to_uuid = {}
-                            
-                            for acct in supabase_accounts:
-                                if 'account_id' in acct and 'id' in acct:
-                                    account_id_to_uuid[acct['account_id']] = acct['id']
-                                elif 'plaid_account_id' in acct and 'id' in acct:
-                                    account_id_to_uuid[acct['plaid_account_id']] = acct['id']
-                            
-                            logger.info(f"Found {len(account_id_to_uuid)} account ID to UUID mappings")
-                        except Exception as account_error:
-                            logger.error(f"Error fetching account mappings: {str(account_error)}")
-                            account_id_to_uuid = {}
-                        
-                        # Process and format transactions for our database
-                        formatted_transactions = []
-                        for tx in transactions:
-                            try:
-                                # Basic required fields
-                                tx_data = {
-                                    'id': str(uuid.uuid4()),
-                                    'transaction_id': tx.get('transaction_id'),
-                                    'amount': tx.get('amount', 0.0),  # Plaid uses positive for debit, negative for credit
-                                    'date': tx.get('date'),
-                                    'name': tx.get('name'),
-                                    'pending': tx.get('pending', False),
-                                    'user_id': str(user.id)  # Add user_id to every transaction
-                                }
-                                
-                                # Add account_id - use UUID mapping if available, otherwise skip this transaction
-                                plaid_account_id = tx.get('account_id')
-                                if plaid_account_id in account_id_to_uuid:
-                                    tx_data['account_id'] = account_id_to_uuid[plaid_account_id]
-                                else:
-                                    logger.warning(f"No UUID mapping found for Plaid account ID: {plaid_account_id}, skipping transaction")
-                                    continue
-                                
-                                # Map merchant name and category
-                                if tx.get('merchant_name'):
-                                    tx_data['merchant_name'] = tx.get('merchant_name')
-                                    
-                                if tx.get('category'):
-                                    tx_data['category'] = tx.get('category')[0] if isinstance(tx.get('category'), list) and tx.get('category') else tx.get('category')
-                                
-                                # Add payment metadata if available
-                                payment_meta = tx.get('payment_meta', {})
-                                if payment_meta:
-                                    if payment_meta.get('reference_number'):
-                                        tx_data['reference_number'] = payment_meta.get('reference_number')
-                                        
-                                    if payment_meta.get('payee'):
-                                        tx_data['payee'] = payment_meta.get('payee')
-                                        
-                                    if payment_meta.get('payer'):
-                                        tx_data['payer'] = payment_meta.get('payer')
-                                    
-                                    if payment_meta.get('payment_method'):
-                                        tx_data['payment_method'] = payment_meta.get('payment_method')
-                                
-                                # Add location data if available
-                                if tx.get('location'):
-                                    tx_data['location'] = json.dumps(tx.get('location'))
-                                    
-                                # Add payment channel if available
-                                if tx.get('payment_channel'):
-                                    tx_data['payment_channel'] = tx.get('payment_channel')
-                                    
-                                # Add personal finance category if available
-                                if tx.get('personal_finance_category'):
-                                    pfc = tx.get('personal_finance_category', {})
-                                    if pfc.get('primary'):
-                                        tx_data['category_id'] = pfc.get('primary')
-                                        
-                                    if pfc.get('detailed'):
-                                        tx_data['subcategory'] = pfc.get('detailed')
-                                        
-                                # Add currency codes if available
-                                if tx.get('iso_currency_code'):
-                                    tx_data['iso_currency_code'] = tx.get('iso_currency_code')
-                                    
-                                if tx.get('unofficial_currency_code'):
-                                    tx_data['unofficial_currency_code'] = tx.get('unofficial_currency_code')
-                                    
-                                # Add other useful fields from Plaid
-                                if tx.get('website'):
-                                    tx_data['website'] = tx.get('website')
-                                    
-                                if tx.get('authorized_date'):
-                                    tx_data['authorized_date'] = tx.get('authorized_date')
-                                    
-                                # Serialize the transaction data using our utility
-                                from .utils import serialize_for_supabase
-                                tx_data = serialize_for_supabase(tx_data)
-                                    
-                                # Add to formatted transactions
-                                formatted_transactions.append(tx_data)
-                            except Exception as tx_error:
-                                logger.error(f"Error formatting transaction: {str(tx_error)}")
-                                continue
-                        
-                        # Add formatted transactions to our collection
-                        all_transactions.extend(formatted_transactions)
-                        
-                        # Handle pagination if needed
-                        has_more = transactions_data.get('has_more', False)
-                        offset = len(transactions)
-                        
-                        while has_more and offset < total_transactions:
-                            # Update options with offset
-                            options = TransactionsGetRequestOptions(
-                                count=500,
-                                offset=offset
-                            )
-                            
-                            request = TransactionsGetRequest(
-                                access_token=access_token,
-                                start_date=start_date_obj,
-                                end_date=end_date_obj,
-                                options=options
-                            )
-                            
-                            logger.info(f"Fetching more transactions, offset {offset}")
-                            
-                            # Get next batch
-                            response = client.transactions_get(request)
-                            transactions_data = self._plaid_object_to_dict(response)
-                            
-                            transactions = transactions_data.get('transactions', [])
-                            has_more = transactions_data.get('has_more', False)
-                            
-                            logger.info(f"Retrieved {len(transactions)} more transactions from Plaid")
-                            
-                            # Process this batch of transactions
-                            formatted_transactions = []
-                            for tx in transactions:
-                                try:
-                                    # Same formatting as above
-                                    tx_data = {
-                                        'id': str(uuid.uuid4()),
-                                        'transaction_id': tx.get('transaction_id'),
-                                        'amount': tx.get('amount', 0.0),
-                                        'date': tx.get('date'),
-                                        'name': tx.get('name'),
-                                        'pending': tx.get('pending', False),
-                                        'user_id': str(user.id)  # Add user_id to every transaction
-                                    }
-                                    
-                                    # Add account_id - use UUID mapping if available, otherwise skip this transaction
-                                    plaid_account_id = tx.get('account_id')
-                                    if plaid_account_id in account_id_to_uuid:
-                                        tx_data['account_id'] = account_id_to_uuid[plaid_account_id]
-                                    else:
-                                        logger.warning(f"No UUID mapping found for Plaid account ID: {plaid_account_id}, skipping transaction")
-                                        continue
-                                    
-                                    if tx.get('merchant_name'):
-                                        tx_data['merchant_name'] = tx.get('merchant_name')
-                                        
-                                    if tx.get('category'):
-                                        tx_data['category'] = tx.get('category')[0] if isinstance(tx.get('category'), list) and tx.get('category') else tx.get('category')
-                                    
-                                    payment_meta = tx.get('payment_meta', {})
-                                    if payment_meta:
-                                        if payment_meta.get('reference_number'):
-                                            tx_data['reference_number'] = payment_meta.get('reference_number')
-                                        if payment_meta.get('payee'):
-                                            tx_data['payee'] = payment_meta.get('payee')
-                                    
-                                    account = accounts_map.get(tx.get('account_id'))
-                                    if account:
-                                        tx_data['account_name'] = account.get('name')
-                                        
-                                    formatted_transactions.append(tx_data)
-                                except Exception as tx_error:
-                                    logger.error(f"Error processing transaction {tx.get('transaction_id')}: {str(tx_error)}")
-                            
-                            # Add formatted transactions to our collection
-                            all_transactions.extend(formatted_transactions)
-                            
-                            # Update offset for next page
-                            offset += len(transactions)
-                        
-                        # Record that we've done a successful sync
-                        self.adapter.record_soft_refresh(item.get('item_id'))
-                        
-                    except plaid.ApiException as e:
-                        # Handle Plaid API errors
-                        try:
-                            response_body = json.loads(e.body)
-                            error_code = response_body.get('error_code')
-                            error_message = response_body.get('error_message')
-                            logger.error(f"Plaid API error: {error_code} - {error_message}")
-                            
-                            # Update item status for specific errors
-                            if error_code == 'ITEM_LOGIN_REQUIRED':
-                                self.adapter.update_plaid_item_status(
-                                    item.get('item_id'),
-                                    status='login_required',
-                                    update_type='error'
-                                )
-                        except Exception:
-                            logger.error(f"Plaid API error: {str(e)}")
-                        
-                        continue
-                    except Exception as e:
-                        logger.error(f"Error getting transactions from Plaid: {str(e)}")
-                        continue
-                
-                except Exception as item_error:
-                    logger.error(f"Error processing Plaid item {item.get('id')}: {str(item_error)}")
+                )
+            finally:
+                # Hold the leases until every page has been written
+                stats = writer.close()
+                lease.release()
+            
+            for item, result in results:
+                if not result:
                     continue
+                if result.get('error_code'):
+                    self._handle_item_error(item, result['error_code'])
+                    continue
+                
+                # Record that we've done a successful sync
+                self.adapter.record_soft_refresh(item.get('item_id'))
             
-            # Store all transactions in Supabase if we have any
-            if all_transactions:
-                logger.info(f"Storing {len(all_transactions)} transactions in Supabase")
-                self.adapter.store_transactions(all_transactions)
+            if stats['pages']:
+                logger.info(
+                    f"Stored {stats['written']} transactions in {stats['pages']} pages "
+                    f"({stats['inserted']} new, {stats['updated']} updated, {stats['failed']} failed)"
+                )
             else:
                 logger.warning("No transactions found to store")
             
-            return all_transactions
+            if stats['written']:
+                from .snapshots import invalidate_dashboard
+                invalidate_dashboard(str(user.id))
+            
+            return stats['written']
         except Exception as e:
             logger.error(f"Error syncing transactions: {str(e)}")
             logger.exception("Full exception details:")
-            return []
+            return 0
+    
+    def _fetch_item_transactions(self, client, item, user_id, start_date, end_date, account_id_to_uuid, on_page):
+        """
+        Fetch and format one Plaid item's transactions in a date range
+        
+        Only reads from Plaid, so it is safe to run for several items at once.
+        Each formatted page is passed to on_page instead of being kept.
+        
+        Returns:
+            dict: The number of formatted 'transactions', and the Plaid 'error_code'
+                  if a request failed
+        """
+        result = {'transactions': 0, 'error_code': None}
+        
+        access_token = item.get('access_token')
+        if not access_token:
+            logger.error(f"No access token found for item {item.get('id')}")
+            result['error_code'] = 'NO_ACCESS_TOKEN'
+            return result
+        
+        logger.info(f"Fetching transactions for Plaid item {item.get('id')}")
+        
+        normalizer = TransactionNormalizer(account_id_to_uuid, user_id)
+        offset = 0
+        total_transactions = None
+        try:
+            while total_transactions is None or offset < total_transactions:
+                # Build the transactions get request
+                options = TransactionsGetRequestOptions(
+                    count=500,  # Max number of transactions per request
+                    offset=offset
+                )
+                
+                request = TransactionsGetRequest(
+                    access_token=access_token,
+                    start_date=start_date,
+                    end_date=end_date,
+                    options=options
+                )
+                
+                transactions_data = self._call_plaid(client, 'transactions_get', request)
+                
+                total_transactions = transactions_data.get('total_transactions', 0)
+                transactions = transactions_data.get('transactions', [])
+                
+                logger.info(f"Retrieved {len(transactions)} transactions at offset {offset} of {total_transactions} from Plaid")
+                
+                # Process and format transactions for our database
+                rows = normalizer.normalize_page(transactions)
+                on_page(rows)
+                result['transactions'] += len(rows)
+                
+                if not transactions:
+                    break
+                offset += len(transactions)
+        except plaid.ApiException as e:
+            # Handle Plaid API errors
+            try:
+                response_body = json.loads(e.body)
+                result['error_code'] = response_body.get('error_code') or 'UNKNOWN'
+                logger.error(f"Plaid API error: {result['error_code']} - {response_body.get('error_message')}")
+            except Exception:
+                result['error_code'] = 'UNKNOWN'
+                logger.error(f"Plaid API error: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error getting transactions from Plaid: {str(e)}")
+            result['error_code'] = 'UNKNOWN'
+        
+        return result
+    
+    def sync_transactions_incremental(self, user):
+        """
+        Incrementally sync transactions for a user using Plaid's /transactions/sync endpoint.
+        
+        Every Plaid item keeps its own cursor in plaid_items.transactions_cursor. The first
+        sync for an item pulls its full history; after that only the transactions that were
+        added, modified or removed since the stored cursor are downloaded and written.
+        
+        Args:
+            user: The Django user to sync transactions for
+            
+        Returns:
+            A dictionary with the number of added, modified and removed transactions, the
+            items synced and the items skipped because another sync held them
+        """
+        summary = {'added': 0, 'modified': 0, 'removed': 0, 'items_synced': 0, 'items_busy': 0}
+        try:
+            logger.info(f"Incrementally syncing transactions for user {user.id}")
+            
+            plaid_items = self.adapter.get_plaid_items(str(user.id))
+            
+            if not plaid_items:
+                logger.warning(f"No Plaid items found for user {user.id}, cannot sync transactions")
+                return summary
+            
+            # Get the shared Plaid API client
+            client = get_plaid_client(self.plaid_environment, self.client_id, self.secret)
+            
+            # Get a mapping of Plaid account IDs to Supabase account UUIDs once for all items
+            account_id_to_uuid = self._get_account_id_map(str(user.id))
+            
+            for item in plaid_items:
+                item_summary = self.sync_item_transactions(client, item, str(user.id), account_id_to_uuid)
+                if item_summary is None:
+                    continue
+                if item_summary.get('busy'):
+                    # Another sync holds the item; it isn't up to date until that one finishes
+                    summary['items_busy'] += 1
+                    continue
+                
+                summary['added'] += item_summary['added']
+                summary['modified'] += item_summary['modified']
+                summary['removed'] += item_summary['removed']
+                summary['items_synced'] += 1
+            
+            logger.info(f"Incremental sync for user {user.id} complete: {summary}")
+            return summary
+        except Exception as e:
+            logger.error(f"Error incrementally syncing transactions: {str(e)}")
+            logger.exception("Full exception details:")
+            return summary
+    
+    def sync_item_transactions(self, client, item, user_id, account_id_to_uuid):
+        """
+        Pull and apply all pending /transactions/sync updates for a single Plaid item,
+        unless another sync of the item is already running
+        
+        The item's sync lease is held while it syncs. If another sync holds it, nothing
+        is fetched and the item is reported as busy. The other sync started from an
+        older cursor and may miss changes Plaid announced since, so callers that sync
+        on behalf of a webhook have to try again once it has finished.
+        
+        Args:
+            client: A configured PlaidApi client
+            item: The plaid_items row for the item
+            user_id: The Supabase user ID that owns the item
+            account_id_to_uuid: Mapping of Plaid account IDs to Supabase account UUIDs
+            
+        Returns:
+            A dictionary with added/modified/removed counts ('busy' is True and the counts
+            are 0 if another sync holds the item), or None if the sync failed
+        """
+        from .leases import ItemSyncLease
+        
+        lease = ItemSyncLease()
+        if not lease.acquire([item.get('item_id')]):
+            return {'added': 0, 'modified': 0, 'removed': 0, 'busy': True}
+        try:
+            # Another sync may have moved the cursor on since the item was read
+            latest = self.adapter.get_plaid_item_by_plaid_id(item.get('item_id'))
+            if latest and latest.get('transactions_cursor') != item.get('transactions_cursor'):
+                item = {**item, 'transactions_cursor': latest.get('transactions_cursor')}
+            result = self._sync_item_transactions(client, item, user_id, account_id_to_uuid)
+        finally:
+            lease.release()
+        
+        if result and (result.get('added') or result.get('modified') or result.get('removed')):
+            from .snapshots import invalidate_dashboard
+            invalidate_dashboard(user_id)
+        return result
+    
+    def _sync_item_transactions(self, client, item, user_id, account_id_to_uuid):
+        """
+        Pull and apply all pending /transactions/sync updates for a single Plaid item.
+        
+        The updates are collected page by page from the item's stored cursor and only
+        written once every page has been received, after which the new cursor is saved.
+        If the item's data changes while we are paginating, Plaid asks us to restart
+        from the original cursor, so nothing is written until a clean pass completes.
+        
+        Args:
+            client: A configured PlaidApi client
+            item: The plaid_items row for the item
+            user_id: The Supabase user ID that owns the item
+            account_id_to_uuid: Mapping of Plaid account IDs to Supabase account UUIDs
+            
+        Returns:
+            A dictionary with added/modified/removed counts, or None if the sync failed
+        """
+        access_token = item.get('access_token')
+        if not access_token:
+            logger.error(f"No access token found for item {item.get('id')}")
+            return None
+        
+        start_cursor = item.get('transactions_cursor') or ''
+        
+        try:
+            for attempt in range(3):
+                cursor = start_cursor
+                added, modified, removed = [], [], []
+                has_more = True
+                
+                try:
+                    while has_more:
+                        request = TransactionsSyncRequest(
+                            access_token=access_token,
+                            cursor=cursor,
+                            count=500  # Max number of updates per request
+                        )
+                        response = self._call_plaid(client, 'transactions_sync', request)
+                        
+                        added.extend(response.get('added', []))
+                        modified.extend(response.get('modified', []))
+                        removed.extend(response.get('removed', []))
+                        has_more = response.get('has_more', False)
+                        cursor = response.get('next_cursor', cursor)
+                    break
+                except plaid.ApiException as e:
+                    try:
+                        error_code = json.loads(e.body).get('error_code')
+                    except Exception:
+                        error_code = None
+                    
+                    if error_code != 'TRANSACTIONS_SYNC_MUTATION_DURING_PAGINATION':
+                        raise
+                    
+                    logger.warning(f"Item {item.get('item_id')} changed during pagination, restarting sync (attempt {attempt + 1})")
+            else:
+                logger.error(f"Giving up on incremental sync for item {item.get('item_id')} after repeated restarts")
+                return None
+            
+            logger.info(
+                f"Item {item.get('item_id')}: {len(added)} added, {len(modified)} modified, "
+                f"{len(removed)} removed transactions"
+            )
+            
+            normalizer = TransactionNormalizer(account_id_to_uuid, user_id)
+            formatted_added = normalizer.normalize_page(added)
+            formatted_modified = normalizer.normalize_page(modified)
+            
+            removed_ids = [tx.get('transaction_id') for tx in removed if tx.get('transaction_id')]
+            
+            if not self.adapter.apply_transaction_changes(user_id, formatted_added, formatted_modified, removed_ids):
+                # Keep the old cursor so the same updates are fetched again next time
+                logger.error(f"Failed to apply transaction updates for item {item.get('item_id')}, cursor not advanced")
+                return None
+            
+            if cursor != start_cursor:
+                self.adapter.update_transactions_cursor(item.get('item_id'), cursor)
+            
+            # Record that we've done a successful sync
+            self.adapter.record_soft_refresh(item.get('item_id'))
+            
+            return {
+                'added': len(formatted_added),
+                'modified': len(formatted_modified),
+                'removed': len(removed_ids)
+            }
+        except plaid.ApiException as e:
+            # Handle Plaid API errors
+            try:
+                response_body = json.loads(e.body)
+                error_code = response_body.get('error_code')
+                error_message = response_body.get('error_message')
+                logger.error(f"Plaid API error: {error_code} - {error_message}")
+                
+                # Update item status for specific errors
+                if error_code == 'ITEM_LOGIN_REQUIRED':
+                    self.adapter.update_plaid_item_status(
+                        item.get('item_id'),
+                        status='login_required',
+                        update_type='error'
+                    )
+            except Exception:
+                logger.error(f"Plaid API error: {str(e)}")
+            return None
+        except Exception as e:
+            logger.error(f"Error syncing transactions for Plaid item {item.get('id')}: {str(e)}")
+            return None
+    
+    def sync_plaid_item_transactions(self, item_id):
+        """
+        Incrementally sync the transactions of a single Plaid item
+        
+        Used when Plaid tells us (by webhook) that one item has new data, so only
+        that item is synced instead of every item of the user.
+        
+        Args:
+            item_id: Plaid's item_id
+            
+        Returns:
+            A dictionary with added/modified/removed counts, or None if the sync failed
+        """
+        try:
+            item = self.adapter.get_plaid_item_by_plaid_id(item_id)
+            if not item:
+                logger.error(f"Could not find Plaid item {item_id} to sync transactions")
+                return None
+            
+            user_id = str(item.get('user_id'))
+            client = get_plaid_client(self.plaid_environment, self.client_id, self.secret)
+            return self.sync_item_transactions(client, item, user_id, self._get_account_id_map(user_id))
+        except Exception as e:
+            logger.error(f"Error syncing transactions for Plaid item {item_id}: {str(e)}")
+            return None
+    
+    def sync_plaid_item_holdings(self, item_id):
+        """
+        Sync the investment holdings of a single Plaid item
+        
+        Args:
+            item_id: Plaid's item_id
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            item = self.adapter.get_plaid_item_by_plaid_id(item_id)
+            if not item:
+                logger.error(f"Could not find Plaid item {item_id} to sync holdings")
+                return False
+            
+            user_id = str(item.get('user_id'))
+            investment_accounts = [
+                {'account_id': acct.get('id'), 'plaid_account_id': acct.get('account_id')}
+                for acct in self.adapter.get_accounts(user_id)
+                if str(acct.get('plaid_item_id')) == str(item.get('id')) and is_investment_account(acct)
+            ]
+            return self.sync_all_investment_holdings(user_id, item.get('id'), investment_accounts)
+        except Exception as e:
+            logger.error(f"Error syncing holdings for Plaid item {item_id}: {str(e)}")
+            return False
+    
+    def update_item_from_webhook(self, item_id, webhook_code, error=None):
+        """
+        Record the connection status Plaid reports for an item in an ITEM webhook
+        
+        Args:
+            item_id: Plaid's item_id
+            webhook_code: The ITEM webhook code, e.g. 'ERROR' or 'LOGIN_REPAIRED'
+            error: The Plaid error object sent with ERROR webhooks
+            
+        Returns:
+            bool: True if the status was updated, False otherwise
+        """
+        if webhook_code == 'ERROR':
+            error_code = (error or {}).get('error_code')
+            status = 'login_required' if error_code == 'ITEM_LOGIN_REQUIRED' else 'error'
+            logger.warning(f"Plaid reported error {error_code} for item {item_id}")
+            return self.adapter.update_plaid_item_status(item_id, status=status, update_type='error')
+        
+        status = ITEM_WEBHOOK_STATUSES.get(webhook_code)
+        if not status:
+            logger.info(f"Ignoring ITEM webhook {webhook_code} for item {item_id}")
+            return False
+        
+        logger.info(f"Plaid item {item_id} is now {status} ({webhook_code})")
+        return self.adapter.update_plaid_item_status(item_id, status=status)
     
     def refresh_accounts(self, user):
         """Refresh accounts for a user from Plaid"""
@@ -1154,7 +1491,7 @@ class PlaidService:
             return []
     
     def refresh_transactions(self, user, start_date, end_date):
-        """Refresh transactions for a user (soft refresh)"""
+        """Refresh transactions for a user (soft refresh), returning the number written"""
         try:
             logger.info(f"Performing soft refresh of transactions for user {user.id} from {start_date} to {end_date}")
             
@@ -1164,21 +1501,21 @@ class PlaidService:
                     datetime.strptime(start_date, '%Y-%m-%d')
                 except ValueError:
                     logger.error(f"Invalid start_date format: {start_date}. Expected YYYY-MM-DD.")
-                    return []
+                    return 0
             
             if isinstance(end_date, str):
                 try:
                     datetime.strptime(end_date, '%Y-%m-%d')
                 except ValueError:
                     logger.error(f"Invalid end_date format: {end_date}. Expected YYYY-MM-DD.")
-                    return []
+                    return 0
             
             # Call the sync_transactions method with the provided parameters
             return self.sync_transactions(user, start_date, end_date)
         except Exception as e:
             logger.error(f"Error refreshing transactions: {str(e)}")
             logger.exception("Full exception details:")
-            return []
+            return 0
         
     def get_plaid_status(self, user):
         """Get Plaid connection status for a user"""
@@ -1296,17 +1633,8 @@ class PlaidService:
                 logger.info("No investment accounts to sync")
                 return True
                 
-            # Create a Plaid API client
-            configuration = Configuration(
-                host=f"https://{self.plaid_environment}.plaid.com",
-                api_key={
-                    'clientId': self.client_id,
-                    'secret': self.secret,
-                }
-            )
-            
-            api_client = ApiClient(configuration)
-            client = plaid_api.PlaidApi(api_client)
+            # Get the shared Plaid API client
+            client = get_plaid_client(self.plaid_environment, self.client_id, self.secret)
             
             # Get the Plaid item for the access token
             item = self.adapter.get_plaid_item_by_id(plaid_item_id)
@@ -1322,10 +1650,7 @@ class PlaidService:
             # Make a single API call to get all investment holdings
             try:
                 holdings_request = InvestmentsHoldingsGetRequest(access_token=access_token)
-                holdings_response = client.investments_holdings_get(holdings_request)
-                
-                # Convert to Python dict for easier access
-                holdings_data = self._plaid_object_to_dict(holdings_response)
+                holdings_data = self._call_plaid(client, 'investments_holdings_get', holdings_request)
                 
                 holdings = holdings_data.get('holdings', [])
                 securities = holdings_data.get('securities', [])
@@ -1353,21 +1678,9 @@ class PlaidService:
                 logger.error(f"Error getting investment holdings from Plaid: {str(e)}")
                 return False
             
-            # Process securities once for all accounts
-            for security in securities:
-                try:
-                    # Check if security already exists
-                    security_id = security.get('security_id')
-                    if not security_id:
-                        logger.warning(f"Security missing security_id: {security}")
-                        continue
-                    
-                    # Store the security in the database
-                    db_security_id = self.adapter.store_security(security)
-                    if not db_security_id:
-                        logger.warning(f"Failed to store security: {security_id}")
-                except Exception as sec_error:
-                    logger.error(f"Error processing security: {str(sec_error)}")
+            # Store all securities in one bulk upsert and map Plaid IDs to database IDs
+            security_id_map = self.adapter.store_securities(securities)
+            securities_by_id = {s.get('security_id'): s for s in securities if s.get('security_id')}
             
             # Create mapping from Plaid account_ids to our database account IDs
             account_mapping = {}
@@ -1377,73 +1690,55 @@ class PlaidService:
                 if db_account_id and plaid_account_id:
                     account_mapping[plaid_account_id] = db_account_id
             
-            # Process holdings for each account
+            # Build the holding rows for every account using the in-memory indexes
+            holding_records = []
+            for holding in holdings:
+                holding_account_id = holding.get('account_id')
+                if not holding_account_id or holding_account_id not in account_mapping:
+                    continue
+                
+                security_id = holding.get('security_id')
+                if not security_id:
+                    logger.warning(f"Holding missing security_id: {holding}")
+                    continue
+                
+                if security_id not in securities_by_id:
+                    logger.warning(f"No matching security found for security_id: {security_id}")
+                    continue
+                
+                db_security_id = security_id_map.get(security_id)
+                if not db_security_id:
+                    logger.warning(f"Security not found in database: {security_id}")
+                    continue
+                
+                holding_records.append({
+                    **holding,
+                    'account_id': account_mapping[holding_account_id],
+                    'security_id': db_security_id,
+                    'security_name': securities_by_id[security_id].get('name', 'Unknown')
+                })
+            
+            # Store all holdings in batched upserts
+            stored_holdings = self.adapter.store_holdings(holding_records)
+            if len(stored_holdings) < len(holding_records):
+                logger.warning(f"Failed to store {len(holding_records) - len(stored_holdings)} holdings")
+            
+            # Add up each account's portfolio value from the stored holdings
             processed_accounts = set()
             account_portfolio_values = {}
-            
-            for holding in holdings:
+            for holding in stored_holdings:
+                institution_value = holding.get('institution_value', 0)
+                if not institution_value:
+                    continue
                 try:
-                    holding_account_id = holding.get('account_id')
-                    if not holding_account_id or holding_account_id not in account_mapping:
-                        continue
-                    
-                    db_account_id = account_mapping[holding_account_id]
-                    
-                    # Get the security associated with this holding
-                    security_id = holding.get('security_id')
-                    if not security_id:
-                        logger.warning(f"Holding missing security_id: {holding}")
-                        continue
-                    
-                    # Find the corresponding security in our securities list
-                    matching_security = next((s for s in securities if s.get('security_id') == security_id), None)
-                    if not matching_security:
-                        logger.warning(f"No matching security found for security_id: {security_id}")
-                        continue
-                    
-                    # Get the database ID for this security
-                    try:
-                        security_response = self.adapter.client.table('securities').select('*').eq('security_id', security_id).execute()
-                        
-                        if security_response.data and len(security_response.data) > 0:
-                            db_security = security_response.data[0]
-                            db_security_id = db_security['id']
-                        else:
-                            logger.warning(f"Security not found in database: {security_id}")
-                            continue
-                    except Exception as sec_query_error:
-                        logger.warning(f"Error querying security with ID {security_id}: {str(sec_query_error)}")
-                        continue
-                    
-                    # Add the security name to the holding for better logging
-                    holding['security_name'] = matching_security.get('name', 'Unknown')
-                    
-                    # Store the holding
-                    db_holding_id = self.adapter.store_holding(
-                        db_account_id, 
-                        db_security_id, 
-                        holding
-                    )
-                    
-                    if db_holding_id:
-                        # Add to the account's portfolio value
-                        institution_value = holding.get('institution_value', 0)
-                        if institution_value:
-                            try:
-                                value = float(institution_value)
-                                processed_accounts.add(db_account_id)
-                                if db_account_id not in account_portfolio_values:
-                                    account_portfolio_values[db_account_id] = 0
-                                account_portfolio_values[db_account_id] += value
-                            except (ValueError, TypeError):
-                                pass
-                        
-                        logger.info(f"Stored holding: {holding.get('security_name')} ({holding.get('quantity')} shares)")
-                    else:
-                        logger.warning(f"Failed to store holding: {holding.get('security_name')}")
-                    
-                except Exception as holding_error:
-                    logger.error(f"Error processing holding: {str(holding_error)}")
+                    value = float(institution_value)
+                except (ValueError, TypeError):
+                    continue
+                db_account_id = holding['account_id']
+                processed_accounts.add(db_account_id)
+                account_portfolio_values[db_account_id] = account_portfolio_values.get(db_account_id, 0) + value
+            
+            logger.info(f"Stored {len(stored_holdings)} holdings and {len(security_id_map)} securities")
             
             # Update each account's portfolio value
             for account_id, portfolio_value in account_portfolio_values.items():
@@ -1459,6 +1754,9 @@ class PlaidService:
                     logger.error(f"Error updating portfolio value for account {account_id}: {str(portfolio_error)}")
             
             logger.info(f"Successfully synced holdings for {len(processed_accounts)} accounts")
+            
+            from .snapshots import invalidate_dashboard
+            invalidate_dashboard(user_id)
             return True
             
         except Exception as e:
@@ -1672,6 +1970,9 @@ class SupabaseService:
                     profile_data
                 ).eq('id', user_id).execute()
                 
+                from .snapshots import invalidate_dashboard
+                invalidate_dashboard(user_id)
+                
                 if result.data:
                     logger.info(f"Successfully updated profile for user {user_id}")
                     return result.data
@@ -0,0 +1,94 @@
+"""
+Per-user snapshots of the dashboard, served until the user's data changes.
+
+The dashboard reads accounts, transactions, the profile and investment positions
+from Supabase, but that data only changes when a Plaid sync writes it or the user
+edits their profile or goals. The computed dashboard context is stored in the
+user's DashboardSnapshot row together with the version it was computed at. Every
+change bumps the version (invalidate_dashboard), so a repeat visit only needs the
+row from the Django database, and the first visit after a change computes the
+dashboard again.
+
+Writes are compare-and-set on the version: a dashboard computed while a sync was
+invalidating it is not stored. Snapshots are also rebuilt every day, since the
+dashboard shows the current month, and after DASHBOARD_SNAPSHOT_TTL seconds
+(0 turns snapshots off).
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+import logging
+
+from django.conf import settings
+from django.db.models import F
+
+from .models import DashboardSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+def dashboard_snapshots_enabled() -> bool:
+    """Whether dashboards are served from snapshots (DASHBOARD_SNAPSHOT_TTL above 0)"""
+    return getattr(settings, 'DASHBOARD_SNAPSHOT_TTL', 0) > 0
+
+
+def get_dashboard_snapshot(user_id: str) -> Tuple[Optional[Dict[str, Any]], Optional[int]]:
+    """
+    Get a user's dashboard snapshot if it is still valid
+
+    Returns:
+        tuple: The snapshot's context (None if there is no valid snapshot) and the
+               version to pass to save_dashboard_snapshot (None if snapshots are off)
+    """
+    if not user_id or not dashboard_snapshots_enabled():
+        return None, None
+    try:
+        snapshot, _ = DashboardSnapshot.objects.get_or_create(user_id=str(user_id))
+        if snapshot.context is None or snapshot.built_version != snapshot.version:
+            return None, snapshot.version
+
+        # The dashboard shows the current month and today's figures, by the server's date like the view
+        max_age = timedelta(seconds=settings.DASHBOARD_SNAPSHOT_TTL)
+        too_old = datetime.now(timezone.utc) - snapshot.built_at > max_age
+        if too_old or snapshot.built_at.astimezone().date() != datetime.now().date():
+            return None, snapshot.version
+        return snapshot.context, snapshot.version
+    except Exception as e:
+        logger.error(f"Error reading the dashboard snapshot of user {user_id}: {str(e)}")
+        return None, None
+
+
+def save_dashboard_snapshot(user_id: str, version: Optional[int], context: Dict[str, Any]) -> bool:
+    """
+    Store a freshly computed dashboard, unless the user's data changed since it was read
+
+    Args:
+        user_id: The user's Supabase ID
+        version: The version returned by get_dashboard_snapshot before reading the data
+        context: The dashboard's template context (JSON serializable)
+
+    Returns:
+        bool: Whether the snapshot was stored
+    """
+    if not user_id or version is None:
+        return False
+    try:
+        stored = DashboardSnapshot.objects.filter(user_id=str(user_id), version=version).update(
+            context=context,
+            built_version=version,
+            built_at=datetime.now(timezone.utc)
+        )
+        return bool(stored)
+    except Exception as e:
+        logger.error(f"Error storing the dashboard snapshot of user {user_id}: {str(e)}")
+        return False
+
+
+def invalidate_dashboard(user_id: str) -> None:
+    """Note that a user's dashboard data changed (called after syncs, profile and goal changes)"""
+    if not user_id:
+        return
+    try:
+        # Users without a snapshot have nothing to invalidate
+        DashboardSnapshot.objects.filter(user_id=str(user_id)).update(version=F('version') + 1, context=None)
+    except Exception as e:
+        logger.error(f"Error invalidating the dashboard snapshot of user {user_id}: {str(e)}")
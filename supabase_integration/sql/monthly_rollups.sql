@@ -0,0 +1,78 @@
+-- SQL script to add the monthly_rollups table and the functions that maintain it
+-- One row per user, month, category, transfer flag and account class holds the
+-- income, spending and number of transactions in it, so pages that only need
+-- monthly totals don't have to read every transaction
+
+CREATE TABLE IF NOT EXISTS monthly_rollups (
+    user_id UUID NOT NULL,
+    -- First day of the month
+    month DATE NOT NULL,
+    category TEXT NOT NULL,
+    is_transfer BOOLEAN NOT NULL DEFAULT FALSE,
+    -- investment, depository, credit, loan or other
+    account_class TEXT NOT NULL,
+    -- Sum of the deposits (negative Plaid amounts), as a positive number
+    income NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    -- Sum of the expenses (positive Plaid amounts)
+    spending NUMERIC(14, 2) NOT NULL DEFAULT 0,
+    transaction_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (user_id, month, category, is_transfer, account_class)
+);
+
+-- Adds the changes from a batch of transaction writes, atomically, so concurrent
+-- syncs of a user's items never lose each other's updates
+-- deltas: [{user_id, month, category, is_transfer, account_class, income, spending, transaction_count}]
+CREATE OR REPLACE FUNCTION apply_monthly_rollup_deltas(deltas JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    applied INTEGER;
+BEGIN
+    INSERT INTO monthly_rollups AS r
+        (user_id, month, category, is_transfer, account_class, income, spending, transaction_count, updated_at)
+    SELECT d.user_id, d.month, d.category, d.is_transfer, d.account_class,
+           SUM(d.income), SUM(d.spending), SUM(d.transaction_count), NOW()
+    FROM jsonb_to_recordset(deltas) AS d(user_id UUID, month DATE, category TEXT, is_transfer BOOLEAN,
+                                         account_class TEXT, income NUMERIC, spending NUMERIC, transaction_count INTEGER)
+    GROUP BY d.user_id, d.month, d.category, d.is_transfer, d.account_class
+    ON CONFLICT (user_id, month, category, is_transfer, account_class) DO UPDATE SET
+        income = r.income + EXCLUDED.income,
+        spending = r.spending + EXCLUDED.spending,
+        transaction_count = r.transaction_count + EXCLUDED.transaction_count,
+        updated_at = NOW();
+    GET DIAGNOSTICS applied = ROW_COUNT;
+
+    -- Drop the groups whose last transaction was changed or deleted
+    DELETE FROM monthly_rollups r
+    USING (SELECT DISTINCT d.user_id, d.month
+           FROM jsonb_to_recordset(deltas) AS d(user_id UUID, month DATE)) AS touched
+    WHERE r.user_id = touched.user_id AND r.month = touched.month AND r.transaction_count <= 0;
+
+    RETURN applied;
+END;
+$$;
+
+-- Replaces all of a user's rollups in one transaction (used by backfill_monthly_rollups)
+CREATE OR REPLACE FUNCTION replace_monthly_rollups(p_user_id UUID, p_rows JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    inserted INTEGER;
+BEGIN
+    DELETE FROM monthly_rollups WHERE user_id = p_user_id;
+
+    INSERT INTO monthly_rollups
+        (user_id, month, category, is_transfer, account_class, income, spending, transaction_count, updated_at)
+    SELECT p_user_id, d.month, d.category, d.is_transfer, d.account_class,
+           SUM(d.income), SUM(d.spending), SUM(d.transaction_count), NOW()
+    FROM jsonb_to_recordset(p_rows) AS d(month DATE, category TEXT, is_transfer BOOLEAN, account_class TEXT,
+                                         income NUMERIC, spending NUMERIC, transaction_count INTEGER)
+    GROUP BY d.month, d.category, d.is_transfer, d.account_class;
+    GET DIAGNOSTICS inserted = ROW_COUNT;
+
+    RETURN inserted;
+END;
+$$;
@@ -0,0 +1,25 @@
+-- SQL script to add the initial sync status to the plaid_items table
+-- After a bank is linked, its accounts, holdings and transactions are synced in the
+-- background; these columns let the app and the mobile client follow that sync
+
+DO $$
+BEGIN
+    -- queued, accounts, holdings, transactions, complete or failed
+    -- NULL for items linked before the status was recorded
+    IF NOT EXISTS (SELECT FROM information_schema.columns 
+                   WHERE table_name = 'plaid_items' AND column_name = 'sync_status') THEN
+        ALTER TABLE plaid_items ADD COLUMN sync_status TEXT;
+    END IF;
+    
+    -- Why the last sync failed
+    IF NOT EXISTS (SELECT FROM information_schema.columns 
+                   WHERE table_name = 'plaid_items' AND column_name = 'sync_error') THEN
+        ALTER TABLE plaid_items ADD COLUMN sync_error TEXT;
+    END IF;
+    
+    -- When sync_status last changed
+    IF NOT EXISTS (SELECT FROM information_schema.columns 
+                   WHERE table_name = 'plaid_items' AND column_name = 'sync_status_updated_at') THEN
+        ALTER TABLE plaid_items ADD COLUMN sync_status_updated_at TIMESTAMP WITH TIME ZONE;
+    END IF;
+END $$;
@@ -0,0 +1,144 @@
+-- SQL script to add the functions that sum a user's transactions in the database
+-- The transaction and budgeting pages call them through client.rpc and get back a
+-- few summary rows per category, account, week or month instead of every transaction
+--
+-- Every function takes the same filters as TransactionQuery (queries.py) and returns
+-- (key, is_transfer, income, spending, transaction_count) rows, where income is the
+-- sum of the deposits (negative Plaid amounts) as a positive number and spending the
+-- sum of the expenses. Rows are split by is_transfer so callers can leave transfers
+-- out; investment accounts are left out by passing them in p_exclude_account_ids.
+
+-- Summing by user and date range reads the user's rows for those dates only
+CREATE INDEX IF NOT EXISTS idx_transactions_user_id_date ON transactions(user_id, date);
+
+-- The filtered transactions the totals are computed from, with cleaned categories and transfers flagged
+CREATE OR REPLACE FUNCTION summary_transactions(
+    p_user_id UUID,
+    p_start_date DATE DEFAULT NULL,
+    p_end_date DATE DEFAULT NULL,
+    p_account_ids TEXT[] DEFAULT NULL,
+    p_exclude_account_ids TEXT[] DEFAULT NULL,
+    p_category TEXT DEFAULT NULL,
+    p_search TEXT DEFAULT NULL,
+    p_sign TEXT DEFAULT NULL
+)
+RETURNS TABLE(account_id TEXT, category TEXT, date DATE, amount NUMERIC, is_transfer BOOLEAN)
+LANGUAGE sql STABLE
+AS $$
+    SELECT
+        t.account_id::TEXT,
+        CASE WHEN t.category IS NULL OR t.category = '' OR LOWER(t.category) IN ('null', 'none')
+             THEN 'Uncategorized' ELSE t.category END,
+        t.date::DATE,
+        COALESCE(t.amount, 0)::NUMERIC,
+        (LOWER(COALESCE(t.category, '')) LIKE '%transfer%'
+         OR LOWER(COALESCE(t.merchant_name, '') || ' ' || COALESCE(t.name, '')) ~ '(venmo|zelle)')
+    FROM transactions t
+    WHERE t.user_id = p_user_id
+      AND (p_start_date IS NULL OR t.date::DATE >= p_start_date)
+      AND (p_end_date IS NULL OR t.date::DATE <= p_end_date)
+      AND (p_account_ids IS NULL OR t.account_id::TEXT = ANY(p_account_ids))
+      AND (p_exclude_account_ids IS NULL OR NOT (t.account_id::TEXT = ANY(p_exclude_account_ids)))
+      AND (p_category IS NULL OR t.category ILIKE '%' || p_category || '%')
+      AND (p_search IS NULL OR t.merchant_name ILIKE '%' || p_search || '%'
+                            OR t.name ILIKE '%' || p_search || '%'
+                            OR t.category ILIKE '%' || p_search || '%')
+      AND (p_sign IS NULL OR (p_sign = 'income' AND t.amount < 0) OR (p_sign = 'expense' AND t.amount > 0));
+$$;
+
+CREATE OR REPLACE FUNCTION transaction_totals_by_category(
+    p_user_id UUID,
+    p_start_date DATE DEFAULT NULL,
+    p_end_date DATE DEFAULT NULL,
+    p_account_ids TEXT[] DEFAULT NULL,
+    p_exclude_account_ids TEXT[] DEFAULT NULL,
+    p_category TEXT DEFAULT NULL,
+    p_search TEXT DEFAULT NULL,
+    p_sign TEXT DEFAULT NULL
+)
+RETURNS TABLE(key TEXT, is_transfer BOOLEAN, income NUMERIC, spending NUMERIC, transaction_count BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT s.category, s.is_transfer,
+           SUM(CASE WHEN s.amount < 0 THEN -s.amount ELSE 0 END),
+           SUM(CASE WHEN s.amount > 0 THEN s.amount ELSE 0 END),
+           COUNT(*)
+    FROM summary_transactions(p_user_id, p_start_date, p_end_date, p_account_ids, p_exclude_account_ids,
+                              p_category, p_search, p_sign) s
+    GROUP BY s.category, s.is_transfer
+    ORDER BY 1, 2;
+$$;
+
+CREATE OR REPLACE FUNCTION transaction_totals_by_account(
+    p_user_id UUID,
+    p_start_date DATE DEFAULT NULL,
+    p_end_date DATE DEFAULT NULL,
+    p_account_ids TEXT[] DEFAULT NULL,
+    p_exclude_account_ids TEXT[] DEFAULT NULL,
+    p_category TEXT DEFAULT NULL,
+    p_search TEXT DEFAULT NULL,
+    p_sign TEXT DEFAULT NULL
+)
+RETURNS TABLE(key TEXT, is_transfer BOOLEAN, income NUMERIC, spending NUMERIC, transaction_count BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT s.account_id, s.is_transfer,
+           SUM(CASE WHEN s.amount < 0 THEN -s.amount ELSE 0 END),
+           SUM(CASE WHEN s.amount > 0 THEN s.amount ELSE 0 END),
+           COUNT(*)
+    FROM summary_transactions(p_user_id, p_start_date, p_end_date, p_account_ids, p_exclude_account_ids,
+                              p_category, p_search, p_sign) s
+    GROUP BY s.account_id, s.is_transfer
+    ORDER BY 1, 2;
+$$;
+
+-- Weeks are 7-day buckets counted from the first of each month (the 1st-7th, 8th-14th, ...),
+-- keyed by their first day
+CREATE OR REPLACE FUNCTION transaction_totals_by_week(
+    p_user_id UUID,
+    p_start_date DATE DEFAULT NULL,
+    p_end_date DATE DEFAULT NULL,
+    p_account_ids TEXT[] DEFAULT NULL,
+    p_exclude_account_ids TEXT[] DEFAULT NULL,
+    p_category TEXT DEFAULT NULL,
+    p_search TEXT DEFAULT NULL,
+    p_sign TEXT DEFAULT NULL
+)
+RETURNS TABLE(key TEXT, is_transfer BOOLEAN, income NUMERIC, spending NUMERIC, transaction_count BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT TO_CHAR(DATE_TRUNC('month', s.date)::DATE + ((EXTRACT(DAY FROM s.date)::INTEGER - 1) / 7) * 7, 'YYYY-MM-DD'),
+           s.is_transfer,
+           SUM(CASE WHEN s.amount < 0 THEN -s.amount ELSE 0 END),
+           SUM(CASE WHEN s.amount > 0 THEN s.amount ELSE 0 END),
+           COUNT(*)
+    FROM summary_transactions(p_user_id, p_start_date, p_end_date, p_account_ids, p_exclude_account_ids,
+                              p_category, p_search, p_sign) s
+    GROUP BY 1, 2
+    ORDER BY 1, 2;
+$$;
+
+-- Months are keyed by their first day
+CREATE OR REPLACE FUNCTION transaction_totals_by_month(
+    p_user_id UUID,
+    p_start_date DATE DEFAULT NULL,
+    p_end_date DATE DEFAULT NULL,
+    p_account_ids TEXT[] DEFAULT NULL,
+    p_exclude_account_ids TEXT[] DEFAULT NULL,
+    p_category TEXT DEFAULT NULL,
+    p_search TEXT DEFAULT NULL,
+    p_sign TEXT DEFAULT NULL
+)
+RETURNS TABLE(key TEXT, is_transfer BOOLEAN, income NUMERIC, spending NUMERIC, transaction_count BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT TO_CHAR(DATE_TRUNC('month', s.date), 'YYYY-MM-DD'),
+           s.is_transfer,
+           SUM(CASE WHEN s.amount < 0 THEN -s.amount ELSE 0 END),
+           SUM(CASE WHEN s.amount > 0 THEN s.amount ELSE 0 END),
+           COUNT(*)
+    FROM summary_transactions(p_user_id, p_start_date, p_end_date, p_account_ids, p_exclude_account_ids,
+                              p_category, p_search, p_sign) s
+    GROUP BY 1, 2
+    ORDER BY 1, 2;
+$$;
@@ -0,0 +1,16 @@
+-- SQL script to add the transactions sync cursor to the plaid_items table
+-- The cursor lets us use Plaid's /transactions/sync endpoint to fetch only the
+-- transactions that were added, modified or removed since the last sync
+
+DO $$
+BEGIN
+    -- Add transactions_cursor column if it doesn't exist
+    -- NULL means the item has never been synced incrementally and will get a full initial sync
+    IF NOT EXISTS (SELECT FROM information_schema.columns 
+                   WHERE table_name = 'plaid_items' AND column_name = 'transactions_cursor') THEN
+        ALTER TABLE plaid_items ADD COLUMN transactions_cursor TEXT;
+    END IF;
+END $$;
+
+-- Removed transactions are deleted by their Plaid transaction_id, so make sure that lookup is indexed
+CREATE INDEX IF NOT EXISTS idx_transactions_transaction_id ON transactions(transaction_id);
@@ -0,0 +1,88 @@
+import uuid
+from unittest import mock
+
+from django.test import TestCase
+
+from .. import services
+from ..adapter import SupabaseAdapter
+from ..jobs import JobError, run_webhook_job_handler
+from ..leases import ItemSyncLease
+from ..services import PlaidService
+
+
+class StandInPlaidItemsTable:
+    """Enough of the Supabase query builder to look up plaid_items rows, whose id is a UUID column."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.filters = []
+
+    def select(self, columns='*'):
+        self.filters = []
+        return self
+
+    def eq(self, column, value):
+        self.filters.append((column, value))
+        return self
+
+    def execute(self):
+        for column, value in self.filters:
+            if column == 'id':
+                # Postgres: invalid input syntax for type uuid
+                uuid.UUID(str(value))
+        data = [row for row in self.rows if all(str(row.get(column)) == str(value) for column, value in self.filters)]
+        return mock.Mock(data=data)
+
+
+class TestPlaidItemSync(TestCase):
+    """Test the syncs of a single Plaid item started by webhooks and sync jobs."""
+
+    def setUp(self):
+        self.item = {'id': str(uuid.uuid4()), 'item_id': 'plaid-item-1', 'user_id': 'user-1',
+                     'transactions_cursor': 'cursor-1'}
+        self.table = StandInPlaidItemsTable([self.item])
+        client = mock.Mock()
+        client.table.return_value = self.table
+
+        self.service = PlaidService.__new__(PlaidService)
+        self.service.adapter = SupabaseAdapter(client=client)
+        self.service.plaid_environment, self.service.client_id, self.service.secret = 'sandbox', 'id', 'secret'
+        patch = mock.patch.object(services, 'get_plaid_client', return_value=mock.Mock())
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_webhook_syncs_find_items_by_plaid_item_id(self):
+        """Test that Plaid's item_id finds the item even though the UUID id column rejects it."""
+        with mock.patch.object(PlaidService, '_get_account_id_map', return_value={}), \
+                mock.patch.object(PlaidService, 'sync_item_transactions', return_value={'added': 1}) as sync:
+            self.assertEqual(self.service.sync_plaid_item_transactions('plaid-item-1'), {'added': 1})
+        self.assertEqual(sync.call_args.args[1], self.item)
+
+        investment = {'id': 'acct-1', 'account_id': 'plaid-acct-1', 'plaid_item_id': self.item['id'], 'type': 'investment'}
+        with mock.patch.object(SupabaseAdapter, 'get_accounts', return_value=[investment]), \
+                mock.patch.object(PlaidService, 'sync_all_investment_holdings', return_value=True) as sync:
+            self.assertTrue(self.service.sync_plaid_item_holdings('plaid-item-1'))
+        sync.assert_called_once_with('user-1', self.item['id'], [{'account_id': 'acct-1', 'plaid_account_id': 'plaid-acct-1'}])
+
+    def test_sync_continues_from_the_cursor_stored_before_the_lease(self):
+        """Test that a sync started with an old cursor uses the one the previous sync stored."""
+        stale = dict(self.item)
+        self.item['transactions_cursor'] = 'cursor-2'
+        with mock.patch.object(PlaidService, '_sync_item_transactions', return_value={'added': 0, 'modified': 0, 'removed': 0}) as sync:
+            self.service.sync_item_transactions(mock.Mock(), stale, 'user-1', {})
+        self.assertEqual(sync.call_args.args[1]['transactions_cursor'], 'cursor-2')
+
+    def test_item_held_by_another_sync_is_busy_not_synced(self):
+        """Test that a leased item isn't counted as synced and the webhook job is retried."""
+        other = ItemSyncLease(owner='cron')
+        other.acquire(['plaid-item-1'])
+        self.addCleanup(other.release)
+
+        with mock.patch.object(PlaidService, '_sync_item_transactions') as sync:
+            summary = self.service.sync_transactions_incremental(mock.Mock(id='user-1'))
+            with mock.patch.object(services, 'PlaidService', return_value=self.service), \
+                    mock.patch.object(PlaidService, '_get_account_id_map', return_value={}):
+                with self.assertRaises(JobError):
+                    run_webhook_job_handler({'job': 'transactions', 'item_id': 'plaid-item-1'})
+        sync.assert_not_called()
+        self.assertEqual((summary['items_synced'], summary['items_busy']), (0, 1))
@@ -0,0 +1,77 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from .. import jobs
+from ..jobs import SyncWorker, claim_job, enqueue_job, extend_lease
+from ..models import SyncJob
+
+
+class TestSyncJobQueue(TestCase):
+    """Test the database-backed queue of background sync jobs."""
+
+    def test_enqueue_merges_waiting_duplicates(self):
+        """Test that queueing a job that is already waiting raises its priority instead of adding another."""
+        first = enqueue_job('refresh_user', {'user_id': 'user-a'}, priority=jobs.PRIORITY_SCHEDULED, dedup_key='refresh_user:user-a')
+        second = enqueue_job('refresh_user', {'user_id': 'user-a'}, priority=jobs.PRIORITY_INTERACTIVE, dedup_key='refresh_user:user-a')
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(SyncJob.objects.count(), 1)
+        self.assertEqual(SyncJob.objects.get().priority, jobs.PRIORITY_INTERACTIVE)
+
+    def test_claim_takes_highest_priority_due_job(self):
+        """Test that workers take due jobs by priority and skip jobs backing off."""
+        enqueue_job('refresh_user', priority=jobs.PRIORITY_SCHEDULED)
+        later = enqueue_job('initial_sync', priority=jobs.PRIORITY_INTERACTIVE, run_at=timezone.now() + timedelta(minutes=5))
+        webhook = enqueue_job('webhook', priority=jobs.PRIORITY_WEBHOOK)
+
+        job = claim_job('worker-1')
+        self.assertEqual(job.id, webhook.id)
+        self.assertEqual((job.status, job.locked_by, job.attempts), ('running', 'worker-1', 1))
+        self.assertEqual(claim_job('worker-2').kind, 'refresh_user')
+        self.assertIsNone(claim_job('worker-2'))
+        self.assertEqual(SyncJob.objects.get(id=later.id).status, 'queued')
+
+    def test_expired_lease_is_taken_over(self):
+        """Test that a job whose worker stopped renewing its lease goes to another worker."""
+        enqueue_job('webhook')
+        job = claim_job('worker-1')
+        self.assertIsNone(claim_job('worker-2'))
+
+        SyncJob.objects.filter(id=job.id).update(locked_until=timezone.now() - timedelta(seconds=1))
+        taken = claim_job('worker-2')
+        self.assertEqual((taken.id, taken.locked_by, taken.attempts), (job.id, 'worker-2', 2))
+        self.assertFalse(extend_lease(job, 'worker-1'))
+
+    def test_failed_job_backs_off_then_gives_up(self):
+        """Test that failures are retried later, and marked failed after the last attempt."""
+        calls = []
+
+        def flaky(payload):
+            calls.append(payload)
+            raise jobs.JobError('Plaid is down')
+
+        worker = SyncWorker(worker_id='worker-1')
+        with mock.patch.dict(jobs.JOB_HANDLERS, {'flaky': flaky}):
+            job = enqueue_job('flaky', {'n': 1}, max_attempts=2)
+            self.assertTrue(worker.run_one())
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'queued')
+            self.assertGreater(job.run_at, timezone.now())
+            self.assertEqual(job.last_error, 'Plaid is down')
+
+            SyncJob.objects.filter(id=job.id).update(run_at=timezone.now())
+            self.assertEqual(worker.run_pending(), 1)
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'failed')
+            self.assertEqual(calls, [{'n': 1}, {'n': 1}])
+
+    def test_worker_completes_job(self):
+        """Test that a job whose handler returns is marked done."""
+        with mock.patch.dict(jobs.JOB_HANDLERS, {'noop': lambda payload: None}):
+            job = enqueue_job('noop')
+            self.assertEqual(SyncWorker(worker_id='worker-1').run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertIsNotNone(job.finished_at)
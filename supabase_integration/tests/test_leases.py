@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..leases import ItemSyncLease
+from ..models import SyncLease
+
+
+class TestItemSyncLease(TestCase):
+    """Test the per-item leases that keep two syncs of an item from overlapping."""
+
+    def test_second_sync_skips_leased_items(self):
+        """Test that a sync only gets the items no other sync holds."""
+        first = ItemSyncLease(owner='cron')
+        self.assertEqual(first.acquire(['item-1', 'item-2']), ['item-1', 'item-2'])
+
+        second = ItemSyncLease(owner='refresh-button')
+        self.assertEqual(second.acquire(['item-2', 'item-3']), ['item-3'])
+        self.assertEqual(ItemSyncLease.holder('item-2'), 'cron')
+
+        first.release()
+        second.release()
+        self.assertIsNone(ItemSyncLease.holder('item-2'))
+        self.assertEqual(SyncLease.objects.count(), 0)
+
+    def test_expired_lease_is_taken_over(self):
+        """Test that a lease left behind by a dead sync stops blocking the item once it expires."""
+        ItemSyncLease(owner='dead-worker').acquire(['item-1'])
+        SyncLease.objects.filter(item_id='item-1').update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(ItemSyncLease.holder('item-1'))
+
+        lease = ItemSyncLease(owner='webhook')
+        self.assertEqual(lease.acquire(['item-1']), ['item-1'])
+        self.assertEqual(ItemSyncLease.holder('item-1'), 'webhook')
+        lease.release()
+
+    def test_release_keeps_other_owners_leases(self):
+        """Test that a sync whose lease was taken over doesn't release the new holder's lease."""
+        stale = ItemSyncLease(owner='slow-worker')
+        stale.acquire(['item-1'])
+        SyncLease.objects.filter(item_id='item-1').update(owner='webhook')
+
+        stale.release()
+        self.assertEqual(ItemSyncLease.holder('item-1'), 'webhook')
@@ -0,0 +1,81 @@
+import unittest
+import datetime
+import json
+from ..normalize import TransactionNormalizer
+
+class TestTransactionNormalizer(unittest.TestCase):
+    """Test the mapping of Plaid transactions to transactions rows."""
+
+    def setUp(self):
+        self.normalizer = TransactionNormalizer({'plaid-acc-1': 'account-uuid-1'}, 'user-uuid')
+
+    def test_normalize_page_full_transaction(self):
+        """Test that every mapped Plaid field is written to its column."""
+        tx = {
+            'transaction_id': 'tx-1',
+            'account_id': 'plaid-acc-1',
+            'amount': 12.5,
+            'date': datetime.date(2025, 4, 1),
+            'authorized_date': datetime.date(2025, 3, 31),
+            'name': 'Coffee',
+            'merchant_name': 'Starbucks',
+            'pending': False,
+            'category': ['Food and Drink', 'Coffee Shop'],
+            'payment_meta': {'reference_number': 'ref-1', 'payee': 'Starbucks', 'payer': None},
+            'location': {'city': 'Seattle', 'region': 'WA'},
+            'payment_channel': 'in store',
+            'personal_finance_category': {'primary': 'FOOD_AND_DRINK', 'detailed': 'FOOD_AND_DRINK_COFFEE'},
+            'iso_currency_code': 'USD',
+            'unofficial_currency_code': None,
+        }
+        rows = self.normalizer.normalize_page([tx])
+        self.assertEqual(rows, [{
+            'account_id': 'account-uuid-1',
+            'user_id': 'user-uuid',
+            'transaction_id': 'tx-1',
+            'amount': 12.5,
+            'date': '2025-04-01',
+            'name': 'Coffee',
+            'pending': False,
+            'merchant_name': 'Starbucks',
+            'category': 'Food and Drink',
+            'reference_number': 'ref-1',
+            'payee': 'Starbucks',
+            'location': json.dumps({'city': 'Seattle', 'region': 'WA'}),
+            'payment_channel': 'in store',
+            'category_id': 'FOOD_AND_DRINK',
+            'subcategory': 'FOOD_AND_DRINK_COFFEE',
+            'iso_currency_code': 'USD',
+            'authorized_date': '2025-03-31',
+        }])
+
+    def test_normalize_page_same_columns_for_raw_json(self):
+        """Test that raw JSON and SDK-shaped transactions produce the same row."""
+        sdk_row = self.normalizer.normalize({
+            'transaction_id': 'tx-2', 'account_id': 'plaid-acc-1', 'amount': 3,
+            'date': datetime.date(2025, 4, 2), 'name': 'Bus', 'pending': False
+        })
+        json_row = self.normalizer.normalize({
+            'transaction_id': 'tx-2', 'account_id': 'plaid-acc-1', 'amount': 3,
+            'date': '2025-04-02', 'name': 'Bus', 'pending': False
+        })
+        self.assertEqual(sdk_row, json_row)
+
+    def test_normalize_page_skips_unknown_accounts(self):
+        """Test that transactions of accounts we don't know are left out."""
+        rows = self.normalizer.normalize_page([
+            {'transaction_id': 'tx-3', 'account_id': 'unknown', 'amount': 1, 'date': '2025-04-01'},
+            {'transaction_id': 'tx-4', 'account_id': 'plaid-acc-1', 'amount': 1, 'date': '2025-04-01'},
+        ])
+        self.assertEqual([row['transaction_id'] for row in rows], ['tx-4'])
+
+    def test_normalize_page_without_user_id(self):
+        """Test that no user_id column is written when the user isn't known."""
+        row = TransactionNormalizer({'plaid-acc-1': 'account-uuid-1'}).normalize(
+            {'transaction_id': 'tx-5', 'account_id': 'plaid-acc-1', 'amount': 1, 'date': '2025-04-01'}
+        )
+        self.assertNotIn('user_id', row)
+        self.assertEqual(row['pending'], False)
+
+if __name__ == '__main__':
+    unittest.main()
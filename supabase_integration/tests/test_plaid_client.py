@@ -0,0 +1,25 @@
+import unittest
+from unittest import mock
+from ..plaid_client import call_plaid_json, parse_plaid_json
+
+class TestCallPlaidJson(unittest.TestCase):
+    """Test the raw JSON path for Plaid responses."""
+
+    def test_call_plaid_json_parses_undecoded_body(self):
+        """Test that the body is requested undecoded and parsed into plain dicts."""
+        response = mock.Mock(data=b'{"transactions": [{"transaction_id": "tx-1", "date": "2025-04-01"}], "total_transactions": 1}')
+        client = mock.Mock()
+        client.transactions_get.return_value = response
+
+        data = call_plaid_json(client, 'transactions_get', 'request')
+
+        client.transactions_get.assert_called_once_with('request', _preload_content=False)
+        self.assertEqual(data, {'transactions': [{'transaction_id': 'tx-1', 'date': '2025-04-01'}], 'total_transactions': 1})
+        response.release_conn.assert_called_once()
+
+    def test_parse_plaid_json_accepts_str(self):
+        """Test that bodies already decoded to str are parsed too."""
+        self.assertEqual(parse_plaid_json('{"has_more": false}'), {'has_more': False})
+
+if __name__ == '__main__':
+    unittest.main()
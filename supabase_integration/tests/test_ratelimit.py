@@ -0,0 +1,119 @@
+import unittest
+from unittest import mock
+import json
+import tempfile
+
+from plaid.api_client import ApiClient
+from plaid.configuration import Configuration
+from plaid.exceptions import ApiException
+from plaid.model.transactions_sync_request import TransactionsSyncRequest
+
+from ..plaid_client import TimeoutApiClient
+from ..ratelimit import FileBucketStore, MemoryBucketStore, PlaidRateLimiter, parse_rate_limits
+
+
+def plaid_error(status, error_type):
+    """An ApiException like the ones the SDK raises for Plaid errors"""
+    error = ApiException(status=status, reason='error')
+    error.body = json.dumps({'error_type': error_type, 'error_code': error_type})
+    return error
+
+
+class StandInClock:
+    """A clock that only moves when the code under test sleeps"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBuckets(unittest.TestCase):
+    """Test the token buckets behind the Plaid rate limiter."""
+
+    def test_bucket_allows_burst_then_waits(self):
+        """Test that a bucket hands out its capacity and then asks callers to wait."""
+        clock = StandInClock()
+        store = MemoryBucketStore(clock=clock.time)
+        self.assertEqual([store.take('k', rate=1.0, capacity=3) for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertEqual(store.take('k', rate=1.0, capacity=3), 1.0)
+        clock.sleep(0.25)
+        self.assertEqual(store.take('k', rate=1.0, capacity=3), 0.75)
+
+    def test_file_buckets_are_shared_between_stores(self):
+        """Test that two processes using the same directory draw from the same buckets."""
+        directory = tempfile.mkdtemp()
+        first, second = FileBucketStore(directory), FileBucketStore(directory)
+        self.assertEqual(first.take('k', rate=0.1, capacity=2), 0.0)
+        self.assertEqual(second.take('k', rate=0.1, capacity=2), 0.0)
+        self.assertGreater(first.take('k', rate=0.1, capacity=2), 0)
+
+        second.drain('other')
+        self.assertGreater(first.take('other', rate=0.1, capacity=2), 0)
+
+    def test_parse_rate_limits(self):
+        """Test parsing of PLAID_RATE_LIMITS overrides."""
+        self.assertEqual(parse_rate_limits('/transactions/sync:1000:20, /item/get:100:'),
+                         {'/transactions/sync': (1000, 20), '/item/get': (100, None)})
+
+
+class TestPlaidRateLimiter(unittest.TestCase):
+    """Test pacing and retrying of Plaid calls."""
+
+    def setUp(self):
+        self.clock = StandInClock()
+        self.limiter = PlaidRateLimiter(limits={'/transactions/sync': (600, 60)}, max_retries=3,
+                                        sleep=self.clock.sleep, clock=self.clock.time)
+        # Backoff delays are the middle of their range
+        patch = mock.patch('supabase_integration.ratelimit.random.uniform', side_effect=lambda low, high: high / 2)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_rate_limited_call_is_retried(self):
+        """Test that RATE_LIMIT_EXCEEDED and server errors are retried until the call succeeds."""
+        func = mock.Mock(side_effect=[plaid_error(429, 'RATE_LIMIT_EXCEEDED'), plaid_error(500, 'API_ERROR'), 'response'])
+        self.assertEqual(self.limiter.call('/transactions/sync', 'access-token', func), 'response')
+        self.assertEqual(func.call_count, 3)
+        # Backoff 0.5s, then the rate limit had emptied the item's bucket (1 token/s), so the
+        # retry waited another 0.5s for a token; the server error only backed off 1s
+        self.assertEqual(self.clock.sleeps, [0.5, 0.5, 1.0])
+
+    def test_other_errors_are_not_retried(self):
+        """Test that errors a retry can't fix are raised straight away."""
+        func = mock.Mock(side_effect=plaid_error(400, 'ITEM_ERROR'))
+        with self.assertRaises(ApiException):
+            self.limiter.call('/transactions/sync', 'access-token', func)
+        self.assertEqual(func.call_count, 1)
+
+        exchange = mock.Mock(side_effect=plaid_error(500, 'API_ERROR'))
+        with self.assertRaises(ApiException):
+            self.limiter.call('/item/public_token/exchange', None, exchange)
+        self.assertEqual(exchange.call_count, 1)
+
+    def test_gives_up_after_max_retries(self):
+        """Test that a call that keeps failing raises its last error."""
+        func = mock.Mock(side_effect=plaid_error(503, 'API_ERROR'))
+        with self.assertRaises(ApiException):
+            self.limiter.call('/transactions/sync', 'access-token', func)
+        self.assertEqual(func.call_count, 4)
+
+    def test_client_limits_calls_per_item(self):
+        """Test that the pooled client takes tokens for the endpoint and the request's item."""
+        limiter = mock.Mock(call=mock.Mock(side_effect=lambda endpoint, item_key, func: func()))
+        client = TimeoutApiClient(Configuration(host='https://sandbox.plaid.com'), rate_limiter=limiter)
+        request = TransactionsSyncRequest(access_token='access-token')
+        with mock.patch.object(ApiClient, 'call_api', return_value='response') as call_api:
+            self.assertEqual(client.call_api('/transactions/sync', 'POST', body=request), 'response')
+        limiter.call.assert_called_once()
+        self.assertEqual(limiter.call.call_args[0][:2], ('/transactions/sync', 'access-token'))
+        call_api.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+import os
+import tempfile
+from ..refresh import PlaidRefreshEngine, RefreshCheckpoint, parse_shard, shard_of
+
+class TestPlaidRefreshEngine(unittest.TestCase):
+    """Test planning and resuming scheduled Plaid refreshes."""
+
+    def setUp(self):
+        self.items = [
+            {'id': 'item-1', 'user_id': 'user-a'},
+            {'id': 'item-2', 'user_id': 'user-a'},
+            {'id': 'item-3', 'user_id': 'user-b'},
+            {'id': 'item-4', 'user_id': 'user-c'},
+        ]
+        self.path = os.path.join(tempfile.mkdtemp(), 'checkpoint.json')
+
+    def test_plan_refreshes_each_user_once(self):
+        """Test that a user with several stale items is refreshed once."""
+        plan = PlaidRefreshEngine(None).plan(self.items)
+        self.assertEqual(plan['users'], {'user-a': 2, 'user-b': 1, 'user-c': 1})
+        self.assertEqual(plan['items'], 4)
+
+    def test_plan_shards_partition_users(self):
+        """Test that the shards of a run cover every user exactly once."""
+        engine = PlaidRefreshEngine(None)
+        shards = [set(engine.plan(self.items, shard=(i, 3))['users']) for i in range(3)]
+        self.assertEqual(sorted(user for shard in shards for user in shard), ['user-a', 'user-b', 'user-c'])
+        self.assertEqual(shard_of('user-a', 3), shard_of('user-a', 3))
+
+    def test_parse_shard(self):
+        """Test parsing of --shard values."""
+        self.assertEqual(parse_shard('1/4'), (1, 4))
+        self.assertIsNone(parse_shard(None))
+        with self.assertRaises(ValueError):
+            parse_shard('4/4')
+
+    def test_checkpoint_resumes_unfinished_users(self):
+        """Test that a second run only refreshes the users the first didn't finish."""
+        checkpoint = RefreshCheckpoint(self.path, key='soft:incremental:all')
+        checkpoint.mark_done('user-a')
+
+        resumed = RefreshCheckpoint(self.path, key='soft:incremental:all')
+        self.assertEqual(resumed.load(), 1)
+        plan = PlaidRefreshEngine(None, checkpoint=resumed).plan(self.items)
+        self.assertEqual(set(plan['users']), {'user-b', 'user-c'})
+        self.assertEqual(plan['skipped'], 1)
+
+        other_run = RefreshCheckpoint(self.path, key='soft:full:all')
+        self.assertEqual(other_run.load(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
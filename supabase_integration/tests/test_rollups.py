@@ -0,0 +1,112 @@
+import unittest
+from datetime import date
+from unittest import mock
+
+from ..adapter import PlaidAdapter
+from ..rollups import RollupDelta, account_class, summarize_rollups
+
+
+def transaction(transaction_id, amount, day='2024-05-10', category='Food', **fields):
+    """A stored transaction row"""
+    return {'id': f'uuid-{transaction_id}', 'transaction_id': transaction_id, 'user_id': 'user-1',
+            'account_id': 'acct-1', 'amount': amount, 'date': day, 'category': category, 'name': 'Shop', **fields}
+
+
+class TestRollupDelta(unittest.TestCase):
+    """Test how transaction changes turn into monthly rollup changes."""
+
+    def test_changes_move_totals_between_rollups(self):
+        """Test that a changed transaction is counted out of its old rollup and into its new one."""
+        delta = RollupDelta({'acct-1': 'depository'})
+        delta.remove(transaction('t1', 10, day='2024-04-30'))
+        delta.add(transaction('t1', 25, day='2024-05-01'))
+        delta.add(transaction('t2', -100, category=None, name='Payroll'))
+        delta.add(transaction('t3', 40, name='Zelle payment'))
+
+        rows = {(row['month'], row['category'], row['is_transfer']): row for row in delta.rows()}
+        self.assertEqual(rows[('2024-04-01', 'Food', False)]['spending'], -10)
+        self.assertEqual(rows[('2024-04-01', 'Food', False)]['transaction_count'], -1)
+        self.assertEqual(rows[('2024-05-01', 'Food', False)]['spending'], 25)
+        self.assertEqual(rows[('2024-05-01', 'Uncategorized', False)]['income'], 100)
+        self.assertEqual(rows[('2024-05-01', 'Food', True)]['spending'], 40)
+
+    def test_unchanged_rollups_are_left_out(self):
+        """Test that counting a transaction in and out again changes nothing."""
+        delta = RollupDelta({})
+        delta.add(transaction('t1', 10))
+        delta.remove(transaction('t1', 10))
+        self.assertEqual(delta.rows(), [])
+
+    def test_summary_matches_budget_figures(self):
+        """Test that summarized rollups give the totals the budgeting pages show."""
+        delta = RollupDelta({'acct-1': 'depository', 'acct-2': account_class({'type': 'investment'})})
+        delta.add(transaction('t1', 30))
+        delta.add(transaction('t2', 20, name='Venmo'))
+        delta.add(transaction('t3', -50))
+        delta.add(transaction('t4', 1000, account_id='acct-2'))
+
+        month = summarize_rollups(delta.rows())[date(2024, 5, 1)]
+        self.assertEqual((month['income'], month['spending'], month['transfers'], month['count']), (50, 50, 20, 3))
+        self.assertEqual(month['spending_by_category'], {'Food': 30, 'Transfer': 20})
+        self.assertEqual(summarize_rollups(delta.rows(), exclude_classes=())[date(2024, 5, 1)]['spending'], 1050)
+
+
+class TestRollupMaintenance(unittest.TestCase):
+    """Test that transaction writes keep the rollups up to date."""
+
+    def setUp(self):
+        self.stored = [transaction('t1', 10)]
+        self.client = mock.MagicMock()
+        self.client.table.side_effect = self.table
+        self.builders = {}
+        patches = [
+            mock.patch('supabase_integration.adapter.monthly_rollups_enabled', return_value=True),
+            mock.patch('supabase_integration.adapter.schema_registry.get_columns', return_value=None),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.adapter = PlaidAdapter(client=self.client)
+
+    def table(self, name):
+        """A query builder returning the stored rows of a table"""
+        builder = mock.MagicMock()
+        self.builders.setdefault(name, []).append(builder)
+        data = {'transactions': self.stored, 'accounts': [{'id': 'acct-1', 'type': 'depository'}]}[name]
+        builder.select.return_value.in_.return_value.execute.return_value.data = data
+        builder.select.return_value.in_.return_value.eq.return_value.execute.return_value.data = data
+        builder.delete.return_value.eq.return_value.in_.return_value.execute.return_value.data = data
+        return builder
+
+    def applied(self):
+        """The rollup changes sent to apply_monthly_rollup_deltas"""
+        return [row for call in self.client.rpc.call_args_list for row in call[0][1]['deltas']]
+
+    def test_upsert_applies_the_difference(self):
+        """Test that an upsert sends only what changed: the modified amount and the new transaction."""
+        counts = self.adapter.upsert_transactions([transaction('t1', 25), transaction('t2', -5, category='Refund')])
+        self.assertEqual(counts, {'inserted': 1, 'updated': 1, 'unchanged': 0})
+
+        deltas = {row['category']: row for row in self.applied()}
+        self.assertEqual((deltas['Food']['spending'], deltas['Food']['transaction_count']), (15, 0))
+        self.assertEqual((deltas['Refund']['income'], deltas['Refund']['transaction_count']), (5, 1))
+
+    def test_inserts_and_updates_are_written_separately(self):
+        """Test that new rows and full updated rows never share an upsert, and only the owner's rows are read."""
+        new = {key: value for key, value in transaction('t2', -5).items() if key not in ('id', 'name')}
+        self.adapter.upsert_transactions([transaction('t1', 25), new])
+
+        lookup = self.builders['transactions'][0].select.return_value.in_.return_value
+        lookup.eq.assert_called_once_with('user_id', 'user-1')
+        upserts = [call.args[0] for builder in self.builders['transactions'] for call in builder.upsert.call_args_list]
+        self.assertEqual(sorted([row['transaction_id'] for row in rows] for rows in upserts), [['t1'], ['t2']])
+
+    def test_delete_counts_removed_transactions_out(self):
+        """Test that deleting a transaction takes it out of its rollup."""
+        self.assertEqual(self.adapter.delete_transactions('user-1', ['t1']), 1)
+        self.builders['transactions'][0].delete.return_value.eq.assert_called_once_with('user_id', 'user-1')
+        self.assertEqual([(row['spending'], row['transaction_count']) for row in self.applied()], [(-10, -1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+
+from django.test import TestCase
+
+from ..models import UserActivity
+from ..scheduler import RefreshScheduler, get_last_dashboard_visits, record_dashboard_visit
+
+
+NOW = datetime(2024, 6, 1, 12, tzinfo=timezone.utc)
+
+
+def item(item_id, user_id, age_hours=None, **fields):
+    """A plaid_items row last updated age_hours before NOW"""
+    last_update = (NOW - timedelta(hours=age_hours)).isoformat() if age_hours is not None else None
+    return {'id': item_id, 'item_id': item_id, 'user_id': user_id, 'institution_id': 'ins_1',
+            'connection_status': 'active', 'last_successful_update': last_update, **fields}
+
+
+class TestRefreshScheduler(TestCase):
+    """Test how scheduled refreshes rank and budget Plaid items."""
+
+    def setUp(self):
+        self.scheduler = RefreshScheduler(budget=0, default_cadence_hours=24, cadence_hours={'ins_fast': 6}, now=NOW)
+
+    def test_items_not_due_or_needing_relink_are_skipped(self):
+        """Test that fresh items and items needing the user are left out."""
+        self.assertIsNone(self.scheduler.score(item('i1', 'u1', age_hours=12)))
+        self.assertIsNotNone(self.scheduler.score(item('i1', 'u1', age_hours=12, institution_id='ins_fast')))
+        self.assertIsNone(self.scheduler.score(item('i2', 'u1', age_hours=200, connection_status='login_required')))
+        self.assertIsNotNone(self.scheduler.score(item('i3', 'u1')))
+
+    def test_active_users_rank_first(self):
+        """Test that a recent visitor's item beats an equally stale item of an inactive user."""
+        items = [item('i1', 'inactive', age_hours=48), item('i2', 'active', age_hours=48), item('i3', 'errored', age_hours=48, update_type='error')]
+        visits = {'active': NOW - timedelta(hours=1), 'errored': NOW - timedelta(hours=1)}
+        batch = self.scheduler.select(items, visits)
+        self.assertEqual([i['id'] for i in batch['items']], ['i2', 'i3', 'i1'])
+
+    def test_budget_defers_lower_priority_users(self):
+        """Test that a user costs the budget all of their items and the rest wait for a later run."""
+        items = [item('a1', 'a', age_hours=100), item('a2', 'a', age_hours=1), item('b1', 'b', age_hours=50), item('c1', 'c', age_hours=30)]
+        visits = {user: NOW for user in 'abc'}
+        batch = RefreshScheduler(budget=3, default_cadence_hours=24, cadence_hours={}, now=NOW).select(items, visits)
+        self.assertEqual([i['id'] for i in batch['items']], ['a1', 'b1'])
+        self.assertEqual((batch['users'], batch['due'], batch['deferred'], batch['not_due']), (2, 3, 1, 1))
+
+    def test_dashboard_visits_are_recorded(self):
+        """Test that dashboard visits are stored for the scheduler."""
+        record_dashboard_visit('user-a')
+        record_dashboard_visit('user-a')
+        self.assertEqual(UserActivity.objects.count(), 1)
+        self.assertEqual(set(get_last_dashboard_visits(['user-a', 'user-b'])), {'user-a'})
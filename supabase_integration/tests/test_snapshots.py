@@ -0,0 +1,48 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+
+from ..models import DashboardSnapshot
+from ..snapshots import get_dashboard_snapshot, invalidate_dashboard, save_dashboard_snapshot
+
+
+@override_settings(DASHBOARD_SNAPSHOT_TTL=3600)
+class TestDashboardSnapshots(TestCase):
+    """Test the per-user dashboard snapshots and their invalidation."""
+
+    def test_snapshot_is_served_until_invalidated(self):
+        """Test that a stored dashboard is returned until the user's data changes."""
+        context, version = get_dashboard_snapshot('user-1')
+        self.assertIsNone(context)
+        self.assertTrue(save_dashboard_snapshot('user-1', version, {'net_worth': 1200.5}))
+
+        context, version = get_dashboard_snapshot('user-1')
+        self.assertEqual(context, {'net_worth': 1200.5})
+
+        invalidate_dashboard('user-1')
+        context, _ = get_dashboard_snapshot('user-1')
+        self.assertIsNone(context)
+
+    def test_dashboard_computed_during_a_sync_is_not_stored(self):
+        """Test that a dashboard read before an invalidation can't overwrite it."""
+        _, version = get_dashboard_snapshot('user-1')
+        invalidate_dashboard('user-1')
+
+        self.assertFalse(save_dashboard_snapshot('user-1', version, {'net_worth': 0}))
+        self.assertEqual(get_dashboard_snapshot('user-1'), (None, version + 1))
+
+    def test_old_snapshot_is_rebuilt(self):
+        """Test that a snapshot older than the TTL is not served."""
+        _, version = get_dashboard_snapshot('user-1')
+        save_dashboard_snapshot('user-1', version, {'net_worth': 10})
+        snapshot = DashboardSnapshot.objects.get(user_id='user-1')
+        DashboardSnapshot.objects.filter(pk=snapshot.pk).update(built_at=snapshot.built_at - timedelta(hours=2))
+
+        self.assertEqual(get_dashboard_snapshot('user-1'), (None, version))
+
+    @override_settings(DASHBOARD_SNAPSHOT_TTL=0)
+    def test_snapshots_can_be_turned_off(self):
+        """Test that nothing is read or stored when the TTL is 0."""
+        self.assertEqual(get_dashboard_snapshot('user-1'), (None, None))
+        self.assertFalse(save_dashboard_snapshot('user-1', None, {'net_worth': 10}))
+        self.assertFalse(DashboardSnapshot.objects.exists())
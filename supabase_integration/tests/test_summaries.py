@@ -0,0 +1,51 @@
+import unittest
+from datetime import date
+from unittest import mock
+
+from django.test import override_settings
+
+from ..adapter import FinancialAdapter
+from ..queries import TransactionQuery
+
+
+class TestTransactionSummaries(unittest.TestCase):
+    """Test summing transactions with the database functions."""
+
+    def setUp(self):
+        self.client = mock.MagicMock()
+        self.adapter = FinancialAdapter(client=self.client)
+        self.query = TransactionQuery('user-1', start_date=date(2024, 5, 1), end_date='2024-05-31',
+                                      exclude_account_ids=['inv-1'], category='Food', sign='expense')
+
+    def test_query_filters_become_function_parameters(self):
+        """Test that the query's filters are passed to the function, and empty account lists mean no filter."""
+        self.assertEqual(self.query.rpc_params(), {
+            'p_user_id': 'user-1', 'p_start_date': '2024-05-01', 'p_end_date': '2024-05-31',
+            'p_account_ids': None, 'p_exclude_account_ids': ['inv-1'], 'p_category': 'Food',
+            'p_search': None, 'p_sign': 'expense',
+        })
+
+    @override_settings(TRANSACTION_SUMMARY_RPC=True)
+    def test_summary_calls_the_grouping_function(self):
+        """Test that each grouping calls its own function and returns its rows."""
+        rows = [{'key': 'Food', 'is_transfer': False, 'income': 0, 'spending': 42.5, 'transaction_count': 3}]
+        self.client.rpc.return_value.execute.return_value.data = rows
+
+        self.assertEqual(self.adapter.summarize_transactions(self.query, 'category'), rows)
+        self.client.rpc.assert_called_once_with('transaction_totals_by_category', self.query.rpc_params())
+        with self.assertRaises(ValueError):
+            self.adapter.summarize_transactions(self.query, 'day')
+
+    def test_callers_fall_back_when_functions_are_unavailable(self):
+        """Test that None is returned when the setting is off or the function call fails."""
+        with override_settings(TRANSACTION_SUMMARY_RPC=False):
+            self.assertIsNone(self.adapter.summarize_transactions(self.query, 'month'))
+        self.client.rpc.assert_not_called()
+
+        self.client.rpc.side_effect = Exception('function transaction_totals_by_month does not exist')
+        with override_settings(TRANSACTION_SUMMARY_RPC=True):
+            self.assertIsNone(self.adapter.summarize_transactions(self.query, 'month'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from .. import adapter
+from ..adapter import PlaidAdapter
+from ..services import PlaidService
+
+
+class TestPlaidSyncStatus(unittest.TestCase):
+    """Test recording and reporting the background sync of newly linked items."""
+
+    def setUp(self):
+        self.client = mock.MagicMock()
+        self.adapter = PlaidAdapter(client=self.client)
+
+    def columns(self, *names):
+        """Patch the plaid_items columns the schema registry reports"""
+        patch = mock.patch.object(adapter.schema_registry, 'get_columns', return_value=frozenset(('id', 'item_id') + names))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_update_sync_status_writes_the_items_row(self):
+        """Test that the status, error and time are written to the item found by Plaid's item_id."""
+        self.columns('sync_status', 'sync_error', 'sync_status_updated_at')
+        self.client.table.return_value.update.return_value.eq.return_value.execute.return_value.data = [{'id': 'uuid-1'}]
+
+        self.assertTrue(self.adapter.update_sync_status('plaid-item-1', 'failed', error='ITEM_LOGIN_REQUIRED'))
+        written = self.client.table.return_value.update.call_args.args[0]
+        self.assertEqual((written['sync_status'], written['sync_error']), ('failed', 'ITEM_LOGIN_REQUIRED'))
+        self.client.table.return_value.update.return_value.eq.assert_called_once_with('item_id', 'plaid-item-1')
+
+    def test_update_sync_status_without_the_columns(self):
+        """Test that nothing is written before plaid_item_sync_status.sql has been run."""
+        self.columns('transactions_cursor')
+        self.assertFalse(self.adapter.update_sync_status('plaid-item-1', 'queued'))
+        self.client.table.return_value.update.assert_not_called()
+
+    def test_get_sync_status_reports_interrupted_and_legacy_items(self):
+        """Test that a sync stuck for too long is failed, and rows without the columns aren't syncing."""
+        now = datetime.now(timezone.utc)
+        service = PlaidService.__new__(PlaidService)
+        service.adapter = mock.Mock()
+        service.adapter.get_plaid_items.return_value = [
+            {'id': 'uuid-1', 'item_id': 'plaid-1', 'sync_status': 'transactions',
+             'sync_status_updated_at': (now - timedelta(minutes=1)).isoformat()},
+            {'id': 'uuid-2', 'item_id': 'plaid-2', 'sync_status': 'accounts',
+             'sync_status_updated_at': (now - timedelta(hours=1)).isoformat()},
+            {'id': 'uuid-3', 'item_id': 'plaid-3'},
+        ]
+        user = mock.Mock(id='user-1')
+
+        status = service.get_sync_status(user)
+        self.assertTrue(status['syncing'])
+        self.assertEqual([item['sync_status'] for item in status['items']], ['transactions', 'failed', None])
+        self.assertEqual(status['items'][1]['sync_error'], 'The sync was interrupted')
+
+        status = service.get_sync_status(user, item_id='uuid-3')
+        self.assertFalse(status['syncing'])
+        self.assertEqual([item['item_id'] for item in status['items']], ['plaid-3'])
+
+
+
+class TestBufferedStatusUpdates(unittest.TestCase):
+    """Test the batched Plaid item status writes of the refresh command."""
+
+    def setUp(self):
+        self.client = mock.MagicMock()
+        self.adapter = PlaidAdapter(client=self.client)
+        self.batches = []
+        patch = mock.patch.object(PlaidAdapter, '_write_status_updates',
+                                  side_effect=lambda pending: self.batches.append(sorted(pending)) or len(pending))
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.adapter.buffer_status_updates()
+
+    def test_statuses_are_written_in_batches(self):
+        """Test that a full batch is written during the run and the rest at the end."""
+        with mock.patch.object(adapter, 'STATUS_FLUSH_BATCH', 2):
+            for item_id in ('item-1', 'item-2', 'item-3'):
+                self.assertIsNone(self.adapter.record_soft_refresh(item_id))
+            self.assertEqual(self.batches, [['item-1', 'item-2']])
+
+            self.assertEqual(self.adapter.flush_status_updates(), 3)
+        self.assertEqual(self.batches, [['item-1', 'item-2'], ['item-3']])
+        self.client.table.return_value.update.assert_not_called()
+
+    def test_error_statuses_are_written_at_once(self):
+        """Test that an error is written straight away and replaces the item's buffered status."""
+        self.adapter.record_soft_refresh('item-1')
+        self.client.table.return_value.update.return_value.eq.return_value.execute.return_value.data = [{'id': 'uuid-1'}]
+
+        with mock.patch.object(adapter.schema_registry, 'get_columns', return_value=None):
+            self.assertTrue(self.adapter.update_plaid_item_status('item-1', status='login_required', update_type='error'))
+        self.assertEqual(self.client.table.return_value.update.call_args.args[0],
+                         {'connection_status': 'login_required', 'update_type': 'error'})
+
+        self.assertEqual(self.adapter.flush_status_updates(), 0)
+        self.assertEqual(self.batches, [[]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,7 @@
 import unittest
 import datetime
 import uuid
-from ..utils import serialize_for_supabase, serialize_value, clean_for_schema, extract_schema_columns
+from ..utils import serialize_for_supabase, serialize_value, clean_for_schema, extract_schema_columns, row_has_changes
 
 class TestSerializationUtils(unittest.TestCase):
     """Test the serialization utilities for Supabase data."""
@@ -90,6 +90,31 @@ class TestSerializationUtils(unittest.TestCase):
         self.assertEqual(result["amount"], 100.50)
         self.assertEqual(result["merchant_name"], "Test Merchant")
         self.assertNotIn("extra_field", result)
+    
+    def test_row_has_changes_unchanged(self):
+        """Test that a re-synced transaction with the same values is not a change."""
+        existing = {
+            "id": "65c33222-de65-4c56-ab96-c5aa9a678709",
+            "transaction_id": "tx_1",
+            "amount": "25.5",
+            "date": "2025-04-01",
+            "location": {"city": "Boston"},
+            "created_at": "2025-04-02T10:00:00+00:00"
+        }
+        incoming = {
+            "id": "a-new-uuid",
+            "transaction_id": "tx_1",
+            "amount": 25.5,
+            "date": "2025-04-01",
+            "location": '{"city": "Boston"}'
+        }
+        self.assertFalse(row_has_changes(incoming, existing))
+    
+    def test_row_has_changes_modified(self):
+        """Test that a changed value is detected."""
+        existing = {"transaction_id": "tx_1", "amount": 25.5, "pending": True}
+        incoming = {"transaction_id": "tx_1", "amount": 25.5, "pending": False}
+        self.assertTrue(row_has_changes(incoming, existing))
 
 if __name__ == "__main__":
     unittest.main() 
\ No newline at end of file
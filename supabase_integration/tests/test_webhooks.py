@@ -0,0 +1,136 @@
+import unittest
+from unittest import mock
+import hashlib
+import json
+import threading
+import time
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec
+from jwt.algorithms import ECAlgorithm
+
+from .. import webhooks
+from ..webhooks import ItemSyncBusy, PlaidWebhookVerifier, PlaidWebhookQueue, handle_plaid_webhook, webhook_job
+
+
+class StandInPlaidWebhookSender:
+    """Signs webhooks the way Plaid does, with a key only this sender and the verifier know."""
+
+    def __init__(self, key_id='test-key-1'):
+        self.key_id = key_id
+        self._private_key = ec.generate_private_key(ec.SECP256R1())
+        jwk = json.loads(ECAlgorithm.to_jwk(self._private_key.public_key()))
+        self.jwk = {**jwk, 'kid': key_id, 'alg': 'ES256', 'use': 'sig', 'created_at': 1, 'expired_at': None}
+
+    def fetch_key(self, key_id):
+        """Stands in for /webhook_verification_key/get"""
+        return self.jwk if key_id == self.key_id else None
+
+    def send(self, payload, issued_at=None):
+        """Build the body and Plaid-Verification header of a webhook"""
+        body = json.dumps(payload).encode('utf-8')
+        claims = {
+            'iat': int(issued_at if issued_at is not None else time.time()),
+            'request_body_sha256': hashlib.sha256(body).hexdigest(),
+        }
+        token = jwt.encode(claims, self._private_key, algorithm='ES256', headers={'kid': self.key_id})
+        return body, token
+
+
+class TestPlaidWebhookVerifier(unittest.TestCase):
+    """Test verification of Plaid webhook signatures."""
+
+    def setUp(self):
+        self.sender = StandInPlaidWebhookSender()
+        self.verifier = PlaidWebhookVerifier(key_fetcher=self.sender.fetch_key)
+        self.payload = {'webhook_type': 'TRANSACTIONS', 'webhook_code': 'SYNC_UPDATES_AVAILABLE', 'item_id': 'item-1'}
+
+    def test_verify_accepts_signed_webhook(self):
+        """Test that a webhook signed by Plaid's key is accepted."""
+        body, token = self.sender.send(self.payload)
+        self.assertTrue(self.verifier.verify(body, token))
+
+    def test_verify_rejects_tampered_body(self):
+        """Test that a body that doesn't match the signed hash is rejected."""
+        body, token = self.sender.send(self.payload)
+        self.assertFalse(self.verifier.verify(body.replace(b'item-1', b'item-2'), token))
+
+    def test_verify_rejects_old_signature(self):
+        """Test that replayed webhooks with an old signature are rejected."""
+        body, token = self.sender.send(self.payload, issued_at=time.time() - 600)
+        self.assertFalse(self.verifier.verify(body, token))
+
+    def test_verify_rejects_other_key(self):
+        """Test that a webhook signed with a key Plaid doesn't know is rejected."""
+        body, token = StandInPlaidWebhookSender(key_id='unknown-key').send(self.payload)
+        self.assertFalse(self.verifier.verify(body, token))
+        self.assertFalse(self.verifier.verify(body, None))
+
+
+class TestPlaidWebhookHandling(unittest.TestCase):
+    """Test that webhooks queue the right per-item jobs."""
+
+    def setUp(self):
+        self.sender = StandInPlaidWebhookSender()
+        self.jobs = []
+        self.queue = PlaidWebhookQueue(handler=lambda job, item_id, payload: self.jobs.append((job, item_id)))
+        patches = [
+            mock.patch.object(webhooks, 'plaid_webhook_verifier', PlaidWebhookVerifier(key_fetcher=self.sender.fetch_key)),
+            mock.patch.object(webhooks, 'plaid_webhook_queue', self.queue),
+            mock.patch.object(webhooks, 'settings', mock.Mock(PLAID_WEBHOOK_VERIFY=True, PLAID_JOB_QUEUE=False)),
+            mock.patch.object(webhooks, 'close_old_connections'),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_webhook_job_routing(self):
+        """Test which webhooks map to which jobs."""
+        self.assertEqual(webhook_job({'webhook_type': 'HOLDINGS', 'webhook_code': 'DEFAULT_UPDATE', 'item_id': 'i'}), ('holdings', 'i'))
+        self.assertEqual(webhook_job({'webhook_type': 'ITEM', 'webhook_code': 'ERROR', 'item_id': 'i'}), ('item_status', 'i'))
+        self.assertIsNone(webhook_job({'webhook_type': 'TRANSACTIONS', 'webhook_code': 'RECURRING_TRANSACTIONS_UPDATE', 'item_id': 'i'}))
+
+    def test_handle_plaid_webhook_queues_item_sync(self):
+        """Test that a signed webhook queues a sync of its item."""
+        body, token = self.sender.send({'webhook_type': 'TRANSACTIONS', 'webhook_code': 'SYNC_UPDATES_AVAILABLE', 'item_id': 'item-1'})
+        status, response = handle_plaid_webhook(body, token)
+        self.queue.join()
+        self.assertEqual(status, 200)
+        self.assertEqual(response['job'], 'transactions')
+        self.assertEqual(self.jobs, [('transactions', 'item-1')])
+
+    def test_handle_plaid_webhook_rejects_unsigned(self):
+        """Test that nothing is queued for a webhook without a valid signature."""
+        body, _ = self.sender.send({'webhook_type': 'TRANSACTIONS', 'webhook_code': 'SYNC_UPDATES_AVAILABLE', 'item_id': 'item-1'})
+        status, _ = handle_plaid_webhook(body, 'not-a-jwt')
+        self.queue.join()
+        self.assertEqual(status, 401)
+        self.assertEqual(self.jobs, [])
+
+    def test_queue_drops_duplicate_waiting_jobs(self):
+        """Test that a burst of webhooks for one item runs one sync."""
+        queue = PlaidWebhookQueue(handler=lambda job, item_id, payload: None)
+        queue._pending.add(('transactions', 'item-1', None))
+        self.assertFalse(queue.enqueue('transactions', 'item-1'))
+        self.assertTrue(queue.enqueue('holdings', 'item-1'))
+        queue.join()
+
+    def test_queue_runs_busy_jobs_again(self):
+        """Test that a job whose item another sync held is queued again instead of dropped."""
+        runs = []
+        finished = threading.Event()
+
+        def handler(job, item_id, payload):
+            runs.append(job)
+            if len(runs) == 1:
+                raise ItemSyncBusy(f"Plaid item {item_id} is being synced by another process")
+            finished.set()
+
+        queue = PlaidWebhookQueue(handler=handler, busy_retry_delay=0)
+        queue.enqueue('transactions', 'item-1')
+        self.assertTrue(finished.wait(5))
+        self.assertEqual(runs, ['transactions', 'transactions'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,7 @@
 """
 Utility functions for the Supabase integration.
 """
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, Iterable, List, Optional, Union
 import datetime
 import uuid
 import json
@@ -295,21 +295,33 @@ def serialize_value(value: Any) -> Any:
     # Handle other types
     return value
 
-def clean_for_schema(data: Dict[str, Any], schema_columns: List[str]) -> Dict[str, Any]:
+def clean_for_schema(data: Dict[str, Any], schema_columns: Optional[Iterable[str]] = None,
+                     table: Optional[str] = None) -> Dict[str, Any]:
     """
     Clean data to match schema columns and ensure all values are serialized
     
     Args:
         data: The data to clean
-        schema_columns: List of column names in the schema
+        schema_columns: Column names in the schema; a set is fastest
+        table: Table name to look the columns up in the schema registry when
+               schema_columns isn't given
         
     Returns:
-        Cleaned and serialized data
+        Cleaned and serialized data. If the columns are unknown, nothing is filtered out.
     """
+    if schema_columns is None and table:
+        from .schema import schema_registry
+        schema_columns = schema_registry.get_columns(table)
+    
     # First serialize all values
     serialized_data = serialize_for_supabase(data)
     
+    if schema_columns is None:
+        return serialized_data
+    
     # Then filter to only include fields in the schema
+    if not isinstance(schema_columns, (set, frozenset)):
+        schema_columns = set(schema_columns)
     return {k: v for k, v in serialized_data.items() if k in schema_columns}
 
 def extract_schema_columns(response) -> List[str]:
@@ -328,4 +340,59 @@ def extract_schema_columns(response) -> List[str]:
     except Exception as e:
         logger.warning(f"Could not extract schema columns: {str(e)}")
     
-    return [] 
\ No newline at end of file
+    return []
+
+def row_has_changes(incoming: Dict[str, Any], existing: Dict[str, Any], ignore: List[str] = None) -> bool:
+    """
+    Check whether an incoming row would change an existing database row
+    
+    Only the fields present in the incoming row are compared, so a partial row
+    never counts as a change for the columns it doesn't include.
+    
+    Args:
+        incoming: The serialized row we are about to write
+        existing: The row currently stored in Supabase
+        ignore: Field names to skip (defaults to the primary key 'id')
+        
+    Returns:
+        True if any incoming value differs from the stored one, False otherwise
+    """
+    ignore = ignore if ignore is not None else ['id']
+    
+    for key, new_value in incoming.items():
+        if key in ignore:
+            continue
+        
+        old_value = existing.get(key)
+        if new_value == old_value:
+            continue
+        
+        # JSON columns come back decoded while we send them as strings
+        if isinstance(new_value, str) and isinstance(old_value, (dict, list)):
+            try:
+                if json.loads(new_value) == old_value:
+                    continue
+            except ValueError:
+                pass
+        
+        # Numeric columns may come back as strings or with a different type
+        if isinstance(new_value, (int, float)) and not isinstance(new_value, bool) and old_value is not None:
+            try:
+                if float(new_value) == float(old_value):
+                    continue
+            except (TypeError, ValueError):
+                pass
+        
+        # Dates and timestamps may come back in a different ISO format
+        if isinstance(new_value, str) and isinstance(old_value, str):
+            try:
+                new_dt = datetime.datetime.fromisoformat(new_value)
+                old_dt = datetime.datetime.fromisoformat(old_value)
+                if new_dt == old_dt or (len(new_value) == 10 and new_dt.date() == old_dt.date()):
+                    continue
+            except ValueError:
+                pass
+        
+        return True
+    
+    return False
@@ -0,0 +1,316 @@
+"""
+Receiving Plaid webhooks and turning them into targeted per-item syncs.
+"""
+from typing import Any, Callable, Dict, Optional, Tuple
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import threading
+import time
+
+import jwt
+from jwt.algorithms import ECAlgorithm
+
+from django.conf import settings
+from django.db import close_old_connections
+from plaid.model.webhook_verification_key_get_request import WebhookVerificationKeyGetRequest
+
+from .plaid_client import get_plaid_client, parse_plaid_json
+
+logger = logging.getLogger(__name__)
+
+# Webhooks we act on: (webhook_type, webhook_code) -> job
+WEBHOOK_JOBS = {
+    ('TRANSACTIONS', 'SYNC_UPDATES_AVAILABLE'): 'transactions',
+    ('TRANSACTIONS', 'DEFAULT_UPDATE'): 'transactions',
+    ('HOLDINGS', 'DEFAULT_UPDATE'): 'holdings',
+    ('ITEM', 'ERROR'): 'item_status',
+    ('ITEM', 'PENDING_EXPIRATION'): 'item_status',
+    ('ITEM', 'USER_PERMISSION_REVOKED'): 'item_status',
+    ('ITEM', 'LOGIN_REPAIRED'): 'item_status',
+}
+
+# Plaid signs every webhook; older signatures are rejected to stop replays
+MAX_WEBHOOK_AGE = 5 * 60
+
+# Seconds before a job whose item was being synced by someone else runs again
+BUSY_RETRY_DELAY = 30
+
+
+class ItemSyncBusy(Exception):
+    """Raised by a webhook job whose item another sync holds; the job must run again after it"""
+
+
+def fetch_verification_key(key_id: str) -> Dict[str, Any]:
+    """Get one of Plaid's webhook signing keys (a JWK) from /webhook_verification_key/get"""
+    request = WebhookVerificationKeyGetRequest(key_id=key_id)
+    response = get_plaid_client().webhook_verification_key_get(request)
+    return response.to_dict()['key']
+
+
+class PlaidWebhookVerifier:
+    """
+    Checks the Plaid-Verification header of incoming webhooks.
+
+    The header is an ES256-signed JWT whose request_body_sha256 claim is the hash of
+    the webhook body. Signing keys are looked up by the JWT's key ID and cached, so
+    Plaid is only asked for a key the first time it is seen.
+    """
+
+    def __init__(self, key_fetcher: Callable[[str], Dict[str, Any]] = fetch_verification_key,
+                 max_age: int = MAX_WEBHOOK_AGE):
+        """
+        Args:
+            key_fetcher: Function that returns the JWK for a key ID
+            max_age: Maximum age in seconds of a webhook signature
+        """
+        self.key_fetcher = key_fetcher
+        self.max_age = max_age
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def verify(self, body: bytes, signed_jwt: Optional[str]) -> bool:
+        """
+        Check that a webhook was sent by Plaid and hasn't been tampered with
+
+        Args:
+            body: The raw request body
+            signed_jwt: The value of the Plaid-Verification header
+
+        Returns:
+            bool: True if the webhook is genuine, False otherwise
+        """
+        if not signed_jwt:
+            logger.warning("Rejected Plaid webhook without a Plaid-Verification header")
+            return False
+
+        try:
+            header = jwt.get_unverified_header(signed_jwt)
+            if header.get('alg') != 'ES256':
+                logger.warning(f"Rejected Plaid webhook signed with {header.get('alg')}")
+                return False
+
+            key = self._get_key(header.get('kid'))
+            if key is None:
+                return False
+
+            claims = jwt.decode(signed_jwt, key=key, algorithms=['ES256'], options={'require': ['iat']})
+            if time.time() - claims['iat'] > self.max_age:
+                logger.warning("Rejected Plaid webhook with an expired signature")
+                return False
+
+            body_hash = hashlib.sha256(body).hexdigest()
+            if not hmac.compare_digest(body_hash, str(claims.get('request_body_sha256', ''))):
+                logger.warning("Rejected Plaid webhook whose body doesn't match its signature")
+                return False
+
+            return True
+        except Exception as e:
+            logger.warning(f"Rejected Plaid webhook: {str(e)}")
+            return False
+
+    def _get_key(self, key_id: Optional[str]):
+        """Get the public key for a key ID, fetching it from Plaid the first time"""
+        if not key_id:
+            logger.warning("Rejected Plaid webhook without a key ID")
+            return None
+
+        with self._lock:
+            if key_id in self._keys:
+                return self._keys[key_id]
+
+        jwk = self.key_fetcher(key_id)
+        if not jwk or jwk.get('expired_at'):
+            logger.warning(f"Rejected Plaid webhook signed with expired or unknown key {key_id}")
+            return None
+
+        key = ECAlgorithm.from_jwk(json.dumps({k: v for k, v in jwk.items() if k in ('kty', 'crv', 'x', 'y', 'kid', 'alg', 'use')}))
+        with self._lock:
+            self._keys[key_id] = key
+        return key
+
+
+def parse_webhook(body: bytes) -> Optional[Dict[str, Any]]:
+    """Parse a webhook body, or return None if it isn't a JSON object"""
+    try:
+        payload = parse_plaid_json(body)
+    except Exception:
+        return None
+    return payload if isinstance(payload, dict) else None
+
+
+def webhook_job(payload: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """
+    Work out what a webhook asks us to do
+
+    Returns:
+        (job, item_id) for webhooks we act on, None for everything else
+    """
+    job = WEBHOOK_JOBS.get((payload.get('webhook_type'), payload.get('webhook_code')))
+    item_id = payload.get('item_id')
+    if not job or not item_id:
+        return None
+    return job, item_id
+
+
+def webhook_job_key(job: str, item_id: str, payload: Dict[str, Any]) -> Tuple[str, str, Optional[str]]:
+    """Jobs with the same key do the same work; ITEM status changes are kept apart by code"""
+    return job, item_id, payload.get('webhook_code') if job == 'item_status' else None
+
+
+def run_webhook_job(job: str, item_id: str, payload: Dict[str, Any]) -> bool:
+    """
+    Run the targeted sync for a webhook
+
+    Returns:
+        bool: True if the sync succeeded, False otherwise
+
+    Raises:
+        ItemSyncBusy: If another sync held the item, which may have missed the changes
+                      this webhook announced
+    """
+    from .services import PlaidService
+
+    service = PlaidService()
+    if job == 'transactions':
+        summary = service.sync_plaid_item_transactions(item_id)
+        logger.info(f"Webhook transactions sync for item {item_id}: {summary}")
+        if summary and summary.get('busy'):
+            raise ItemSyncBusy(f"Plaid item {item_id} is being synced by another process")
+        return summary is not None
+    elif job == 'holdings':
+        success = service.sync_plaid_item_holdings(item_id)
+        logger.info(f"Webhook holdings sync for item {item_id}: {'succeeded' if success else 'failed'}")
+        return success
+    elif job == 'item_status':
+        return service.update_item_from_webhook(item_id, payload.get('webhook_code'), payload.get('error'))
+    return False
+
+
+class PlaidWebhookQueue:
+    """
+    Queue of webhook jobs, run one at a time by a background thread.
+
+    The webhook endpoint only enqueues, so Plaid gets its response straight away.
+    Plaid often sends several webhooks for an item in a burst; a job is dropped if
+    the same job for the same item is still waiting, since one sync picks up every
+    change. A job that is already running doesn't count, so changes that arrive
+    during a sync get a sync of their own. When that sync finds the item held by a
+    sync from elsewhere (ItemSyncBusy), the job is queued again after busy_retry_delay.
+    """
+
+    def __init__(self, handler: Callable[[str, str, Dict[str, Any]], None] = run_webhook_job,
+                 busy_retry_delay: float = BUSY_RETRY_DELAY):
+        """
+        Args:
+            handler: Function called with (job, item_id, payload) for each job
+            busy_retry_delay: Seconds to wait before running a job whose item was busy again
+        """
+        self.handler = handler
+        self.busy_retry_delay = busy_retry_delay
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def enqueue(self, job: str, item_id: str, payload: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Queue a job for an item
+
+        Returns:
+            bool: True if queued, False if the same job was already waiting
+        """
+        payload = payload or {}
+        key = self._job_key(job, item_id, payload)
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='plaid-webhooks', daemon=True)
+                self._thread.start()
+        self._queue.put((key, job, item_id, payload))
+        return True
+
+    def join(self) -> None:
+        """Wait until every queued job has run"""
+        self._queue.join()
+
+    def _job_key(self, job: str, item_id: str, payload: Dict[str, Any]) -> Tuple[str, str, Optional[str]]:
+        return webhook_job_key(job, item_id, payload)
+
+    def _run(self) -> None:
+        """Run jobs as they arrive"""
+        while True:
+            key, job, item_id, payload = self._queue.get()
+            with self._lock:
+                self._pending.discard(key)
+            # The thread lives as long as the process; jobs use the ORM (leases, snapshots)
+            close_old_connections()
+            try:
+                self.handler(job, item_id, payload)
+            except ItemSyncBusy as e:
+                logger.info(f"{str(e)}, running the {job} webhook job again in {self.busy_retry_delay}s")
+                retry = threading.Timer(self.busy_retry_delay, self.enqueue, args=(job, item_id, payload))
+                retry.daemon = True
+                retry.start()
+            except Exception as e:
+                logger.error(f"Error running {job} webhook job for item {item_id}: {str(e)}")
+            finally:
+                close_old_connections()
+                self._queue.task_done()
+
+
+# Shared by the webhook endpoint in this process
+plaid_webhook_verifier = PlaidWebhookVerifier()
+plaid_webhook_queue = PlaidWebhookQueue()
+
+
+def handle_plaid_webhook(body: bytes, signed_jwt: Optional[str]) -> Tuple[int, Dict[str, Any]]:
+    """
+    Verify a Plaid webhook and queue the sync it asks for
+
+    Args:
+        body: The raw request body
+        signed_jwt: The value of the Plaid-Verification header
+
+    Returns:
+        (HTTP status, response body)
+    """
+    if getattr(settings, 'PLAID_WEBHOOK_VERIFY', True) and not plaid_webhook_verifier.verify(body, signed_jwt):
+        return 401, {'error': 'Invalid webhook signature'}
+
+    payload = parse_webhook(body)
+    if payload is None:
+        return 400, {'error': 'Invalid webhook body'}
+
+    logger.info(f"Received Plaid webhook {payload.get('webhook_type')}/{payload.get('webhook_code')} for item {payload.get('item_id')}")
+
+    target = webhook_job(payload)
+    if target is None:
+        return 200, {'status': 'ignored'}
+
+    job, item_id = target
+    if getattr(settings, 'PLAID_JOB_QUEUE', False):
+        return 200, enqueue_webhook_job(job, item_id, payload)
+    queued = plaid_webhook_queue.enqueue(job, item_id, payload)
+    return 200, {'status': 'queued' if queued else 'already_queued', 'job': job}
+
+
+def enqueue_webhook_job(job: str, item_id: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Hand a webhook's job to the job queue, merging it with the same job if that is still waiting"""
+    from .jobs import PRIORITY_WEBHOOK, enqueue_job
+
+    dedup_key = ':'.join(part for part in ('webhook',) + webhook_job_key(job, item_id, payload) if part)
+    queued = enqueue_job(
+        'webhook',
+        {'job': job, 'item_id': item_id, 'webhook': payload},
+        priority=PRIORITY_WEBHOOK,
+        dedup_key=dedup_key
+    )
+    if queued is None:
+        # Don't lose the webhook because the queue is unavailable
+        plaid_webhook_queue.enqueue(job, item_id, payload)
+    return {'status': 'queued', 'job': job}
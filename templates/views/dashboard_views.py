@@ -12,8 +12,13 @@ import json
 import logging
 import random
 
+from dashboard.frames import TransactionFrame
 from supabase_integration.adapter import SupabaseAdapter
+from supabase_integration.queries import TransactionQuery
+from supabase_integration.rollups import monthly_rollups_enabled, summarize_rollups
 from supabase_integration.services import SupabaseService
+from supabase_integration.scheduler import record_dashboard_visit
+from supabase_integration.snapshots import get_dashboard_snapshot, save_dashboard_snapshot
 from supabase_integration.utils import is_investment_account
 
 logger = logging.getLogger(__name__)
@@ -28,6 +33,14 @@ def dashboard_view(request):
             messages.error(request, "Unable to retrieve your Supabase ID. Please log in again.")
             return render(request, 'dashboard/dashboard.html', {'error': "User ID not available", 'has_plaid_data': False})
         
+        # Scheduled refreshes favour users who look at their data
+        record_dashboard_visit(supabase_id)
+        
+        # Serve the stored dashboard while none of the user's data has changed since it was computed
+        snapshot, snapshot_version = get_dashboard_snapshot(supabase_id)
+        if snapshot is not None:
+            return render(request, 'dashboard/dashboard.html', snapshot)
+        
         adapter = SupabaseAdapter()
         
         # Fetch accounts from Supabase
@@ -52,12 +65,22 @@ def dashboard_view(request):
         today = datetime.now().date()
         first_day = today.replace(day=1)
         
-        # Get transactions for the current month
-        transactions = adapter.get_transactions(supabase_id, first_day.isoformat(), today.isoformat())
-        
-        # Calculate monthly income and expenses
-        monthly_income = sum(abs(float(t.get('amount', 0))) for t in transactions if float(t.get('amount', 0)) < 0)
-        monthly_expenses = sum(float(t.get('amount', 0)) for t in transactions if float(t.get('amount', 0)) > 0)
+        if monthly_rollups_enabled():
+            # The month's totals are pre-aggregated, so only the few transactions shown are read
+            month = summarize_rollups(adapter.get_monthly_rollups(supabase_id, first_day, first_day), exclude_classes=()).get(first_day, {})
+            monthly_income = month.get('income', 0)
+            monthly_expenses = month.get('spending', 0)
+            transactions = adapter.query_transactions(
+                TransactionQuery(supabase_id, start_date=first_day, end_date=today, page_size=5)
+            )['transactions']
+        else:
+            # Get transactions for the current month
+            transactions = adapter.get_transactions(supabase_id, first_day.isoformat(), today.isoformat())
+            
+            # Calculate monthly income and expenses
+            frame = TransactionFrame(transactions)
+            monthly_income = frame.total(frame.income, values=-frame.amount)
+            monthly_expenses = frame.total(frame.expense)
         
         # Calculate savings rate
         savings_rate = 0
@@ -117,9 +140,10 @@ def dashboard_view(request):
         
         # Add asset allocation data for charts
         try:
-            # Fetch securities and holdings data
-            securities = adapter.get_securities(supabase_id)
-            holdings = adapter.get_holdings(supabase_id)
+            # Fetch holdings together with their securities in one request
+            investments = adapter.get_investment_positions(supabase_id, account_ids=[account['id'] for account in accounts if account.get('id')])
+            securities = investments['securities']
+            holdings = investments['holdings']
             
             # Create a dictionary mapping security IDs to securities
             security_lookup = {}
@@ -327,6 +351,10 @@ def dashboard_view(request):
             'historical_data': json.dumps(historical_data)
         }
         
+        # A failed account read looks like a user without accounts, so that isn't kept
+        if accounts:
+            save_dashboard_snapshot(supabase_id, snapshot_version, context)
+        
         return render(request, 'dashboard/dashboard.html', context)
         
     except Exception as e:
@@ -357,9 +385,10 @@ def portfolio_view(request):
     total_value = sum(float(account.get('portfolio_value', 0) or float(account.get('current_balance', 0) or 0)) for account in investment_accounts)
     
     try:
-        # Fetch securities and holdings data
-        securities = adapter.get_securities(supabase_id)
-        holdings = adapter.get_holdings(supabase_id)
+        # Fetch holdings together with their securities in one request
+        investments = adapter.get_investment_positions(supabase_id, account_ids=[account['id'] for account in accounts if account.get('id')])
+        securities = investments['securities']
+        holdings = investments['holdings']
         
         # Log the data counts we're working with
         logger.info(f"Found {len(securities)} securities and {len(holdings)} holdings")
@@ -671,12 +700,30 @@ def transactions_view(request):
             
         extended_start_date_str = extended_start_date.date().isoformat()
         
-        # Get all transactions for this extended period
-        extended_transactions = adapter.get_transactions(
-            supabase_id,
-            start_date=extended_start_date_str,
-            end_date=end_date_str
-        )
+        if monthly_rollups_enabled():
+            # Read the months' pre-aggregated totals instead of their transactions, newest month first
+            months = summarize_rollups(adapter.get_monthly_rollups(supabase_id, extended_start_date.date(), end_date), exclude_classes=())
+            for month in sorted(months, reverse=True):
+                monthly_cashflow[month.strftime('%B')] = {'inflow': months[month]['income'], 'outflow': months[month]['spending']}
+            extended_transactions = []
+        else:
+            month_totals = adapter.summarize_transactions(
+                TransactionQuery(supabase_id, start_date=extended_start_date_str, end_date=end_date_str), 'month'
+            )
+            if month_totals is not None:
+                # Summed in the database, newest month first
+                for row in sorted(month_totals, key=lambda row: row['key'], reverse=True):
+                    month_cashflow = monthly_cashflow.setdefault(date.fromisoformat(row['key']).strftime('%B'), {'inflow': 0, 'outflow': 0})
+                    month_cashflow['inflow'] += float(row['income'])
+                    month_cashflow['outflow'] += float(row['spending'])
+                extended_transactions = []
+            else:
+                # Get all transactions for this extended period
+                extended_transactions = adapter.get_transactions(
+                    supabase_id,
+                    start_date=extended_start_date_str,
+                    end_date=end_date_str
+                )
         
         # Calculate cash flow by month
         for transaction in extended_transactions: